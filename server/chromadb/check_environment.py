@@ -1,9 +1,16 @@
+import os
 import sys
-import subprocess
+import argparse
 from pathlib import Path
 
-def check_environment():
-    """Check if environment is ready for ChromaDB MCP."""
+from perf_doctor import run_doctor, print_report, write_report
+
+DEFAULT_CHROMA_PATH = r"C:\Users\vikym\Documents\GitHub\llmAgent\chromaDB_MCP\chroma_data"
+
+def check_environment(args=None):
+    """Check if environment is ready for ChromaDB MCP, then measure its performance."""
+    if args is None:
+        args = create_parser().parse_args([])
     
     print("🔍 Environment Check\n" + "="*50)
     
@@ -13,17 +20,20 @@ def check_environment():
     
     # Check required packages
     print("\n📦 Checking packages:")
-    packages = ["chromadb", "sentence_transformers", "mcp", "fastmcp", "torch"]
+    packages = ["chromadb", "sentence_transformers", "mcp", "fastmcp", "torch", "onnxruntime"]
     missing = []
+    versions = {}
     
     for pkg in packages:
         try:
             mod = __import__(pkg)
             version = getattr(mod, "__version__", "unknown")
             print(f"  ✓ {pkg}: {version}")
+            versions[pkg] = version
         except ImportError:
             print(f"  ✗ {pkg}: NOT INSTALLED")
             missing.append(pkg)
+            versions[pkg] = None
     
     if missing:
         print(f"\n⚠️  Missing packages: {', '.join(missing)}")
@@ -31,7 +41,7 @@ def check_environment():
     
     # Check ChromaDB data folder
     print("\n📂 Checking data folder:")
-    chroma_path = Path(r"C:\Users\vikym\Documents\GitHub\llmAgent\chromaDB_MCP\chroma_data")
+    chroma_path = Path(args.data_dir)
     
     if chroma_path.exists():
         print(f"  ✓ Folder exists: {chroma_path}")
@@ -111,6 +121,19 @@ def check_environment():
     else:
         print(f"  ⚠️  Settings file not found (optional): {vscode_settings}")
     
+    # Performance doctor
+    report = None
+    if not args.skip_performance:
+        report = run_doctor(
+            chroma_path if chroma_path.exists() else None,
+            models=args.models,
+            json_data_dir=Path(__file__).parent / "json_data",
+            skip_embeddings=args.skip_embeddings,
+            skip_disk=args.skip_disk,
+        )
+        report["packages"] = versions
+        print_report(report)
+    
     print("\n" + "="*50)
     print("\n✅ Environment check complete!")
     
@@ -118,6 +141,26 @@ def check_environment():
         print("🎉 Your setup looks good! Ready to use ChromaDB MCP.")
     else:
         print("⚠️  Some issues found. Please fix them before proceeding.")
+    
+    if report is not None and args.report:
+        write_report(report, args.report)
+    return report
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description="Check the ChromaDB MCP environment and its performance")
+    parser.add_argument("--data-dir", default=os.getenv("CHROMA_DATA_DIR", DEFAULT_CHROMA_PATH),
+                        help="Persistent ChromaDB directory")
+    parser.add_argument("--model", action="append", dest="models",
+                        help="Embedding model to benchmark, e.g. sentence-transformers:all-MiniLM-L6-v2 "
+                             "or chroma:default (repeatable; default: the models this repo uses)")
+    parser.add_argument("--skip-performance", action="store_true", help="Only run the setup checks")
+    parser.add_argument("--skip-embeddings", action="store_true", help="Don't benchmark embedding models")
+    parser.add_argument("--skip-disk", action="store_true", help="Don't measure disk read throughput")
+    parser.add_argument("--report", default=None,
+                        help="Write the JSON report to this file (compare hosts with: python perf_doctor.py compare a.json b.json)")
+    return parser
+
 
 if __name__ == "__main__":
-    check_environment()
+    check_environment(create_parser().parse_args())
@@ -0,0 +1,392 @@
+"""
+Bulk export/import of Chroma collections without re-embedding.
+
+A dump is a directory with three files:
+    manifest.json   - collection name, metadata, HNSW configuration, embedding function,
+                      count, dimension and, for sharded collections, the shard key
+    records.jsonl   - one {"id", "document", "metadata"} object per line
+    embeddings.npy  - float32 matrix, row i belongs to line i of records.jsonl
+
+Export pages through the collection so only one batch is in memory at a
+time. Import memory-maps embeddings.npy and streams records.jsonl, so
+multi-GB dumps don't need to fit in RAM.
+
+The HNSW configuration (space, ef_*, max_neighbors) is recorded so an
+import that creates the collection gets the same distance space and graph
+settings. A sharded collection (see sharding.py) is exported from all of
+its shards into one dump and imported back into a sharded collection,
+which routes every row to its shard again.
+
+Usage:
+    python collection_io.py export policy_documents ./dumps/policy_documents --data-dir ./chroma_data
+    python collection_io.py import ./dumps/policy_documents --data-dir ./chroma_data --collection policy_documents
+"""
+
+import json
+import sys
+import time
+import argparse
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Any, List, Set
+import numpy as np
+import chromadb
+from chromadb.errors import NotFoundError
+
+from sharding import SHARD_MODEL_FIELD, ShardRouter, is_sharded
+
+DUMP_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+RECORDS_FILE = "records.jsonl"
+EMBEDDINGS_FILE = "embeddings.npy"
+
+
+def _embedding_function_name(collection) -> str | None:
+    """Best-effort name of the collection's embedding function, for the manifest."""
+    ef = getattr(collection, "_embedding_function", None)
+    if ef is None:
+        return None
+    try:
+        return ef.name()
+    except Exception:
+        return type(ef).__name__
+
+
+def hnsw_configuration(collection) -> Dict[str, Any] | None:
+    """The collection's HNSW configuration (space, ef_*, max_neighbors, ...), if Chroma exposes it."""
+    try:
+        hnsw = (collection.configuration or {}).get("hnsw")
+    except Exception:
+        return None
+    return {k: v for k, v in dict(hnsw).items() if v is not None} if hnsw else None
+
+
+def export_collection(
+    collection,
+    out_dir: str,
+    batch_size: int = 1000,
+    where: Dict | None = None,
+    client=None,
+) -> Dict[str, Any]:
+    """
+    Export IDs, documents, metadata and stored embeddings of a collection.
+
+    Args:
+        collection: Chroma collection to export
+        out_dir: Directory to write the dump into (created if missing)
+        batch_size: Number of rows fetched from Chroma per round trip
+        where: Optional metadata filter restricting the exported rows
+        client: Chroma client owning the collection; required for sharded collections
+
+    Returns:
+        The manifest that was written
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer.")
+
+    shard_key = None
+    sources = [collection]
+    if is_sharded(collection):
+        if client is None:
+            raise ValueError(f"Exporting sharded collection '{collection.name}' requires its client.")
+        router = ShardRouter(client, collection)
+        shard_key = router.shard_key
+        sources = list(router.shards().values())
+
+    out_path = Path(out_dir)
+    out_path.mkdir(parents=True, exist_ok=True)
+
+    if where is None:
+        totals = [source.count() for source in sources]
+    else:
+        totals = [len(source.get(where=where, include=[])["ids"]) for source in sources]
+    total = sum(totals)
+
+    started = time.perf_counter()
+    embeddings_out = None
+    dimension = None
+    written = 0
+
+    with open(out_path / RECORDS_FILE, "w", encoding="utf-8") as records_out:
+        for source, source_total in zip(sources, totals):
+            exported = 0
+            while exported < source_total:
+                batch = source.get(
+                    where=where,
+                    include=["documents", "metadatas", "embeddings"],
+                    limit=min(batch_size, source_total - exported),
+                    offset=exported,
+                )
+                if not batch["ids"]:
+                    break
+
+                vectors = np.asarray(batch["embeddings"], dtype=np.float32)
+                if embeddings_out is None:
+                    dimension = vectors.shape[1]
+                    embeddings_out = np.lib.format.open_memmap(
+                        out_path / EMBEDDINGS_FILE, mode="w+", dtype=np.float32, shape=(total, dimension)
+                    )
+                embeddings_out[written:written + len(vectors)] = vectors
+
+                for doc_id, document, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                    records_out.write(json.dumps(
+                        {"id": doc_id, "document": document, "metadata": metadata},
+                        ensure_ascii=False,
+                    ) + "\n")
+                exported += len(batch["ids"])
+                written += len(batch["ids"])
+
+    if embeddings_out is None:
+        np.save(out_path / EMBEDDINGS_FILE, np.zeros((0, 0), dtype=np.float32))
+    else:
+        embeddings_out.flush()
+        del embeddings_out
+        if written < total:
+            # Rows were deleted while exporting; rewrite the matrix at its real size.
+            trimmed = np.load(out_path / EMBEDDINGS_FILE, mmap_mode="r")[:written].copy()
+            np.save(out_path / EMBEDDINGS_FILE, trimmed)
+
+    manifest = {
+        "format_version": DUMP_FORMAT_VERSION,
+        "collection_name": collection.name,
+        "collection_metadata": collection.metadata,
+        "hnsw": hnsw_configuration(collection),
+        "shard_key": shard_key,
+        "embedding_function": _embedding_function_name(collection),
+        "where": where,
+        "count": written,
+        "dimension": dimension,
+        "dtype": "float32",
+        "export_seconds": round(time.perf_counter() - started, 3),
+    }
+    with open(out_path / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def copy_rows(source, target, batch_size: int = 1000, where: Dict | None = None) -> int:
+    """
+    Copy rows with their stored embeddings from one collection to another.
+
+    Args:
+        source: Collection to read from
+        target: Collection to write into (rows are upserted)
+        batch_size: Number of rows per round trip
+        where: Optional metadata filter restricting the copied rows
+
+    Returns:
+        Number of rows copied
+    """
+    copied = 0
+    while True:
+        batch = source.get(
+            where=where,
+            include=["documents", "metadatas", "embeddings"],
+            limit=batch_size,
+            offset=copied,
+        )
+        if not batch["ids"]:
+            return copied
+        target.upsert(
+            ids=batch["ids"],
+            embeddings=np.asarray(batch["embeddings"], dtype=np.float32),
+            documents=batch["documents"],
+            metadatas=[m or None for m in batch["metadatas"]],
+        )
+        copied += len(batch["ids"])
+
+
+def read_manifest(in_dir: str) -> Dict[str, Any]:
+    """Read and validate the manifest of a dump directory."""
+    manifest_path = Path(in_dir) / MANIFEST_FILE
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"No {MANIFEST_FILE} found in {in_dir}")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != DUMP_FORMAT_VERSION:
+        raise ValueError(f"Unsupported dump format version: {manifest.get('format_version')}")
+    return manifest
+
+
+def get_or_create_target(client, name: str, manifest: Dict[str, Any], embedding_function=None):
+    """
+    Collection to import a dump into, created with the dump's HNSW settings if it doesn't exist.
+
+    A dump of a sharded collection is imported into a new sharded collection
+    with the same shard key.
+
+    Args:
+        client: Chroma client
+        name: Target collection name
+        manifest: Manifest of the dump (see read_manifest)
+        embedding_function: Embedding function for a newly created collection
+
+    Returns:
+        The existing or newly created collection
+    """
+    try:
+        return client.get_collection(name)
+    except NotFoundError:
+        pass
+    configuration: Dict[str, Any] = {}
+    if manifest.get("hnsw"):
+        configuration["hnsw"] = manifest["hnsw"]
+    if embedding_function is not None:
+        configuration["embedding_function"] = embedding_function
+    metadata = manifest.get("collection_metadata")
+    if manifest.get("shard_key"):
+        return ShardRouter.create(
+            client, name, manifest["shard_key"],
+            embedding_model=(metadata or {}).get(SHARD_MODEL_FIELD) or manifest.get("embedding_function"),
+            configuration=configuration or None,
+            metadata=metadata,
+        ).anchor
+    return client.create_collection(name, configuration=configuration or None, metadata=metadata)
+
+
+def import_collection(
+    collection,
+    in_dir: str,
+    batch_size: int = 5000,
+    upsert: bool = False,
+    client=None,
+) -> Dict[str, Any]:
+    """
+    Load a dump produced by export_collection into a collection.
+
+    Embeddings are memory-mapped and records are streamed line by line, so
+    only one batch is materialized at a time.
+
+    Args:
+        collection: Target Chroma collection (see get_or_create_target)
+        in_dir: Dump directory
+        batch_size: Number of rows written to Chroma per call
+        upsert: Use upsert instead of add, so existing IDs are overwritten; otherwise
+                rows whose ID already exists are skipped (and counted as skipped)
+        client: Chroma client owning the collection; required for sharded collections
+
+    Returns:
+        Import statistics
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer.")
+
+    manifest = read_manifest(in_dir)
+    in_path = Path(in_dir)
+    embeddings = np.load(in_path / EMBEDDINGS_FILE, mmap_mode="r")
+    if manifest["count"] and embeddings.shape[0] != manifest["count"]:
+        raise ValueError(
+            f"Dump is inconsistent: manifest lists {manifest['count']} rows but "
+            f"{EMBEDDINGS_FILE} has {embeddings.shape[0]}"
+        )
+
+    if is_sharded(collection):
+        if client is None:
+            raise ValueError(f"Importing into sharded collection '{collection.name}' requires its client.")
+        router = ShardRouter(client, collection)
+
+        def write(**rows):
+            router.write(upsert=upsert, **rows)
+
+        def existing(ids: List[str]) -> Set[str]:
+            return set(router.locate(ids))
+    else:
+        write = collection.upsert if upsert else collection.add
+
+        def existing(ids: List[str]) -> Set[str]:
+            return set(collection.get(ids=ids, include=[])["ids"])
+    started = time.perf_counter()
+    read = 0
+    imported = 0
+    skipped = 0
+    batches = 0
+
+    with open(in_path / RECORDS_FILE, "r", encoding="utf-8") as records_in:
+        while True:
+            lines = list(islice(records_in, batch_size))
+            if not lines:
+                break
+            records = [json.loads(line) for line in lines]
+            vectors = np.ascontiguousarray(embeddings[read:read + len(records)], dtype=np.float32)
+            read += len(records)
+            batches += 1
+            if not upsert:
+                # Chroma's add silently ignores existing IDs; leave them out so they aren't counted as imported.
+                present = existing([r["id"] for r in records])
+                if present:
+                    keep = [n for n, r in enumerate(records) if r["id"] not in present]
+                    records, vectors = [records[n] for n in keep], vectors[keep]
+                    skipped += len(present)
+                if not records:
+                    continue
+            write(
+                ids=[r["id"] for r in records],
+                embeddings=vectors,
+                documents=[r["document"] for r in records],
+                metadatas=[r["metadata"] or None for r in records],
+            )
+            imported += len(records)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "collection_name": collection.name,
+        "hnsw": hnsw_configuration(collection),
+        "imported": imported,
+        "skipped": skipped,
+        "batches": batches,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(imported / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def create_parser():
+    """Create and return the argument parser."""
+    parser = argparse.ArgumentParser(description='Export/import Chroma collections with their embeddings')
+    parser.add_argument('--data-dir', default='./chroma_data',
+                        help='Directory of the persistent Chroma client')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = sub.add_parser('export', help='Export a collection to a dump directory')
+    export_parser.add_argument('collection', help='Name of the collection to export')
+    export_parser.add_argument('out_dir', help='Directory to write the dump into')
+    export_parser.add_argument('--batch-size', type=int, default=1000)
+    export_parser.add_argument('--where', type=json.loads, default=None,
+                               help='Optional metadata filter as JSON')
+
+    import_parser = sub.add_parser('import', help='Import a dump directory into a collection')
+    import_parser.add_argument('in_dir', help='Dump directory written by export')
+    import_parser.add_argument('--collection', default=None,
+                               help='Target collection (default: name stored in the dump)')
+    import_parser.add_argument('--batch-size', type=int, default=5000)
+    import_parser.add_argument('--upsert', action='store_true',
+                               help='Overwrite existing IDs instead of skipping them')
+    return parser
+
+
+def main():
+    """Command line entry point."""
+    args = create_parser().parse_args()
+    client = chromadb.PersistentClient(path=args.data_dir)
+
+    if args.command == 'export':
+        collection = client.get_collection(args.collection)
+        manifest = export_collection(collection, args.out_dir, batch_size=args.batch_size, where=args.where,
+                                     client=client)
+        print(f"✓ Exported {manifest['count']} documents from '{args.collection}' to {args.out_dir} "
+              f"in {manifest['export_seconds']}s")
+    else:
+        manifest = read_manifest(args.in_dir)
+        name = args.collection or manifest["collection_name"]
+        collection = get_or_create_target(client, name, manifest)
+        stats = import_collection(collection, args.in_dir, batch_size=args.batch_size, upsert=args.upsert,
+                                  client=client)
+        print(f"✓ Imported {stats['imported']} documents ({stats['skipped']} existing skipped) into '{name}' in {stats['batches']} batches "
+              f"({stats['seconds']}s)")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
@@ -0,0 +1,62 @@
+"""
+Cheap change markers for collections of a persistent Chroma data dir.
+
+Derived state the server keeps in memory (local engine matrices, cached
+query results) goes stale when another process writes to the same data
+dir: an ingest script, the ingest watcher or a second server. Chroma
+records, per segment, the sequence number of the last write it applied
+in the `max_seq_id` table of chroma.sqlite3; every add, update, upsert
+and delete advances it, whichever process made the write.
+DataVersionProbe reads those numbers over a read-only SQLite connection,
+so one indexed lookup tells whether a collection changed since a snapshot
+was taken.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, Tuple
+
+_VERSION_QUERY = """
+    SELECT s.collection, MAX(m.seq_id)
+    FROM max_seq_id m JOIN segments s ON s.id = m.segment_id
+    WHERE s.collection IN ({placeholders})
+    GROUP BY s.collection
+"""
+
+
+class DataVersionProbe:
+    """Reads per-collection write sequence numbers from a Chroma SQLite file."""
+
+    def __init__(self, sqlite_path: str):
+        """
+        Args:
+            sqlite_path: Path of chroma.sqlite3 inside a persistent data dir
+        """
+        self.sqlite_path = Path(sqlite_path)
+        # sqlite3 connections must not be shared between threads.
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            uri = f"{self.sqlite_path.resolve().as_uri()}?mode=ro"
+            connection = sqlite3.connect(uri, uri=True, timeout=5.0)
+            self._local.connection = connection
+        return connection
+
+    def version(self, collection_ids: Iterable[str]) -> Tuple:
+        """
+        Version token of a set of collections; it changes whenever any of them is written.
+
+        Args:
+            collection_ids: IDs of the collections (e.g. a sharded collection's anchor and shards)
+
+        Returns:
+            Hashable token; collections without any write yet contribute nothing
+        """
+        ids = sorted({str(collection_id) for collection_id in collection_ids})
+        if not ids:
+            return ()
+        query = _VERSION_QUERY.format(placeholders=", ".join("?" * len(ids)))
+        return tuple(sorted(self._connection().execute(query, ids).fetchall()))
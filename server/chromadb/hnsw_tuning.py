@@ -0,0 +1,337 @@
+"""
+HNSW parameter handling, index rebuilds and recall-vs-latency sweeps.
+
+Chroma fixes `ef_construction` and `max_neighbors` (M) when a collection is
+created, so changing them means building a new index. rebuild_collection()
+does that by copying the stored embeddings into a fresh collection with the
+new settings and swapping it in under the original name; nothing is
+re-embedded. `ef_search` is a query-time setting and is modified in place.
+A sharded collection is rebuilt shard by shard, then its (empty) anchor, so
+shards created later inherit the new settings.
+
+A rebuild does not lock out writers itself (the server refuses its own
+writes meanwhile, see write_guard.py). Given a `version` function (see
+data_version.py) it checks that nothing was written to the collection
+while its rows were copied, and gives up without changing anything if so.
+
+sweep() builds a throwaway copy of a collection per candidate setting, runs
+sample queries against it and reports recall@k (against exact brute-force
+results from local_engine) next to query latency, so settings can be chosen
+per collection. The copy of a sharded collection is sharded the same way and
+queried through a ShardRouter, so recall and latency include the merge.
+"""
+
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+
+from collection_io import copy_rows
+from local_engine import LocalVectorIndex, collection_space
+from mcp_shared.collection_metadata import modifiable_metadata
+from sharding import SHARD_OF_FIELD, ShardRouter, is_sharded, shard_name
+
+# HNSW settings that can only be set when the index is built.
+BUILD_TIME_KEYS = ("space", "ef_construction", "max_neighbors")
+
+# HNSW settings Chroma allows changing on an existing collection.
+MUTABLE_KEYS = ("ef_search", "num_threads", "batch_size", "sync_threshold", "resize_factor")
+
+
+def hnsw_config(
+    space: str | None = None,
+    ef_construction: int | None = None,
+    ef_search: int | None = None,
+    max_neighbors: int | None = None,
+) -> Dict[str, Any]:
+    """Build an `hnsw` configuration dict from the non-None settings, validating them."""
+    if space is not None and space not in ("cosine", "l2", "ip"):
+        raise ValueError(f"Unknown HNSW space: {space}. Valid options: ['cosine', 'l2', 'ip']")
+    config = {
+        "space": space,
+        "ef_construction": ef_construction,
+        "ef_search": ef_search,
+        "max_neighbors": max_neighbors,
+    }
+    for key, value in config.items():
+        if key != "space" and value is not None and value <= 0:
+            raise ValueError(f"HNSW '{key}' must be a positive integer.")
+    return {k: v for k, v in config.items() if v is not None}
+
+
+def current_hnsw(collection) -> Dict[str, Any]:
+    """The collection's effective HNSW configuration."""
+    try:
+        return dict((collection.configuration or {}).get("hnsw") or {})
+    except Exception:
+        return {"space": collection_space(collection)}
+
+
+class ConcurrentWriteError(RuntimeError):
+    """Raised when a collection was written while a rebuild copied it; the rebuild is discarded."""
+
+
+def rebuild_collection(
+    client,
+    collection,
+    hnsw: Dict[str, Any],
+    batch_size: int = 1000,
+    swap: bool = True,
+    version: Callable[[Any], Any] | None = None,
+) -> Dict[str, Any]:
+    """
+    Rebuild a collection's index with new HNSW settings by copying its stored embeddings.
+
+    Args:
+        client: Chroma client owning the collection
+        collection: Collection to rebuild; for a sharded collection, its anchor
+        hnsw: New HNSW settings; unspecified ones keep their current values
+        batch_size: Rows copied per round trip
+        swap: Replace the original collection with the rebuilt one under the same name
+        version: Optional version(collection) -> token that changes on every write;
+                 a collection whose token changed during the copy is left as it was
+
+    Returns:
+        Rebuild statistics, including the old and new settings
+
+    Raises:
+        ConcurrentWriteError: A collection (or shard) was written while it was copied
+    """
+    old_hnsw = current_hnsw(collection)
+    new_hnsw = {k: v for k, v in {**old_hnsw, **hnsw}.items() if k in BUILD_TIME_KEYS + MUTABLE_KEYS}
+    name = collection.name
+    shards = ShardRouter(client, collection).shards() if is_sharded(collection) else {}
+
+    if all(new_hnsw.get(k) == old_hnsw.get(k) for k in BUILD_TIME_KEYS):
+        mutable = {k: v for k, v in hnsw.items() if k in MUTABLE_KEYS}
+        if mutable:
+            for target in [*shards.values(), collection]:
+                target.modify(configuration={"hnsw": mutable})
+        return {
+            "collection_name": name,
+            "rebuilt": False,
+            "old_hnsw": old_hnsw,
+            "new_hnsw": current_hnsw(collection),
+            "copied": 0,
+            "seconds": 0.0,
+        }
+
+    if shards and not swap:
+        raise ValueError("A sharded collection can only be rebuilt in place (swap=True).")
+    started = time.perf_counter()
+    copied = 0
+    # Shards first and the anchor last: if a shard fails, the anchor still
+    # has its old settings and a retry rebuilds every shard again.
+    for shard in shards.values():
+        copied += _rebuild_one(client, shard, new_hnsw, batch_size, swap, version)[1]
+    # The anchor holds no rows, so there are no writes to lose.
+    final_name, anchor_copied = _rebuild_one(client, collection, new_hnsw, batch_size, swap,
+                                             None if shards else version)
+    copied += anchor_copied
+
+    stats = {
+        "collection_name": final_name,
+        "rebuilt": True,
+        "old_hnsw": old_hnsw,
+        "new_hnsw": current_hnsw(client.get_collection(final_name)),
+        "copied": copied,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    if shards:
+        stats["shards"] = len(shards)
+    return stats
+
+
+def _rebuild_one(client, collection, new_hnsw: Dict[str, Any], batch_size: int, swap: bool,
+                 version: Callable[[Any], Any] | None) -> Tuple[str, int]:
+    """Copy one physical collection into a new one with `new_hnsw`; returns (final name, rows copied)."""
+    configuration: Dict[str, Any] = {"hnsw": new_hnsw}
+    embedding_function = getattr(collection, "_embedding_function", None)
+    if embedding_function is not None:
+        configuration["embedding_function"] = embedding_function
+
+    name = collection.name
+    before = version(collection) if version is not None else None
+    staging_name = f"{name}__rebuild_{uuid.uuid4().hex[:8]}"
+    metadata = modifiable_metadata(collection.metadata)
+    # A staging shard must not join its sharded collection before the swap.
+    staging_metadata = {k: v for k, v in metadata.items() if k != SHARD_OF_FIELD}
+    staging = client.create_collection(staging_name, configuration=configuration, metadata=staging_metadata or None)
+
+    def changed() -> bool:
+        return version is not None and version(collection) != before
+
+    try:
+        copied = copy_rows(collection, staging, batch_size=batch_size)
+        if changed():
+            raise ConcurrentWriteError(
+                f"Collection '{name}' was written during the rebuild; nothing was changed. "
+                f"Retry once writes have stopped."
+            )
+    except Exception:
+        client.delete_collection(staging_name)
+        raise
+    if not swap:
+        return staging_name, copied
+
+    # Move the old collection aside first so the name is never unbound for long.
+    backup_name = f"{name}__old_{uuid.uuid4().hex[:8]}"
+    collection.modify(name=backup_name)
+    if changed():
+        # A writer that resolved the collection before the rename got in last.
+        collection.modify(name=name)
+        client.delete_collection(staging_name)
+        raise ConcurrentWriteError(
+            f"Collection '{name}' was written during the rebuild; nothing was changed. Retry once writes have stopped."
+        )
+    if staging_metadata != metadata:
+        staging.modify(name=name, metadata=metadata)
+    else:
+        staging.modify(name=name)
+    client.delete_collection(backup_name)
+    return name, copied
+
+
+def _sources(client, collection) -> Dict[str | None, Any]:
+    """Collections holding the rows: the shards of a sharded collection by key value, else {None: collection}."""
+    return ShardRouter(client, collection).shards() if is_sharded(collection) else {None: collection}
+
+
+def sample_queries(client, collection, sample_size: int, seed: int = 0) -> np.ndarray:
+    """Use stored embeddings of randomly chosen rows (of any shard) as query vectors."""
+    sources = list(_sources(client, collection).values())
+    starts = np.cumsum([0] + [source.count() for source in sources])
+    count = int(starts[-1])
+    if count == 0:
+        raise ValueError(f"Collection '{collection.name}' is empty")
+    rng = np.random.default_rng(seed)
+    offsets = sorted(rng.choice(count, size=min(sample_size, count), replace=False).tolist())
+    vectors = []
+    for offset in offsets:
+        n = int(np.searchsorted(starts, offset, side="right")) - 1
+        row = sources[n].get(include=["embeddings"], limit=1, offset=offset - int(starts[n]))
+        vectors.append(np.asarray(row["embeddings"][0], dtype=np.float32))
+    return np.stack(vectors)
+
+
+def _exact_ids(sources: List, queries: np.ndarray, n_results: int) -> List[List[str]]:
+    """Exact top-k IDs per query over the rows of all `sources`, merged by distance like sharded queries."""
+    partials = [LocalVectorIndex.from_collection(source).query(queries, n_results=n_results, include=["distances"])
+                for source in sources]
+    exact = []
+    for qi in range(len(queries)):
+        hits = sorted((d, doc_id) for p in partials for doc_id, d in zip(p["ids"][qi], p["distances"][qi]))
+        exact.append([doc_id for _, doc_id in hits[:n_results]])
+    return exact
+
+
+def _build_trial(client, collection, sources: Dict[str | None, Any], trial_hnsw: Dict[str, Any],
+                 batch_size: int, created: List[str]) -> Callable[[np.ndarray, int], List[str]]:
+    """
+    Copy the rows into a temporary collection (sharded like the original) built with `trial_hnsw`.
+
+    Names of the collections created are appended to `created`.
+
+    Returns:
+        search(query vector, k) -> IDs, querying the trial the way the server queries the original
+    """
+    trial_name = f"{collection.name}__sweep_{uuid.uuid4().hex[:8]}"
+    configuration = {"hnsw": trial_hnsw}
+    if None in sources:
+        trial = client.create_collection(trial_name, configuration=configuration)
+        created.append(trial_name)
+        copy_rows(collection, trial, batch_size=batch_size)
+        return lambda query, k: trial.query(query_embeddings=query[None, :], n_results=k, include=[])["ids"][0]
+
+    router = ShardRouter(client, collection)
+    trial = ShardRouter.create(client, trial_name, router.shard_key, router.embedding_model, configuration=configuration)
+    created.append(trial_name)
+    for value, shard in sources.items():
+        metadata = modifiable_metadata(shard.metadata)
+        metadata[SHARD_OF_FIELD] = trial_name
+        trial_shard = client.create_collection(shard_name(trial_name, value), configuration=configuration, metadata=metadata)
+        created.append(trial_shard.name)
+        copy_rows(shard, trial_shard, batch_size=batch_size)
+    return lambda query, k: trial.query(query[None, :], n_results=k, include=[])["ids"][0]
+
+
+def sweep(
+    client,
+    collection,
+    candidates: List[Dict[str, Any]],
+    query_embeddings=None,
+    sample_size: int = 50,
+    n_results: int = 10,
+    batch_size: int = 1000,
+) -> Dict[str, Any]:
+    """
+    Measure recall@k and query latency for each candidate HNSW setting.
+
+    Each candidate is built as a temporary copy of the collection, which is
+    deleted afterwards. Ground truth comes from an exact search over the
+    same stored embeddings.
+
+    Args:
+        client: Chroma client owning the collection
+        collection: Collection to tune; for a sharded collection, its anchor
+        candidates: HNSW settings to try, e.g. [{"max_neighbors": 32, "ef_construction": 200, "ef_search": 64}]
+        query_embeddings: Optional query vectors; defaults to `sample_size` stored embeddings
+        sample_size: Number of stored embeddings used as queries when none are given
+        n_results: k for recall@k
+        batch_size: Rows copied per round trip while building candidates
+
+    Returns:
+        Report with one row per candidate, sorted by median latency
+    """
+    if not candidates:
+        raise ValueError("At least one candidate HNSW setting is required.")
+
+    sources = _sources(client, collection)
+    if query_embeddings is None:
+        queries = sample_queries(client, collection, sample_size)
+    else:
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+
+    exact = _exact_ids(list(sources.values()), queries, n_results)
+    base_hnsw = current_hnsw(collection)
+    rows = []
+
+    for candidate in candidates:
+        settings = hnsw_config(**candidate)
+        trial_hnsw = {k: v for k, v in {**base_hnsw, **settings}.items() if k in BUILD_TIME_KEYS + MUTABLE_KEYS}
+        created: List[str] = []
+        try:
+            build_started = time.perf_counter()
+            search = _build_trial(client, collection, sources, trial_hnsw, batch_size, created)
+            build_s = time.perf_counter() - build_started
+
+            latencies, recalls = [], []
+            for qi, query in enumerate(queries):
+                started = time.perf_counter()
+                found = search(query, n_results)
+                latencies.append(time.perf_counter() - started)
+                truth = set(exact[qi])
+                if truth:
+                    recalls.append(len(truth & set(found)) / len(truth))
+        finally:
+            for name in reversed(created):
+                client.delete_collection(name)
+
+        rows.append({
+            "hnsw": {k: trial_hnsw.get(k) for k in ("ef_construction", "max_neighbors", "ef_search")},
+            "recall_at_k": round(float(np.mean(recalls)), 4) if recalls else None,
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+            "build_seconds": round(build_s, 3),
+        })
+
+    rows.sort(key=lambda r: r["p50_ms"])
+    return {
+        "collection_name": collection.name,
+        "collection_size": sum(source.count() for source in sources.values()),
+        "space": base_hnsw.get("space"),
+        "queries": len(queries),
+        "n_results": n_results,
+        "current_hnsw": base_hnsw,
+        "results": rows,
+    }
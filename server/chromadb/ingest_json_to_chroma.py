@@ -6,16 +6,155 @@ This script:
 2. Extracts document chunks and their metadata
 3. Generates embeddings using sentence transformers
 4. Stores everything in ChromaDB
+
+Documents are embedded and committed in batches into a staging collection
+(`<collection>__staging`). After each batch, a manifest in the ChromaDB directory
+records how many documents are committed. If a run dies, the next run with the
+same input resumes after the last committed batch instead of re-embedding
+everything. Only a complete staging collection replaces the live one, so
+queries keep seeing the previous collection while a run is in progress.
+
+The swap renames the live collection to `<collection>__old_<time>`, the
+staging collection to `<collection>` and then drops the old one. It is
+recorded in the manifest first, and every step is skipped if already
+done, so a run that dies in between finishes the swap on the next start.
+A leftover `__old_*` collection without such a record is dropped if the
+live name is bound, and renamed back otherwise.
+
+A lock file per collection (`<collection>.ingest.lock` in the ChromaDB
+directory) keeps two runs, or a run and ingest_watcher.py, from writing
+to the same collection at once; the second one fails instead of waiting.
 """
 
+import argparse
+import hashlib
 import json
 import os
 import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any, Tuple
 import chromadb
 from sentence_transformers import SentenceTransformer
 
+from sharding import SHARD_OF_FIELD, ShardRouter, is_sharded
+from mcp_shared.embedding_cache import EmbeddingCache, cache_enabled
+from mcp_shared.reload_signal import notify_reload
+
+
+def load_json_file(json_file: Path) -> List[Dict[str, Any]]:
+    """
+    Load the documents of one JSON file, tagging each with its source file.
+    
+    Args:
+        json_file: Path of a JSON file holding one document or a list of them
+        
+    Returns:
+        Documents with `_source_file` and `_file_prefix` set
+    """
+    json_file = Path(json_file)
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    # Get filename without extension for prefixing IDs
+    file_prefix = json_file.stem.replace(" ", "_").replace("-", "_")
+    
+    documents = data if isinstance(data, list) else [data]
+    for doc in documents:
+        # Add source file info to each document
+        doc['_source_file'] = json_file.name
+        doc['_file_prefix'] = file_prefix
+    return documents
+
+
+def prepare_records(documents: List[Dict[str, Any]]) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """
+    Turn loaded JSON documents into ChromaDB ids, texts and metadatas.
+    
+    Documents without an id or text are skipped.
+    
+    Returns:
+        Tuple of (ids, texts, metadatas)
+    """
+    ids = []
+    texts = []
+    metadatas = []
+    
+    for doc in documents:
+        # Extract ID and make it unique by prefixing with source file
+        doc_id = doc.get("id", "")
+        if not doc_id:
+            continue
+        
+        # Create unique ID by combining file prefix with original ID
+        file_prefix = doc.get("_file_prefix", "unknown")
+        unique_id = f"{file_prefix}_{doc_id}"
+        
+        # Extract document text
+        doc_text = doc.get("document", "")
+        if not doc_text:
+            continue
+        
+        # Extract metadata and add source file info
+        metadata = doc.get("metadata", {})
+        metadata["source_file"] = doc.get("_source_file", "unknown")
+        
+        ids.append(unique_id)
+        texts.append(doc_text)
+        metadatas.append(metadata)
+    
+    return ids, texts, metadatas
+
+
+STAGING_SUFFIX = "__staging"
+BACKUP_INFIX = "__old_"
+DEFAULT_BATCH_SIZE = 256
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def ingest_lock(chroma_db_path: str, collection_name: str) -> Iterator[None]:
+    """
+    Hold the write lock of one collection for a whole ingestion.
+    
+    Raises:
+        RuntimeError: If another process holds it
+    """
+    path = Path(chroma_db_path) / f"{collection_name}.ingest.lock"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError as e:
+            raise RuntimeError(
+                f"Another ingestion into '{collection_name}' is running (lock: {path}); retry once it has finished."
+            ) from e
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def input_fingerprint(ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], settings: Dict[str, Any]) -> str:
+    """Hash of the records and collection settings; a manifest only resumes a run with the same one."""
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+    for doc_id, text, metadata in zip(ids, texts, metadatas):
+        digest.update(json.dumps([doc_id, text, metadata], sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
 
 class JSONToChromaIngester:
     """Ingests JSON documents into ChromaDB with embeddings."""
@@ -25,7 +164,14 @@ class JSONToChromaIngester:
         json_data_dir: str,
         model_name: str = "all-MiniLM-L6-v2",
         collection_name: str = "policy_documents",
-        chroma_db_path: str = "./chroma_data"
+        chroma_db_path: str = "./chroma_data",
+        hnsw_ef_construction: int | None = None,
+        hnsw_ef_search: int | None = None,
+        hnsw_m: int | None = None,
+        shard_key: str | None = None,
+        use_embedding_cache: bool | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        resume: bool = True
     ):
         """
         Initialize the ingester.
@@ -35,32 +181,207 @@ class JSONToChromaIngester:
             model_name: Sentence transformer model to use
             collection_name: Name of ChromaDB collection
             chroma_db_path: Path where ChromaDB will store data
+            hnsw_ef_construction: Optional HNSW candidate list size while building the index
+            hnsw_ef_search: Optional HNSW candidate list size while querying
+            hnsw_m: Optional HNSW graph degree (M)
+            shard_key: Optional metadata key (e.g. "source_file") to split the
+                       collection into one shard per value
+            use_embedding_cache: Reuse embeddings of previously seen texts from the
+                                 shared on-disk cache (default: on unless EMBEDDING_CACHE=off)
+            batch_size: Documents embedded and committed per checkpoint
+            resume: Continue an interrupted run from its manifest instead of starting over
         """
+        if batch_size <= 0:
+            raise ValueError("batch_size must be a positive integer.")
         self.json_data_dir = json_data_dir
         self.model_name = model_name
         self.collection_name = collection_name
         self.chroma_db_path = chroma_db_path
+        self.shard_key = shard_key
+        self.batch_size = batch_size
+        self.resume = resume
+        self.staging_name = f"{collection_name}{STAGING_SUFFIX}"
+        self.backup_prefix = f"{collection_name}{BACKUP_INFIX}"
+        self.manifest_path = Path(chroma_db_path) / f"{collection_name}.ingest_manifest.json"
         
         # Initialize sentence transformer
         print(f"Loading sentence transformer model: {model_name}")
         self.model = SentenceTransformer(model_name)
+        if use_embedding_cache is None:
+            use_embedding_cache = cache_enabled()
+        self.embedding_cache = EmbeddingCache(model_name) if use_embedding_cache else None
         
         # Initialize ChromaDB with modern API
         print(f"Initializing ChromaDB at: {chroma_db_path}")
         self.client = chromadb.PersistentClient(path=chroma_db_path)
         
-        # Create or get collection
+        collection_metadata = {"hnsw:space": "cosine"}
+        hnsw_settings = {
+            "hnsw:construction_ef": hnsw_ef_construction,
+            "hnsw:search_ef": hnsw_ef_search,
+            "hnsw:M": hnsw_m,
+        }
+        collection_metadata.update({k: v for k, v in hnsw_settings.items() if v is not None})
+        self.collection_metadata = collection_metadata
+        
+        # Queries keep using the current collection until a new one is swapped in.
+        self.collection = None
+        self.router = None
         try:
-            self.client.delete_collection(name=collection_name)
-            print(f"Deleted existing collection: {collection_name}")
-        except:
+            self._attach(self.client.get_collection(name=collection_name))
+        except Exception:
             pass
-        
-        self.collection = self.client.create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
+    
+    def _attach(self, collection) -> None:
+        """Point queries and stats at `collection`."""
+        self.collection = collection
+        self.router = ShardRouter(self.client, collection) if is_sharded(collection) else None
+    
+    def _drop_collection(self, name: str) -> None:
+        """Delete a collection and, if it is sharded, its shards."""
+        collection = self.client.get_collection(name=name)
+        if is_sharded(collection):
+            for shard in ShardRouter(self.client, collection).shards().values():
+                self.client.delete_collection(name=shard.name)
+        self.client.delete_collection(name=name)
+    
+    def _create_staging(self):
+        """Create an empty staging collection; returns (collection, router or None)."""
+        try:
+            self._drop_collection(self.staging_name)
+            print(f"Discarded incomplete staging collection: {self.staging_name}")
+        except Exception:
+            pass
+        if self.shard_key:
+            router = ShardRouter.create(
+                self.client,
+                self.staging_name,
+                shard_key=self.shard_key,
+                embedding_model=self.model_name,
+                metadata=self.collection_metadata
+            )
+            print(f"Created sharded staging collection: {self.staging_name} (shard key: {self.shard_key})")
+            return router.anchor, router
+        collection = self.client.create_collection(
+            name=self.staging_name,
+            metadata=self.collection_metadata
         )
-        print(f"Created collection: {collection_name}")
+        print(f"Created staging collection: {self.staging_name} ({self.collection_metadata})")
+        return collection, None
+    
+    def _load_manifest(self) -> Dict[str, Any] | None:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        manifest["updated_at"] = time.time()
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+    
+    def _resume_point(self, fingerprint: str, total: int):
+        """Staging collection, router and committed count to continue from (or a fresh start)."""
+        manifest = self._load_manifest() if self.resume else None
+        if manifest and manifest.get("fingerprint") == fingerprint and manifest.get("staging") == self.staging_name:
+            try:
+                staging = self.client.get_collection(name=self.staging_name)
+                router = ShardRouter(self.client, staging) if is_sharded(staging) else None
+                committed = manifest["committed"]
+                print(f"Resuming from manifest: {committed}/{total} documents already committed "
+                      f"in {manifest['batches']} batches")
+                return staging, router, manifest
+            except Exception:
+                print("Manifest found but its staging collection is missing; starting over")
+        elif manifest:
+            print("Input or settings changed since the interrupted run; starting over")
+        staging, router = self._create_staging()
+        manifest = {
+            "collection": self.collection_name,
+            "staging": self.staging_name,
+            "fingerprint": fingerprint,
+            "total": total,
+            "committed": 0,
+            "batches": 0,
+            "started_at": time.time(),
+        }
+        self._save_manifest(manifest)
+        return staging, router, manifest
+    
+    def _anchor_names(self) -> set:
+        """Names of the collections in the ChromaDB directory, without shard collections."""
+        return {c.name for c in self.client.list_collections() if SHARD_OF_FIELD not in (c.metadata or {})}
+    
+    def _rename(self, old_name: str, new_name: str) -> None:
+        """Rename a collection and its shards; repeating it after a crash part way through completes it."""
+        if old_name not in self._anchor_names():
+            return
+        collection = self.client.get_collection(name=old_name)
+        if is_sharded(collection):
+            ShardRouter(self.client, collection).rename(new_name)
+        else:
+            collection.modify(name=new_name)
+    
+    def _swap_in(self, manifest: Dict[str, Any]) -> None:
+        """Replace the live collection by the completed staging collection."""
+        backup_name = None
+        if self.collection_name in self._anchor_names():
+            backup_name = f"{self.backup_prefix}{int(time.time())}"
+        # Recorded before the first rename, so a crash during the swap is finished on the next run.
+        manifest["swap"] = {"backup": backup_name}
+        self._save_manifest(manifest)
+        self._finish_swap(manifest["swap"])
+    
+    def _finish_swap(self, swap: Dict[str, Any]) -> None:
+        """Run the steps of a swap that haven't happened yet, then forget the manifest."""
+        backup_name = swap["backup"]
+        names = self._anchor_names()
+        # Move the old collection aside first so the name is never unbound for long.
+        if backup_name and self.collection_name in names and self.staging_name in names:
+            self._rename(self.collection_name, backup_name)
+        if self.staging_name in self._anchor_names():
+            self._rename(self.staging_name, self.collection_name)
+        if backup_name and backup_name in self._anchor_names():
+            self._drop_collection(backup_name)
+        self.manifest_path.unlink(missing_ok=True)
+        self._attach(self.client.get_collection(name=self.collection_name))
+    
+    def _recover_swap(self) -> str | None:
+        """
+        Finish or undo a swap that an earlier run left half done.
+        
+        Returns:
+            Input fingerprint of the run whose swap was finished here, else None
+        """
+        manifest = self._load_manifest()
+        if manifest and manifest.get("swap") is not None:
+            print(f"Finishing the swap of an interrupted run into {self.collection_name}...")
+            self._finish_swap(manifest["swap"])
+            return manifest.get("fingerprint")
+        names = self._anchor_names()
+        backups = sorted((name for name in names if name.startswith(self.backup_prefix)),
+                         key=lambda name: name[len(self.backup_prefix):].zfill(20))
+        if not backups:
+            return None
+        if self.collection_name not in names:
+            # No record of a complete staging collection: put the previous live collection back.
+            print(f"Restoring {backups[-1]} as {self.collection_name} after an interrupted swap")
+            self._rename(backups.pop(), self.collection_name)
+        for name in backups:
+            print(f"Dropping leftover collection {name}")
+            self._drop_collection(name)
+        self._attach(self.client.get_collection(name=self.collection_name))
+        return None
+    
+    def _embed(self, texts: List[str]):
+        """Embed one batch, reusing cached vectors for texts seen before."""
+        if self.embedding_cache is not None:
+            return self.embedding_cache.embed(texts, lambda batch: self.model.encode(batch))
+        return self.model.encode(texts)
     
     def load_json_files(self) -> List[Dict[str, Any]]:
         """
@@ -70,28 +391,15 @@ class JSONToChromaIngester:
             List of all documents from all JSON files with source file info
         """
         all_documents = []
-        json_files = list(Path(self.json_data_dir).glob("*.json"))
+        # Sorted, so a resumed run sees the records in the same order.
+        json_files = sorted(Path(self.json_data_dir).glob("*.json"))
         
         print(f"\nFound {len(json_files)} JSON files")
         
         for json_file in json_files:
             print(f"  - Loading: {json_file.name}")
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Get filename without extension for prefixing IDs
-                    file_prefix = json_file.stem.replace(" ", "_").replace("-", "_")
-                    
-                    if isinstance(data, list):
-                        # Add source file info to each document
-                        for doc in data:
-                            doc['_source_file'] = json_file.name
-                            doc['_file_prefix'] = file_prefix
-                            all_documents.append(doc)
-                    else:
-                        data['_source_file'] = json_file.name
-                        data['_file_prefix'] = file_prefix
-                        all_documents.append(data)
+                all_documents.extend(load_json_file(json_file))
             except Exception as e:
                 print(f"    ERROR: Failed to load {json_file.name}: {e}")
         
@@ -100,7 +408,10 @@ class JSONToChromaIngester:
     
     def ingest_to_chroma(self) -> None:
         """Load JSON files and ingest them into ChromaDB with embeddings."""
-        
+        with ingest_lock(self.chroma_db_path, self.collection_name):
+            self._ingest_locked()
+    
+    def _ingest_locked(self) -> None:
         # Load all JSON documents
         documents = self.load_json_files()
         
@@ -109,51 +420,61 @@ class JSONToChromaIngester:
             return
         
         # Prepare data for ChromaDB
-        ids = []
-        texts = []
-        metadatas = []
-        
         print(f"\nPreparing {len(documents)} documents for ingestion...")
-        
-        for doc in documents:
-            # Extract ID and make it unique by prefixing with source file
-            doc_id = doc.get("id", "")
-            if not doc_id:
-                continue
-            
-            # Create unique ID by combining file prefix with original ID
-            file_prefix = doc.get("_file_prefix", "unknown")
-            unique_id = f"{file_prefix}_{doc_id}"
-            
-            # Extract document text
-            doc_text = doc.get("document", "")
-            if not doc_text:
-                continue
-            
-            # Extract metadata and add source file info
-            metadata = doc.get("metadata", {})
-            metadata["source_file"] = doc.get("_source_file", "unknown")
-            
-            ids.append(unique_id)
-            texts.append(doc_text)
-            metadatas.append(metadata)
+        ids, texts, metadatas = prepare_records(documents)
         
         if not ids:
             print("No valid documents found!")
             return
         
-        print(f"Generating embeddings for {len(texts)} documents...")
-        # Generate embeddings
-        embeddings = self.model.encode(texts, show_progress_bar=True)
-        
-        # Add to ChromaDB
-        print(f"Adding documents to ChromaDB collection...")
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings.tolist(),
-            documents=texts,
-            metadatas=metadatas
-        )
+        fingerprint = input_fingerprint(ids, texts, metadatas, {
+            "model": self.model_name,
+            "metadata": self.collection_metadata,
+            "shard_key": self.shard_key,
+        })
+        if self._recover_swap() == fingerprint:
+            print(f"\n✓ {self.collection_name} already holds these {len(ids)} documents")
+            return
+        staging, router, manifest = self._resume_point(fingerprint, len(ids))
+        
+        print(f"Embedding and committing {len(texts) - manifest['committed']} documents "
+              f"in batches of {self.batch_size}...")
+        for start in range(manifest["committed"], len(ids), self.batch_size):
+            end = min(start + self.batch_size, len(ids))
+            embeddings = self._embed(texts[start:end])
+            # Upsert: a batch written just before a crash (but not yet in the manifest) is rewritten, not duplicated.
+            if router is not None:
+                router.write(
+                    ids=ids[start:end],
+                    embeddings=embeddings,
+                    documents=texts[start:end],
+                    metadatas=metadatas[start:end],
+                    upsert=True
+                )
+            else:
+                staging.upsert(
+                    ids=ids[start:end],
+                    embeddings=embeddings.tolist(),
+                    documents=texts[start:end],
+                    metadatas=metadatas[start:end]
+                )
+            manifest["committed"] = end
+            manifest["batches"] += 1
+            self._save_manifest(manifest)
+            print(f"  Committed {end}/{len(ids)} documents (batch {manifest['batches']})")
+        
+        if self.embedding_cache is not None:
+            stats = self.embedding_cache.stats()
+            print(f"  Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"(hit rate {stats['hit_rate']}), {stats['entries']} entries")
+        
+        print(f"Swapping {self.staging_name} in as {self.collection_name}...")
+        self._swap_in(manifest)
+        # Running servers reopen their client, so queries see the new collection's vectors.
+        notify_reload(self.chroma_db_path, source="ingest_json_to_chroma.py")
+        if self.router is not None:
+            for value, count in sorted(self.router.count().items()):
+                print(f"  - {value}: {count} documents")
         
         print(f"\n✓ Successfully ingested {len(ids)} documents into ChromaDB!")
         print(f"  Collection name: {self.collection_name}")
@@ -170,6 +491,10 @@ class JSONToChromaIngester:
         Returns:
             Query results
         """
+        if self.collection is None:
+            raise ValueError(f"Collection '{self.collection_name}' has not been ingested yet")
+        if self.router is not None:
+            return self.router.query(self.model.encode([query_text]), n_results=n_results)
         results = self.collection.query(
             query_texts=[query_text],
             n_results=n_results
@@ -178,6 +503,14 @@ class JSONToChromaIngester:
     
     def print_stats(self) -> None:
         """Print collection statistics."""
+        if self.collection is None:
+            print(f"\nCollection '{self.collection_name}' has not been ingested yet")
+            return
+        if self.router is not None:
+            counts = self.router.count()
+            print(f"\nCollection Statistics:")
+            print(f"  Total documents: {sum(counts.values())} across {len(counts)} shards")
+            return
         count = self.collection.count()
         print(f"\nCollection Statistics:")
         print(f"  Total documents: {count}")
@@ -185,6 +518,12 @@ class JSONToChromaIngester:
 
 def main():
     """Main function to run the ingester."""
+    parser = argparse.ArgumentParser(description="Ingest json_data/ into ChromaDB")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("INGEST_BATCH_SIZE", str(DEFAULT_BATCH_SIZE))),
+                        help=f"Documents embedded and committed per checkpoint (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the manifest of an interrupted run and start over")
+    args = parser.parse_args()
     
     # Paths
     script_dir = Path(__file__).parent
@@ -201,7 +540,9 @@ def main():
         json_data_dir=str(json_data_dir),
         model_name="all-MiniLM-L6-v2",  # Fast and effective model
         collection_name="policy_documents",
-        chroma_db_path=str(chroma_db_path)
+        chroma_db_path=str(chroma_db_path),
+        batch_size=args.batch_size,
+        resume=not args.restart
     )
     
     # Ingest documents
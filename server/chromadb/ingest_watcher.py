@@ -0,0 +1,603 @@
+"""
+Watch-folder ingestion daemon.
+
+Polls the regulation PDFs under server/llama_index/data/extracted/ and the
+policy JSON files under server/chromadb/json_data/, and incrementally
+ingests only the files that were added, changed or removed:
+
+- JSON files go to `policy_documents` in chroma_data/ (all-MiniLM-L6-v2),
+  replacing the rows whose `source_file` is the changed file.
+- PDFs go to `rag_demo` in server/llama_index/storage/ (bge-base, split
+  with the chunker recorded in the collection by ingest.py, see
+  server/layout.py), replacing the nodes whose `file_path` is the changed
+  file, their parent sections in storage/parent_docstore.json (small-to-big
+  layout) and their facts in storage/regulation_facts.sqlite.
+
+File events are debounced: a file is ingested once its size and mtime have
+been stable for `--debounce` seconds, so half-copied files are not read.
+A content hash per file is kept in a state file, so touching a file without
+changing it, or restarting the daemon, does not re-ingest anything.
+
+The daemon writes through its own Chroma client, and a running server's
+client only sees another process's vectors in queries after it is
+reopened. After every change the daemon therefore calls
+`notify_reload()` (mcp_shared/reload_signal.py) for the Chroma directory;
+mcp_chroma_server.py and the regulations server reopen their client on
+their next call. It then reopens its own client the same way and queries
+for the new vectors: the reported lag runs from the moment the change was
+first seen until such a query returns the document.
+
+Queue depth, lag and per-file results are written to a JSON status file and,
+with --metrics-port, served as JSON over HTTP.
+
+JSON writes hold the collection's ingest lock (see ingest_json_to_chroma.py):
+while a full rebuild runs, changed files fail and stay queued until it has
+swapped in. Don't run the daemon and a full ingest.py rebuild at the same
+time.
+
+Usage:
+    python ingest_watcher.py
+    python ingest_watcher.py --debounce 3 --metrics-port 9108
+    python ingest_watcher.py --once          # catch up and exit
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from mcp_shared.reload_signal import notify_reload, reopen_persistent_client
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+CHROMA_DIR = SERVER_DIR / "chromadb"
+LLAMA_DIR = SERVER_DIR / "llama_index"
+
+# Latencies kept for the lag percentiles in the status report.
+LAG_WINDOW = 200
+# Neighbours fetched when checking that a new document is searchable.
+VISIBILITY_TOP_K = 10
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class JSONFolderTarget:
+    """Incrementally maintains a Chroma collection from a folder of policy JSON files."""
+
+    suffixes = (".json",)
+
+    def __init__(self, json_dir: str, chroma_db_path: str, collection_name: str = "policy_documents",
+                 model_name: str = "all-MiniLM-L6-v2"):
+        self.name = "json"
+        self.root = Path(json_dir).resolve()
+        self.chroma_db_path = chroma_db_path
+        self.collection_name = collection_name
+        self.model_name = model_name
+        self._client = None
+        self._model = None
+        self._cache = None
+
+    def _collection(self):
+        import chromadb
+        if self._client is None:
+            self._client = chromadb.PersistentClient(path=self.chroma_db_path)
+        return self._client.get_or_create_collection(self.collection_name, metadata={"hnsw:space": "cosine"})
+
+    def signal_reload(self) -> None:
+        notify_reload(self.chroma_db_path, source="ingest_watcher.py")
+
+    def visible(self, probe: Dict[str, Any]) -> bool:
+        """Reopen the client like a signalled server would and query for the probe document."""
+        if self._client is not None:
+            self._client = reopen_persistent_client(self._client)
+        return any(
+            _query_returns(target, probe) for target in self._targets(self._collection())
+        )
+
+    def _targets(self, collection) -> List[Any]:
+        """Physical collections holding rows: the shards of a sharded collection, else itself."""
+        from sharding import ShardRouter, is_sharded
+        if is_sharded(collection):
+            return list(ShardRouter(self._client, collection).shards().values())
+        return [collection]
+
+    def _embed(self, texts: List[str]):
+        from sentence_transformers import SentenceTransformer
+        from mcp_shared.embedding_cache import EmbeddingCache, cache_enabled
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+            self._cache = EmbeddingCache(self.model_name) if cache_enabled() else None
+        if self._cache is not None:
+            return self._cache.embed(texts, lambda batch: self._model.encode(batch))
+        return self._model.encode(texts)
+
+    def _locked(self):
+        """The collection's ingest lock, so a full ingest_json_to_chroma.py run can't swap over these writes."""
+        from ingest_json_to_chroma import ingest_lock
+        return ingest_lock(self.chroma_db_path, self.collection_name)
+
+    def remove(self, path: Path) -> int:
+        with self._locked():
+            return self._remove(path)
+
+    def _remove(self, path: Path) -> int:
+        collection = self._collection()
+        removed = 0
+        for target in self._targets(collection):
+            ids = target.get(where={"source_file": path.name}, include=[])["ids"]
+            if ids:
+                target.delete(ids=ids)
+                removed += len(ids)
+        return removed
+
+    def ingest(self, path: Path) -> Dict[str, Any]:
+        from ingest_json_to_chroma import load_json_file, prepare_records
+
+        ids, texts, metadatas = prepare_records(load_json_file(path))
+        with self._locked():
+            return self._replace(path, ids, texts, metadatas)
+
+    def _replace(self, path: Path, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]) -> Dict[str, Any]:
+        from sharding import ShardRouter, is_sharded
+
+        removed = self._remove(path)
+        if ids:
+            embeddings = self._embed(texts)
+            collection = self._collection()
+            if is_sharded(collection):
+                ShardRouter(self._client, collection).write(
+                    ids=ids, documents=texts, metadatas=metadatas, embeddings=embeddings, upsert=True
+                )
+            else:
+                collection.upsert(ids=ids, documents=texts, metadatas=metadatas, embeddings=embeddings)
+            return {"removed": removed, "added": len(ids),
+                    "probe": {"ids": [ids[0]], "embedding": [float(x) for x in embeddings[0]]}}
+        return {"removed": removed, "added": 0}
+
+
+def _query_returns(collection, probe: Dict[str, Any]) -> bool:
+    """Whether a nearest-neighbour query with the probe's own embedding returns one of its ids."""
+    if collection.count() == 0:
+        return False
+    hits = collection.query(query_embeddings=[probe["embedding"]], n_results=VISIBILITY_TOP_K, include=[])
+    return bool(set(hits["ids"][0]) & set(probe["ids"]))
+
+
+def _use_llama_dir() -> None:
+    """Make the regulations server's `server` package importable."""
+    if str(LLAMA_DIR) not in sys.path:
+        sys.path.append(str(LLAMA_DIR))
+
+
+class PDFFolderTarget:
+    """Incrementally maintains the regulations index from a folder of PDFs."""
+
+    suffixes = (".pdf",)
+
+    def __init__(self, data_dir: str, storage_dir: str, collection_name: str = "rag_demo",
+                 model_name: str = "BAAI/bge-base-en-v1.5", chunker: str | None = None):
+        """
+        Args:
+            chunker: Layout for an empty index (INGEST_CHUNKER by default); the layout
+                     recorded in the collection always wins, and an unrecorded non-empty
+                     index is taken to use the sentence window it was built with
+        """
+        self.name = "pdf"
+        self.root = Path(data_dir).resolve()
+        self.storage_dir = storage_dir
+        self.collection_name = collection_name
+        self.model_name = model_name
+        self.chunker = chunker
+        self._client = None
+        self._embed_model = None
+        self._facts = None
+
+    def _collection(self):
+        import chromadb
+        if self._client is None:
+            self._client = chromadb.PersistentClient(path=self.storage_dir)
+        return self._client.get_or_create_collection(self.collection_name)
+
+    def _embedding(self):
+        """Embedding model, built on first use (model load is slow)."""
+        if self._embed_model is None:
+            _use_llama_dir()
+            from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+            from server.cached_embedding import CachedEmbedding
+            self._embed_model = CachedEmbedding.wrap(HuggingFaceEmbedding(model_name=self.model_name))
+        return self._embed_model
+
+    def _parsers(self, collection):
+        """(parent parser or None, embedded-node parser) of the layout the index was built with."""
+        _use_llama_dir()
+        from server.layout import node_parsers, record_chunker, resolve_chunker
+        chunker = resolve_chunker(collection, self.chunker)
+        # Recorded before the first write, so later files (and ingest.py) keep to this layout.
+        record_chunker(collection, chunker)
+        return node_parsers(chunker)
+
+    def signal_reload(self) -> None:
+        notify_reload(self.storage_dir, source="ingest_watcher.py")
+
+    def visible(self, probe: Dict[str, Any]) -> bool:
+        """Reopen the client like a signalled server would and query for the probe nodes."""
+        if self._client is not None:
+            self._client = reopen_persistent_client(self._client)
+        return _query_returns(self._collection(), probe)
+
+    def _fact_index(self):
+        _use_llama_dir()
+        from server.facts import FactIndex, facts_path
+        if self._facts is None:
+            self._facts = FactIndex(facts_path(self.storage_dir))
+        return self._facts
+
+    def _parent_store_path(self) -> str:
+        _use_llama_dir()
+        from server.small_to_big import parent_store_path
+        return parent_store_path(self.storage_dir)
+
+    def remove(self, path: Path) -> int:
+        collection = self._collection()
+        ids = collection.get(where={"file_path": str(path)}, include=[])["ids"]
+        if ids:
+            collection.delete(ids=ids)
+        store_path = self._parent_store_path()
+        from server.small_to_big import load_parent_store, remove_parents, save_parent_store
+        store = load_parent_store(store_path)
+        if remove_parents(store, str(path)):
+            save_parent_store(store, store_path)
+        self._fact_index().remove_file(path.name)
+        return len(ids)
+
+    def ingest(self, path: Path) -> Dict[str, int]:
+        from llama_index.core import SimpleDirectoryReader
+        from llama_index.core.ingestion import IngestionPipeline
+        from llama_index.readers.file import PDFReader
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
+        collection = self._collection()
+        parent_parser, node_parser = self._parsers(collection)
+        embed_model = self._embedding()
+        from server.small_to_big import load_parent_store, save_parent_store
+        documents = SimpleDirectoryReader(
+            input_files=[str(path)], file_extractor={".pdf": PDFReader()}
+        ).load_data()
+        removed = self.remove(path)
+
+        from server.facts import extract_facts
+        self._fact_index().replace_file(path.name, extract_facts(documents))
+
+        pipeline = IngestionPipeline(
+            transformations=[node_parser, embed_model],
+            vector_store=ChromaVectorStore(chroma_collection=collection),
+        )
+        if parent_parser is not None:
+            # Parents go to the docstore first, so a child is never served without its parent.
+            parents = parent_parser.get_nodes_from_documents(documents)
+            store_path = self._parent_store_path()
+            store = load_parent_store(store_path)
+            store.add_documents(parents)
+            save_parent_store(store, store_path)
+            nodes = pipeline.run(nodes=parents)
+        else:
+            nodes = pipeline.run(documents=documents)
+        if not nodes:
+            return {"removed": removed, "added": 0}
+        return {"removed": removed, "added": len(nodes),
+                "probe": {"ids": [nodes[0].node_id], "embedding": list(nodes[0].embedding)}}
+
+
+class IngestWatcher:
+    """Polls watched folders, debounces changes and ingests changed files one at a time."""
+
+    def __init__(self, targets: List[Any], state_file: str, debounce: float = 2.0, poll_interval: float = 1.0,
+                 status_file: str | None = None, visibility_timeout: float = 30.0):
+        """
+        Initialize the watcher.
+
+        Args:
+            targets: Folder targets (JSONFolderTarget, PDFFolderTarget)
+            state_file: JSON file recording the content hash of every ingested file
+            debounce: Seconds a file must stay unchanged before it is ingested
+            poll_interval: Seconds between folder scans
+            status_file: Optional JSON file the metrics are written to after every scan
+            visibility_timeout: Seconds to wait for an ingested file to be returned by queries
+        """
+        if debounce < 0 or poll_interval <= 0 or visibility_timeout < 0:
+            raise ValueError("debounce and visibility_timeout must be >= 0 and poll_interval must be positive.")
+        self.targets = targets
+        self.state_file = Path(state_file)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.status_file = Path(status_file) if status_file else None
+        self.visibility_timeout = visibility_timeout
+
+        self.state: Dict[str, Dict[str, Any]] = {}
+        if self.state_file.exists():
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+        # path -> {"target", "signature", "first_seen", "last_change"}
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {"ingested": 0, "removed": 0, "unchanged": 0, "failed": 0, "not_visible": 0}
+        self.lags: List[float] = []
+        self.last_events: List[Dict[str, Any]] = []
+        self.current: str | None = None
+
+    ##### Scanning #####
+
+    def _scan(self) -> Dict[str, Tuple[Any, Tuple[float, int]]]:
+        """Current files of every target: path -> (target, (mtime, size))."""
+        files = {}
+        for target in self.targets:
+            if not target.root.is_dir():
+                continue
+            for path in target.root.rglob("*"):
+                if path.suffix.lower() in target.suffixes and path.is_file():
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    files[str(path)] = (target, (stat.st_mtime, stat.st_size))
+        return files
+
+    def poll(self) -> None:
+        """Scan once: queue new, changed and removed files and ingest the ones that settled."""
+        now = time.time()
+        files = self._scan()
+        known = {path for path, entry in self.state.items() if entry.get("target") in {t.name for t in self.targets}}
+
+        with self.lock:
+            for path, (target, signature) in files.items():
+                recorded = self.state.get(path, {})
+                if recorded.get("signature") == list(signature):
+                    self.pending.pop(path, None)
+                    continue
+                entry = self.pending.get(path)
+                if entry is None:
+                    self.pending[path] = {"target": target, "signature": signature,
+                                          "first_seen": now, "last_change": now}
+                elif entry["signature"] != signature:
+                    entry.update(signature=signature, last_change=now)
+
+            for path in known - set(files):
+                if path not in self.pending:
+                    target = next(t for t in self.targets if t.name == self.state[path]["target"])
+                    self.pending[path] = {"target": target, "signature": None,
+                                          "first_seen": now, "last_change": now}
+
+            ready = [path for path, entry in self.pending.items() if now - entry["last_change"] >= self.debounce]
+
+        for path in sorted(ready):
+            self._process(path)
+        self._write_status()
+
+    def _process(self, path: str) -> None:
+        with self.lock:
+            entry = self.pending.get(path)
+            self.current = path
+        target = entry["target"]
+        started = time.time()
+        event: Dict[str, Any] = {"path": path, "target": target.name}
+        probe = None
+        try:
+            if entry["signature"] is None:
+                event["action"] = "removed"
+                event["removed"] = target.remove(Path(path))
+                target.signal_reload()
+                self.state.pop(path, None)
+                self.counters["removed"] += 1
+            else:
+                sha = file_sha256(Path(path))
+                if self.state.get(path, {}).get("sha256") == sha:
+                    event["action"] = "unchanged"
+                    self.counters["unchanged"] += 1
+                else:
+                    event["action"] = "ingested"
+                    event.update(target.ingest(Path(path)))
+                    probe = event.pop("probe", None)
+                    target.signal_reload()
+                    self.counters["ingested"] += 1
+                self.state[path] = {"target": target.name, "signature": list(entry["signature"]), "sha256": sha}
+            self._save_state()
+        except Exception as e:
+            # Keep the file queued; a later change or restart retries it.
+            event["action"] = "failed"
+            event["error"] = str(e)
+            self.counters["failed"] += 1
+            with self.lock:
+                entry["last_change"] = time.time()
+                self.current = None
+            print(f"ERROR: Failed to ingest {path}: {e}")
+            self._record(event, started, entry)
+            return
+
+        with self.lock:
+            self.pending.pop(path, None)
+            self.current = None
+        if probe is not None:
+            event["visible"] = self._wait_visible(target, probe)
+            if not event["visible"]:
+                self.counters["not_visible"] += 1
+                print(f"WARNING: {path} was not returned by queries within {self.visibility_timeout}s")
+        self._record(event, started, entry)
+        print(f"✓ {event['action']} {path} ({event.get('removed', 0)} removed, {event.get('added', 0)} added, "
+              f"{event['seconds']}s, lag {event['lag_seconds']}s)")
+
+    def _wait_visible(self, target: Any, probe: Dict[str, Any]) -> bool:
+        """Query until the ingested document is returned, up to visibility_timeout seconds."""
+        deadline = time.time() + self.visibility_timeout
+        delay = 0.05
+        while True:
+            try:
+                if target.visible(probe):
+                    return True
+            except Exception as e:
+                print(f"WARNING: Visibility check failed: {e}")
+            if time.time() >= deadline:
+                return False
+            time.sleep(min(delay, max(deadline - time.time(), 0)))
+            delay = min(delay * 2, 1.0)
+
+    def _record(self, event: Dict[str, Any], started: float, entry: Dict[str, Any]) -> None:
+        finished = time.time()
+        event["seconds"] = round(finished - started, 3)
+        # Lag: first time the change was seen -> a query returns the new document
+        # (for removals and unchanged files: -> the change was written and signalled).
+        event["lag_seconds"] = round(finished - entry["first_seen"], 3)
+        event["finished_at"] = finished
+        with self.lock:
+            if event["action"] != "failed" and event.get("visible", True):
+                self.lags = (self.lags + [event["lag_seconds"]])[-LAG_WINDOW:]
+            self.last_events = (self.last_events + [event])[-20:]
+
+    def _save_state(self) -> None:
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_file)
+
+    ##### Metrics #####
+
+    def status(self) -> Dict[str, Any]:
+        """Queue depth, lag and counters."""
+        now = time.time()
+        with self.lock:
+            lags = sorted(self.lags)
+            oldest = min((e["first_seen"] for e in self.pending.values()), default=None)
+            return {
+                "uptime_seconds": round(now - self.started, 1),
+                "queue_depth": len(self.pending),
+                "in_progress": self.current,
+                "oldest_pending_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+                "lag_p50_seconds": lags[len(lags) // 2] if lags else None,
+                "lag_max_seconds": lags[-1] if lags else None,
+                "tracked_files": len(self.state),
+                **self.counters,
+                "recent": list(self.last_events),
+            }
+
+    def _write_status(self) -> None:
+        if self.status_file is None:
+            return
+        tmp = self.status_file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.status(), f, indent=2)
+        os.replace(tmp, self.status_file)
+
+    def serve_metrics(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve status() as JSON on http://host:port/ from a background thread."""
+        watcher = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(watcher.status()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    ##### Main loop #####
+
+    def run(self, once: bool = False) -> None:
+        """Poll until interrupted; with `once`, stop as soon as the queue is empty."""
+        while True:
+            self.poll()
+            if once and not self.pending:
+                return
+            time.sleep(self.poll_interval)
+
+
+def create_parser():
+    """Create and return the argument parser."""
+    parser = argparse.ArgumentParser(description='Watch data folders and incrementally ingest changed files')
+    parser.add_argument('--json-dir', default=os.getenv('INGEST_JSON_DIR', str(CHROMA_DIR / 'json_data')),
+                        help='Folder of policy JSON files')
+    parser.add_argument('--chroma-data-dir', default=os.getenv('CHROMA_DATA_DIR', str(CHROMA_DIR / 'chroma_data')),
+                        help='Chroma directory for the JSON collection')
+    parser.add_argument('--json-collection', default='policy_documents')
+    parser.add_argument('--pdf-dir', default=os.getenv('INGEST_PDF_DIR', str(LLAMA_DIR / 'data' / 'extracted')),
+                        help='Folder of regulation PDFs (one subfolder per regulation year)')
+    parser.add_argument('--pdf-storage-dir', default=os.getenv('INGEST_PDF_STORAGE_DIR', str(LLAMA_DIR / 'storage')),
+                        help='Chroma directory for the regulations collection')
+    parser.add_argument('--pdf-collection', default='rag_demo')
+    parser.add_argument('--pdf-chunker', default=os.getenv('INGEST_CHUNKER'),
+                        help='Chunker for an empty regulations index: small_to_big, '
+                             'regulation or sentence (default: INGEST_CHUNKER, else small_to_big)')
+    parser.add_argument('--targets', default='json,pdf',
+                        help='Comma-separated folders to watch: json, pdf')
+    parser.add_argument('--debounce', type=float, default=float(os.getenv('INGEST_DEBOUNCE', '2.0')),
+                        help='Seconds a file must be unchanged before it is ingested')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='Seconds between folder scans')
+    parser.add_argument('--state-file', default=str(SERVER_DIR / 'ingest_watch_state.json'),
+                        help='File recording the content hash of every ingested file')
+    parser.add_argument('--visibility-timeout', type=float, default=30.0,
+                        help='Seconds to wait for an ingested file to be returned by queries')
+    parser.add_argument('--status-file', default=None,
+                        help='Write queue depth and lag metrics to this JSON file after every scan')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve metrics as JSON over HTTP on this port')
+    parser.add_argument('--once', action='store_true',
+                        help='Ingest pending changes and exit')
+    return parser
+
+
+def main():
+    """Command line entry point."""
+    args = create_parser().parse_args()
+    selected = {t.strip() for t in args.targets.split(',') if t.strip()}
+    unknown = selected - {'json', 'pdf'}
+    if unknown:
+        raise ValueError(f"Unknown targets: {sorted(unknown)}. Valid options: ['json', 'pdf']")
+
+    targets = []
+    if 'json' in selected:
+        targets.append(JSONFolderTarget(args.json_dir, args.chroma_data_dir, args.json_collection))
+    if 'pdf' in selected:
+        targets.append(PDFFolderTarget(args.pdf_dir, args.pdf_storage_dir, args.pdf_collection,
+                                       chunker=args.pdf_chunker))
+
+    watcher = IngestWatcher(targets, args.state_file, debounce=args.debounce,
+                            poll_interval=args.poll_interval, status_file=args.status_file,
+                            visibility_timeout=args.visibility_timeout)
+    if args.metrics_port:
+        watcher.serve_metrics(args.metrics_port)
+        print(f"Metrics on http://127.0.0.1:{args.metrics_port}/")
+    for target in targets:
+        print(f"Watching {target.root} ({target.name})")
+    try:
+        watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        print("Stopped")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
@@ -0,0 +1,213 @@
+"""
+Background jobs for long-running write tools of the Chroma MCP server.
+
+chroma_batch_add_documents, chroma_upsert_documents and
+chroma_delete_documents_by_filter accept `background=True`: the call
+validates its arguments, resolves the collection, submits a job and
+returns its ID immediately instead of holding the MCP call (and its
+admission slot and deadline) open until the write finishes.
+
+JobManager runs at most `max_workers` jobs at once; further jobs wait in
+submission order, and at most `max_pending` may wait before submissions
+are rejected. A job body is a plain function that runs in a worker thread
+(asyncio.to_thread) and writes in batches. After each batch it reports
+progress with `job.advance(n)` and calls `job.check_cancelled()`, so
+cancelling a running job stops it at the next batch boundary. Batches
+already written stay written. A queued job is cancelled before it starts.
+
+Jobs live in memory only: they are lost when the server restarts. The
+most recent `keep_finished` finished jobs are kept for status queries.
+"""
+
+import time
+import uuid
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+JOB_STATES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job body, at a batch boundary, once the job was cancelled."""
+
+
+@dataclass
+class Job:
+    """State and progress of one background job."""
+    id: str
+    kind: str
+    collection: str
+    total: int | None
+    unit: str = "documents"
+    status: str = "queued"
+    done: int = 0
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    result: str | None = None
+    error: str | None = None
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+    _task: asyncio.Task | None = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def advance(self, count: int) -> None:
+        """Record `count` more items as written."""
+        self.done += count
+
+    def check_cancelled(self) -> None:
+        """Raise JobCancelled if cancel was requested; call between batches."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable status, progress and throughput."""
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        rate = self.done / elapsed if elapsed else None
+        remaining = None
+        if self.status == "running" and rate and self.total is not None:
+            remaining = round(max(self.total - self.done, 0) / rate, 1)
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "collection": self.collection,
+            "status": self.status,
+            "cancel_requested": self._cancel.is_set() and not self.finished,
+            "unit": self.unit,
+            "done": self.done,
+            "total": self.total,
+            "progress": round(self.done / self.total, 4) if self.total else None,
+            "per_second": round(rate, 1) if rate is not None else None,
+            "eta_seconds": remaining,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queued_seconds": round((self.started_at or self.finished_at or time.time()) - self.submitted_at, 3),
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Bounded pool of in-process background jobs."""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 100, keep_finished: int = 200):
+        """
+        Args:
+            max_workers: Jobs that run at the same time
+            max_pending: Jobs that may wait for a worker before submissions are rejected
+            keep_finished: Finished jobs kept for status queries
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be >= 1.")
+        if max_pending < 0 or keep_finished < 0:
+            raise ValueError("max_pending and keep_finished must be >= 0.")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._slots = asyncio.Semaphore(max_workers)
+        self._jobs: Dict[str, Job] = {}
+        self.counters = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+
+    def submit(self, kind: str, collection: str, fn: Callable[[Job], str],
+               total: int | None = None, unit: str = "documents") -> Job:
+        """
+        Queue `fn(job)` to run in a worker thread; must be called from the event loop.
+
+        Args:
+            kind: Tool that submitted the job, e.g. 'chroma_upsert_documents'
+            collection: Collection the job writes to
+            fn: Job body; returns the result message, raises on failure
+            total: Items the job will write, if known up front
+            unit: What `total` and `done` count
+
+        Returns:
+            The queued job
+        """
+        pending = sum(1 for job in self._jobs.values() if job.status == "queued")
+        if self.max_pending and pending >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise RuntimeError(f"Job queue full: {pending} jobs are waiting for a worker. Retry later.")
+        job = Job(id=uuid.uuid4().hex[:12], kind=kind, collection=collection, total=total, unit=unit)
+        self._jobs[job.id] = job
+        self.counters["submitted"] += 1
+        job._task = asyncio.get_running_loop().create_task(self._run(job, fn), name=f"job-{job.id}")
+        return job
+
+    async def _run(self, job: Job, fn: Callable[[Job], str]) -> None:
+        try:
+            async with self._slots:
+                job.check_cancelled()
+                job.status = "running"
+                job.started_at = time.time()
+                # The thread is never cancelled; cancel() stops it via check_cancelled().
+                job.result = await asyncio.to_thread(fn, job)
+                self._finish(job, "succeeded")
+        except (JobCancelled, asyncio.CancelledError):
+            self._finish(job, "cancelled")
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, "failed")
+
+    def _finish(self, job: Job, status: str) -> None:
+        if job.finished:
+            return
+        job.status = status
+        job.finished_at = time.time()
+        job._task = None
+        self.counters[status] += 1
+        self._prune()
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id: str) -> Job:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Unknown job: {job_id}")
+        return job
+
+    def list(self, status: str | None = None, limit: int = 50) -> List[Job]:
+        """Most recently submitted jobs first, optionally only those in `status`."""
+        if status is not None and status not in JOB_STATES:
+            raise ValueError(f"Unknown job status: {status}. Valid options: {list(JOB_STATES)}")
+        jobs = [job for job in reversed(self._jobs.values()) if status is None or job.status == status]
+        return jobs[:limit]
+
+    def unfinished(self, collection: str) -> List[Job]:
+        """Queued and running jobs that write to `collection`."""
+        return [job for job in self._jobs.values() if job.collection == collection and not job.finished]
+
+    def cancel(self, job_id: str) -> Job:
+        """Cancel a queued job now, or a running one at its next batch boundary."""
+        job = self.get(job_id)
+        if job.finished:
+            return job
+        job._cancel.set()
+        if job.status == "queued":
+            # The task may not have started yet, so it can't be relied on to record this.
+            if job._task is not None:
+                job._task.cancel()
+            self._finish(job, "cancelled")
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        by_status = {state: 0 for state in JOB_STATES}
+        for job in self._jobs.values():
+            by_status[job.status] += 1
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "running": by_status["running"],
+            "queued": by_status["queued"],
+            **{f"total_{name}": count for name, count in self.counters.items()},
+        }
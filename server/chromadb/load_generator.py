@@ -0,0 +1,523 @@
+"""
+Concurrent load generator for the MCP servers.
+
+Drives the real MCP tools of either server with many simultaneous client
+sessions, the way several agents would:
+
+- chroma: mcp_chroma_server.py (SSE on 3001 by default). A collection is
+  seeded from json_data/ and the workers mix chroma_query_documents,
+  chroma_add_documents, chroma_upsert_documents, chroma_get_documents and
+  chroma_get_collection_count calls.
+- regulations: server/llama_index/server.py (HTTP on 3002) and its
+  search_regulations tool, with questions from questions/.
+
+Unless --url is given the server is started as a subprocess; the Chroma
+server then runs against an ephemeral client or a temporary persistent
+directory that is removed afterwards.
+
+Every worker is a closed loop (one call at a time per session). The load
+profile decides how many workers are active over time:
+
+    constant  all workers for the whole run
+    ramp      1 -> --concurrency linearly
+    step      --concurrency in four equal steps
+    spike     a quarter of the workers, all of them in the middle third
+
+The report lists throughput, latency percentiles, error rate and error
+kinds ("overloaded", "deadline" from admission control, client timeouts)
+per tool, plus a timeline per --interval with active workers and the RSS
+of the server process tree (from /proc, Linux only).
+
+Usage:
+    python load_generator.py chroma --concurrency 32 --duration 60 --profile ramp
+    python load_generator.py chroma --mix chroma_query_documents=8,chroma_add_documents=1 --client-type persistent
+    python load_generator.py chroma --url http://localhost:3001/sse --pid 12345
+    python load_generator.py regulations --concurrency 8 --profile step --server-arg=--workers=2
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from fastmcp import Client
+
+from ingest_json_to_chroma import load_json_file, prepare_records
+
+CHROMA_DIR = Path(__file__).resolve().parent
+LLAMA_DIR = CHROMA_DIR.parent / "llama_index"
+
+PROFILES = ("constant", "ramp", "step", "spike")
+
+DEFAULT_MIX = {
+    "chroma": {
+        "chroma_query_documents": 70,
+        "chroma_get_documents": 10,
+        "chroma_add_documents": 10,
+        "chroma_upsert_documents": 5,
+        "chroma_get_collection_count": 5,
+    },
+    "regulations": {"search_regulations": 1},
+}
+
+
+def target_workers(profile: str, concurrency: int, elapsed: float, duration: float) -> int:
+    """Number of active workers `elapsed` seconds into a run of `duration` seconds."""
+    fraction = min(max(elapsed / duration, 0.0), 1.0) if duration > 0 else 1.0
+    if profile == "ramp":
+        return max(1, round(1 + (concurrency - 1) * fraction))
+    if profile == "step":
+        return max(1, round(concurrency * min(int(fraction * 4) + 1, 4) / 4))
+    if profile == "spike":
+        return concurrency if 1 / 3 <= fraction < 2 / 3 else max(1, concurrency // 4)
+    return concurrency
+
+
+def parse_mix(spec: str | None, server: str) -> Dict[str, float]:
+    """Parse 'tool=weight,tool=weight' into a weight dict (default: DEFAULT_MIX[server])."""
+    if not spec:
+        return dict(DEFAULT_MIX[server])
+    mix = {}
+    for part in spec.split(","):
+        tool, _, weight = part.partition("=")
+        try:
+            mix[tool.strip()] = float(weight) if weight else 1.0
+        except ValueError as e:
+            raise ValueError(f"Invalid mix entry: {part}") from e
+    unknown = set(mix) - set(DEFAULT_MIX[server])
+    if unknown:
+        raise ValueError(f"Unsupported tools for {server}: {sorted(unknown)}. "
+                         f"Valid options: {list(DEFAULT_MIX[server])}")
+    if not any(w > 0 for w in mix.values()):
+        raise ValueError("At least one tool needs a positive weight.")
+    return mix
+
+
+def load_questions() -> List[str]:
+    questions = []
+    for path in sorted((LLAMA_DIR / "questions").glob("q*.txt")):
+        for line in path.read_text(encoding="utf-8").splitlines():
+            match = re.match(r"^\s*\d+\.\s*(.+)$", line)
+            if match:
+                questions.append(match.group(1).strip())
+    return questions
+
+
+##### Workloads #####
+
+class ChromaWorkload:
+    """Seeded collection plus generators for the Chroma tool mix."""
+
+    def __init__(self, collection: str, mix: Dict[str, float], seed_docs: int, add_batch: int, n_results: int):
+        self.collection = collection
+        self.tools = list(mix)
+        self.weights = [mix[t] for t in self.tools]
+        self.add_batch = add_batch
+        self.n_results = n_results
+        documents = []
+        for json_file in sorted((CHROMA_DIR / "json_data").glob("*.json")):
+            documents.extend(load_json_file(json_file))
+        self.ids, self.texts, self.metadatas = prepare_records(documents)
+        if not self.texts:
+            # No policy documents checked out: fall back to synthetic text.
+            self.texts = [f"Policy clause {i} on leave, travel allowance and promotion norms." for i in range(200)]
+            self.ids = [f"synthetic_{i}" for i in range(len(self.texts))]
+            self.metadatas = [{"source_file": "synthetic"} for _ in self.texts]
+        if seed_docs:
+            self.ids, self.texts, self.metadatas = (
+                self.ids[:seed_docs], self.texts[:seed_docs], self.metadatas[:seed_docs]
+            )
+        self.queries = load_questions() or [" ".join(t.split()[:8]) for t in self.texts]
+        self._counter = 0
+
+    async def setup(self, client: Client) -> None:
+        await client.call_tool("chroma_get_or_create_collection", {"collection_name": self.collection})
+        await client.call_tool("chroma_upsert_documents", {
+            "collection_name": self.collection,
+            "documents": self.texts,
+            "ids": self.ids,
+            "metadatas": self.metadatas,
+        })
+
+    async def teardown(self, client: Client) -> None:
+        await client.call_tool("chroma_delete_collection", {"collection_name": self.collection})
+
+    def _new_docs(self, rng: random.Random, worker: int) -> Tuple[List[str], List[str]]:
+        ids, texts = [], []
+        for _ in range(self.add_batch):
+            self._counter += 1
+            ids.append(f"load_{worker}_{self._counter}")
+            texts.append(f"{rng.choice(self.texts)} (load test copy {self._counter})")
+        return ids, texts
+
+    def next_call(self, rng: random.Random, worker: int) -> Tuple[str, Dict[str, Any]]:
+        tool = rng.choices(self.tools, self.weights)[0]
+        if tool == "chroma_query_documents":
+            return tool, {"collection_name": self.collection, "query_texts": [rng.choice(self.queries)],
+                          "n_results": self.n_results}
+        if tool == "chroma_get_documents":
+            return tool, {"collection_name": self.collection, "limit": 10, "offset": rng.randrange(len(self.ids))}
+        if tool == "chroma_add_documents":
+            ids, texts = self._new_docs(rng, worker)
+            return tool, {"collection_name": self.collection, "documents": texts, "ids": ids}
+        if tool == "chroma_upsert_documents":
+            picks = rng.sample(range(len(self.ids)), min(self.add_batch, len(self.ids)))
+            return tool, {"collection_name": self.collection, "ids": [self.ids[i] for i in picks],
+                          "documents": [self.texts[i] for i in picks]}
+        return tool, {"collection_name": self.collection}
+
+
+class RegulationsWorkload:
+    """search_regulations calls with questions from questions/."""
+
+    def __init__(self, mix: Dict[str, float]):
+        self.questions = load_questions()
+        if not self.questions:
+            raise ValueError(f"No questions found in {LLAMA_DIR / 'questions'}")
+
+    async def setup(self, client: Client) -> None:
+        return None
+
+    async def teardown(self, client: Client) -> None:
+        return None
+
+    def next_call(self, rng: random.Random, worker: int) -> Tuple[str, Dict[str, Any]]:
+        return "search_regulations", {"query": rng.choice(self.questions)}
+
+
+##### Server process #####
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(host: str, port: int, timeout: float, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before listening")
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"Server did not start listening on {host}:{port} within {timeout}s")
+
+
+def start_server(args) -> Tuple[subprocess.Popen, str, str | None]:
+    """Start the selected server; returns (process, MCP URL, temp data dir or None)."""
+    port = args.port or _free_port()
+    data_dir = None
+    if args.server == "chroma":
+        if args.client_type == "persistent":
+            data_dir = tempfile.mkdtemp(prefix="load_test_chroma_")
+        command = [sys.executable, "mcp_chroma_server.py", "--client-type", args.client_type,
+                   "--data-dir", data_dir or "", "--transport", args.transport,
+                   "--mcp-host", "127.0.0.1", "--mcp-port", str(port), "--dotenv-path", ""]
+        cwd = CHROMA_DIR
+        path = "/sse" if args.transport == "sse" else "/mcp"
+    else:
+        command = [sys.executable, "server.py", "--host", "127.0.0.1", "--port", str(port)]
+        cwd = LLAMA_DIR
+        path = "/mcp"
+    command += args.server_arg
+    process = subprocess.Popen(
+        command,
+        cwd=cwd,
+        stdout=None if args.verbose else subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port("127.0.0.1", port, args.startup_timeout, process)
+    except Exception:
+        stop_server(process, data_dir)
+        raise
+    return process, f"http://127.0.0.1:{port}{path}", data_dir
+
+
+def stop_server(process: subprocess.Popen, data_dir: str | None) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    if data_dir:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        try:
+            with open(f"/proc/{current}/task/{current}/children", "r") as f:
+                stack.extend(int(p) for p in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _rss_kb(pid: int) -> int | None:
+    """Summed VmRSS of a process and its descendants, or None where /proc isn't available."""
+    total, seen = 0, False
+    for p in _process_tree(pid):
+        try:
+            with open(f"/proc/{p}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        seen = True
+                        break
+        except OSError:
+            pass
+    return total if seen else None
+
+
+class RSSSampler(threading.Thread):
+    """Samples the server's RSS every `interval` seconds in the background."""
+
+    def __init__(self, pid: int | None, interval: float):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Tuple[float, int]] = []
+        self._halt = threading.Event()
+        self.started_at = time.monotonic()
+
+    def run(self) -> None:
+        while self.pid and not self._halt.is_set():
+            rss = _rss_kb(self.pid)
+            if rss is not None:
+                self.samples.append((time.monotonic() - self.started_at, rss))
+            self._halt.wait(self.interval)
+
+    def stop(self) -> None:
+        self._halt.set()
+
+
+##### Load loop #####
+
+def classify_error(error: BaseException) -> str:
+    message = str(error)
+    if "Server overloaded" in message:
+        return "overloaded"
+    if "Deadline exceeded" in message:
+        return "deadline"
+    if isinstance(error, asyncio.TimeoutError):
+        return "client_timeout"
+    return f"{type(error).__name__}: {message[:80]}"
+
+
+async def run_load(url: str, workload, args, duration: float, record: bool = True) -> List[Dict[str, Any]]:
+    """Run the profile for `duration` seconds; returns one record per completed call."""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    end = started + duration
+    calls: List[Dict[str, Any]] = []
+
+    async def worker(index: int) -> None:
+        rng = random.Random(args.seed * 1000 + index)
+        while loop.time() < end:
+            if index >= target_workers(args.profile, args.concurrency, loop.time() - started, duration):
+                await asyncio.sleep(0.05)
+                continue
+            try:
+                # Sessions open when a worker first becomes active, like an agent joining.
+                async with Client(url, timeout=args.call_timeout) as client:
+                    while loop.time() < end:
+                        if index >= target_workers(args.profile, args.concurrency, loop.time() - started, duration):
+                            await asyncio.sleep(0.05)
+                            continue
+                        tool, arguments = workload.next_call(rng, index)
+                        call_started = loop.time()
+                        error = None
+                        try:
+                            await asyncio.wait_for(client.call_tool(tool, arguments), args.call_timeout)
+                        except Exception as e:
+                            error = classify_error(e)
+                        if record:
+                            calls.append({"tool": tool, "start": call_started - started,
+                                          "end": loop.time() - started, "latency": loop.time() - call_started,
+                                          "error": error})
+            except Exception as e:
+                if record:
+                    now = loop.time() - started
+                    calls.append({"tool": "connect", "start": now, "end": now, "latency": 0.0,
+                                  "error": classify_error(e)})
+                await asyncio.sleep(1.0)
+
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    return calls
+
+
+def _latency_stats(latencies: List[float]) -> Dict[str, float | None]:
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        "max_ms": round(float(ms.max()), 1),
+    }
+
+
+def summarize(calls: List[Dict[str, Any]], rss: List[Tuple[float, int]], args, duration: float) -> Dict[str, Any]:
+    """Totals, per-tool breakdown and a per-interval timeline."""
+    def block(items: List[Dict[str, Any]], seconds: float) -> Dict[str, Any]:
+        ok = [c["latency"] for c in items if c["error"] is None]
+        errors: Dict[str, int] = {}
+        for c in items:
+            if c["error"] is not None:
+                errors[c["error"]] = errors.get(c["error"], 0) + 1
+        return {
+            "calls": len(items),
+            "ok": len(ok),
+            "errors": len(items) - len(ok),
+            "error_rate": round((len(items) - len(ok)) / len(items), 4) if items else None,
+            "throughput_rps": round(len(ok) / seconds, 2) if seconds > 0 else None,
+            **_latency_stats(ok),
+            "error_kinds": dict(sorted(errors.items(), key=lambda kv: -kv[1])),
+        }
+
+    tools = sorted({c["tool"] for c in calls})
+    timeline = []
+    steps = max(1, int(np.ceil(duration / args.interval)))
+    for i in range(steps):
+        lo, hi = i * args.interval, min((i + 1) * args.interval, duration)
+        window = [c for c in calls if lo <= c["end"] < hi]
+        rss_window = [kb for t, kb in rss if lo <= t < hi]
+        entry = block(window, hi - lo)
+        entry.pop("error_kinds")
+        timeline.append({
+            "t": round(hi, 1),
+            "active_workers": target_workers(args.profile, args.concurrency, lo, duration),
+            **entry,
+            "rss_mb": round(max(rss_window) / 1024, 1) if rss_window else None,
+        })
+    return {
+        "server": args.server,
+        "profile": args.profile,
+        "concurrency": args.concurrency,
+        "duration_s": duration,
+        "total": block(calls, duration),
+        "tools": {tool: block([c for c in calls if c["tool"] == tool], duration) for tool in tools},
+        "peak_rss_mb": round(max(kb for _, kb in rss) / 1024, 1) if rss else None,
+        "timeline": timeline,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{'t (s)':>7}{'workers':>9}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err %':>8}{'RSS MB':>9}")
+    for row in report["timeline"]:
+        err = f"{row['error_rate'] * 100:.1f}" if row["error_rate"] is not None else "-"
+        print(f"{row['t']:>7}{row['active_workers']:>9}{row['throughput_rps'] or 0:>9}{row['p50_ms'] or '-':>9}"
+              f"{row['p95_ms'] or '-':>9}{row['p99_ms'] or '-':>9}{err:>8}{row['rss_mb'] or '-':>9}")
+
+    print(f"\n{'tool':<30}{'calls':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err %':>8}")
+    for name, stats in [*report["tools"].items(), ("TOTAL", report["total"])]:
+        err = f"{stats['error_rate'] * 100:.1f}" if stats["error_rate"] is not None else "-"
+        print(f"{name:<30}{stats['calls']:>8}{stats['throughput_rps'] or 0:>9}{stats['p50_ms'] or '-':>9}"
+              f"{stats['p95_ms'] or '-':>9}{stats['p99_ms'] or '-':>9}{err:>8}")
+    if report["total"]["error_kinds"]:
+        print("\nErrors:")
+        for kind, count in report["total"]["error_kinds"].items():
+            print(f"  {count:>6}  {kind}")
+    if report["peak_rss_mb"] is not None:
+        print(f"\nPeak server RSS: {report['peak_rss_mb']} MB")
+
+
+async def _session(url: str, fn) -> None:
+    async with Client(url, timeout=600) as client:
+        await fn(client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the MCP servers")
+    parser.add_argument("server", choices=["chroma", "regulations"])
+    parser.add_argument("--url", default=None, help="Attach to a running server instead of starting one")
+    parser.add_argument("--pid", type=int, default=None, help="Server PID for RSS sampling when using --url")
+    parser.add_argument("--concurrency", type=int, default=16, help="Maximum concurrent sessions (default: 16)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds (default: 30)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before the run (default: 5)")
+    parser.add_argument("--profile", choices=PROFILES, default="constant")
+    parser.add_argument("--mix", default=None,
+                        help="Tool weights, e.g. chroma_query_documents=8,chroma_add_documents=1")
+    parser.add_argument("--interval", type=float, default=5.0, help="Timeline bucket in seconds (default: 5)")
+    parser.add_argument("--call-timeout", type=float, default=120.0, help="Client-side timeout per call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--client-type", choices=["ephemeral", "persistent"], default="ephemeral",
+                        help="Chroma client of the started server; persistent uses a temp dir (default: ephemeral)")
+    parser.add_argument("--transport", choices=["sse", "http"], default="sse",
+                        help="Transport of the started Chroma server (default: sse)")
+    parser.add_argument("--collection", default="load_test", help="Chroma collection seeded and used by the test")
+    parser.add_argument("--seed-docs", type=int, default=0, help="Seed only the first N policy documents (0: all)")
+    parser.add_argument("--add-batch", type=int, default=5, help="Documents per add/upsert call (default: 5)")
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--port", type=int, default=None, help="Port of the started server (default: a free port)")
+    parser.add_argument("--server-arg", action="append", default=[],
+                        help="Extra argument for the started server, e.g. --server-arg=--max-in-flight=32")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--output", default=None, help="Write the report (with timeline) to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show server output")
+    args = parser.parse_args()
+
+    if args.concurrency < 1 or args.duration <= 0 or args.interval <= 0:
+        parser.error("--concurrency must be >= 1, --duration and --interval must be positive")
+
+    mix = parse_mix(args.mix, args.server)
+    if args.server == "chroma":
+        workload = ChromaWorkload(args.collection, mix, args.seed_docs, args.add_batch, args.n_results)
+    else:
+        workload = RegulationsWorkload(mix)
+
+    process, data_dir = None, None
+    url, pid = args.url, args.pid
+    if url is None:
+        print(f"▶ Starting {args.server} server ...")
+        process, url, data_dir = start_server(args)
+        pid = process.pid
+    print(f"🔗 {url}")
+
+    sampler = RSSSampler(pid, min(args.interval, 1.0))
+    try:
+        asyncio.run(_session(url, workload.setup))
+        if args.warmup > 0:
+            print(f"🔥 Warm-up {args.warmup}s")
+            asyncio.run(run_load(url, workload, args, args.warmup, record=False))
+        print(f"🚀 {args.profile} profile, up to {args.concurrency} sessions, {args.duration}s")
+        sampler.start()
+        calls = asyncio.run(run_load(url, workload, args, args.duration))
+        sampler.stop()
+        report = summarize(calls, sampler.samples, args, args.duration)
+        if args.url is not None:
+            asyncio.run(_session(url, workload.teardown))
+    finally:
+        sampler.stop()
+        if process is not None:
+            stop_server(process, data_dir)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📁 Report: {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
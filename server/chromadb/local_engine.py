@@ -0,0 +1,326 @@
+"""
+Exact in-process vector search for ephemeral and small collections.
+
+LocalVectorIndex snapshots a collection's embeddings into one contiguous
+float32 matrix and answers queries with a single batched matrix multiply
+followed by a partial sort, skipping Chroma's HNSW/SQLite path entirely.
+For persistent clients the matrix is written next to the Chroma data and
+memory-mapped back, so the page cache is shared between restarts.
+
+Metadata filters are evaluated against boolean masks: equality masks for
+every (key, value) pair are precomputed at build time, and masks for other
+operators are computed on first use and cached for the life of the index.
+Values compare the way Chroma compares them: ints and floats are one
+numeric kind, while bools and strings only ever equal values of their own
+kind (so `True` does not match `1`), and range operators only apply to
+numbers.
+
+An index is a snapshot; callers decide when it is stale (the server checks
+data_version.py before every query).
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import numpy as np
+
+# Range operators of Chroma's `where` syntax; they only apply to numbers.
+_COMPARATORS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+}
+
+
+def collection_space(collection) -> str:
+    """Distance space of a collection, from its HNSW configuration or legacy `hnsw:space` metadata."""
+    try:
+        space = (collection.configuration or {}).get("hnsw", {}).get("space")
+    except Exception:
+        space = None
+    return space or (collection.metadata or {}).get("hnsw:space", "l2")
+
+
+def _kind(value: Any) -> str:
+    """Comparison class of a metadata value; values of different kinds never match."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    return type(value).__name__
+
+
+class UnsupportedFilterError(ValueError):
+    """Raised when a `where` clause can't be evaluated locally; callers fall back to Chroma."""
+
+
+class LocalVectorIndex:
+    """Brute-force exact top-k over a snapshot of one collection."""
+
+    def __init__(
+        self,
+        ids: List[str],
+        embeddings: np.ndarray,
+        documents: List[str | None],
+        metadatas: List[Dict | None],
+        space: str = "l2",
+        cache_path: str | None = None,
+    ):
+        """
+        Initialize the index from already-fetched collection rows.
+
+        Args:
+            ids: Document IDs, one per row
+            embeddings: (N, D) matrix of stored embeddings
+            documents: Document texts, one per row
+            metadatas: Metadata dicts, one per row
+            space: Distance space of the collection ('cosine', 'l2' or 'ip')
+            cache_path: Optional .npy path; when given the matrix is saved there and memory-mapped
+        """
+        if space not in ("cosine", "l2", "ip"):
+            raise ValueError(f"Unsupported distance space: {space}")
+
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = [m or {} for m in metadatas]
+        self.space = space
+
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(self.ids), -1)
+        # The stored vectors are kept as they are (queries may return them); cosine
+        # scores are divided by the row norms at search time instead.
+        self.inv_norms = 1.0 / np.maximum(np.linalg.norm(matrix, axis=1), 1e-12) if space == "cosine" else None
+
+        if cache_path is not None:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            # Another process may have the old file mapped; replace it instead of truncating it.
+            temp_path = f"{cache_path}.{os.getpid()}.tmp.npy"
+            np.save(temp_path, matrix)
+            os.replace(temp_path, cache_path)
+            matrix = np.load(cache_path, mmap_mode="r")
+        self.matrix = matrix
+        self.sq_norms = np.einsum("ij,ij->i", matrix, matrix) if space == "l2" else None
+
+        # Version of the collection the snapshot was taken at; set by the owner (see data_version.py).
+        self.data_version: Any = None
+        self._masks: Dict[Tuple, np.ndarray] = {}
+        self._precompute_equality_masks()
+
+    @classmethod
+    def from_collection(cls, collection, batch_size: int = 5000, cache_dir: str | None = None, **kwargs) -> "LocalVectorIndex":
+        """Build an index by paging through every row of a Chroma collection; extra kwargs go to the constructor."""
+        ids, documents, metadatas, chunks = [], [], [], []
+        offset = 0
+        while True:
+            batch = collection.get(
+                include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset
+            )
+            if not batch["ids"]:
+                break
+            ids.extend(batch["ids"])
+            documents.extend(batch["documents"])
+            metadatas.extend(batch["metadatas"])
+            chunks.append(np.asarray(batch["embeddings"], dtype=np.float32))
+            offset += len(batch["ids"])
+
+        embeddings = np.concatenate(chunks) if chunks else np.zeros((0, 0), dtype=np.float32)
+        space = collection_space(collection)
+        cache_path = str(Path(cache_dir) / f"{collection.id}.npy") if cache_dir else None
+        return cls(ids, embeddings, documents, metadatas, space=space, cache_path=cache_path, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    ##### Metadata masks #####
+
+    def _precompute_equality_masks(self) -> None:
+        """Build one boolean mask per (key, value) pair present in the metadata."""
+        rows_by_pair: Dict[Tuple[str, Any], List[int]] = {}
+        for row, metadata in enumerate(self.metadatas):
+            for key, value in metadata.items():
+                if isinstance(value, (list, dict)):
+                    continue
+                rows_by_pair.setdefault((key, _kind(value), value), []).append(row)
+        for (key, kind, value), rows in rows_by_pair.items():
+            mask = np.zeros(len(self.ids), dtype=bool)
+            mask[rows] = True
+            self._masks[(key, "$eq", kind, value)] = mask
+
+    def _field_mask(self, key: str, op: str, value: Any) -> np.ndarray:
+        """Mask for a single `{key: {op: value}}` condition, cached after first use."""
+        if op in ("$in", "$nin"):
+            if not isinstance(value, list) or len({type(item) for item in value}) > 1:
+                # Chroma rejects lists mixing types (even ints and floats); let it raise its own error.
+                raise UnsupportedFilterError(f"{op} expects a list of values of one type")
+            mask = np.zeros(len(self.ids), dtype=bool)
+            for item in value:
+                mask |= self._field_mask(key, "$eq", item)
+            return ~mask if op == "$nin" else mask
+        if isinstance(value, (list, dict)):
+            raise UnsupportedFilterError(f"{op} does not accept a {type(value).__name__}")
+
+        # The kind keeps True and 1 apart: they are equal (and hash alike) in Python.
+        cache_key = (key, op, _kind(value), value)
+        if cache_key in self._masks:
+            return self._masks[cache_key]
+        if op == "$eq":
+            # Not present in any row at build time.
+            return np.zeros(len(self.ids), dtype=bool)
+        if op == "$ne":
+            # Like Chroma, rows without the key or with a value of another kind match.
+            return ~self._field_mask(key, "$eq", value)
+        compare = _COMPARATORS.get(op)
+        if compare is None:
+            raise UnsupportedFilterError(f"Unsupported operator: {op}")
+        if _kind(value) != "number":
+            raise UnsupportedFilterError(f"{op} expects a number")
+
+        mask = np.zeros(len(self.ids), dtype=bool)
+        for row, metadata in enumerate(self.metadatas):
+            if _kind(metadata.get(key)) == "number":
+                mask[row] = compare(metadata[key], value)
+        self._masks[cache_key] = mask
+        return mask
+
+    def mask_for(self, where: Dict | None) -> np.ndarray | None:
+        """Evaluate a Chroma `where` clause to a boolean row mask (None means no filter)."""
+        if not where:
+            return None
+        masks = []
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                parts = [self.mask_for(clause) for clause in condition]
+                parts = [p for p in parts if p is not None]
+                if not parts:
+                    continue
+                combine = np.logical_and if key == "$and" else np.logical_or
+                masks.append(combine.reduce(parts))
+            elif key.startswith("$"):
+                raise UnsupportedFilterError(f"Unsupported logical operator: {key}")
+            elif isinstance(condition, dict):
+                for op, value in condition.items():
+                    masks.append(self._field_mask(key, op, value))
+            else:
+                masks.append(self._field_mask(key, "$eq", condition))
+        if not masks:
+            return None
+        return np.logical_and.reduce(masks)
+
+    ##### Search #####
+
+    def _distances(self, queries: np.ndarray, candidates: np.ndarray | None) -> np.ndarray:
+        """(Q, N) distances in Chroma's conventions, against all rows or only `candidates`."""
+        rows = self.matrix if candidates is None else self.matrix[candidates]
+        scores = self._cosine(queries @ rows.T, candidates)
+        if self.space in ("cosine", "ip"):
+            return 1.0 - scores
+        sq_norms = self.sq_norms if candidates is None else self.sq_norms[candidates]
+        q_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        return np.maximum(q_norms - 2.0 * scores + sq_norms[None, :], 0.0)
+
+    def _cosine(self, scores: np.ndarray, candidates: np.ndarray | None) -> np.ndarray:
+        """Inner products of unit queries with rows (all or `candidates`) turned into cosine similarities."""
+        if self.inv_norms is None:
+            return scores
+        return scores * (self.inv_norms if candidates is None else self.inv_norms[candidates])[None, :]
+
+    def _search(self, queries: np.ndarray, candidates: np.ndarray | None, n_results: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Top-k (row indices, distances) per query, nearest first, among all rows or only `candidates`."""
+        if candidates is not None and len(candidates) == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        distances = self._distances(queries, candidates)
+        k = min(n_results, distances.shape[1])
+        hits = []
+        for row in distances:
+            if k == 0:
+                top = np.zeros(0, dtype=np.int64)
+            else:
+                top = np.argpartition(row, k - 1)[:k]
+                top = top[np.argsort(row[top], kind="stable")]
+            hits.append((top if candidates is None else candidates[top], row[top]))
+        return hits
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Dict | None = None,
+        include: List[str] = ["documents", "metadatas", "distances"],
+    ) -> Dict:
+        """
+        Exact top-k search for a batch of query embeddings.
+
+        Returns:
+            Dictionary shaped like Chroma's QueryResult (one inner list per query)
+        """
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        if self.space == "cosine":
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        mask = self.mask_for(where)
+        result: Dict[str, Any] = {"ids": [], "included": list(include)}
+        for field in ("documents", "metadatas", "distances", "embeddings"):
+            result[field] = [] if field in include else None
+
+        if len(self.ids) == 0:
+            candidates = np.zeros(0, dtype=np.int64)
+        elif mask is None:
+            candidates = None
+        else:
+            candidates = np.flatnonzero(mask)
+
+        hits = self._search(queries, candidates, n_results)
+        for rows, row_distances in hits:
+            result["ids"].append([self.ids[r] for r in rows])
+            if result["documents"] is not None:
+                result["documents"].append([self.documents[r] for r in rows])
+            if result["metadatas"] is not None:
+                result["metadatas"].append([self.metadatas[r] or None for r in rows])
+            if result["distances"] is not None:
+                result["distances"].append(row_distances.tolist())
+            if result["embeddings"] is not None:
+                result["embeddings"].append(np.asarray(self.matrix[rows]).tolist())
+        return result
+
+
+def benchmark(collection, index: LocalVectorIndex, query_embeddings, n_results: int = 10, repeats: int = 5) -> Dict:
+    """
+    Time the Chroma query path against the local index for the same query vectors.
+
+    Returns:
+        Median latencies of both paths, the speedup, and recall@k of the
+        HNSW results measured against the exact local results
+    """
+    queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+
+    def timed(fn) -> Tuple[float, Any]:
+        samples, out = [], None
+        for _ in range(max(repeats, 1)):
+            started = time.perf_counter()
+            out = fn()
+            samples.append(time.perf_counter() - started)
+        return float(np.median(samples)), out
+
+    chroma_s, chroma_out = timed(lambda: collection.query(
+        query_embeddings=queries, n_results=n_results, include=["distances"]
+    ))
+    local_s, local_out = timed(lambda: index.query(queries, n_results=n_results, include=["distances"]))
+
+    overlaps = []
+    for exact_ids, hnsw_ids in zip(local_out["ids"], chroma_out["ids"]):
+        if exact_ids:
+            overlaps.append(len(set(exact_ids) & set(hnsw_ids)) / len(exact_ids))
+
+    return {
+        "collection_size": len(index),
+        "queries": len(queries),
+        "n_results": n_results,
+        "chroma_ms": round(chroma_s * 1000, 3),
+        "local_ms": round(local_s * 1000, 3),
+        "speedup": round(chroma_s / local_s, 2) if local_s > 0 else None,
+        "hnsw_recall_at_k": round(float(np.mean(overlaps)), 4) if overlaps else None,
+        "faster": "local" if local_s < chroma_s else "chroma",
+    }
@@ -22,14 +22,20 @@ For Claude Desktop, add to config:
 }
 """
 
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import chromadb
+import numpy as np
 import os
 import sys
+import json
+import time
+import base64
+import asyncio
+import hashlib
 import argparse
 from pathlib import Path
 from dotenv import load_dotenv
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
 from chromadb.config import Settings
 from chromadb.api.collection_configuration import CreateCollectionConfiguration
 from chromadb.api import EmbeddingFunction
@@ -41,6 +47,19 @@ from chromadb.utils.embedding_functions import (
     VoyageAIEmbeddingFunction,
     RoboflowEmbeddingFunction,
 )
+from collection_io import export_collection, get_or_create_target, import_collection, read_manifest
+from local_engine import LocalVectorIndex, UnsupportedFilterError, collection_space, benchmark as benchmark_local_engine
+from quantization import QuantizedVectorIndex
+from hnsw_tuning import hnsw_config, current_hnsw, rebuild_collection, sweep as hnsw_sweep
+from sharding import SHARD_KEY_FIELD, SHARD_MODEL_FIELD, ShardRouter, is_sharded
+from mcp_shared.admission import AdmissionControl, ToolLimit, parse_tool_limits
+from mcp_shared.profiling import LiveProfiler
+from mcp_shared.reload_signal import ReloadSignal, reopen_persistent_client
+from query_cache import QueryResultCache
+from jobs import Job, JobManager
+from write_buffer import WriteCoalescer
+from data_version import DataVersionProbe
+from write_guard import CollectionWriteGuard
 
 # Initialize FastMCP server
 mcp = FastMCP("chroma")
@@ -58,6 +77,57 @@ mcp_known_embedding_functions: Dict[str, EmbeddingFunction] = {
     "roboflow": RoboflowEmbeddingFunction,
 }
 
+# Rows re-read behind a pagination cursor so it can relocate its anchor
+# document after earlier rows have been deleted.
+CURSOR_LOOKBACK_ROWS = 100
+
+# Default page size for streamed get responses.
+STREAM_PAGE_SIZE = 500
+
+# Fields of a GetResult that hold one entry per returned row.
+_ROW_FIELDS = ("ids", "embeddings", "documents", "uris", "data", "metadatas")
+
+# Local similarity engine state (see local_engine.py). Mode is 'off', 'auto'
+# (collections up to _local_engine_max_docs, or whichever path won the last
+# benchmark) or 'always'.
+_local_engine_mode = "off"
+_local_engine_max_docs = 20000
+_local_engine_cache_dir: str | None = None
+# Compressed first stage of the local engine ('none', 'int8' or 'pq') and
+# its re-scoring shortlist multiple (see quantization.py).
+_local_engine_quantization = "none"
+_local_engine_rescore = 4
+
+# Admission control middleware (see mcp_shared/admission.py), installed by configure_admission().
+_admission: AdmissionControl | None = None
+# Live profiler (see mcp_shared/profiling.py); only set, and its tool only registered, with --enable-profiling.
+_profiler: LiveProfiler | None = None
+# Results of read tools, invalidated by _mark_collection_changed (see query_cache.py).
+_query_cache = QueryResultCache()
+# Background write jobs (see jobs.py), configured by configure_jobs().
+_jobs = JobManager()
+# Group commit of small add/upsert calls (see write_buffer.py); only set with --write-coalesce-ms.
+_write_buffer: WriteCoalescer | None = None
+# Keeps this server's writes and index rebuilds of a collection apart (see write_guard.py).
+_write_guard = CollectionWriteGuard()
+# Result of the startup warm-up (see warm_up_collections), or None without --warmup-collections.
+_warmup_report: Dict | None = None
+_local_indexes: Dict[str, LocalVectorIndex] = {}
+# Change markers of a persistent data dir, which other processes may write to (see data_version.py).
+_data_version: DataVersionProbe | None = None
+# Http and cloud clients, whose collections are versioned by their row count instead.
+_remote_client = False
+# Fired by ingesters that wrote to the persistent data dir (see mcp_shared/reload_signal.py).
+_reload_signal: ReloadSignal | None = None
+_local_engine_choice: Dict[str, str] = {}
+
+# Include fields the local engine can answer; anything else goes to Chroma.
+LOCAL_ENGINE_INCLUDES = {"documents", "metadatas", "distances", "embeddings"}
+
+# Documents per write in background upsert and delete jobs; progress and
+# cancellation are checked between batches.
+JOB_BATCH_SIZE = 100
+
 
 def create_parser():
     """Create and return the argument parser."""
@@ -107,6 +177,99 @@ def create_parser():
                        choices=['stdio', 'http', 'sse'],
                        default=os.getenv('MCP_TRANSPORT', 'sse'),
                        help='Transport type for MCP server (default: sse)')
+
+    # Local similarity engine
+    parser.add_argument('--local-engine',
+                       choices=['off', 'auto', 'always'],
+                       default=os.getenv('CHROMA_LOCAL_ENGINE', 'off'),
+                       help='Answer queries with the in-process exact engine (default: off)')
+    parser.add_argument('--local-engine-max-docs',
+                       type=int,
+                       default=int(os.getenv('CHROMA_LOCAL_ENGINE_MAX_DOCS', '20000')),
+                       help='Largest collection served by the local engine in auto mode (default: 20000)')
+    parser.add_argument('--local-engine-quantization',
+                       choices=['none', 'int8', 'pq'],
+                       default=os.getenv('CHROMA_LOCAL_ENGINE_QUANTIZATION', 'none'),
+                       help='Keep only compressed codes of the local engine in RAM (default: none)')
+    parser.add_argument('--local-engine-rescore',
+                       type=int,
+                       default=int(os.getenv('CHROMA_LOCAL_ENGINE_RESCORE', '4')),
+                       help='Candidates re-scored at full precision, as a multiple of n_results; '
+                            '0 disables re-scoring (default: 4)')
+
+    # Admission control
+    parser.add_argument('--max-in-flight',
+                       type=int,
+                       default=int(os.getenv('CHROMA_MCP_MAX_IN_FLIGHT', '16')),
+                       help='Concurrent calls allowed per tool, 0 for unlimited (default: 16)')
+    parser.add_argument('--max-queue',
+                       type=int,
+                       default=int(os.getenv('CHROMA_MCP_MAX_QUEUE', '64')),
+                       help='Calls per tool waiting for a slot before new ones are rejected, 0 for unlimited (default: 64)')
+    parser.add_argument('--tool-timeout',
+                       type=float,
+                       default=float(os.getenv('CHROMA_MCP_TOOL_TIMEOUT', '0')),
+                       help='Deadline in seconds for each tool call including queueing, 0 for none (default: 0)')
+    parser.add_argument('--tool-limits',
+                       default=os.getenv('CHROMA_MCP_TOOL_LIMITS'),
+                       help='Per-tool overrides as JSON, e.g. \'{"chroma_query_documents": {"max_in_flight": 8, "timeout": 10}}\'')
+
+    # Profiling
+    parser.add_argument('--enable-profiling',
+                       action='store_true',
+                       default=os.getenv('CHROMA_MCP_ENABLE_PROFILING', 'false').lower() in ['true', 'yes', '1', 't', 'y'],
+                       help='Register the chroma_profile_server tool for live CPU and memory profiles (default: off)')
+    parser.add_argument('--profile-dir',
+                       default=os.getenv('CHROMA_MCP_PROFILE_DIR', './profiles'),
+                       help='Directory for full profiles saved by chroma_profile_server (default: ./profiles)')
+    parser.add_argument('--profile-max-seconds',
+                       type=float,
+                       default=float(os.getenv('CHROMA_MCP_PROFILE_MAX_SECONDS', '60')),
+                       help='Longest capture window chroma_profile_server accepts (default: 60)')
+
+    # Query result cache
+    parser.add_argument('--query-cache-entries',
+                       type=int,
+                       default=int(os.getenv('CHROMA_MCP_QUERY_CACHE_ENTRIES', '1024')),
+                       help='Cached query/get results, 0 disables the cache (default: 1024)')
+    parser.add_argument('--query-cache-mb',
+                       type=float,
+                       default=float(os.getenv('CHROMA_MCP_QUERY_CACHE_MB', '64')),
+                       help='Size limit of the query result cache in MB (default: 64)')
+    parser.add_argument('--query-cache-ttl',
+                       type=float,
+                       default=float(os.getenv('CHROMA_MCP_QUERY_CACHE_TTL', '300')),
+                       help='Seconds a cached result may be served, 0 for no expiry (default: 300)')
+
+    # Background jobs
+    parser.add_argument('--job-workers',
+                       type=int,
+                       default=int(os.getenv('CHROMA_MCP_JOB_WORKERS', '2')),
+                       help='Background write jobs that run at the same time (default: 2)')
+    parser.add_argument('--job-queue',
+                       type=int,
+                       default=int(os.getenv('CHROMA_MCP_JOB_QUEUE', '100')),
+                       help='Background jobs that may wait for a worker before new submissions are rejected, '
+                            '0 for unlimited (default: 100)')
+
+    # Write coalescing
+    parser.add_argument('--write-coalesce-ms',
+                       type=float,
+                       default=float(os.getenv('CHROMA_MCP_WRITE_COALESCE_MS', '0')),
+                       help='Milliseconds small chroma_add_documents/chroma_upsert_documents calls wait to be '
+                            'embedded and written together with others to the same collection, 0 disables '
+                            'coalescing (default: 0)')
+    parser.add_argument('--write-coalesce-max-docs',
+                       type=int,
+                       default=int(os.getenv('CHROMA_MCP_WRITE_COALESCE_MAX_DOCS', '256')),
+                       help='Documents at which a coalesced group is written without waiting; calls this '
+                            'large are written directly (default: 256)')
+
+    # Startup warm-up
+    parser.add_argument('--warmup-collections',
+                       default=os.getenv('CHROMA_MCP_WARMUP_COLLECTIONS'),
+                       help='Comma-separated collections (or "all") whose indexes and embedding functions are '
+                            'loaded before the server starts accepting calls (default: none)')
     return parser
 
 
@@ -168,10 +331,467 @@ def get_chroma_client(args=None):
         else:  # ephemeral
             print("Initializing ChromaDB with ephemeral storage", file=sys.stderr)
             _chroma_client = chromadb.EphemeralClient()
-            
+
+    elif _reload_signal is not None and _reload_signal.changed():
+        # Queries only see rows written by other processes after the client is reopened.
+        print("Reopening ChromaDB client after writes by another process", file=sys.stderr)
+        _chroma_client = reopen_persistent_client(_chroma_client)
+
     return _chroma_client
 
 
+##### Pagination Helpers #####
+
+def _jsonable(value):
+    """Convert numpy arrays (embeddings) inside a Chroma result to plain lists."""
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return value
+
+
+def _slice_get_result(result: Dict, start: int, end: int) -> Dict:
+    """Slice every per-row field of a GetResult to rows [start, end)."""
+    sliced = dict(result)
+    for field in _ROW_FIELDS:
+        if sliced.get(field) is not None:
+            sliced[field] = sliced[field][start:end]
+    return sliced
+
+
+def _query_fingerprint(
+    ids: List[str] | None,
+    where: Dict | None,
+    where_document: Dict | None,
+    include: List[str],
+) -> str:
+    """Hash the parameters that define a result set, so a cursor can't be replayed against another query."""
+    payload = json.dumps(
+        {"ids": ids, "where": where, "where_document": where_document, "include": sorted(include)},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _encode_cursor(state: Dict) -> str:
+    """Encode cursor state as an opaque URL-safe token."""
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(token: str, collection_id: str, fingerprint: str) -> Dict:
+    """Decode and validate a cursor token produced by _encode_cursor."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        offset, last_id = int(state["o"]), state["l"]
+    except Exception as e:
+        raise ValueError(f"Invalid cursor token: {str(e)}") from e
+    if state.get("c") != collection_id:
+        raise ValueError("Cursor belongs to a different collection (or the collection was recreated).")
+    if state.get("f") != fingerprint:
+        raise ValueError("Cursor was issued for a different ids/where/where_document/include combination.")
+    return {"o": offset, "l": last_id}
+
+
+def _fetch_page(
+    collection,
+    page_size: int,
+    cursor_state: Dict | None,
+    **get_kwargs,
+) -> Tuple[Dict, int]:
+    """Fetch one page of a collection.get() result set.
+
+    The cursor remembers both the offset and the ID of the last row it
+    returned. On resume a short window behind the offset is re-read so the
+    anchor row can be found even if up to CURSOR_LOOKBACK_ROWS rows before
+    it were deleted in the meantime. If the anchor itself was deleted (or
+    moved further), the resume position is unknown; rather than guess from
+    the raw offset and skip or repeat rows, the cursor is rejected as expired.
+
+    Returns:
+        Tuple of (page result, offset just past the last returned row)
+    """
+    if cursor_state is None:
+        result = collection.get(limit=page_size, offset=0, **get_kwargs)
+        return result, len(result["ids"])
+
+    offset, last_id = cursor_state["o"], cursor_state["l"]
+    start = max(offset - 1 - CURSOR_LOOKBACK_ROWS, 0)
+    window = collection.get(limit=(offset - start) + page_size, offset=start, **get_kwargs)
+    try:
+        anchor = window["ids"].index(last_id)
+    except ValueError:
+        raise ValueError(
+            "Cursor expired: the last document it returned was deleted, or more than "
+            f"{CURSOR_LOOKBACK_ROWS} earlier documents were. Restart pagination without a cursor."
+        ) from None
+    page = _slice_get_result(window, anchor + 1, anchor + 1 + page_size)
+    return page, start + anchor + 1 + len(page["ids"])
+
+
+def _progress_token(ctx: Context | None):
+    """The request's progressToken; without one, progress notifications are silently dropped."""
+    request_context = ctx.request_context if ctx is not None else None
+    if request_context is None or not request_context.meta:
+        return None
+    return request_context.meta.get("progressToken")
+
+
+def _next_cursor(collection_id: str, fingerprint: str, page: Dict, page_size: int, next_offset: int) -> str | None:
+    """Build the cursor for the page after `page`, or None once the result set is exhausted."""
+    if len(page["ids"]) < page_size:
+        return None
+    return _encode_cursor({"c": collection_id, "f": fingerprint, "o": next_offset, "l": page["ids"][-1]})
+
+
+##### Admission Control #####
+
+def configure_admission(args) -> None:
+    """Install per-tool concurrency limits, wait queues and deadlines."""
+    global _admission
+    default = ToolLimit(max_in_flight=args.max_in_flight, max_queue=args.max_queue, timeout=args.tool_timeout)
+    overrides = parse_tool_limits(args.tool_limits)
+    # Stats must stay reachable while the server is overloaded.
+    overrides.setdefault("chroma_get_server_stats", ToolLimit())
+    # A capture is meant to run alongside the load it measures.
+    overrides.setdefault("chroma_profile_server", ToolLimit())
+    # Polling and cancelling jobs must work while writes saturate the server.
+    for tool in ("chroma_get_job", "chroma_list_jobs", "chroma_cancel_job"):
+        overrides.setdefault(tool, ToolLimit())
+    _admission = AdmissionControl(default, overrides)
+    mcp.add_middleware(_admission)
+
+
+##### Query Result Cache #####
+
+def configure_query_cache(args) -> None:
+    """Apply the --query-cache options."""
+    global _query_cache
+    _query_cache = QueryResultCache(
+        max_entries=args.query_cache_entries,
+        max_bytes=int(args.query_cache_mb * 1024 ** 2),
+        ttl=args.query_cache_ttl,
+    )
+
+
+def _cache_lookup(tool: str, collection, arguments: Dict) -> Tuple[str, int, Dict | None]:
+    """Return (key, version, cached result or None); store a computed result with the same key and version."""
+    # The data version makes writes by other processes to the same data dir miss too.
+    key = QueryResultCache.key(tool, collection.name, str(collection.id),
+                               data_version=_collection_version(collection), **arguments)
+    cached = _query_cache.get(tool, key)
+    # Read before computing: a write landing meanwhile makes the result unservable.
+    return key, _query_cache.version(collection.name), cached
+
+
+##### Sharded Collection Helpers #####
+
+def _rows_of(client, collection):
+    """What gets, updates and deletes on `collection` go through.
+
+    For a sharded collection that is its ShardRouter, which fans them out to
+    the shards (the anchor itself holds no rows); otherwise the collection.
+    """
+    return ShardRouter(client, collection) if is_sharded(collection) else collection
+
+
+def _count(client, collection) -> int:
+    """Number of rows in a collection, summed over the shards of a sharded one."""
+    if is_sharded(collection):
+        return sum(ShardRouter(client, collection).count().values())
+    return collection.count()
+
+
+def _peek(client, collection, limit: int) -> Dict:
+    """First `limit` rows of a collection, like collection.peek()."""
+    if is_sharded(collection):
+        return ShardRouter(client, collection).get(include=["embeddings", "documents", "metadatas"], limit=limit)
+    return collection.peek(limit=limit)
+
+
+##### Background Job Helpers #####
+
+def configure_jobs(args) -> None:
+    """Apply the --job-workers and --job-queue options."""
+    global _jobs
+    _jobs = JobManager(max_workers=args.job_workers, max_pending=args.job_queue)
+
+
+def _submit_job(kind: str, collection_name: str, fn, total: int | None = None) -> str:
+    """Queue a write job and return the message handed back to the caller."""
+    def guarded(job: Job) -> str:
+        with _write_guard.write(collection_name):
+            return fn(job)
+    job = _jobs.submit(kind, collection_name, guarded, total=total)
+    size = f"{total} documents" if total is not None else "matching documents"
+    return (f"Submitted background job '{job.id}' ({kind}, {size}, collection '{collection_name}'). "
+            f"Poll chroma_get_job for progress; chroma_cancel_job stops it.")
+
+
+def _write_batches(client, collection, documents, ids, metadatas, batch_size: int,
+                   upsert: bool = False, job: Job | None = None) -> int:
+    """Add or upsert documents batch by batch, routing to shards; returns the number of batches.
+
+    With a `job`, progress is reported and cancellation checked after every
+    batch, and each batch is visible to readers as soon as it is written.
+    """
+    router = ShardRouter(client, collection) if is_sharded(collection) else None
+    batches = 0
+    for i in range(0, len(documents), batch_size):
+        if job is not None:
+            job.check_cancelled()
+        end_idx = min(i + batch_size, len(documents))
+        batch_docs = documents[i:end_idx]
+        batch_ids = ids[i:end_idx]
+        batch_metas = metadatas[i:end_idx] if metadatas else None
+
+        if router is not None:
+            router.write(ids=batch_ids, documents=batch_docs, metadatas=batch_metas, upsert=upsert)
+        elif upsert:
+            collection.upsert(documents=batch_docs, ids=batch_ids, metadatas=batch_metas)
+        else:
+            collection.add(documents=batch_docs, ids=batch_ids, metadatas=batch_metas)
+        batches += 1
+        if job is not None:
+            _mark_collection_changed(collection.name)
+            job.advance(len(batch_ids))
+    return batches
+
+
+def _delete_matching(client, collection, where, where_document, job: Job) -> str:
+    """Job body of a background chroma_delete_documents_by_filter.
+
+    The matching IDs are resolved once when the job starts and deleted in
+    batches, so documents that start matching later are left alone.
+    """
+    rows = _rows_of(client, collection)
+    ids = rows.get(where=where, where_document=where_document, include=[])["ids"]
+    job.total = len(ids)
+    for i in range(0, len(ids), JOB_BATCH_SIZE):
+        job.check_cancelled()
+        batch_ids = ids[i:i + JOB_BATCH_SIZE]
+        rows.delete(ids=batch_ids)
+        _mark_collection_changed(collection.name)
+        job.advance(len(batch_ids))
+    return f"Successfully deleted {len(ids)} documents from collection '{collection.name}' matching the filters"
+
+
+##### Write Coalescing #####
+
+def configure_write_buffer(args) -> None:
+    """Enable group commit of small writes when --write-coalesce-ms is set."""
+    global _write_buffer
+    if args.write_coalesce_ms < 0:
+        raise ValueError("--write-coalesce-ms must be >= 0.")
+    if args.write_coalesce_ms == 0:
+        return
+    _write_buffer = WriteCoalescer(
+        window=args.write_coalesce_ms / 1000,
+        max_docs=args.write_coalesce_max_docs,
+        embed=_embed_texts,
+        write=_write_rows,
+        existing=_existing_ids,
+        on_commit=_mark_collection_changed,
+    )
+
+
+def _write_rows(collection, op: str, ids, documents, metadatas, embeddings) -> None:
+    """Add or upsert pre-embedded rows, routing them to shards for sharded collections."""
+    if is_sharded(collection):
+        ShardRouter(get_chroma_client(), collection).write(
+            ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings, upsert=op == "upsert"
+        )
+        return
+    write_fn = collection.upsert if op == "upsert" else collection.add
+    write_fn(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+
+def _existing_ids(collection, ids: List[str]) -> List[str]:
+    """IDs among `ids` that are already stored, looked up in the shards for sharded collections."""
+    if is_sharded(collection):
+        return list(ShardRouter(get_chroma_client(), collection).locate(ids))
+    return collection.get(ids=ids, include=[])["ids"]
+
+
+def _coalesces(ids: List[str]) -> bool:
+    """Whether a write of `ids` goes through the write buffer."""
+    return _write_buffer is not None and len(ids) < _write_buffer.max_docs
+
+
+##### Local Engine Helpers #####
+
+def configure_local_engine(args) -> None:
+    """Apply the --local-engine options; persistent clients memory-map matrices under the data dir."""
+    global _local_engine_mode, _local_engine_max_docs, _local_engine_cache_dir
+    global _local_engine_quantization, _local_engine_rescore
+    if args.local_engine_rescore < 0:
+        raise ValueError("--local-engine-rescore must be >= 0.")
+    _local_engine_mode = args.local_engine
+    _local_engine_max_docs = args.local_engine_max_docs
+    _local_engine_quantization = args.local_engine_quantization
+    _local_engine_rescore = args.local_engine_rescore
+    if args.client_type == 'persistent' and args.data_dir:
+        _local_engine_cache_dir = str(Path(args.data_dir) / "local_engine")
+
+
+def configure_data_version(args) -> None:
+    """Watch the data dir of a persistent client for writes made by other processes."""
+    global _data_version, _remote_client, _reload_signal
+    if args.client_type == 'persistent' and args.data_dir:
+        _data_version = DataVersionProbe(Path(args.data_dir) / "chroma.sqlite3")
+        _reload_signal = ReloadSignal(args.data_dir)
+    _remote_client = args.client_type in ('http', 'cloud')
+
+
+def _collection_version(collection) -> Tuple | None:
+    """Token that changes whenever `collection` (or any of its shards) is written, by any process.
+
+    Persistent clients read Chroma's write sequence numbers; remote clients
+    fall back to the row count. Ephemeral clients return None: only this
+    process can write to them, and its writes call _mark_collection_changed.
+    """
+    if _data_version is not None:
+        ids = [collection.id]
+        if is_sharded(collection):
+            ids += [shard.id for shard in ShardRouter(get_chroma_client(), collection).shards().values()]
+        return _data_version.version(ids)
+    if _remote_client:
+        return ("count", collection.count())
+    return None
+
+
+def _mark_collection_changed(collection_name: str) -> None:
+    """Drop derived per-collection state after a write so it is rebuilt from Chroma."""
+    _query_cache.bump(collection_name)
+    _local_indexes.pop(collection_name, None)
+    if _local_engine_choice.get(collection_name) == "oversized":
+        _local_engine_choice.pop(collection_name, None)
+
+
+def _build_local_index(collection) -> LocalVectorIndex:
+    """Load `collection` into a local index, quantized if --local-engine-quantization is set."""
+    # Read before the rows, so a write that lands during the build marks the index stale.
+    version = _collection_version(collection)
+    if _local_engine_quantization == "none":
+        index = LocalVectorIndex.from_collection(collection, cache_dir=_local_engine_cache_dir)
+    else:
+        index = QuantizedVectorIndex.from_collection(
+            collection,
+            cache_dir=_local_engine_cache_dir,
+            quantization=_local_engine_quantization,
+            rescore_factor=_local_engine_rescore,
+        )
+    index.data_version = version
+    return index
+
+
+def _get_local_index(collection) -> LocalVectorIndex | None:
+    """Return the local index to serve `collection`, building it on first use, or None to use Chroma."""
+    if _local_engine_mode == "off":
+        return None
+    name = collection.name
+    if _local_engine_mode == "auto" and _local_engine_choice.get(name) in ("chroma", "oversized"):
+        return None
+
+    index = _local_indexes.get(name)
+    if index is not None and index.data_version != _collection_version(collection):
+        # Written by another process since the snapshot was taken.
+        _mark_collection_changed(name)
+        index = None
+    if index is None:
+        if (_local_engine_mode == "auto" and name not in _local_engine_choice
+                and collection.count() > _local_engine_max_docs):
+            _local_engine_choice[name] = "oversized"
+            return None
+        index = _build_local_index(collection)
+        _local_indexes[name] = index
+    return index
+
+
+def _embed_texts(collection, texts: List[str]):
+    """Embed texts with the collection's own embedding function."""
+    embedding_function = getattr(collection, "_embedding_function", None)
+    if embedding_function is None:
+        raise ValueError(f"Collection '{collection.name}' has no embedding function to embed query texts")
+    return embedding_function(texts)
+
+
+##### Startup Warm-up #####
+
+def _embedding_function_key(embedding_function) -> str:
+    """Identity of an embedding function's model, so each one is warmed once."""
+    try:
+        config = json.dumps(embedding_function.get_config(), sort_keys=True, default=str)
+    except Exception:
+        config = str(id(embedding_function))
+    return f"{type(embedding_function).__name__}:{config}"
+
+
+def warm_up_collections(spec: str) -> Dict:
+    """Load HNSW segments, local indexes and embedding models before serving.
+
+    Chroma loads a collection's vector segment on its first query and an
+    embedding function loads its model on first use, so without this the
+    first calls after a deploy pay both.
+
+    Args:
+        spec: "all" or a comma-separated list of collection names
+
+    Returns:
+        Per-collection and per-embedding-function timings and the total duration
+    """
+    client = get_chroma_client()
+    started = time.perf_counter()
+    if spec.strip().lower() == "all":
+        names = [c.name for c in client.list_collections()]
+    else:
+        names = [name.strip() for name in spec.split(",") if name.strip()]
+
+    collections: Dict[str, Dict] = {}
+    embedding_functions: Dict[str, float] = {}
+    for name in names:
+        entry: Dict = {}
+        collection_started = time.perf_counter()
+        try:
+            collection = client.get_collection(name)
+            embedding_function = getattr(collection, "_embedding_function", None)
+            if embedding_function is not None:
+                key = _embedding_function_key(embedding_function)
+                if key not in embedding_functions:
+                    model_started = time.perf_counter()
+                    _embed_texts(collection, ["warm-up query"])
+                    embedding_functions[key] = round(time.perf_counter() - model_started, 3)
+
+            # A query with a stored embedding loads the HNSW segment without touching the model.
+            targets = list(ShardRouter(client, collection).shards().values()) if is_sharded(collection) else [collection]
+            for target in targets:
+                row = target.get(limit=1, include=["embeddings"])
+                if len(row["ids"]):
+                    target.query(query_embeddings=[row["embeddings"][0]], n_results=1, include=[])
+            entry["count"] = sum(target.count() for target in targets)
+            if is_sharded(collection):
+                entry["shards"] = len(targets)
+            elif _local_engine_mode != "off":
+                entry["local_engine"] = _get_local_index(collection) is not None
+        except Exception as e:
+            entry["error"] = str(e)
+            print(f"Warm-up of collection '{name}' failed: {str(e)}", file=sys.stderr)
+        entry["seconds"] = round(time.perf_counter() - collection_started, 3)
+        collections[name] = entry
+
+    return {
+        "seconds": round(time.perf_counter() - started, 3),
+        "collections": collections,
+        "embedding_functions": embedding_functions,
+        "finished_at": time.time(),
+    }
+
+
 ##### Collection Management Tools #####
 
 @mcp.tool()
@@ -203,6 +823,10 @@ async def chroma_create_collection(
     collection_name: str,
     embedding_function_name: str = "default",
     metadata: Dict | None = None,
+    hnsw_space: str | None = None,
+    hnsw_ef_construction: int | None = None,
+    hnsw_ef_search: int | None = None,
+    hnsw_max_neighbors: int | None = None,
 ) -> str:
     """Create a new Chroma collection with configurable embedding functions.
     
@@ -210,6 +834,10 @@ async def chroma_create_collection(
         collection_name: Name of the collection to create
         embedding_function_name: Name of the embedding function to use. Options: 'default', 'cohere', 'openai', 'jina', 'voyageai', 'roboflow'
         metadata: Optional metadata dict to add to the collection
+        hnsw_space: Optional distance space: 'cosine', 'l2' or 'ip' (Chroma default: 'l2')
+        hnsw_ef_construction: Optional candidate list size while building the index
+        hnsw_ef_search: Optional candidate list size while querying
+        hnsw_max_neighbors: Optional graph degree (M)
     
     Returns:
         Success message
@@ -220,9 +848,12 @@ async def chroma_create_collection(
     if not embedding_function:
         raise ValueError(f"Unknown embedding function: {embedding_function_name}. Valid options: {list(mcp_known_embedding_functions.keys())}")
     
+    hnsw = hnsw_config(hnsw_space, hnsw_ef_construction, hnsw_ef_search, hnsw_max_neighbors)
     configuration = CreateCollectionConfiguration(
         embedding_function=embedding_function()
     )
+    if hnsw:
+        configuration["hnsw"] = hnsw
     
     try:
         client.create_collection(
@@ -230,7 +861,8 @@ async def chroma_create_collection(
             configuration=configuration,
             metadata=metadata
         )
-        return f"Successfully created collection '{collection_name}' with {embedding_function_name} embedding function"
+        settings = f" and HNSW settings {hnsw}" if hnsw else ""
+        return f"Successfully created collection '{collection_name}' with {embedding_function_name} embedding function{settings}"
     except Exception as e:
         raise Exception(f"Failed to create collection '{collection_name}': {str(e)}") from e
 
@@ -248,8 +880,8 @@ async def chroma_get_collection_info(collection_name: str) -> Dict:
     client = get_chroma_client()
     try:
         collection = client.get_collection(collection_name)
-        count = collection.count()
-        peek_results = collection.peek(limit=3)
+        count = _count(client, collection)
+        peek_results = _peek(client, collection, 3)
         
         return {
             "name": collection_name,
@@ -273,7 +905,7 @@ async def chroma_get_collection_count(collection_name: str) -> int:
     client = get_chroma_client()
     try:
         collection = client.get_collection(collection_name)
-        return collection.count()
+        return _count(client, collection)
     except Exception as e:
         raise Exception(f"Failed to get collection count for '{collection_name}': {str(e)}") from e
 
@@ -297,7 +929,19 @@ async def chroma_modify_collection(
     client = get_chroma_client()
     try:
         collection = client.get_collection(collection_name)
-        collection.modify(name=new_name, metadata=new_metadata)
+        if is_sharded(collection):
+            if new_metadata is not None:
+                # The shard key and model must survive, or the shards are orphaned.
+                new_metadata = {**new_metadata, SHARD_KEY_FIELD: collection.metadata[SHARD_KEY_FIELD],
+                                SHARD_MODEL_FIELD: collection.metadata.get(SHARD_MODEL_FIELD)}
+                collection.modify(metadata=new_metadata)
+            if new_name:
+                ShardRouter(client, collection).rename(new_name)
+        else:
+            collection.modify(name=new_name, metadata=new_metadata)
+        _mark_collection_changed(collection_name)
+        if new_name:
+            _mark_collection_changed(new_name)
         
         modified_aspects = []
         if new_name:
@@ -327,6 +971,8 @@ async def chroma_fork_collection(
     client = get_chroma_client()
     try:
         collection = client.get_collection(collection_name)
+        if is_sharded(collection):
+            raise ValueError("Sharded collections can't be forked; export and import them instead.")
         collection.fork(new_collection_name)
         return f"Successfully forked collection {collection_name} to {new_collection_name}"
     except Exception as e:
@@ -345,7 +991,15 @@ async def chroma_delete_collection(collection_name: str) -> str:
     """
     client = get_chroma_client()
     try:
-        client.delete_collection(collection_name)
+        collection = client.get_collection(collection_name)
+        shard_names = []
+        if is_sharded(collection):
+            shard_names = [shard.name for shard in ShardRouter(client, collection).shards().values()]
+        for name in shard_names + [collection_name]:
+            client.delete_collection(name)
+            _mark_collection_changed(name)
+        if shard_names:
+            return f"Successfully deleted sharded collection '{collection_name}' and its {len(shard_names)} shards"
         return f"Successfully deleted collection '{collection_name}'"
     except Exception as e:
         raise Exception(f"Failed to delete collection '{collection_name}': {str(e)}") from e
@@ -385,23 +1039,40 @@ async def chroma_add_documents(
     
     client = get_chroma_client()
     try:
-        collection = client.get_or_create_collection(collection_name)
-        
-        # Check for duplicate IDs
-        existing_ids = collection.get(include=[])["ids"]
-        duplicate_ids = [id for id in ids if id in existing_ids]
-        
-        if duplicate_ids:
-            raise ValueError(
-                f"The following IDs already exist in collection '{collection_name}': {duplicate_ids}. "
-                f"Use 'chroma_update_documents' to update existing documents."
+        with _write_guard.write(collection_name):
+            collection = client.get_or_create_collection(collection_name)
+            if _coalesces(ids):
+                # Returns once committed together with concurrent small writes to this collection.
+                await _write_buffer.write(collection, "add", ids, documents, metadatas)
+                return f"Successfully added {len(documents)} documents to collection {collection_name}"
+            if is_sharded(collection):
+                router = ShardRouter(client, collection)
+                duplicate_ids = [id for id in ids if id in router.locate(ids)]
+                if duplicate_ids:
+                    raise ValueError(
+                        f"The following IDs already exist in collection '{collection_name}': {duplicate_ids}. "
+                        f"Use 'chroma_update_documents' to update existing documents."
+                    )
+                counts = router.write(ids=ids, documents=documents, metadatas=metadatas)
+                _mark_collection_changed(collection_name)
+                return f"Successfully added {len(documents)} documents to {len(counts)} shards of collection {collection_name}"
+            
+            # Check for duplicate IDs
+            existing_ids = collection.get(include=[])["ids"]
+            duplicate_ids = [id for id in ids if id in existing_ids]
+            
+            if duplicate_ids:
+                raise ValueError(
+                    f"The following IDs already exist in collection '{collection_name}': {duplicate_ids}. "
+                    f"Use 'chroma_update_documents' to update existing documents."
+                )
+            
+            result = collection.add(
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids
             )
-        
-        result = collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+            _mark_collection_changed(collection_name)
         
         return f"Successfully added {len(documents)} documents to collection {collection_name}"
     except Exception as e:
@@ -436,15 +1107,49 @@ async def chroma_query_documents(
     client = get_chroma_client()
     try:
         collection = client.get_collection(collection_name)
-        return collection.query(
-            query_texts=query_texts,
+        cache_key, version, cached = _cache_lookup("chroma_query_documents", collection, {
+            "query_texts": query_texts, "n_results": n_results, "where": where,
+            "where_document": where_document, "include": include,
+        })
+        if cached is not None:
+            return cached
+        result = await _run_query(client, collection, query_texts, n_results, where, where_document, include)
+        _query_cache.put(cache_key, collection_name, version, result)
+        return result
+    except Exception as e:
+        raise Exception(f"Failed to query documents from '{collection_name}': {str(e)}") from e
+
+
+async def _run_query(client, collection, query_texts, n_results, where, where_document, include) -> Dict:
+    """Answer a query from the shards, the local engine or Chroma."""
+    if is_sharded(collection):
+        return await asyncio.to_thread(
+            ShardRouter(client, collection).query,
+            _embed_texts(collection, query_texts),
             n_results=n_results,
             where=where,
             where_document=where_document,
             include=include
         )
-    except Exception as e:
-        raise Exception(f"Failed to query documents from '{collection_name}': {str(e)}") from e
+    if where_document is None and set(include) <= LOCAL_ENGINE_INCLUDES:
+        local_index = _get_local_index(collection)
+        if local_index is not None:
+            try:
+                return local_index.query(
+                    _embed_texts(collection, query_texts),
+                    n_results=n_results,
+                    where=where,
+                    include=include
+                )
+            except UnsupportedFilterError:
+                pass
+    return collection.query(
+        query_texts=query_texts,
+        n_results=n_results,
+        where=where,
+        where_document=where_document,
+        include=include
+    )
 
 
 @mcp.tool()
@@ -455,10 +1160,26 @@ async def chroma_get_documents(
     where_document: Dict | None = None,
     include: List[str] = ["documents", "metadatas"],
     limit: int | None = None,
-    offset: int | None = None
+    offset: int | None = None,
+    page_size: int | None = None,
+    cursor: str | None = None,
+    stream: bool = False,
+    ctx: Context | None = None,
 ) -> Dict:
     """Get documents from a Chroma collection with optional filtering.
-    
+
+    Large result sets can be walked page by page: pass `page_size` to get the
+    first page plus a `next_cursor` token, then pass that token back as
+    `cursor` (with the same ids/where/where_document/include) for the next
+    page. With `stream=True` the server walks every page itself and sends
+    each one to the client as a progress notification, so only one page is
+    held in memory at a time. Streaming needs a request with a
+    progressToken; without one the call returns the first page and its
+    `next_cursor` instead, as if only `page_size` had been given.
+
+    A cursor survives deletions of earlier documents. If the last document
+    of the previous page was deleted the cursor is rejected as expired.
+
     Args:
         collection_name: Name of the collection to get documents from
         ids: Optional list of document IDs to retrieve
@@ -467,21 +1188,73 @@ async def chroma_get_documents(
         include: List of what to include in response. By default, this will include documents, and metadatas.
         limit: Optional maximum number of documents to return
         offset: Optional number of documents to skip before returning results
-    
+        page_size: Optional page size; enables cursor pagination
+        cursor: Optional cursor token returned as `next_cursor` by a previous call
+        stream: Stream all matching documents in pages of `page_size` (default: 500)
+
     Returns:
-        Dictionary containing the matching documents, their IDs, and requested includes
+        Dictionary containing the matching documents, their IDs, and requested includes.
+        Paginated calls add `next_cursor` (None on the last page); streamed calls
+        return a summary with the number of documents and pages sent.
+        A stream request that can't be streamed also carries `stream_unavailable`.
     """
+    paginated = page_size is not None or cursor is not None or stream
+    if paginated and (limit is not None or offset is not None):
+        raise ValueError("Use either limit/offset or page_size/cursor/stream, not both.")
+    if page_size is not None and page_size <= 0:
+        raise ValueError("page_size must be a positive integer.")
+    # Progress notifications are the only channel for streamed rows; with no
+    # progressToken they'd be dropped, so page instead.
+    stream_unavailable = stream and _progress_token(ctx) is None
+    if stream_unavailable:
+        stream = False
+
     client = get_chroma_client()
     try:
         collection = client.get_collection(collection_name)
-        return collection.get(
-            ids=ids,
-            where=where,
-            where_document=where_document,
-            include=include,
-            limit=limit,
-            offset=offset
-        )
+        rows = _rows_of(client, collection)
+        get_kwargs = {"ids": ids, "where": where, "where_document": where_document, "include": include}
+        if not stream:
+            cache_key, version, cached = _cache_lookup("chroma_get_documents", collection, {
+                **get_kwargs, "limit": limit, "offset": offset, "page_size": page_size, "cursor": cursor,
+                "stream_unavailable": stream_unavailable,
+            })
+            if cached is not None:
+                return cached
+        if not paginated:
+            result = rows.get(limit=limit, offset=offset, **get_kwargs)
+            _query_cache.put(cache_key, collection_name, version, result)
+            return result
+
+        collection_id = str(collection.id)
+        fingerprint = _query_fingerprint(ids, where, where_document, include)
+        cursor_state = _decode_cursor(cursor, collection_id, fingerprint) if cursor else None
+        page_size = page_size or STREAM_PAGE_SIZE
+
+        if not stream:
+            page, next_offset = _fetch_page(rows, page_size, cursor_state, **get_kwargs)
+            page = dict(page)
+            page["next_cursor"] = _next_cursor(collection_id, fingerprint, page, page_size, next_offset)
+            if stream_unavailable:
+                page["stream_unavailable"] = "The request has no progressToken; continue with next_cursor."
+            _query_cache.put(cache_key, collection_name, version, page)
+            return page
+
+        sent = pages = 0
+        while True:
+            page, next_offset = _fetch_page(rows, page_size, cursor_state, **get_kwargs)
+            if page["ids"]:
+                pages += 1
+                sent += len(page["ids"])
+                await ctx.report_progress(
+                    progress=sent,
+                    message=json.dumps({"page": pages, "result": _jsonable(page)}),
+                )
+            if len(page["ids"]) < page_size:
+                break
+            cursor_state = {"o": next_offset, "l": page["ids"][-1]}
+
+        return {"streamed": sent, "pages": pages, "page_size": page_size, "next_cursor": None}
     except Exception as e:
         raise Exception(f"Failed to get documents from '{collection_name}': {str(e)}") from e
 
@@ -544,7 +1317,9 @@ async def chroma_update_documents(
     kwargs = {k: v for k, v in update_args.items() if v is not None}
 
     try:
-        collection.update(**kwargs)
+        with _write_guard.write(collection_name):
+            _rows_of(client, collection).update(**kwargs)
+        _mark_collection_changed(collection_name)
         return (
             f"Successfully processed update request for {len(ids)} documents in "
             f"collection '{collection_name}'. Note: Non-existent IDs are ignored by ChromaDB."
@@ -581,7 +1356,9 @@ async def chroma_delete_documents(
         ) from e
 
     try:
-        collection.delete(ids=ids)
+        with _write_guard.write(collection_name):
+            _rows_of(client, collection).delete(ids=ids)
+        _mark_collection_changed(collection_name)
         return (
             f"Successfully deleted {len(ids)} documents from "
             f"collection '{collection_name}'. Note: Non-existent IDs are ignored by ChromaDB."
@@ -611,7 +1388,7 @@ async def chroma_peek_collection(
     client = get_chroma_client()
     try:
         collection = client.get_collection(collection_name)
-        return collection.peek(limit=limit)
+        return _peek(client, collection, limit)
     except Exception as e:
         raise Exception(f"Failed to peek collection '{collection_name}': {str(e)}") from e
 
@@ -662,7 +1439,8 @@ async def chroma_upsert_documents(
     collection_name: str,
     documents: List[str],
     ids: List[str],
-    metadatas: List[Dict] | None = None
+    metadatas: List[Dict] | None = None,
+    background: bool = False
 ) -> str:
     """Upsert documents (add if new, update if exists) - useful for incremental updates.
     
@@ -671,9 +1449,10 @@ async def chroma_upsert_documents(
         documents: List of text documents
         ids: List of document IDs
         metadatas: Optional list of metadata dictionaries
+        background: Return a job ID immediately and upsert in a background job
     
     Returns:
-        Success message
+        Success message, or the submitted job ID with background=True
     """
     if not documents or not ids:
         raise ValueError("Both 'documents' and 'ids' are required")
@@ -684,12 +1463,26 @@ async def chroma_upsert_documents(
     client = get_chroma_client()
     try:
         collection = client.get_or_create_collection(collection_name)
-        
-        collection.upsert(
-            documents=documents,
-            ids=ids,
-            metadatas=metadatas
-        )
+        if background:
+            def upsert_job(job: Job) -> str:
+                _write_batches(client, collection, documents, ids, metadatas, JOB_BATCH_SIZE, upsert=True, job=job)
+                return f"Successfully upserted {len(documents)} documents in collection '{collection_name}'"
+            return _submit_job("chroma_upsert_documents", collection_name, upsert_job, total=len(documents))
+        with _write_guard.write(collection_name):
+            if _coalesces(ids):
+                await _write_buffer.write(collection, "upsert", ids, documents, metadatas)
+                return f"Successfully upserted {len(documents)} documents in collection '{collection_name}'"
+            if is_sharded(collection):
+                counts = ShardRouter(client, collection).write(ids=ids, documents=documents, metadatas=metadatas, upsert=True)
+                _mark_collection_changed(collection_name)
+                return f"Successfully upserted {len(documents)} documents across {len(counts)} shards of collection '{collection_name}'"
+            
+            collection.upsert(
+                documents=documents,
+                ids=ids,
+                metadatas=metadatas
+            )
+        _mark_collection_changed(collection_name)
         
         return f"Successfully upserted {len(documents)} documents in collection '{collection_name}'"
     except Exception as e:
@@ -715,6 +1508,8 @@ async def chroma_count_documents_with_filter(
     client = get_chroma_client()
     try:
         collection = client.get_collection(collection_name)
+        if is_sharded(collection):
+            return sum(ShardRouter(client, collection).count(where=where, where_document=where_document).values())
         
         # Get filtered documents and count them
         results = collection.get(
@@ -732,7 +1527,8 @@ async def chroma_count_documents_with_filter(
 async def chroma_delete_documents_by_filter(
     collection_name: str,
     where: Dict | None = None,
-    where_document: Dict | None = None
+    where_document: Dict | None = None,
+    background: bool = False
 ) -> str:
     """Delete all documents matching filters (useful for bulk cleanup).
     
@@ -740,9 +1536,10 @@ async def chroma_delete_documents_by_filter(
         collection_name: Name of the collection
         where: Optional metadata filters
         where_document: Optional document content filters
+        background: Return a job ID immediately and delete in a background job
     
     Returns:
-        Success message with count of deleted documents
+        Success message with count of deleted documents, or the submitted job ID with background=True
     """
     if not where and not where_document:
         raise ValueError("At least one filter (where or where_document) must be provided")
@@ -750,11 +1547,18 @@ async def chroma_delete_documents_by_filter(
     client = get_chroma_client()
     try:
         collection = client.get_collection(collection_name)
+        if background:
+            return _submit_job(
+                "chroma_delete_documents_by_filter", collection_name,
+                lambda job: _delete_matching(client, collection, where, where_document, job)
+            )
         
-        collection.delete(
-            where=where,
-            where_document=where_document
-        )
+        with _write_guard.write(collection_name):
+            _rows_of(client, collection).delete(
+                where=where,
+                where_document=where_document
+            )
+        _mark_collection_changed(collection_name)
         
         return f"Successfully deleted documents from collection '{collection_name}' matching the filters"
     except Exception as e:
@@ -767,7 +1571,8 @@ async def chroma_batch_add_documents(
     documents: List[str],
     ids: List[str],
     metadatas: List[Dict] | None = None,
-    batch_size: int = 100
+    batch_size: int = 100,
+    background: bool = False
 ) -> str:
     """Add documents in batches for better performance with large datasets.
     
@@ -777,9 +1582,10 @@ async def chroma_batch_add_documents(
         ids: List of document IDs
         metadatas: Optional list of metadata dictionaries
         batch_size: Number of documents per batch (default: 100)
+        background: Return a job ID immediately and add in a background job
     
     Returns:
-        Success message with batch statistics
+        Success message with batch statistics, or the submitted job ID with background=True
     """
     if not documents or not ids:
         raise ValueError("Both 'documents' and 'ids' are required")
@@ -787,26 +1593,23 @@ async def chroma_batch_add_documents(
     if len(ids) != len(documents):
         raise ValueError(f"Number of ids must match number of documents")
     
+    if batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer")
+    
     client = get_chroma_client()
     try:
         collection = client.get_or_create_collection(collection_name)
+        if background:
+            def batch_add_job(job: Job) -> str:
+                batches = _write_batches(client, collection, documents, ids, metadatas, batch_size, job=job)
+                return f"Successfully added {len(documents)} documents in {batches} batches to collection '{collection_name}'"
+            return _submit_job("chroma_batch_add_documents", collection_name, batch_add_job, total=len(documents))
         
-        total_docs = len(documents)
-        batches = (total_docs + batch_size - 1) // batch_size
-        
-        for i in range(0, total_docs, batch_size):
-            end_idx = min(i + batch_size, total_docs)
-            batch_docs = documents[i:end_idx]
-            batch_ids = ids[i:end_idx]
-            batch_metas = metadatas[i:end_idx] if metadatas else None
-            
-            collection.add(
-                documents=batch_docs,
-                ids=batch_ids,
-                metadatas=batch_metas
-            )
+        with _write_guard.write(collection_name):
+            batches = _write_batches(client, collection, documents, ids, metadatas, batch_size)
+        _mark_collection_changed(collection_name)
         
-        return f"Successfully added {total_docs} documents in {batches} batches to collection '{collection_name}'"
+        return f"Successfully added {len(documents)} documents in {batches} batches to collection '{collection_name}'"
     except Exception as e:
         raise Exception(f"Failed to batch add documents: {str(e)}") from e
 
@@ -826,6 +1629,11 @@ async def chroma_reset_collection(
     client = get_chroma_client()
     try:
         collection = client.get_collection(collection_name)
+        if is_sharded(collection):
+            with _write_guard.write(collection_name):
+                count_before = ShardRouter(client, collection).reset()
+            _mark_collection_changed(collection_name)
+            return f"Successfully reset sharded collection '{collection_name}' - removed {count_before} documents"
         
         # Get current count
         count_before = collection.count()
@@ -835,7 +1643,9 @@ async def chroma_reset_collection(
         all_ids = all_docs["ids"]
         
         if all_ids:
-            collection.delete(ids=all_ids)
+            with _write_guard.write(collection_name):
+                collection.delete(ids=all_ids)
+        _mark_collection_changed(collection_name)
         
         return f"Successfully reset collection '{collection_name}' - removed {count_before} documents"
     except Exception as e:
@@ -860,7 +1670,7 @@ async def chroma_get_collection_metadata(
         
         return {
             "name": collection_name,
-            "count": collection.count(),
+            "count": _count(client, collection),
             "metadata": collection.metadata if hasattr(collection, 'metadata') else {}
         }
     except Exception as e:
@@ -893,11 +1703,8 @@ async def chroma_search_by_text_with_limit(
     try:
         collection = client.get_collection(collection_name)
         
-        results = collection.query(
-            query_texts=[query_text],
-            n_results=n_results,
-            where=where,
-            include=["documents", "metadatas", "distances"]
+        results = await _run_query(
+            client, collection, [query_text], n_results, where, None, ["documents", "metadatas", "distances"]
         )
         
         # Apply distance filtering if specified
@@ -924,8 +1731,614 @@ async def chroma_search_by_text_with_limit(
         raise Exception(f"Failed to search with distance filtering: {str(e)}") from e
 
 
+##### Bulk Import / Export #####
+
+@mcp.tool()
+async def chroma_export_collection(
+    collection_name: str,
+    out_dir: str,
+    where: Dict | None = None,
+    batch_size: int = 1000
+) -> Dict:
+    """Export a collection (IDs, documents, metadata and stored embeddings) to a dump directory.
+
+    The dump is written as manifest.json + records.jsonl + embeddings.npy (float32)
+    and can be loaded elsewhere with chroma_import_collection without re-embedding.
+
+    Args:
+        collection_name: Name of the collection to export
+        out_dir: Directory on the server host to write the dump into
+        where: Optional metadata filter restricting the exported rows
+        batch_size: Number of rows fetched from Chroma per round trip (default: 1000)
+
+    Returns:
+        The manifest of the written dump
+    """
+    client = get_chroma_client()
+    try:
+        collection = client.get_collection(collection_name)
+        return await asyncio.to_thread(
+            export_collection, collection, out_dir, batch_size=batch_size, where=where, client=client
+        )
+    except Exception as e:
+        raise Exception(f"Failed to export collection '{collection_name}': {str(e)}") from e
+
+
+@mcp.tool()
+async def chroma_import_collection(
+    in_dir: str,
+    collection_name: str | None = None,
+    embedding_function_name: str = "default",
+    batch_size: int = 5000,
+    upsert: bool = False
+) -> Dict:
+    """Import a dump written by chroma_export_collection, reusing its stored embeddings.
+
+    The embedding matrix is memory-mapped and records are streamed, so dumps
+    larger than RAM can be imported. The collection is created with the
+    metadata and HNSW configuration stored in the dump (sharded, for a dump
+    of a sharded collection) if it does not exist yet.
+
+    Args:
+        in_dir: Dump directory on the server host
+        collection_name: Target collection (default: the name stored in the dump)
+        embedding_function_name: Embedding function for the collection if it has to be created;
+                                 must match the model that produced the dump for later queries
+        batch_size: Number of rows written per call (default: 5000)
+        upsert: Overwrite existing IDs; otherwise rows whose ID already exists are skipped
+
+    Returns:
+        Import statistics (rows imported and skipped, batches, seconds, rows per second)
+    """
+    embedding_function = mcp_known_embedding_functions.get(embedding_function_name)
+    if not embedding_function:
+        raise ValueError(f"Unknown embedding function: {embedding_function_name}. Valid options: {list(mcp_known_embedding_functions.keys())}")
+
+    client = get_chroma_client()
+    try:
+        manifest = read_manifest(in_dir)
+        name = collection_name or manifest["collection_name"]
+        collection = get_or_create_target(client, name, manifest, embedding_function=embedding_function())
+        with _write_guard.write(name):
+            stats = await asyncio.to_thread(
+                import_collection, collection, in_dir, batch_size=batch_size, upsert=upsert, client=client
+            )
+        _mark_collection_changed(name)
+        return stats
+    except Exception as e:
+        raise Exception(f"Failed to import collection from '{in_dir}': {str(e)}") from e
+
+
+##### HNSW Tuning #####
+
+@mcp.tool()
+async def chroma_get_hnsw_config(collection_name: str) -> Dict:
+    """Get the effective HNSW index settings of a collection.
+    
+    Args:
+        collection_name: Name of the collection
+    
+    Returns:
+        Dictionary with space, ef_construction, ef_search, max_neighbors and related settings
+    """
+    client = get_chroma_client()
+    try:
+        collection = client.get_collection(collection_name)
+        return {"name": collection_name, "hnsw": current_hnsw(collection)}
+    except Exception as e:
+        raise Exception(f"Failed to get HNSW settings for '{collection_name}': {str(e)}") from e
+
+
+@mcp.tool()
+async def chroma_rebuild_collection_index(
+    collection_name: str,
+    hnsw_space: str | None = None,
+    hnsw_ef_construction: int | None = None,
+    hnsw_ef_search: int | None = None,
+    hnsw_max_neighbors: int | None = None,
+    batch_size: int = 1000
+) -> Dict:
+    """Rebuild a collection's HNSW index with new settings, reusing its stored embeddings.
+
+    Build-time settings (space, ef_construction, max_neighbors) are applied by
+    copying every row into a new collection and swapping it in under the same
+    name; nothing is re-embedded. If only ef_search changes it is updated in place.
+    A sharded collection is rebuilt shard by shard. The rebuild is refused
+    while writes or background jobs on the collection are in progress, writes
+    are refused while it runs, and it is discarded if another process writes
+    to the collection meanwhile.
+    
+    Args:
+        collection_name: Name of the collection to rebuild
+        hnsw_space: Optional new distance space ('cosine', 'l2', 'ip')
+        hnsw_ef_construction: Optional new build-time candidate list size
+        hnsw_ef_search: Optional new query-time candidate list size
+        hnsw_max_neighbors: Optional new graph degree (M)
+        batch_size: Rows copied per round trip (default: 1000)
+    
+    Returns:
+        Rebuild statistics with the old and new settings
+    """
+    hnsw = hnsw_config(hnsw_space, hnsw_ef_construction, hnsw_ef_search, hnsw_max_neighbors)
+    if not hnsw:
+        raise ValueError("At least one HNSW setting must be provided.")
+    
+    client = get_chroma_client()
+    try:
+        collection = client.get_collection(collection_name)
+        jobs = [job.id for job in _jobs.unfinished(collection_name)]
+        if jobs:
+            raise RuntimeError(f"Background jobs {jobs} write to the collection; wait for them or cancel them first.")
+        with _write_guard.exclusive(collection_name):
+            stats = await asyncio.to_thread(
+                rebuild_collection, client, collection, hnsw, batch_size=batch_size, version=_collection_version
+            )
+        _mark_collection_changed(collection_name)
+        return stats
+    except Exception as e:
+        raise Exception(f"Failed to rebuild index of '{collection_name}': {str(e)}") from e
+
+
+@mcp.tool()
+async def chroma_hnsw_sweep(
+    collection_name: str,
+    candidates: List[Dict],
+    query_texts: List[str] | None = None,
+    sample_size: int = 50,
+    n_results: int = 10
+) -> Dict:
+    """Report recall@k vs. query latency for candidate HNSW settings on a collection.
+
+    Each candidate is built as a temporary copy of the collection from its
+    stored embeddings and deleted afterwards; recall is measured against an
+    exact brute-force search. A sharded collection is copied shard by shard
+    and queried across its shards.
+    
+    Args:
+        collection_name: Name of the collection to tune
+        candidates: List of settings to try, e.g. [{"max_neighbors": 16, "ef_construction": 100, "ef_search": 32}]
+        query_texts: Optional sample queries; by default stored embeddings are used as queries
+        sample_size: Number of stored embeddings sampled as queries when query_texts is not given
+        n_results: k for recall@k (default: 10)
+    
+    Returns:
+        Report with recall, p50/p95 latency and build time per candidate
+    """
+    if not candidates:
+        raise ValueError("The 'candidates' list cannot be empty.")
+    
+    client = get_chroma_client()
+    try:
+        collection = client.get_collection(collection_name)
+        query_embeddings = _embed_texts(collection, query_texts) if query_texts else None
+        return await asyncio.to_thread(
+            hnsw_sweep, client, collection, candidates,
+            query_embeddings=query_embeddings, sample_size=sample_size, n_results=n_results
+        )
+    except Exception as e:
+        raise Exception(f"Failed to run HNSW sweep on '{collection_name}': {str(e)}") from e
+
+
+##### Sharded Collections #####
+
+@mcp.tool()
+async def chroma_create_sharded_collection(
+    collection_name: str,
+    shard_key: str,
+    embedding_function_name: str = "default",
+    metadata: Dict | None = None,
+    hnsw_space: str | None = None,
+    hnsw_ef_construction: int | None = None,
+    hnsw_ef_search: int | None = None,
+    hnsw_max_neighbors: int | None = None,
+) -> str:
+    """Create a collection that is split into one physical collection per value of a metadata key.
+
+    Add/upsert/batch-add calls on this collection route each document to the
+    shard for its `shard_key` metadata value (shards are created on demand),
+    and chroma_query_documents fans out across shards concurrently and merges
+    the top-k. A `where` filter on `shard_key` ($eq/$in) only queries the
+    matching shards. All shards share one embedding function.
+    
+    Args:
+        collection_name: Name of the sharded collection
+        shard_key: Metadata key to shard by, e.g. 'source_file', 'regulation_year' or 'programme'
+        embedding_function_name: Embedding function shared by every shard
+        metadata: Optional metadata dict for the collection
+        hnsw_space: Optional distance space for every shard ('cosine', 'l2', 'ip')
+        hnsw_ef_construction: Optional build-time candidate list size for every shard
+        hnsw_ef_search: Optional query-time candidate list size for every shard
+        hnsw_max_neighbors: Optional graph degree (M) for every shard
+    
+    Returns:
+        Success message
+    """
+    embedding_function = mcp_known_embedding_functions.get(embedding_function_name)
+    if not embedding_function:
+        raise ValueError(f"Unknown embedding function: {embedding_function_name}. Valid options: {list(mcp_known_embedding_functions.keys())}")
+    if not shard_key.strip():
+        raise ValueError("The 'shard_key' cannot be empty.")
+    
+    configuration = CreateCollectionConfiguration(
+        embedding_function=embedding_function()
+    )
+    hnsw = hnsw_config(hnsw_space, hnsw_ef_construction, hnsw_ef_search, hnsw_max_neighbors)
+    if hnsw:
+        configuration["hnsw"] = hnsw
+    
+    client = get_chroma_client()
+    try:
+        ShardRouter.create(
+            client,
+            collection_name,
+            shard_key=shard_key,
+            embedding_model=embedding_function_name,
+            configuration=configuration,
+            metadata=metadata
+        )
+        return f"Successfully created sharded collection '{collection_name}' sharded by '{shard_key}'"
+    except Exception as e:
+        raise Exception(f"Failed to create sharded collection '{collection_name}': {str(e)}") from e
+
+
+@mcp.tool()
+async def chroma_list_shards(collection_name: str) -> Dict:
+    """List the shards of a sharded collection with their document counts.
+    
+    Args:
+        collection_name: Name of the sharded collection
+    
+    Returns:
+        Dictionary with the shard key, embedding model and per-shard counts
+    """
+    client = get_chroma_client()
+    try:
+        router = ShardRouter(client, client.get_collection(collection_name))
+        counts = router.count()
+        return {
+            "name": collection_name,
+            "shard_key": router.shard_key,
+            "embedding_model": router.embedding_model,
+            "total": sum(counts.values()),
+            "shards": counts
+        }
+    except Exception as e:
+        raise Exception(f"Failed to list shards of '{collection_name}': {str(e)}") from e
+
+
+##### Local Similarity Engine #####
+
+@mcp.tool()
+async def chroma_benchmark_local_engine(
+    collection_name: str,
+    query_texts: List[str],
+    n_results: int = 10,
+    repeats: int = 5
+) -> Dict:
+    """Benchmark the in-process exact engine against Chroma's HNSW path on one collection.
+
+    In 'auto' local-engine mode the faster path is remembered and used for
+    later queries on this collection, overriding --local-engine-max-docs.
+
+    Args:
+        collection_name: Name of the collection to benchmark
+        query_texts: Sample queries (embedded once, reused for both paths)
+        n_results: Number of results per query
+        repeats: Timed repetitions per path; the median is reported
+
+    Returns:
+        Latencies of both paths, speedup, HNSW recall@k against exact results, and the selected path
+    """
+    if not query_texts:
+        raise ValueError("The 'query_texts' list cannot be empty.")
+
+    client = get_chroma_client()
+    try:
+        collection = client.get_collection(collection_name)
+        index = _local_indexes.get(collection_name) or await asyncio.to_thread(_build_local_index, collection)
+        query_embeddings = _embed_texts(collection, query_texts)
+        report = await asyncio.to_thread(
+            benchmark_local_engine, collection, index, query_embeddings, n_results=n_results, repeats=repeats
+        )
+        if _local_engine_mode == "auto":
+            _local_engine_choice[collection_name] = report["faster"]
+            if report["faster"] == "local":
+                _local_indexes[collection_name] = index
+        report["engine_mode"] = _local_engine_mode
+        if isinstance(index, QuantizedVectorIndex):
+            report["memory"] = index.memory()
+        return report
+    except Exception as e:
+        raise Exception(f"Failed to benchmark local engine on '{collection_name}': {str(e)}") from e
+
+
+##### Federated Search #####
+
+# Rank constant of reciprocal rank fusion (merge="rrf").
+RRF_K = 60
+
+
+def _distance_to_similarity(distance: float, space: str) -> float:
+    """Cosine similarity implied by a distance, assuming normalized embeddings."""
+    if space == "l2":
+        # Chroma's l2 is the squared distance: |a - b|^2 = 2 - 2cos for unit vectors.
+        return 1.0 - distance / 2.0
+    return 1.0 - distance
+
+
+def _query_one_collection(client, collection, query_embedding, n_results, where, where_document, include) -> Dict:
+    """Top-k of one collection (or all its shards) with the embeddings needed for re-scoring."""
+    sub_include = list(dict.fromkeys(list(include) + ["distances", "embeddings"]))
+    if is_sharded(collection):
+        return ShardRouter(client, collection).query(
+            [query_embedding], n_results=n_results, where=where, where_document=where_document, include=sub_include
+        )
+    return collection.query(
+        query_embeddings=[query_embedding], n_results=n_results, where=where,
+        where_document=where_document, include=sub_include
+    )
+
+
+@mcp.tool()
+async def chroma_federated_query(
+    collection_names: List[str],
+    query_text: str,
+    n_results: int = 10,
+    where: Dict | None = None,
+    where_document: Dict | None = None,
+    include: List[str] = ["documents", "metadatas"],
+    merge: str = "score",
+    per_collection: int | None = None
+) -> Dict:
+    """Search several collections at once and return one merged top-k.
+
+    The query is embedded once per distinct embedding function, and the
+    collections are queried concurrently. With merge="score", every hit is
+    re-scored by the cosine similarity of its stored embedding to the query,
+    so collections using cosine, l2 or ip spaces rank on one scale. With
+    merge="rrf", hits are ranked by reciprocal rank fusion of their
+    per-collection ranks, which also suits collections embedded with
+    different models. A collection that fails (missing, or an embedding
+    dimension that doesn't match) is reported under `collections` and
+    doesn't fail the call.
+
+    Args:
+        collection_names: Collections to search
+        query_text: Query text
+        n_results: Number of merged results to return
+        where: Optional metadata filter applied to every collection
+        where_document: Optional document content filter applied to every collection
+        include: What to return per hit: 'documents', 'metadatas', 'embeddings'
+        merge: 'score' (cosine similarity) or 'rrf' (reciprocal rank fusion)
+        per_collection: Candidates taken from each collection (default: n_results)
+
+    Returns:
+        Dictionary with `results` (collection, id, score, distance and the
+        requested fields, best first) and per-collection hit counts, distance
+        space, timings and errors
+    """
+    if not collection_names:
+        raise ValueError("The 'collection_names' list cannot be empty.")
+    if merge not in ("score", "rrf"):
+        raise ValueError(f"Unknown merge: {merge}. Valid options: ['score', 'rrf']")
+    if n_results <= 0 or (per_collection is not None and per_collection <= 0):
+        raise ValueError("n_results and per_collection must be positive integers.")
+    per_collection = per_collection or n_results
+
+    client = get_chroma_client()
+    try:
+        report: Dict[str, Dict] = {}
+        collections = {}
+        for name in dict.fromkeys(collection_names):
+            try:
+                collections[name] = client.get_collection(name)
+            except Exception as e:
+                report[name] = {"error": str(e)}
+
+        # One embedding per distinct embedding function, computed concurrently.
+        groups: Dict[str, List[str]] = {}
+        for name, collection in collections.items():
+            embedding_function = getattr(collection, "_embedding_function", None)
+            key = _embedding_function_key(embedding_function) if embedding_function is not None else name
+            groups.setdefault(key, []).append(name)
+        embedded = await asyncio.gather(
+            *(asyncio.to_thread(_embed_texts, collections[names[0]], [query_text]) for names in groups.values()),
+            return_exceptions=True,
+        )
+        query_embeddings = {}
+        for names, result in zip(groups.values(), embedded):
+            for name in names:
+                if isinstance(result, Exception):
+                    report[name] = {"error": f"Embedding failed: {str(result)}"}
+                else:
+                    query_embeddings[name] = np.asarray(result[0], dtype=np.float32)
+
+        async def search(name: str):
+            started = time.perf_counter()
+            result = await asyncio.to_thread(
+                _query_one_collection, client, collections[name], query_embeddings[name],
+                per_collection, where, where_document, include
+            )
+            return result, time.perf_counter() - started
+
+        names = list(query_embeddings)
+        outcomes = await asyncio.gather(*(search(name) for name in names), return_exceptions=True)
+
+        hits = []
+        fields = [f for f in ("documents", "metadatas", "embeddings") if f in include]
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, Exception):
+                report[name] = {"error": str(outcome)}
+                continue
+            result, seconds = outcome
+            space = collection_space(collections[name])
+            query = query_embeddings[name]
+            query_norm = float(np.linalg.norm(query)) or 1.0
+            ids = result["ids"][0]
+            for rank, doc_id in enumerate(ids):
+                distance = float(result["distances"][0][rank])
+                stored = result.get("embeddings")
+                if stored is not None and stored[0] is not None and len(stored[0]) > rank:
+                    vector = np.asarray(stored[0][rank], dtype=np.float32)
+                    score = float(vector @ query) / ((float(np.linalg.norm(vector)) or 1.0) * query_norm)
+                else:
+                    score = _distance_to_similarity(distance, space)
+                hit = {"collection": name, "id": doc_id, "score": score, "distance": distance, "rank": rank}
+                for field in fields:
+                    values = result.get(field)
+                    hit[field[:-1]] = _jsonable(values[0][rank]) if values is not None else None
+                hits.append(hit)
+            report[name] = {"hits": len(ids), "space": space, "seconds": round(seconds, 4)}
+
+        if merge == "rrf":
+            for hit in hits:
+                hit["score"] = 1.0 / (RRF_K + hit["rank"] + 1)
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+        for hit in hits:
+            hit["score"] = round(hit["score"], 6)
+            del hit["rank"]
+
+        return {
+            "results": hits[:n_results],
+            "merge": merge,
+            "embedding_calls": len(groups),
+            "collections": report,
+        }
+    except Exception as e:
+        raise Exception(f"Failed to run federated query: {str(e)}") from e
+
+
+##### Background Jobs #####
+
+@mcp.tool()
+async def chroma_get_job(job_id: str) -> Dict:
+    """Status and progress of a background write job.
+
+    Args:
+        job_id: ID returned by a write tool called with background=True
+
+    Returns:
+        Dictionary with the job's status ('queued', 'running', 'succeeded',
+        'failed' or 'cancelled'), documents done and total, progress,
+        throughput (documents per second), estimated seconds remaining,
+        timestamps, and the result message or error
+    """
+    try:
+        return _jobs.get(job_id).snapshot()
+    except Exception as e:
+        raise Exception(f"Failed to get job '{job_id}': {str(e)}") from e
+
+
+@mcp.tool()
+async def chroma_list_jobs(status: str | None = None, limit: int = 50) -> Dict:
+    """List background write jobs, most recently submitted first.
+
+    Args:
+        status: Optional filter: 'queued', 'running', 'succeeded', 'failed' or 'cancelled'
+        limit: Maximum number of jobs to return (default: 50)
+
+    Returns:
+        Dictionary with the jobs and the worker pool's counters
+    """
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    try:
+        return {
+            "jobs": [job.snapshot() for job in _jobs.list(status=status, limit=limit)],
+            "pool": _jobs.stats(),
+        }
+    except Exception as e:
+        raise Exception(f"Failed to list jobs: {str(e)}") from e
+
+
+@mcp.tool()
+async def chroma_cancel_job(job_id: str) -> str:
+    """Cancel a background write job.
+
+    A queued job never starts. A running job stops after the batch it is
+    writing; batches already written stay in the collection (re-submitting
+    an upsert is safe).
+
+    Args:
+        job_id: ID of the job to cancel
+
+    Returns:
+        Message with the job's state
+    """
+    try:
+        previous = _jobs.get(job_id).status
+        job = _jobs.cancel(job_id)
+    except Exception as e:
+        raise Exception(f"Failed to cancel job '{job_id}': {str(e)}") from e
+    if previous == "queued":
+        return f"Job '{job_id}' cancelled before it started"
+    if job.finished:
+        return f"Job '{job_id}' already finished with status '{job.status}'"
+    return f"Cancellation of job '{job_id}' requested; it stops after the current batch ({job.done} documents done)"
+
+
+##### Server Operations #####
+
+@mcp.tool()
+async def chroma_get_server_stats() -> Dict:
+    """Runtime counters of this server process.
+
+    Returns:
+        Dictionary with admission control stats (per-tool limits, calls in
+        flight and queued, and counts of rejected (overloaded), timed-out and
+        cancelled calls), query result cache hit rate and size, background
+        job counts, write coalescing counters, and the startup warm-up timings
+    """
+    return {
+        "admission": _admission.stats() if _admission is not None else None,
+        "query_cache": _query_cache.stats(),
+        "jobs": _jobs.stats(),
+        "write_buffer": _write_buffer.stats() if _write_buffer is not None else None,
+        "warmup": _warmup_report,
+    }
+
+
+async def chroma_profile_server(
+    seconds: float = 10,
+    cpu: str = "sampling",
+    memory: bool = True,
+    top_n: int = 20,
+    save: bool = False
+) -> Dict:
+    """Profile this server process for a few seconds while it keeps serving.
+
+    Only available when the server runs with --enable-profiling.
+
+    Args:
+        seconds: Length of the capture window (at most --profile-max-seconds)
+        cpu: 'sampling' (all threads, low overhead), 'cprofile' (event-loop
+             thread only, exact call counts) or 'off'
+        memory: Also report allocation sites from tracemalloc snapshots
+        top_n: Entries per ranking
+        save: Also write the full profiles to --profile-dir
+
+    Returns:
+        Top functions by self and total time, allocation sites that grew
+        during the window and the largest live ones, and saved file paths
+    """
+    try:
+        return await _profiler.capture(seconds=seconds, cpu=cpu, memory=memory, top_n=top_n, save=save)
+    except Exception as e:
+        raise Exception(f"Failed to profile server: {str(e)}") from e
+
+
+def configure_profiling(args) -> None:
+    """Register chroma_profile_server when profiling is enabled."""
+    global _profiler
+    if not args.enable_profiling:
+        return
+    _profiler = LiveProfiler(args.profile_dir, max_seconds=args.profile_max_seconds)
+    mcp.tool(chroma_profile_server)
+
+
 def main():
     """Entry point for the Chroma MCP server."""
+    global _warmup_report
     parser = create_parser()
     args = parser.parse_args()
     
@@ -951,7 +2364,19 @@ def main():
     # Initialize client with parsed args
     try:
         get_chroma_client(args)
+        configure_data_version(args)
+        configure_local_engine(args)
+        configure_query_cache(args)
+        configure_jobs(args)
+        configure_write_buffer(args)
+        configure_admission(args)
+        configure_profiling(args)
         print("Successfully initialized Chroma client", file=sys.stderr)
+        if args.warmup_collections:
+            # Runs before mcp.run(), so the server only starts listening once warm.
+            _warmup_report = warm_up_collections(args.warmup_collections)
+            print(f"Warm-up of {len(_warmup_report['collections'])} collection(s) finished in "
+                  f"{_warmup_report['seconds']}s", file=sys.stderr)
     except Exception as e:
         print(f"Failed to initialize Chroma client: {str(e)}", file=sys.stderr)
         sys.exit(1)
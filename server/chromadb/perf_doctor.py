@@ -0,0 +1,524 @@
+"""
+Performance doctor: measurements behind check_environment.py and test_connection.py.
+
+Measures what decides query and ingestion speed on a host:
+
+- embedding throughput of the configured models (load time, single-text
+  latency, batched texts/s),
+- cold vs. warm query latency of each collection (first query on a fresh
+  client, which loads the HNSW index, vs. the median of repeated queries),
+- read throughput of the data directory (page cache dropped per file where
+  the OS allows it),
+- on-disk HNSW index size vs. available RAM,
+- CPU/thread settings of torch and ONNX Runtime against the cores this
+  process may actually use (affinity and cgroup quota),
+
+and turns them into actionable warnings. The report is plain JSON so runs on
+different hosts can be compared:
+
+    python check_environment.py --report host_a.json
+    python perf_doctor.py compare host_a.json host_b.json
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import platform
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+# Models used by this repo: the JSON ingester, the Chroma server's default
+# embedding function and the regulations RAG server.
+DEFAULT_MODELS = [
+    "sentence-transformers:all-MiniLM-L6-v2",
+    "chroma:default",
+    "sentence-transformers:BAAI/bge-base-en-v1.5",
+]
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                   "TOKENIZERS_PARALLELISM", "RAG_WORKERS")
+
+# hnswlib keeps these files of a vector segment fully in memory.
+HNSW_FILES = ("data_level0.bin", "link_lists.bin", "header.bin", "length.bin")
+
+SAMPLE_TEXTS = [
+    "Faculty members are entitled to earned leave as per the leave norms circular.",
+    "Travel allowance for outstation journeys is admissible at the rates notified.",
+    "Promotion to the next grade requires the minimum years of service and assessment.",
+    "The programme shall be completed within the maximum duration prescribed.",
+]
+
+
+##### Host #####
+
+def _cgroup_cpu_limit() -> float | None:
+    """CPU quota of this container in cores (cgroup v2, then v1), or None if unlimited/unknown."""
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def _memory_mb() -> Tuple[float | None, float | None]:
+    """(total, available) RAM in MB."""
+    try:
+        import psutil
+        vm = psutil.virtual_memory()
+        return vm.total / 1024 ** 2, vm.available / 1024 ** 2
+    except ImportError:
+        pass
+    try:
+        info = {}
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            key, value = line.split(":", 1)
+            info[key] = int(value.split()[0]) / 1024
+        return info.get("MemTotal"), info.get("MemAvailable")
+    except (OSError, ValueError):
+        return None, None
+
+
+def host_info() -> Dict[str, Any]:
+    total, available = _memory_mb()
+    affinity = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    quota = _cgroup_cpu_limit()
+    return {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "affinity_cores": affinity,
+        "cgroup_cpu_limit": quota,
+        "effective_cores": min(affinity or 1, quota) if quota else affinity,
+        "memory_total_mb": round(total, 1) if total else None,
+        "memory_available_mb": round(available, 1) if available else None,
+    }
+
+
+def thread_settings() -> Dict[str, Any]:
+    """Thread-pool settings of torch and ONNX Runtime plus the env vars that control them."""
+    settings: Dict[str, Any] = {"env": {name: os.getenv(name) for name in THREAD_ENV_VARS}}
+    try:
+        import torch
+        settings["torch"] = {
+            "version": torch.__version__,
+            "num_threads": torch.get_num_threads(),
+            "num_interop_threads": torch.get_num_interop_threads(),
+            "cuda": torch.cuda.is_available(),
+        }
+    except ImportError:
+        settings["torch"] = None
+    try:
+        import onnxruntime
+        settings["onnxruntime"] = {
+            "version": onnxruntime.__version__,
+            "providers": onnxruntime.get_available_providers(),
+            # 0 means ONNX Runtime picks one thread per physical core it can see.
+            "intra_op_num_threads": onnxruntime.SessionOptions().intra_op_num_threads,
+        }
+    except ImportError:
+        settings["onnxruntime"] = None
+    return settings
+
+
+##### Embeddings #####
+
+def _model_encoder(spec: str) -> Callable[[List[str]], Any]:
+    kind, _, name = spec.partition(":")
+    if kind == "sentence-transformers":
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(name)
+        return lambda texts: model.encode(texts, batch_size=32, show_progress_bar=False)
+    if kind == "chroma" and name == "default":
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+        embedding_function = DefaultEmbeddingFunction()
+        return lambda texts: embedding_function(texts)
+    raise ValueError(f"Unknown model spec: {spec}. Use 'sentence-transformers:<name>' or 'chroma:default'")
+
+
+def measure_embedding(spec: str, texts: List[str], repeats: int = 3) -> Dict[str, Any]:
+    """Load time, single-text latency and batched throughput of one embedding model."""
+    result: Dict[str, Any] = {"model": spec}
+    try:
+        started = time.perf_counter()
+        encode = _model_encoder(spec)
+        encode(texts[:1])
+        result["load_seconds"] = round(time.perf_counter() - started, 3)
+
+        single = []
+        for text in texts[:max(repeats, 5)]:
+            started = time.perf_counter()
+            encode([text])
+            single.append(time.perf_counter() - started)
+        batch_seconds = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            vectors = encode(texts)
+            batch_seconds.append(time.perf_counter() - started)
+        result.update({
+            "dimension": int(np.asarray(vectors).shape[-1]),
+            "single_ms": round(float(np.median(single)) * 1000, 2),
+            "batch_size": len(texts),
+            "texts_per_second": round(len(texts) / min(batch_seconds), 1),
+        })
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def sample_texts(json_data_dir: Path | None = None, limit: int = 64) -> List[str]:
+    """Texts from json_data/ (so lengths are realistic), padded with built-in samples."""
+    texts: List[str] = []
+    if json_data_dir is not None:
+        for path in sorted(Path(json_data_dir).glob("*.json")):
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            for doc in data if isinstance(data, list) else [data]:
+                if isinstance(doc, dict) and doc.get("document"):
+                    texts.append(doc["document"])
+    while len(texts) < limit:
+        texts.append(SAMPLE_TEXTS[len(texts) % len(SAMPLE_TEXTS)])
+    return texts[:limit]
+
+
+##### Data directory #####
+
+def _drop_cache(fd: int) -> bool:
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            return True
+        except OSError:
+            pass
+    return False
+
+
+def measure_disk_read(data_dir: Path, max_mb: int = 512, chunk_mb: int = 4) -> Dict[str, Any]:
+    """Sequential read throughput over the files of the data directory."""
+    files = sorted((p for p in Path(data_dir).rglob("*") if p.is_file()), key=lambda p: -p.stat().st_size)
+    budget = max_mb * 1024 ** 2
+    read = 0
+    dropped = True
+    started = time.perf_counter()
+    for path in files:
+        if read >= budget:
+            break
+        with open(path, "rb", buffering=0) as f:
+            dropped = _drop_cache(f.fileno()) and dropped
+            while read < budget:
+                chunk = f.read(chunk_mb * 1024 ** 2)
+                if not chunk:
+                    break
+                read += len(chunk)
+    seconds = time.perf_counter() - started
+    return {
+        "path": str(data_dir),
+        "total_mb": round(sum(p.stat().st_size for p in files) / 1024 ** 2, 2),
+        "read_mb": round(read / 1024 ** 2, 2),
+        "seconds": round(seconds, 3),
+        "mb_per_second": round(read / 1024 ** 2 / seconds, 1) if seconds > 0 and read else None,
+        "page_cache_dropped": dropped,
+    }
+
+
+def hnsw_index_sizes(data_dir: Path) -> Dict[str, int]:
+    """On-disk bytes of each collection's HNSW files, keyed by collection name."""
+    db = Path(data_dir) / "chroma.sqlite3"
+    if not db.exists():
+        return {}
+    connection = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    try:
+        rows = connection.execute(
+            "SELECT c.name, s.id FROM segments s JOIN collections c ON s.collection = c.id "
+            "WHERE s.scope = 'VECTOR'"
+        ).fetchall()
+    finally:
+        connection.close()
+    sizes: Dict[str, int] = {}
+    for name, segment_id in rows:
+        segment_dir = Path(data_dir) / segment_id
+        sizes[name] = sizes.get(name, 0) + sum(
+            (segment_dir / f).stat().st_size for f in HNSW_FILES if (segment_dir / f).exists()
+        )
+    return sizes
+
+
+##### Collections #####
+
+def _fresh_client(data_dir: Path):
+    """A PersistentClient that has not loaded any index yet in this process."""
+    import chromadb
+    from chromadb.api.shared_system_client import SharedSystemClient
+    SharedSystemClient.clear_system_cache()
+    return chromadb.PersistentClient(path=str(data_dir))
+
+
+def measure_collections(data_dir: Path, repeats: int = 20, n_results: int = 5) -> List[Dict[str, Any]]:
+    """Cold (first query on a fresh client) vs. warm query latency per collection."""
+    index_sizes = hnsw_index_sizes(data_dir)
+    names = [c.name for c in _fresh_client(data_dir).list_collections()]
+    results = []
+    for name in names:
+        entry: Dict[str, Any] = {"name": name, "hnsw_bytes": index_sizes.get(name)}
+        try:
+            # Stored embeddings as queries, so no embedding model is involved.
+            client = _fresh_client(data_dir)
+            collection = client.get_collection(name)
+            entry["count"] = collection.count()
+            if entry["count"] == 0:
+                results.append(entry)
+                continue
+            rows = collection.get(limit=repeats, include=["embeddings"])
+            queries = [np.asarray(e, dtype=np.float32).tolist() for e in rows["embeddings"]]
+            entry["dimension"] = len(queries[0])
+
+            started = time.perf_counter()
+            collection.query(query_embeddings=[queries[0]], n_results=n_results, include=["distances"])
+            entry["cold_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+            warm = []
+            for i in range(repeats):
+                started = time.perf_counter()
+                collection.query(query_embeddings=[queries[i % len(queries)]], n_results=n_results,
+                                 include=["distances"])
+                warm.append(time.perf_counter() - started)
+            entry["warm_p50_ms"] = round(float(np.percentile(warm, 50)) * 1000, 2)
+            entry["warm_p95_ms"] = round(float(np.percentile(warm, 95)) * 1000, 2)
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+        results.append(entry)
+    return results
+
+
+##### Warnings #####
+
+def diagnose(report: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Actionable warnings from a report."""
+    warnings: List[Dict[str, str]] = []
+
+    def warn(area: str, message: str) -> None:
+        warnings.append({"area": area, "message": message})
+
+    host = report.get("host") or {}
+    cores = host.get("effective_cores") or host.get("cpu_count") or 1
+    threads = report.get("threads") or {}
+    env = threads.get("env") or {}
+    workers = int(env.get("RAG_WORKERS") or 1)
+
+    if host.get("cgroup_cpu_limit") and host["cgroup_cpu_limit"] < (host.get("cpu_count") or 0) \
+            and not env.get("OMP_NUM_THREADS"):
+        warn("threads", f"CPU quota is {host['cgroup_cpu_limit']:g} cores but {host['cpu_count']} are visible; "
+                        f"torch/ONNX size their pools by visible cores. Set OMP_NUM_THREADS={int(cores)}.")
+    torch_info = threads.get("torch")
+    if torch_info:
+        if torch_info["num_threads"] > cores:
+            warn("threads", f"torch uses {torch_info['num_threads']} threads on {cores:g} usable cores; "
+                            f"set OMP_NUM_THREADS or torch.set_num_threads({int(cores)}).")
+        if workers > 1 and torch_info["num_threads"] * workers > cores:
+            warn("threads", f"RAG_WORKERS={workers} x {torch_info['num_threads']} torch threads oversubscribes "
+                            f"{cores:g} cores; set OMP_NUM_THREADS={max(1, int(cores // workers))}.")
+    onnx_info = threads.get("onnxruntime")
+    if onnx_info and onnx_info["intra_op_num_threads"] == 0 and host.get("cgroup_cpu_limit"):
+        warn("threads", "ONNX Runtime defaults to one thread per visible core, which ignores the CPU quota; "
+                        "the Chroma default embedding function may oversubscribe.")
+
+    for model in report.get("embeddings") or []:
+        if "error" in model:
+            warn("embeddings", f"{model['model']} could not be measured ({model['error']}).")
+        elif model["texts_per_second"] < 20:
+            warn("embeddings", f"{model['model']} embeds only {model['texts_per_second']} texts/s; ingestion "
+                               f"will be slow. Enable the embedding cache or use a GPU or a smaller model.")
+        elif model.get("load_seconds", 0) > 30:
+            warn("embeddings", f"{model['model']} takes {model['load_seconds']}s to load; pre-download it "
+                               f"so server startup doesn't pay this.")
+
+    disk = report.get("disk")
+    if disk and disk.get("mb_per_second") and disk["read_mb"] >= 16 and disk["mb_per_second"] < 100:
+        warn("disk", f"Data directory reads at {disk['mb_per_second']} MB/s; cold index loads will be slow. "
+                     f"Move chroma_data to local SSD storage.")
+
+    available = host.get("memory_available_mb")
+    collections = report.get("collections") or []
+    index_mb = sum(c.get("hnsw_bytes") or 0 for c in collections) / 1024 ** 2
+    if available and index_mb > 0.5 * available:
+        warn("memory", f"HNSW indexes need {index_mb:.0f} MB but only {available:.0f} MB RAM is available; "
+                       f"expect swapping. Shard, use the quantized local engine or add RAM.")
+    for c in collections:
+        if "error" in c:
+            warn("collections", f"{c['name']}: query failed ({c['error']}).")
+            continue
+        if c.get("cold_ms") and c["cold_ms"] > 2000:
+            warn("collections", f"{c['name']}: first query takes {c['cold_ms']:.0f} ms (index load); "
+                                f"warm collections at server startup.")
+        if c.get("warm_p50_ms") and c["warm_p50_ms"] > 50:
+            warn("collections", f"{c['name']}: warm queries take {c['warm_p50_ms']} ms (p50); tune HNSW "
+                                f"ef_search or enable the local engine.")
+    return warnings
+
+
+##### Report #####
+
+def run_doctor(
+    data_dir: Path | None,
+    models: List[str] | None = None,
+    json_data_dir: Path | None = None,
+    skip_embeddings: bool = False,
+    skip_disk: bool = False,
+    query_repeats: int = 20,
+) -> Dict[str, Any]:
+    """
+    Run all measurements.
+
+    Args:
+        data_dir: Persistent ChromaDB directory; None skips disk and collection checks
+        models: Embedding model specs (default: DEFAULT_MODELS)
+        json_data_dir: Source of realistic sample texts for embedding benchmarks
+        skip_embeddings: Don't load or benchmark embedding models
+        skip_disk: Don't measure disk read throughput
+        query_repeats: Warm queries per collection
+
+    Returns:
+        Report dict with host, threads, embeddings, disk, collections and warnings
+    """
+    report: Dict[str, Any] = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": host_info(),
+        "threads": thread_settings(),
+    }
+    if not skip_embeddings:
+        texts = sample_texts(json_data_dir)
+        report["embeddings"] = [measure_embedding(spec, texts) for spec in (models or DEFAULT_MODELS)]
+    if data_dir is not None and Path(data_dir).exists():
+        if not skip_disk:
+            report["disk"] = measure_disk_read(Path(data_dir))
+        report["collections"] = measure_collections(Path(data_dir), repeats=query_repeats)
+    report["warnings"] = diagnose(report)
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    host = report["host"]
+    print("\n⚡ Performance")
+    print(f"  Cores: {host['cpu_count']} visible, {host['affinity_cores']} in affinity, "
+          f"quota {host['cgroup_cpu_limit'] or 'none'}")
+    if host["memory_total_mb"]:
+        print(f"  RAM: {host['memory_available_mb']:.0f} MB available of {host['memory_total_mb']:.0f} MB")
+    threads = report["threads"]
+    if threads.get("torch"):
+        print(f"  torch: {threads['torch']['num_threads']} threads, "
+              f"{threads['torch']['num_interop_threads']} inter-op, cuda={threads['torch']['cuda']}")
+    if threads.get("onnxruntime"):
+        print(f"  onnxruntime: intra-op threads {threads['onnxruntime']['intra_op_num_threads'] or 'auto'}, "
+              f"providers {threads['onnxruntime']['providers']}")
+    for model in report.get("embeddings", []):
+        if "error" in model:
+            print(f"  ✗ {model['model']}: {model['error']}")
+        else:
+            print(f"  ✓ {model['model']}: {model['texts_per_second']} texts/s (batch {model['batch_size']}), "
+                  f"{model['single_ms']} ms single, loaded in {model['load_seconds']}s")
+    disk = report.get("disk")
+    if disk:
+        cache = "" if disk["page_cache_dropped"] else " (page cache not dropped)"
+        print(f"  Disk: {disk['mb_per_second'] or '-'} MB/s over {disk['read_mb']} MB{cache}")
+    for c in report.get("collections", []):
+        if "error" in c:
+            print(f"  ✗ {c['name']}: {c['error']}")
+        elif "cold_ms" in c:
+            size = f", HNSW {c['hnsw_bytes'] / 1024 ** 2:.1f} MB" if c.get("hnsw_bytes") else ""
+            print(f"  ✓ {c['name']}: {c['count']} docs, cold {c['cold_ms']} ms, "
+                  f"warm p50 {c['warm_p50_ms']} ms / p95 {c['warm_p95_ms']} ms{size}")
+    if report["warnings"]:
+        print("\n⚠️  Performance warnings:")
+        for w in report["warnings"]:
+            print(f"  - [{w['area']}] {w['message']}")
+    else:
+        print("\n✓ No performance warnings")
+
+
+def write_report(report: Dict[str, Any], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📁 Report written to {os.path.abspath(path)}")
+
+
+##### Compare #####
+
+def _metrics(report: Dict[str, Any]) -> Dict[str, float]:
+    """Comparable numbers of a report, keyed by a readable path."""
+    metrics: Dict[str, float] = {}
+    for key in ("effective_cores", "memory_available_mb"):
+        if report["host"].get(key) is not None:
+            metrics[f"host.{key}"] = report["host"][key]
+    for model in report.get("embeddings", []):
+        for key in ("texts_per_second", "single_ms", "load_seconds"):
+            if key in model:
+                metrics[f"embeddings.{model['model']}.{key}"] = model[key]
+    if report.get("disk", {}).get("mb_per_second"):
+        metrics["disk.mb_per_second"] = report["disk"]["mb_per_second"]
+    for c in report.get("collections", []):
+        for key in ("cold_ms", "warm_p50_ms", "warm_p95_ms"):
+            if key in c:
+                metrics[f"collections.{c['name']}.{key}"] = c[key]
+    return metrics
+
+
+def compare(a: Dict[str, Any], b: Dict[str, Any]) -> None:
+    ma, mb = _metrics(a), _metrics(b)
+    keys = sorted(set(ma) | set(mb))
+    width = max([len(k) for k in keys] + [6]) + 2
+    print(f"{'metric':<{width}}{a['host']['hostname'][:14]:>15}{b['host']['hostname'][:14]:>15}{'b/a':>8}")
+    for key in keys:
+        va, vb = ma.get(key), mb.get(key)
+        ratio = f"{vb / va:.2f}" if va and vb is not None else "-"
+        print(f"{key:<{width}}{va if va is not None else '-':>15}{vb if vb is not None else '-':>15}{ratio:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance doctor for the ChromaDB MCP setup")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Measure this host")
+    run_parser.add_argument("--data-dir", default=os.getenv("CHROMA_DATA_DIR"), help="Persistent ChromaDB directory")
+    run_parser.add_argument("--model", action="append", dest="models",
+                            help=f"Embedding model spec, repeatable (default: {DEFAULT_MODELS})")
+    run_parser.add_argument("--skip-embeddings", action="store_true")
+    run_parser.add_argument("--skip-disk", action="store_true")
+    run_parser.add_argument("--report", default=None, help="Write the JSON report to this file")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two JSON reports")
+    compare_parser.add_argument("a")
+    compare_parser.add_argument("b")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.a, "r", encoding="utf-8") as fa, open(args.b, "r", encoding="utf-8") as fb:
+            compare(json.load(fa), json.load(fb))
+        return
+
+    report = run_doctor(
+        Path(args.data_dir) if args.data_dir else None,
+        models=args.models,
+        json_data_dir=Path(__file__).parent / "json_data",
+        skip_embeddings=args.skip_embeddings,
+        skip_disk=args.skip_disk,
+    )
+    print_report(report)
+    if args.report:
+        write_report(report, args.report)
+
+
+if __name__ == "__main__":
+    main()
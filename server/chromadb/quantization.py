@@ -0,0 +1,373 @@
+"""
+Compressed vector tier with full-precision re-scoring.
+
+The float32 matrix of a LocalVectorIndex is the largest memory consumer
+once collections grow (768-dim bge-base vectors are 3 KB each). A
+QuantizedVectorIndex keeps only compact codes in RAM for the first stage:
+
+- int8: per-dimension scalar quantization, 1 byte per dimension (4x smaller),
+- pq:   product quantization, 1 byte per subspace (e.g. 96 subspaces of a
+        768-dim vector: 32x smaller).
+
+The first stage scores every candidate from the codes and keeps the best
+`rescore_factor * n_results`; those are re-scored exactly against the
+full-precision vectors, which stay on disk in a memory-mapped .npy file,
+so only the shortlisted rows are read. Distances returned to callers are
+always exact.
+
+The report command measures memory saved and recall lost against exact
+search, using the questions/ set of the regulations server (or stored
+embeddings as queries when no model is given):
+
+    python quantization.py report --data-dir ../llama_index/storage --collection rag_demo \\
+        --questions ../llama_index/questions --model BAAI/bge-base-en-v1.5
+"""
+
+import os
+import re
+import sys
+import time
+import weakref
+import tempfile
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import chromadb
+
+from hnsw_tuning import sample_queries
+from local_engine import LocalVectorIndex
+
+QUANTIZATIONS = ("int8", "pq")
+
+# Rows encoded / scored per block, bounding temporary float32 copies.
+BLOCK_ROWS = 16384
+
+# Rows sampled to train PQ codebooks.
+PQ_TRAIN_ROWS = 20000
+PQ_ITERATIONS = 15
+
+
+class ScalarQuantizer:
+    """Per-dimension affine int8 quantization: x ~= low + scale * code."""
+
+    def fit(self, matrix: np.ndarray) -> "ScalarQuantizer":
+        self.low = np.asarray(matrix.min(axis=0), dtype=np.float32)
+        high = np.asarray(matrix.max(axis=0), dtype=np.float32)
+        self.scale = np.maximum(high - self.low, 1e-12) / 255.0
+        return self
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        codes = np.empty(matrix.shape, dtype=np.uint8)
+        for start in range(0, len(matrix), BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + BLOCK_ROWS], dtype=np.float32)
+            codes[start:start + len(block)] = np.clip(np.rint((block - self.low) / self.scale), 0, 255)
+        return codes
+
+    def inner_products(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate (Q, N) inner products between float32 queries and encoded rows."""
+        offset = queries @ self.low
+        scaled = queries * self.scale
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS].astype(np.float32)
+            out[:, start:start + len(block)] = scaled @ block.T
+        return out + offset[:, None]
+
+    @property
+    def nbytes(self) -> int:
+        return self.low.nbytes + self.scale.nbytes
+
+
+class ProductQuantizer:
+    """Product quantization with 256 centroids per subspace, trained with k-means."""
+
+    def __init__(self, subspaces: int):
+        self.subspaces = subspaces
+
+    def fit(self, matrix: np.ndarray, seed: int = 0) -> "ProductQuantizer":
+        n, dim = matrix.shape
+        if dim % self.subspaces:
+            raise ValueError(f"PQ subspaces ({self.subspaces}) must divide the dimension ({dim})")
+        self.sub_dim = dim // self.subspaces
+        self.centroids_per_subspace = min(256, n)
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(n, size=min(n, PQ_TRAIN_ROWS), replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+
+        self.codebooks = np.empty((self.subspaces, self.centroids_per_subspace, self.sub_dim), dtype=np.float32)
+        for j in range(self.subspaces):
+            self.codebooks[j] = self._kmeans(sample[:, j * self.sub_dim:(j + 1) * self.sub_dim], rng)
+        return self
+
+    def _kmeans(self, points: np.ndarray, rng) -> np.ndarray:
+        k = self.centroids_per_subspace
+        centroids = points[rng.choice(len(points), size=k, replace=False)].copy()
+        for _ in range(PQ_ITERATIONS):
+            assign = self._nearest(points, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, points)
+            counts = np.bincount(assign, minlength=k)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            # Re-seed empty clusters from random points.
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                centroids[empty] = points[rng.choice(len(points), size=len(empty))]
+        return centroids
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (np.einsum("ij,ij->i", centroids, centroids)[None, :] - 2.0 * points @ centroids.T)
+        return distances.argmin(axis=1)
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(matrix), self.subspaces), dtype=np.uint8)
+        for start in range(0, len(matrix), BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + BLOCK_ROWS], dtype=np.float32)
+            for j in range(self.subspaces):
+                sub = block[:, j * self.sub_dim:(j + 1) * self.sub_dim]
+                codes[start:start + len(block), j] = self._nearest(sub, self.codebooks[j])
+        return codes
+
+    def inner_products(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Asymmetric (Q, N) inner products via per-subspace lookup tables."""
+        q_sub = queries.reshape(len(queries), self.subspaces, self.sub_dim)
+        tables = np.einsum("qjd,jkd->qjk", q_sub, self.codebooks)
+        out = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for j in range(self.subspaces):
+            out += tables[:, j, codes[:, j]]
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return self.codebooks.nbytes
+
+
+def default_pq_subspaces(dim: int) -> int:
+    """Largest divisor of `dim` giving sub-vectors of at least 8 dimensions (96 for 768, 48 for 384)."""
+    for subspaces in range(max(dim // 8, 1), 0, -1):
+        if dim % subspaces == 0:
+            return subspaces
+    return 1
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class QuantizedVectorIndex(LocalVectorIndex):
+    """LocalVectorIndex whose first stage runs on compressed codes, re-scored at full precision."""
+
+    def __init__(
+        self,
+        ids: List[str],
+        embeddings: np.ndarray,
+        documents: List[str | None],
+        metadatas: List[Dict | None],
+        space: str = "l2",
+        cache_path: str | None = None,
+        quantization: str = "int8",
+        rescore_factor: int = 4,
+        pq_subspaces: int | None = None,
+    ):
+        """
+        Initialize the index; see LocalVectorIndex for the shared arguments.
+
+        Args:
+            cache_path: .npy path for the full-precision vectors; a temporary file is used if omitted
+            quantization: 'int8' or 'pq'
+            rescore_factor: Shortlist size as a multiple of n_results; 0 returns first-stage results unrescored
+            pq_subspaces: PQ subspaces (default: default_pq_subspaces(dim))
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}. Valid options: {list(QUANTIZATIONS)}")
+        if rescore_factor < 0:
+            raise ValueError("rescore_factor must be >= 0.")
+        temporary = cache_path is None
+        if temporary:
+            # Full-precision vectors live on disk either way; only codes stay resident.
+            fd, cache_path = tempfile.mkstemp(prefix="quantized_", suffix=".npy")
+            os.close(fd)
+        super().__init__(ids, embeddings, documents, metadatas, space=space, cache_path=cache_path)
+        if temporary:
+            weakref.finalize(self, _remove_file, cache_path)
+
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        if len(self.ids) == 0:
+            self.quantizer, self.codes = None, np.zeros((0, 0), dtype=np.uint8)
+            return
+        if quantization == "int8":
+            self.quantizer = ScalarQuantizer().fit(self.matrix)
+        else:
+            self.quantizer = ProductQuantizer(pq_subspaces or default_pq_subspaces(self.matrix.shape[1])).fit(self.matrix)
+        self.codes = self.quantizer.encode(self.matrix)
+
+    def _approximate_distances(self, queries: np.ndarray, candidates: np.ndarray | None) -> np.ndarray:
+        codes = self.codes if candidates is None else self.codes[candidates]
+        scores = self._cosine(self.quantizer.inner_products(queries, codes), candidates)
+        if self.space in ("cosine", "ip"):
+            return 1.0 - scores
+        sq_norms = self.sq_norms if candidates is None else self.sq_norms[candidates]
+        q_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        return np.maximum(q_norms - 2.0 * scores + sq_norms[None, :], 0.0)
+
+    def _search(self, queries: np.ndarray, candidates: np.ndarray | None, n_results: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        if len(self.ids) == 0 or (candidates is not None and len(candidates) == 0):
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        approx = self._approximate_distances(queries, candidates)
+        total = approx.shape[1]
+        k = min(n_results, total)
+        shortlist_size = min(total, max(k * self.rescore_factor, k))
+
+        hits = []
+        for query, row in zip(queries, approx):
+            short = np.argpartition(row, shortlist_size - 1)[:shortlist_size] if k else np.zeros(0, dtype=np.int64)
+            rows = short if candidates is None else candidates[short]
+            if self.rescore_factor == 0:
+                distances = row[short]
+            else:
+                # Sorted row order keeps memory-mapped reads sequential.
+                order = np.argsort(rows)
+                rows = rows[order]
+                distances = self._distances(query[None, :], rows)[0]
+            top = np.argsort(distances, kind="stable")[:k]
+            hits.append((rows[top], distances[top]))
+        return hits
+
+    def memory(self) -> Dict[str, Any]:
+        """Resident bytes of the first stage versus a float32 matrix."""
+        float32_bytes = int(self.matrix.shape[0] * self.matrix.shape[1] * 4) if len(self.ids) else 0
+        resident = int(self.codes.nbytes + (self.quantizer.nbytes if self.quantizer is not None else 0))
+        return {
+            "quantization": self.quantization,
+            "rows": len(self.ids),
+            "float32_bytes": float32_bytes,
+            "resident_bytes": resident,
+            "compression": round(float32_bytes / resident, 2) if resident else None,
+            "full_precision_path": str(self.matrix.filename) if isinstance(self.matrix, np.memmap) else None,
+        }
+
+
+##### Report #####
+
+def load_questions(questions_dir: str) -> List[str]:
+    """Numbered questions ("1. ...") from questions_dir/q*.txt."""
+    questions = []
+    for path in sorted(Path(questions_dir).glob("q*.txt")):
+        for line in path.read_text(encoding="utf-8").splitlines():
+            match = re.match(r"^\s*\d+\.\s*(.+)$", line)
+            if match:
+                questions.append(match.group(1).strip())
+    return questions
+
+
+def embed_questions(questions: List[str], model_name: str) -> np.ndarray:
+    """Embed questions the way the regulations server does (with the model's query prompt, if any)."""
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name)
+    prompt_name = "query" if "query" in (getattr(model, "prompts", None) or {}) else None
+    return np.asarray(model.encode(questions, prompt_name=prompt_name, normalize_embeddings=True), dtype=np.float32)
+
+
+def compare(collection, queries: np.ndarray, n_results: int = 5, rescore_factors=(0, 4),
+            pq_subspaces: int | None = None, work_dir: str | None = None) -> Dict[str, Any]:
+    """
+    Recall@k and latency of each compressed tier against exact float32 search.
+
+    Returns:
+        Report with one row per (quantization, rescore_factor)
+    """
+    work = Path(work_dir or tempfile.mkdtemp(prefix="quantization_report_"))
+    exact_index = LocalVectorIndex.from_collection(collection)
+    exact = exact_index.query(queries, n_results=n_results, include=[])
+
+    def timed_query(index) -> Tuple[Dict, float]:
+        started = time.perf_counter()
+        out = index.query(queries, n_results=n_results, include=[])
+        return out, (time.perf_counter() - started) / max(len(queries), 1)
+
+    _, exact_s = timed_query(exact_index)
+    rows = [{
+        "tier": "float32 (exact)",
+        "resident_bytes": int(exact_index.matrix.nbytes),
+        "compression": 1.0,
+        "recall_at_k": 1.0,
+        "ms_per_query": round(exact_s * 1000, 3),
+    }]
+    for quantization in QUANTIZATIONS:
+        index = QuantizedVectorIndex.from_collection(
+            collection, cache_dir=str(work / quantization), quantization=quantization, pq_subspaces=pq_subspaces
+        )
+        memory = index.memory()
+        for factor in rescore_factors:
+            index.rescore_factor = factor
+            out, seconds = timed_query(index)
+            recalls = [len(set(a) & set(b)) / len(a) for a, b in zip(exact["ids"], out["ids"]) if a]
+            rows.append({
+                "tier": f"{quantization} (rescore x{factor})" if factor else f"{quantization} (no rescore)",
+                "resident_bytes": memory["resident_bytes"],
+                "compression": memory["compression"],
+                "recall_at_k": round(float(np.mean(recalls)), 4) if recalls else None,
+                "ms_per_query": round(seconds * 1000, 3),
+            })
+    return {
+        "collection_name": collection.name,
+        "rows_indexed": len(exact_index),
+        "dimension": int(exact_index.matrix.shape[1]) if len(exact_index) else None,
+        "queries": len(queries),
+        "n_results": n_results,
+        "results": rows,
+    }
+
+
+def create_parser():
+    """Create and return the argument parser."""
+    parser = argparse.ArgumentParser(description='Memory and recall of compressed vector tiers')
+    sub = parser.add_subparsers(dest='command', required=True)
+    report = sub.add_parser('report', help='Compare int8 / PQ tiers with exact search on one collection')
+    report.add_argument('--data-dir', default='./chroma_data', help='Directory of the persistent Chroma client')
+    report.add_argument('--collection', required=True)
+    report.add_argument('--questions', default=None, help='Folder of q*.txt question files')
+    report.add_argument('--model', default=None, help='Model to embed the questions with')
+    report.add_argument('--sample-size', type=int, default=100,
+                        help='Stored embeddings used as queries when --questions/--model are not given')
+    report.add_argument('--n-results', type=int, default=5)
+    report.add_argument('--rescore-factors', type=int, nargs='+', default=[0, 2, 4, 8])
+    report.add_argument('--pq-subspaces', type=int, default=None)
+    return parser
+
+
+def main():
+    """Command line entry point."""
+    args = create_parser().parse_args()
+    client = chromadb.PersistentClient(path=args.data_dir)
+    collection = client.get_collection(args.collection)
+
+    if args.questions and args.model:
+        questions = load_questions(args.questions)
+        print(f"Embedding {len(questions)} questions with {args.model}")
+        queries = embed_questions(questions, args.model)
+    else:
+        queries = sample_queries(client, collection, args.sample_size)
+
+    report = compare(collection, queries, n_results=args.n_results, rescore_factors=args.rescore_factors,
+                     pq_subspaces=args.pq_subspaces)
+    print(f"\n{report['collection_name']}: {report['rows_indexed']} vectors x {report['dimension']} dims, "
+          f"{report['queries']} queries, recall@{report['n_results']}")
+    print(f"{'tier':<26}{'resident MB':>12}{'x smaller':>10}{'recall':>9}{'ms/query':>10}")
+    for row in report["results"]:
+        print(f"{row['tier']:<26}{row['resident_bytes'] / 1024 / 1024:>12.2f}{row['compression']:>10}"
+              f"{row['recall_at_k']:>9}{row['ms_per_query']:>10}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
@@ -0,0 +1,159 @@
+"""
+Write-aware result cache for read tools of the Chroma MCP server.
+
+Agents often repeat the same chroma_query_documents / chroma_get_documents
+call within a session. QueryResultCache keeps recent results keyed by the
+tool, the collection (name and id, so a re-created collection never shares
+entries) and every argument that shapes the result.
+
+Staleness is handled with a version counter per collection name: every
+write tool bumps it (via _mark_collection_changed), and an entry is only
+served while the version it was computed under is still current. Callers
+read the version *before* computing a result, so a write that lands while
+a query is running makes that result unservable instead of caching
+pre-write data under the post-write version.
+
+Writes that bypass the server (another process ingesting into the same
+persistent directory) don't bump the counter, so the server also puts the
+collection's data version (see data_version.py) into every key: after such
+a write, lookups compute a new key and miss. `ttl` additionally bounds how
+long any entry is served.
+
+Entries are evicted least-recently-used once `max_entries` or `max_bytes`
+(estimated from the JSON size of the result) is exceeded.
+"""
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict
+
+
+@dataclass
+class _Entry:
+    collection: str
+    version: int
+    created: float
+    size: int
+    value: Any
+
+
+def _encode_default(value):
+    """json.dumps fallback for numpy arrays (embeddings) and other non-JSON values."""
+    return value.tolist() if hasattr(value, "tolist") else str(value)
+
+
+class QueryResultCache:
+    """LRU cache of read results, invalidated per collection by version counters."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 ** 2, ttl: float = 300.0):
+        """
+        Args:
+            max_entries: Maximum cached results; 0 disables the cache
+            max_bytes: Maximum estimated size of all cached results
+            ttl: Seconds an entry may be served; 0 for no expiry
+        """
+        if max_entries < 0 or max_bytes < 0 or ttl < 0:
+            raise ValueError("Query cache limits must be >= 0.")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stale": 0, "expired": 0, "stored": 0,
+                         "evicted": 0, "too_large": 0, "invalidations": 0}
+        self._tools: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def key(tool: str, collection_name: str, collection_id: str, **arguments) -> str:
+        """Stable key over the tool, the collection and all result-shaping arguments."""
+        payload = json.dumps([tool, collection_name, collection_id, arguments], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def version(self, collection_name: str) -> int:
+        """Current version of a collection; read it before computing a result to cache."""
+        with self._lock:
+            return self._versions.get(collection_name, 0)
+
+    def bump(self, collection_name: str) -> None:
+        """Invalidate every cached result of a collection."""
+        with self._lock:
+            self._versions[collection_name] = self._versions.get(collection_name, 0) + 1
+            self.counters["invalidations"] += 1
+            # Stale entries can never be served again; free their space now.
+            for key in [k for k, e in self._entries.items() if e.collection == collection_name]:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _count(self, tool: str, outcome: str) -> None:
+        self.counters[outcome] += 1
+        per_tool = self._tools.setdefault(tool, {"hits": 0, "misses": 0})
+        per_tool["hits" if outcome == "hits" else "misses"] += 1
+
+    def get(self, tool: str, key: str) -> Any | None:
+        """Cached result for `key`, or None on a miss."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._count(tool, "misses")
+                return None
+            if entry.version != self._versions.get(entry.collection, 0):
+                self._remove(key)
+                self._count(tool, "stale")
+                return None
+            if self.ttl and time.monotonic() - entry.created > self.ttl:
+                self._remove(key)
+                self._count(tool, "expired")
+                return None
+            self._entries.move_to_end(key)
+            self._count(tool, "hits")
+            return entry.value
+
+    def put(self, key: str, collection_name: str, version: int, value: Any) -> None:
+        """Store a result computed under `version` (unless a write has bumped it since)."""
+        if not self.enabled:
+            return
+        size = len(json.dumps(value, default=_encode_default))
+        with self._lock:
+            if version != self._versions.get(collection_name, 0):
+                return
+            if size > self.max_bytes:
+                self.counters["too_large"] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(collection_name, version, time.monotonic(), size, value)
+            self._bytes += size
+            self.counters["stored"] += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.counters["evicted"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"] + self.counters["stale"] + self.counters["expired"]
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                **self.counters,
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+                "tools": {tool: dict(counts) for tool, counts in sorted(self._tools.items())},
+            }
@@ -0,0 +1,472 @@
+"""
+Sharded logical collections.
+
+A sharded collection is an empty "anchor" collection whose metadata names
+the shard key (e.g. `source_file`, `regulation_year`, `programme`), plus one
+physical collection per shard key value named `<anchor>__<value>`. Each
+shard has its own, smaller HNSW graph.
+
+Writes are grouped by the shard key value in each row's metadata and the
+per-shard writes run concurrently. An ID lives in exactly one shard: an
+upsert or update that changes a row's shard key value moves the row.
+Queries embed once, pick the shards a `where` filter on the shard key
+allows (all shards otherwise), query them concurrently and merge the
+per-shard top-k by distance. Gets, counts and deletes fan out the same way;
+get results list the shards in order of their key value.
+
+All shards of one anchor must use the anchor's embedding model, since their
+distances are only comparable if the vectors live in the same space; the
+model is recorded on the anchor and on every shard and checked on use.
+"""
+
+import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Set
+import numpy as np
+
+from mcp_shared.collection_metadata import modifiable_metadata
+
+SHARD_KEY_FIELD = "shard:key"
+SHARD_OF_FIELD = "shard:of"
+SHARD_VALUE_FIELD = "shard:value"
+SHARD_MODEL_FIELD = "shard:embedding_model"
+
+# Shard for rows whose metadata lacks the shard key.
+UNSHARDED_VALUE = "_unsharded"
+
+DEFAULT_MAX_WORKERS = 8
+
+
+def is_sharded(collection) -> bool:
+    """True if `collection` is the anchor of a sharded collection."""
+    metadata = collection.metadata or {}
+    return SHARD_KEY_FIELD in metadata and SHARD_OF_FIELD not in metadata
+
+
+def shard_name(anchor_name: str, value: Any) -> str:
+    """Physical collection name for a shard key value."""
+    safe = re.sub(r"[^a-zA-Z0-9._-]+", "_", str(value)).strip("._-")
+    if not safe:
+        safe = hashlib.sha1(str(value).encode("utf-8")).hexdigest()[:12]
+    return f"{anchor_name}__{safe}"[:512].rstrip("._-")
+
+
+class ShardRouter:
+    """Routes writes and fans out queries for one sharded collection."""
+
+    def __init__(self, client, anchor, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Initialize the router.
+
+        Args:
+            client: Chroma client owning the anchor and its shards
+            anchor: The anchor collection (see create())
+            max_workers: Maximum shards written or queried concurrently
+        """
+        if not is_sharded(anchor):
+            raise ValueError(f"Collection '{anchor.name}' is not a sharded collection")
+        self.client = client
+        self.anchor = anchor
+        self.shard_key = anchor.metadata[SHARD_KEY_FIELD]
+        self.embedding_model = anchor.metadata.get(SHARD_MODEL_FIELD)
+        self.max_workers = max_workers
+
+    @classmethod
+    def create(
+        cls,
+        client,
+        name: str,
+        shard_key: str,
+        embedding_model: str,
+        configuration: Dict | None = None,
+        metadata: Dict | None = None,
+    ) -> "ShardRouter":
+        """Create the anchor collection of a new sharded collection."""
+        anchor_metadata = dict(metadata or {})
+        anchor_metadata.update({SHARD_KEY_FIELD: shard_key, SHARD_MODEL_FIELD: embedding_model})
+        anchor = client.create_collection(name, configuration=configuration, metadata=anchor_metadata)
+        return cls(client, anchor)
+
+    ##### Shard registry #####
+
+    def shards(self) -> Dict[str, Any]:
+        """Map of shard key value -> shard collection."""
+        shards = {}
+        for collection in self.client.list_collections():
+            metadata = collection.metadata or {}
+            if metadata.get(SHARD_OF_FIELD) == self.anchor.name:
+                self._check_model(collection)
+                shards[metadata[SHARD_VALUE_FIELD]] = collection
+        return shards
+
+    def _shards_for(self, where: Dict | None) -> Dict[str, Any]:
+        """Shards a `where` filter may match, ordered by shard key value."""
+        shards = self.shards()
+        allowed = self.shard_values_for(where)
+        return {value: shards[value] for value in sorted(shards) if allowed is None or value in allowed}
+
+    def _map(self, fn, items: List) -> List:
+        """fn over items, up to max_workers at a time, results in order."""
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items) or 1)) as pool:
+            return list(pool.map(fn, items))
+
+    def _check_model(self, shard) -> None:
+        model = (shard.metadata or {}).get(SHARD_MODEL_FIELD)
+        if model != self.embedding_model:
+            raise ValueError(
+                f"Shard '{shard.name}' was embedded with '{model}' but '{self.anchor.name}' "
+                f"uses '{self.embedding_model}'; distances across shards would not be comparable"
+            )
+
+    def _shard_for_write(self, value: str):
+        """Get or create the shard for a key value, with the anchor's configuration."""
+        configuration: Dict[str, Any] = {}
+        try:
+            hnsw = (self.anchor.configuration or {}).get("hnsw")
+            if hnsw:
+                configuration["hnsw"] = {k: v for k, v in hnsw.items() if k in ("space", "ef_construction", "ef_search", "max_neighbors")}
+        except Exception:
+            pass
+        embedding_function = getattr(self.anchor, "_embedding_function", None)
+        if embedding_function is not None:
+            configuration["embedding_function"] = embedding_function
+
+        shard = self.client.get_or_create_collection(
+            shard_name(self.anchor.name, value),
+            configuration=configuration or None,
+            metadata={
+                SHARD_OF_FIELD: self.anchor.name,
+                SHARD_KEY_FIELD: self.shard_key,
+                SHARD_VALUE_FIELD: value,
+                SHARD_MODEL_FIELD: self.embedding_model,
+            },
+        )
+        self._check_model(shard)
+        return shard
+
+    def rename(self, new_name: str) -> None:
+        """
+        Rename the anchor and every shard, keeping the shards attached to the anchor.
+
+        Shards go first, each re-pointed at the new name as it is renamed, and
+        the anchor last; shards() only finds the ones not renamed yet, so
+        calling rename again after a crash part way through finishes it.
+        """
+        for value, shard in self.shards().items():
+            metadata = modifiable_metadata(shard.metadata)
+            metadata[SHARD_OF_FIELD] = new_name
+            shard.modify(name=shard_name(new_name, value), metadata=metadata)
+        if self.anchor.name != new_name:
+            self.anchor.modify(name=new_name)
+
+    def shard_values_for(self, where: Dict | None) -> Set[str] | None:
+        """Shard key values a `where` filter restricts to, or None if every shard may match."""
+        if not where:
+            return None
+        if "$and" in where:
+            restricted = [self.shard_values_for(clause) for clause in where["$and"]]
+            restricted = [r for r in restricted if r is not None]
+            return set.intersection(*restricted) if restricted else None
+        if "$or" in where:
+            alternatives = [self.shard_values_for(clause) for clause in where["$or"]]
+            if any(a is None for a in alternatives):
+                return None
+            return set().union(*alternatives)
+
+        condition = where.get(self.shard_key)
+        if condition is None:
+            return None
+        if not isinstance(condition, dict):
+            return {str(condition)}
+        if "$eq" in condition:
+            return {str(condition["$eq"])}
+        if "$in" in condition:
+            return {str(v) for v in condition["$in"]}
+        return None
+
+    ##### Writes #####
+
+    def write(
+        self,
+        ids: List[str],
+        documents: List[str] | None = None,
+        metadatas: List[Dict] | None = None,
+        embeddings=None,
+        upsert: bool = False,
+    ) -> Dict[str, int]:
+        """
+        Route rows to shards by their shard key value and write each shard concurrently.
+
+        Returns:
+            Number of rows written per shard key value
+        """
+        if metadatas is None:
+            metadatas = [None] * len(ids)
+        # Chroma ignores adds of existing IDs; so do shards, also for IDs held by another shard.
+        existing = set(self.locate(ids)) if not upsert else set()
+        groups: Dict[str, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            if ids[row] in existing:
+                continue
+            value = (metadata or {}).get(self.shard_key, UNSHARDED_VALUE)
+            groups.setdefault(str(value), []).append(row)
+
+        if embeddings is not None:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        def write_shard(value: str) -> int:
+            rows = groups[value]
+            shard = self._shard_for_write(value)
+            write_fn = shard.upsert if upsert else shard.add
+            write_fn(
+                ids=[ids[r] for r in rows],
+                documents=[documents[r] for r in rows] if documents is not None else None,
+                metadatas=[metadatas[r] for r in rows] if any(metadatas[r] for r in rows) else None,
+                embeddings=embeddings[rows] if embeddings is not None else None,
+            )
+            return len(rows)
+
+        counts = dict(zip(groups, self._map(write_shard, list(groups))))
+        if upsert:
+            # A row whose shard key value changed must not stay behind in its old shard.
+            target = {ids[r]: value for value, rows in groups.items() for r in rows}
+            shards = self.shards()
+            stale = {
+                value: [doc_id for doc_id in found if target[doc_id] != value]
+                for value, found in self._found(ids, shards).items()
+            }
+            self._map(lambda value: shards[value].delete(ids=stale[value]), [v for v in stale if stale[v]])
+        return counts
+
+    def _found(self, ids: List[str], shards: Dict[str, Any]) -> Dict[str, List[str]]:
+        """IDs present in each shard."""
+        found = self._map(lambda shard: shard.get(ids=ids, include=[])["ids"], list(shards.values()))
+        return dict(zip(shards, found))
+
+    def locate(self, ids: List[str]) -> Dict[str, str]:
+        """Shard key value of the shard holding each of `ids`; IDs not found are left out."""
+        return {doc_id: value for value, found in self._found(ids, self.shards()).items() for doc_id in found}
+
+    def update(
+        self,
+        ids: List[str],
+        embeddings=None,
+        metadatas: List[Dict] | None = None,
+        documents: List[str] | None = None,
+    ) -> int:
+        """
+        Update rows in whichever shard holds them; rows whose shard key value changes are moved.
+
+        Like Chroma's update, metadata is merged into the stored metadata (a
+        None value removes a key) and IDs that don't exist are ignored.
+
+        Returns:
+            Number of rows found and updated
+        """
+        located = self.locate(ids)
+        shards = self.shards()
+        in_place: Dict[str, List[int]] = {}
+        moves: List[int] = []
+        for row, doc_id in enumerate(ids):
+            if doc_id not in located:
+                continue
+            target = located[doc_id]
+            if metadatas is not None and metadatas[row] and self.shard_key in metadatas[row]:
+                value = metadatas[row][self.shard_key]
+                target = UNSHARDED_VALUE if value is None else str(value)
+            if target == located[doc_id]:
+                in_place.setdefault(target, []).append(row)
+            else:
+                moves.append(row)
+
+        def pick(values, rows):
+            return [values[r] for r in rows] if values is not None else None
+
+        def update_shard(value: str) -> None:
+            rows = in_place[value]
+            shards[value].update(
+                ids=[ids[r] for r in rows],
+                embeddings=pick(embeddings, rows),
+                metadatas=pick(metadatas, rows),
+                documents=pick(documents, rows),
+            )
+
+        self._map(update_shard, list(in_place))
+        if moves:
+            self._move(ids, moves, located, embeddings, metadatas, documents)
+        return len(located)
+
+    def _move(self, ids, rows: List[int], located: Dict[str, str], embeddings, metadatas, documents) -> None:
+        """Rewrite updated rows into their new shard, then delete them from the old one."""
+        shards = self.shards()
+        moved_ids, moved_docs, moved_metas, moved_vectors = [], [], [], []
+        for row in rows:
+            doc_id = ids[row]
+            current = shards[located[doc_id]].get(ids=[doc_id], include=["documents", "metadatas", "embeddings"])
+            metadata = {**(current["metadatas"][0] or {}), **(metadatas[row] or {})}
+            moved_ids.append(doc_id)
+            moved_metas.append({k: v for k, v in metadata.items() if v is not None})
+            if embeddings is not None:
+                moved_vectors.append(embeddings[row])
+                moved_docs.append(documents[row] if documents is not None else current["documents"][0])
+            elif documents is not None:
+                # New text without a vector: the shard embeds it on write.
+                moved_vectors.append(None)
+                moved_docs.append(documents[row])
+            else:
+                moved_vectors.append(current["embeddings"][0])
+                moved_docs.append(current["documents"][0])
+
+        reembed = [n for n, vector in enumerate(moved_vectors) if vector is None]
+        keep = [n for n, vector in enumerate(moved_vectors) if vector is not None]
+        for subset, vectors in ((keep, [moved_vectors[n] for n in keep]), (reembed, None)):
+            if subset:
+                self.write(
+                    ids=[moved_ids[n] for n in subset],
+                    documents=[moved_docs[n] for n in subset],
+                    metadatas=[moved_metas[n] for n in subset],
+                    embeddings=vectors,
+                    upsert=True,
+                )
+
+    def delete(self, ids: List[str] | None = None, where: Dict | None = None,
+               where_document: Dict | None = None) -> None:
+        """Delete rows by ID and/or filter from every shard that may hold them."""
+        def delete_shard(shard) -> None:
+            shard.delete(ids=ids, where=where, where_document=where_document)
+
+        self._map(delete_shard, list(self._shards_for(where).values()))
+
+    def reset(self) -> int:
+        """Drop every shard, keeping the anchor; returns the number of rows removed."""
+        removed = 0
+        for shard in self.shards().values():
+            removed += shard.count()
+            self.client.delete_collection(shard.name)
+        return removed
+
+    ##### Queries #####
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Dict | None = None,
+        where_document: Dict | None = None,
+        include: List[str] = ["documents", "metadatas", "distances"],
+    ) -> Dict:
+        """
+        Query the relevant shards concurrently and merge their top-k by distance.
+
+        Returns:
+            Dictionary shaped like Chroma's QueryResult, plus `shards_queried`
+        """
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        shards = self.shards()
+        allowed = self.shard_values_for(where)
+        if allowed is not None:
+            shards = {value: shard for value, shard in shards.items() if value in allowed}
+
+        shard_include = list(dict.fromkeys(list(include) + ["distances"]))
+
+        def query_shard(shard) -> Dict:
+            return shard.query(
+                query_embeddings=queries,
+                n_results=n_results,
+                where=where,
+                where_document=where_document,
+                include=shard_include,
+            )
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(shards) or 1)) as pool:
+            partials = list(pool.map(query_shard, shards.values()))
+
+        fields = [f for f in ("documents", "metadatas", "embeddings", "uris", "data") if f in include]
+        merged: Dict[str, Any] = {"ids": [], "distances": [] if "distances" in include else None}
+        for field in fields:
+            merged[field] = []
+
+        for qi in range(len(queries)):
+            hits = []
+            for partial in partials:
+                for pos, distance in enumerate(partial["distances"][qi]):
+                    hits.append((distance, partial, pos))
+            hits.sort(key=lambda hit: hit[0])
+            hits = hits[:n_results]
+
+            merged["ids"].append([p["ids"][qi][pos] for _, p, pos in hits])
+            if merged["distances"] is not None:
+                merged["distances"].append([float(d) for d, _, _ in hits])
+            for field in fields:
+                merged[field].append([p[field][qi][pos] if p.get(field) is not None else None for _, p, pos in hits])
+
+        merged["included"] = list(include)
+        merged["shards_queried"] = sorted(shards)
+        return merged
+
+    def get(
+        self,
+        ids: List[str] | None = None,
+        where: Dict | None = None,
+        where_document: Dict | None = None,
+        include: List[str] = ["documents", "metadatas"],
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> Dict:
+        """
+        Get rows from the relevant shards, concatenated in shard key value order.
+
+        limit/offset apply to the concatenation, so pages of a sharded
+        collection are stable like those of a plain one. A page only reads
+        the shards it overlaps, from the matching offset within each.
+
+        Returns:
+            Dictionary shaped like Chroma's GetResult
+        """
+        shards = self._shards_for(where)
+        start = offset or 0
+        if start == 0 and limit is None:
+            windows = [(shard, None, None) for shard in shards.values()]
+        else:
+            # Map the page onto (shard, local offset, local limit) by the number of matching rows per shard.
+            counts = self._counts(shards, ids=ids, where=where, where_document=where_document)
+            end = start + limit if limit is not None else None
+            windows, first = [], 0
+            for value, shard in shards.items():
+                last = first + counts[value]
+                low, high = max(start, first), last if end is None else min(end, last)
+                if low < high:
+                    windows.append((shard, low - first, high - low))
+                first = last
+
+        def get_shard(window) -> Dict:
+            shard, local_offset, local_limit = window
+            return shard.get(ids=ids, where=where, where_document=where_document, include=include,
+                             limit=local_limit, offset=local_offset)
+
+        partials = self._map(get_shard, windows)
+        merged: Dict[str, Any] = {"ids": []}
+        for field in ("embeddings", "documents", "uris", "data", "metadatas"):
+            merged[field] = [] if field in include else None
+        for partial in partials:
+            for field, rows in merged.items():
+                if rows is not None and partial.get(field) is not None:
+                    rows.extend(partial[field])
+        merged["included"] = list(include)
+        return merged
+
+    def count(self, where: Dict | None = None, where_document: Dict | None = None) -> Dict[str, int]:
+        """Number of rows per shard, optionally only those matching the filters."""
+        return self._counts(self._shards_for(where), where=where, where_document=where_document)
+
+    def _counts(self, shards: Dict[str, Any], ids: List[str] | None = None, where: Dict | None = None,
+                where_document: Dict | None = None) -> Dict[str, int]:
+        """Number of rows of each of `shards` matching the IDs and filters."""
+        if ids is None and where is None and where_document is None:
+            return {value: shard.count() for value, shard in shards.items()}
+
+        def count_shard(shard) -> int:
+            return len(shard.get(ids=ids, where=where, where_document=where_document, include=[])["ids"])
+
+        return dict(zip(shards, self._map(count_shard, list(shards.values()))))
@@ -0,0 +1,69 @@
+"""
+Shared fixtures for the Chroma MCP server tests.
+
+The server modules are flat scripts in server/chromadb, so that directory
+is put on sys.path. Chroma's default embedding model is downloaded on
+first use; tests replace it with a deterministic bag-of-words hash so they
+run offline and rank texts with shared words as similar.
+"""
+
+import sys
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import chromadb  # noqa: E402
+from chromadb.api.shared_system_client import SharedSystemClient  # noqa: E402
+from chromadb.utils.embedding_functions import onnx_mini_lm_l6_v2  # noqa: E402
+
+DIMENSIONS = 64
+
+
+def hash_embed(texts):
+    """One unit vector per text; each word adds to one of DIMENSIONS buckets."""
+    vectors = []
+    for text in texts:
+        vector = np.zeros(DIMENSIONS, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % DIMENSIONS] += 1
+        vectors.append(vector / (np.linalg.norm(vector) or 1.0))
+    return vectors
+
+
+@pytest.fixture(autouse=True)
+def offline_embeddings(monkeypatch):
+    monkeypatch.setattr(onnx_mini_lm_l6_v2.ONNXMiniLM_L6_V2, "__call__", lambda self, input: hash_embed(input))
+
+
+@pytest.fixture
+def client(tmp_path):
+    """A Chroma client on a fresh data directory."""
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma_data"))
+    yield client
+    SharedSystemClient.clear_system_cache()
+
+
+@pytest.fixture
+def server(client, tmp_path, monkeypatch):
+    """mcp_chroma_server with its global state pointed at `client` and reset."""
+    import mcp_chroma_server
+    from data_version import DataVersionProbe
+    from jobs import JobManager
+    from query_cache import QueryResultCache
+    from mcp_shared.reload_signal import ReloadSignal
+
+    monkeypatch.setattr(mcp_chroma_server, "_chroma_client", client)
+    monkeypatch.setattr(mcp_chroma_server, "_data_version", DataVersionProbe(tmp_path / "chroma_data" / "chroma.sqlite3"))
+    monkeypatch.setattr(mcp_chroma_server, "_remote_client", False)
+    monkeypatch.setattr(mcp_chroma_server, "_reload_signal", ReloadSignal(tmp_path / "chroma_data"))
+    monkeypatch.setattr(mcp_chroma_server, "_query_cache", QueryResultCache())
+    monkeypatch.setattr(mcp_chroma_server, "_jobs", JobManager())
+    monkeypatch.setattr(mcp_chroma_server, "_write_buffer", None)
+    monkeypatch.setattr(mcp_chroma_server, "_local_indexes", {})
+    monkeypatch.setattr(mcp_chroma_server, "_local_engine_choice", {})
+    monkeypatch.setattr(mcp_chroma_server, "_local_engine_mode", "off")
+    return mcp_chroma_server
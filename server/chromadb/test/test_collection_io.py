@@ -0,0 +1,69 @@
+"""Export/import round trips of collection_io."""
+
+import asyncio
+
+import pytest
+
+from collection_io import export_collection, get_or_create_target, import_collection, read_manifest
+from sharding import ShardRouter, is_sharded
+
+from conftest import hash_embed
+
+
+def test_round_trip_keeps_hnsw_configuration(client, tmp_path):
+    source = client.create_collection(
+        "tuned", embedding_function=None,
+        configuration={"hnsw": {"space": "cosine", "max_neighbors": 32, "ef_search": 77}},
+    )
+    texts = [f"leave rule {i} " + " ".join(f"w{j}" for j in range(i % 7)) for i in range(20)]
+    source.add(ids=[str(i) for i in range(20)], documents=texts, embeddings=hash_embed(texts))
+
+    manifest = export_collection(source, str(tmp_path / "dump"))
+    assert manifest["hnsw"]["space"] == "cosine"
+
+    target = get_or_create_target(client, "tuned_copy", read_manifest(str(tmp_path / "dump")))
+    stats = import_collection(target, str(tmp_path / "dump"))
+    assert stats["imported"] == 20
+    hnsw = target.configuration["hnsw"]
+    assert (hnsw["space"], hnsw["max_neighbors"], hnsw["ef_search"]) == ("cosine", 32, 77)
+
+    query = hash_embed([texts[3]])
+    before = source.query(query_embeddings=query, n_results=5, include=["distances"])
+    after = target.query(query_embeddings=query, n_results=5, include=["distances"])
+    assert after["ids"][0][0] == before["ids"][0][0] == "3"
+    assert after["distances"][0] == pytest.approx(before["distances"][0], abs=1e-5)
+
+
+def test_sharded_collection_round_trip(server, client, tmp_path):
+    asyncio.run(server.chroma_create_sharded_collection("programmes", shard_key="programme"))
+    asyncio.run(server.chroma_add_documents(
+        "programmes", ["mba fees", "mca fees", "mba leave"], ["a", "b", "c"],
+        [{"programme": "MBA"}, {"programme": "MCA"}, {"programme": "MBA"}],
+    ))
+
+    manifest = asyncio.run(server.chroma_export_collection("programmes", str(tmp_path / "dump")))
+    assert manifest["count"] == 3 and manifest["shard_key"] == "programme"
+
+    asyncio.run(server.chroma_import_collection(str(tmp_path / "dump"), "programmes_copy"))
+    copy = client.get_collection("programmes_copy")
+    assert is_sharded(copy)
+    assert ShardRouter(client, copy).count() == {"MBA": 2, "MCA": 1}
+
+
+def test_import_skips_and_reports_existing_ids(client, tmp_path):
+    texts = ["fee refund", "exam schedule", "hostel rules"]
+    source = client.create_collection("notices", embedding_function=None)
+    source.add(ids=["a", "b", "c"], documents=texts, embeddings=hash_embed(texts))
+    export_collection(source, str(tmp_path / "dump"))
+
+    target = client.create_collection("notices_copy", embedding_function=None)
+    target.add(ids=["b"], documents=["exam schedule revised"], embeddings=hash_embed(["exam schedule revised"]))
+    stats = import_collection(target, str(tmp_path / "dump"), batch_size=2)
+    assert (stats["imported"], stats["skipped"], stats["batches"]) == (2, 1, 2)
+    assert target.get(ids=["b"])["documents"] == ["exam schedule revised"]
+
+    again = import_collection(target, str(tmp_path / "dump"))
+    assert (again["imported"], again["skipped"]) == (0, 3)
+    stats = import_collection(target, str(tmp_path / "dump"), upsert=True)
+    assert (stats["imported"], stats["skipped"]) == (3, 0)
+    assert target.get(ids=["b"])["documents"] == ["exam schedule"]
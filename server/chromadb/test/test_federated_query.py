@@ -0,0 +1,60 @@
+"""Merging the hits of several collections in chroma_federated_query."""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from conftest import hash_embed
+
+NOTICES = {"a": "exam schedule", "b": "fee refund", "c": "exam hall allotment"}
+POLICIES = {"p1": "exam schedule revised", "p2": "hostel rules"}
+
+
+@pytest.fixture
+def federated(server):
+    # Different distance spaces: only the re-scored similarities are comparable.
+    asyncio.run(server.chroma_create_collection("notices"))
+    asyncio.run(server.chroma_create_collection("policies", hnsw_space="cosine"))
+    asyncio.run(server.chroma_add_documents("notices", list(NOTICES.values()), list(NOTICES)))
+    asyncio.run(server.chroma_add_documents("policies", list(POLICIES.values()), list(POLICIES)))
+    return server
+
+
+def cosine(a, b):
+    a, b = hash_embed([a])[0], hash_embed([b])[0]
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def test_score_merge_ranks_all_collections_on_one_scale(federated):
+    result = asyncio.run(federated.chroma_federated_query(
+        ["notices", "policies", "missing"], "exam schedule", n_results=3, include=["documents"],
+    ))
+    texts = {**{("notices", k): v for k, v in NOTICES.items()}, **{("policies", k): v for k, v in POLICIES.items()}}
+    expected = sorted(texts, key=lambda key: cosine(texts[key], "exam schedule"), reverse=True)[:3]
+
+    assert [(hit["collection"], hit["id"]) for hit in result["results"]] == expected
+    for hit in result["results"]:
+        assert hit["document"] == texts[(hit["collection"], hit["id"])]
+        assert hit["score"] == pytest.approx(cosine(hit["document"], "exam schedule"), abs=1e-5)
+    assert result["collections"]["notices"]["hits"] == 3 and result["collections"]["policies"]["space"] == "cosine"
+    assert "error" in result["collections"]["missing"]
+    # Both collections use the default embedding function: the query is embedded once.
+    assert result["embedding_calls"] == 1
+
+
+def test_rrf_merge_interleaves_collections_by_rank(federated):
+    result = asyncio.run(federated.chroma_federated_query(
+        ["notices", "policies"], "exam schedule", n_results=4, merge="rrf", per_collection=2,
+    ))
+    hits = result["results"]
+    assert [hit["score"] for hit in hits] == [round(1 / 61, 6)] * 2 + [round(1 / 62, 6)] * 2
+
+    per_collection = {}
+    for hit in hits:
+        per_collection.setdefault(hit["collection"], []).append(hit["id"])
+    single = {
+        name: asyncio.run(federated.chroma_query_documents(name, ["exam schedule"], n_results=2))["ids"][0]
+        for name in ("notices", "policies")
+    }
+    assert per_collection == single
@@ -0,0 +1,79 @@
+"""Index rebuilds of hnsw_tuning and the server's write guard."""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+import hnsw_tuning
+from hnsw_tuning import ConcurrentWriteError, rebuild_collection
+from sharding import ShardRouter
+
+from conftest import hash_embed
+
+
+def test_sharded_rebuild_rebuilds_every_shard(server, client):
+    asyncio.run(server.chroma_create_sharded_collection("programmes", shard_key="programme"))
+    asyncio.run(server.chroma_add_documents(
+        "programmes", ["mba fees", "mca fees", "mba leave"], ["a", "b", "c"],
+        [{"programme": "MBA"}, {"programme": "MCA"}, {"programme": "MBA"}],
+    ))
+
+    stats = asyncio.run(server.chroma_rebuild_collection_index("programmes", hnsw_max_neighbors=24))
+    assert (stats["rebuilt"], stats["copied"], stats["shards"]) == (True, 3, 2)
+
+    router = ShardRouter(client, client.get_collection("programmes"))
+    assert router.count() == {"MBA": 2, "MCA": 1}
+    for shard in [router.anchor, *router.shards().values()]:
+        assert shard.configuration["hnsw"]["max_neighbors"] == 24
+    assert sorted(c.name for c in client.list_collections()) == ["programmes", "programmes__MBA", "programmes__MCA"]
+
+
+def test_sweep_of_a_sharded_collection_queries_its_shards(server, client):
+    asyncio.run(server.chroma_create_sharded_collection("programmes", shard_key="programme"))
+    # Random vectors, so the exact top-k has no ties.
+    vectors = np.random.default_rng(0).normal(size=(12, 8)).astype(np.float32)
+    ShardRouter(client, client.get_collection("programmes")).write(
+        [str(i) for i in range(12)], [f"notice {i}" for i in range(12)],
+        [{"programme": "MBA" if i % 2 else "MCA"} for i in range(12)], embeddings=vectors,
+    )
+
+    report = asyncio.run(server.chroma_hnsw_sweep(
+        "programmes", [{"max_neighbors": 16}, {"max_neighbors": 32}], sample_size=5, n_results=3,
+    ))
+    assert (report["collection_size"], report["queries"]) == (12, 5)
+    assert [row["recall_at_k"] for row in report["results"]] == [1.0, 1.0]
+    assert sorted(c.name for c in client.list_collections()) == ["programmes", "programmes__MBA", "programmes__MCA"]
+
+
+def test_rebuild_is_discarded_when_written_during_copy(server, client, monkeypatch):
+    collection = client.create_collection("rules", embedding_function=None)
+    texts = [f"rule {i}" for i in range(10)]
+    collection.add(ids=[str(i) for i in range(10)], embeddings=hash_embed(texts), documents=texts)
+    copy_rows = hnsw_tuning.copy_rows
+
+    def copy_then_write(source, target, batch_size):
+        copied = copy_rows(source, target, batch_size=batch_size)
+        # Another process adds a row after it was copied past.
+        client.get_collection("rules").add(ids=["late"], embeddings=hash_embed(["late rule"]))
+        return copied
+
+    monkeypatch.setattr(hnsw_tuning, "copy_rows", copy_then_write)
+    with pytest.raises(ConcurrentWriteError):
+        rebuild_collection(client, collection, {"max_neighbors": 24}, version=server._collection_version)
+
+    assert [c.name for c in client.list_collections()] == ["rules"]
+    kept = client.get_collection("rules")
+    assert kept.count() == 11
+    assert kept.configuration["hnsw"]["max_neighbors"] != 24
+
+
+def test_writes_and_rebuilds_exclude_each_other(server):
+    asyncio.run(server.chroma_create_collection("notices"))
+    with server._write_guard.exclusive("notices"):
+        with pytest.raises(Exception, match="being rebuilt"):
+            asyncio.run(server.chroma_add_documents("notices", ["exam schedule"], ["a"]))
+    with server._write_guard.write("notices"):
+        with pytest.raises(Exception, match="writes in progress"):
+            asyncio.run(server.chroma_rebuild_collection_index("notices", hnsw_max_neighbors=24))
+    asyncio.run(server.chroma_add_documents("notices", ["exam schedule"], ["a"]))
@@ -0,0 +1,117 @@
+"""Visibility of writes made by the ingest watcher and other processes."""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from conftest import hash_embed
+from ingest_watcher import IngestWatcher, JSONFolderTarget, PDFFolderTarget
+from mcp_shared.reload_signal import signal_path
+
+SHARED_DIR = Path(__file__).resolve().parents[2] / "shared"
+
+# Adds one row from a separate process, then signals running servers.
+WRITER = """
+import json, sys
+import chromadb
+from mcp_shared.reload_signal import notify_reload
+data_dir, row = sys.argv[1], json.loads(sys.argv[2])
+chromadb.PersistentClient(path=data_dir).get_collection("notices").add(**row)
+notify_reload(data_dir, source="test")
+"""
+
+
+def write_from_another_process(data_dir, **row):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(SHARED_DIR), os.environ.get("PYTHONPATH", "")]))
+    subprocess.run([sys.executable, "-c", WRITER, str(data_dir), json.dumps(row)], check=True, env=env)
+
+
+def test_server_queries_see_rows_of_a_signalling_process(server, tmp_path):
+    asyncio.run(server.chroma_create_collection("notices"))
+    asyncio.run(server.chroma_add_documents("notices", ["fee refund", "hostel rules"], ["a", "b"]))
+    query = {"query_texts": ["exam schedule"], "n_results": 1, "include": ["documents"]}
+    # Loads the collection's index into the server's client before the other process writes.
+    asyncio.run(server.chroma_query_documents("notices", **query))
+
+    write_from_another_process(tmp_path / "chroma_data", ids=["c"], documents=["exam schedule"],
+                               embeddings=[hash_embed(["exam schedule"])[0].tolist()])
+    assert asyncio.run(server.chroma_query_documents("notices", **query))["ids"] == [["c"]]
+    assert server._reload_signal.reloads == 1
+
+
+class FakeTarget:
+    name = "fake"
+    suffixes = (".txt",)
+
+    def __init__(self, root, visible_after):
+        self.root = root
+        self.visible_after = visible_after
+        self.signals = 0
+        self.checks = 0
+
+    def ingest(self, path):
+        return {"removed": 0, "added": 1, "probe": {"ids": [path.name], "embedding": [1.0]}}
+
+    def remove(self, path):
+        return 1
+
+    def signal_reload(self):
+        self.signals += 1
+
+    def visible(self, probe):
+        self.checks += 1
+        return self.checks >= self.visible_after
+
+
+def watch_one_file(tmp_path, target, **kwargs):
+    (tmp_path / "notice.txt").write_text("exam schedule")
+    watcher = IngestWatcher([target], str(tmp_path / "state.json"), debounce=0, **kwargs)
+    watcher.poll()
+    return watcher
+
+
+def test_lag_runs_until_a_query_returns_the_document(tmp_path):
+    target = FakeTarget(tmp_path, visible_after=3)
+    watcher = watch_one_file(tmp_path, target)
+
+    event = watcher.last_events[-1]
+    assert event["action"] == "ingested" and event["visible"] is True
+    assert "probe" not in event
+    assert target.signals == 1 and target.checks == 3
+    assert watcher.lags == [event["lag_seconds"]]
+
+
+def test_document_never_returned_is_reported_not_lagged(tmp_path):
+    target = FakeTarget(tmp_path, visible_after=10**6)
+    watcher = watch_one_file(tmp_path, target, visibility_timeout=0.1)
+
+    assert watcher.last_events[-1]["visible"] is False
+    assert watcher.status()["not_visible"] == 1
+    assert watcher.lags == []
+
+
+def test_json_target_signals_and_finds_its_rows(tmp_path):
+    target = JSONFolderTarget(str(tmp_path / "json"), str(tmp_path / "watch_chroma"))
+    target._collection().add(ids=["n_1"], documents=["exam schedule"], embeddings=hash_embed(["exam schedule"]))
+    target.signal_reload()
+
+    assert signal_path(tmp_path / "watch_chroma").exists()
+    embedding = hash_embed(["exam schedule"])[0].tolist()
+    assert target.visible({"ids": ["n_1"], "embedding": embedding})
+    assert not target.visible({"ids": ["n_2"], "embedding": embedding})
+
+
+def test_pdf_target_records_the_layout_it_writes(tmp_path):
+    empty = PDFFolderTarget(str(tmp_path / "pdfs"), str(tmp_path / "empty"), chunker="regulation")
+    empty._parsers(empty._collection())
+    assert empty._collection().metadata["chunker"] == "regulation"
+
+    # An index built before the chunker was recorded holds sentence-window chunks.
+    legacy = PDFFolderTarget(str(tmp_path / "pdfs"), str(tmp_path / "legacy"), chunker="small_to_big")
+    legacy._collection().add(ids=["n1"], documents=["exam schedule"], embeddings=hash_embed(["exam schedule"]))
+    parent_parser, _ = legacy._parsers(legacy._collection())
+    assert parent_parser is None
+    assert legacy._collection().metadata["chunker"] == "sentence"
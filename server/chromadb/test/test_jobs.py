@@ -0,0 +1,77 @@
+"""Cancelling background write jobs."""
+
+import asyncio
+import threading
+
+import pytest
+
+from jobs import Job, JobManager
+
+DOCUMENTS = [f"notice {i}" for i in range(10)]
+IDS = [f"n{i}" for i in range(10)]
+
+
+@pytest.fixture
+def paused(server, monkeypatch):
+    """Jobs of `server` stop after their first batch until `release` is set."""
+    first_batch, release = threading.Event(), threading.Event()
+    advance = Job.advance
+
+    def advance_and_wait(job, count):
+        advance(job, count)
+        first_batch.set()
+        release.wait(timeout=10)
+
+    monkeypatch.setattr(Job, "advance", advance_and_wait)
+    monkeypatch.setattr(server, "JOB_BATCH_SIZE", 2)
+    monkeypatch.setattr(server, "_jobs", JobManager(max_workers=1))
+    return server, first_batch, release
+
+
+async def finished(server, job_id):
+    while True:
+        job = await server.chroma_get_job(job_id)
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            return job
+        await asyncio.sleep(0.01)
+
+
+def test_running_job_stops_after_its_batch(paused, client):
+    server, first_batch, release = paused
+
+    async def main():
+        await server.chroma_upsert_documents("notices", DOCUMENTS, IDS, background=True)
+        job_id = server._jobs.list()[0].id
+        await asyncio.to_thread(first_batch.wait, 10)
+        message = await server.chroma_cancel_job(job_id)
+        release.set()
+        return message, await finished(server, job_id)
+
+    message, job = asyncio.run(main())
+    assert "stops after the current batch" in message
+    assert job["status"] == "cancelled" and job["done"] == 2
+    # The batch written before the cancel stays; nothing after it is written.
+    assert sorted(client.get_collection("notices").get()["ids"]) == ["n0", "n1"]
+    # The job released its write guard.
+    with server._write_guard.exclusive("notices"):
+        pass
+
+
+def test_queued_job_never_starts(paused, client):
+    server, first_batch, release = paused
+
+    async def main():
+        await server.chroma_upsert_documents("notices", DOCUMENTS[:2], IDS[:2], background=True)
+        await server.chroma_upsert_documents("later", DOCUMENTS, IDS, background=True)
+        running, queued = reversed(server._jobs.list())
+        await asyncio.to_thread(first_batch.wait, 10)
+        message = await server.chroma_cancel_job(queued.id)
+        release.set()
+        return message, await finished(server, running.id), await finished(server, queued.id)
+
+    message, running, queued = asyncio.run(main())
+    assert "before it started" in message
+    assert running["status"] == "succeeded"
+    assert queued["status"] == "cancelled" and queued["started_at"] is None
+    assert client.get_collection("later").count() == 0
+    assert server._jobs.stats()["total_cancelled"] == 1
@@ -0,0 +1,86 @@
+"""Filter semantics and freshness of the local exact engine."""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from local_engine import LocalVectorIndex, UnsupportedFilterError
+from query_cache import QueryResultCache
+
+VALUES = [True, False, 1, 0, 1.0, 2, 2.5, "1", "true", None]
+
+FILTERS = [
+    {"a": True},
+    {"a": 1},
+    {"a": {"$eq": 1.0}},
+    {"a": {"$eq": False}},
+    {"a": {"$eq": "1"}},
+    {"a": {"$ne": 1}},
+    {"a": {"$ne": True}},
+    {"a": {"$in": [1, 2]}},
+    {"a": {"$in": ["1", "true"]}},
+    {"a": {"$nin": [True]}},
+    {"a": {"$nin": [0, 2]}},
+    {"a": {"$gt": 0}},
+    {"a": {"$gte": 1}},
+    {"a": {"$lt": 1}},
+    {"a": {"$lte": 2}},
+]
+
+
+@pytest.fixture
+def mixed(client):
+    """A collection whose `a` values mix bools, ints, floats and strings, with one row lacking `a`."""
+    collection = client.create_collection("mixed", embedding_function=None)
+    ids = [str(n) for n in range(len(VALUES))]
+    metadatas = [{"a": value, "row": n} if value is not None else {"row": n} for n, value in enumerate(VALUES)]
+    collection.add(ids=ids, embeddings=np.eye(len(VALUES), dtype=np.float32), metadatas=metadatas)
+    return collection
+
+
+@pytest.mark.parametrize("where", FILTERS, ids=str)
+def test_masks_match_chroma(mixed, where):
+    index = LocalVectorIndex.from_collection(mixed)
+    local = {index.ids[row] for row in np.flatnonzero(index.mask_for(where))}
+    assert local == set(mixed.get(where=where, include=[])["ids"])
+
+
+def test_mixed_kind_lists_fall_back_to_chroma(mixed):
+    index = LocalVectorIndex.from_collection(mixed)
+    for where in ({"a": {"$in": [1, "1"]}}, {"a": {"$nin": [0, 2.5]}}):
+        with pytest.raises(UnsupportedFilterError):
+            index.mask_for(where)
+        with pytest.raises(ValueError):
+            mixed.get(where=where)
+
+
+def test_index_is_rebuilt_after_write_by_another_process(server, client, monkeypatch):
+    monkeypatch.setattr(server, "_local_engine_mode", "always")
+    monkeypatch.setattr(server, "_query_cache", QueryResultCache(max_entries=0))
+    asyncio.run(server.chroma_create_collection("notices", embedding_function_name="default"))
+    asyncio.run(server.chroma_add_documents("notices", ["exam schedule", "fee refund"], ["a", "b"]))
+    query = {"query_texts": ["hostel allotment"], "n_results": 5, "include": ["documents"]}
+    first = asyncio.run(server.chroma_query_documents("notices", **query))
+    assert sorted(first["ids"][0]) == ["a", "b"]
+
+    # Written behind the server's back, as an ingest script sharing the data dir would.
+    client.get_collection("notices").add(ids=["c"], documents=["hostel allotment"])
+
+    second = asyncio.run(server.chroma_query_documents("notices", **query))
+    assert second["ids"][0][0] == "c"
+    assert server._local_indexes["notices"].data_version == server._collection_version(client.get_collection("notices"))
+
+
+def test_cosine_results_return_the_stored_vectors(client):
+    collection = client.create_collection("scaled", embedding_function=None, configuration={"hnsw": {"space": "cosine"}})
+    vectors = np.random.default_rng(0).normal(size=(20, 8)).astype(np.float32) * 5
+    collection.add(ids=[str(n) for n in range(20)], embeddings=vectors)
+    index = LocalVectorIndex.from_collection(collection)
+
+    include = ["embeddings", "distances"]
+    local = index.query(vectors[:3] * 2, n_results=4, include=include)
+    chroma = collection.query(query_embeddings=vectors[:3] * 2, n_results=4, include=include)
+    assert local["ids"] == chroma["ids"]
+    np.testing.assert_allclose(local["distances"], chroma["distances"], atol=1e-5)
+    np.testing.assert_allclose(local["embeddings"], np.asarray(chroma["embeddings"]), rtol=1e-6)
@@ -0,0 +1,77 @@
+"""Cursor pagination and streaming of chroma_get_documents."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+
+def _seed(server, count=30):
+    ids = [f"doc{i:02d}" for i in range(count)]
+    asyncio.run(server.chroma_add_documents("paged", [f"text {i}" for i in range(count)], ids))
+    return ids
+
+
+def _page(server, **kwargs):
+    return asyncio.run(server.chroma_get_documents("paged", page_size=10, include=[], **kwargs))
+
+
+def test_cursor_walks_all_rows(server):
+    ids = _seed(server)
+    seen, cursor = [], None
+    while True:
+        page = _page(server, cursor=cursor)
+        seen += page["ids"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ids
+
+
+def test_cursor_survives_deletion_of_earlier_rows(server, client):
+    ids = _seed(server)
+    first = _page(server)
+    client.get_collection("paged").delete(ids=first["ids"][:5])
+    second = _page(server, cursor=first["next_cursor"])
+    assert second["ids"] == ids[10:20]
+
+
+def test_cursor_expires_when_its_anchor_is_deleted(server, client):
+    _seed(server)
+    first = _page(server)
+    client.get_collection("paged").delete(ids=[first["ids"][-1]])
+    with pytest.raises(Exception, match="Cursor expired"):
+        _page(server, cursor=first["next_cursor"])
+
+
+def test_cursor_rejected_for_other_filters(server):
+    _seed(server)
+    first = _page(server)
+    with pytest.raises(Exception, match="different ids/where"):
+        _page(server, cursor=first["next_cursor"], where={"n": 1})
+
+
+class _Context:
+    def __init__(self, meta):
+        self.request_context = SimpleNamespace(meta=meta)
+        self.messages = []
+
+    async def report_progress(self, progress, total=None, message=None):
+        self.messages.append(json.loads(message))
+
+
+def test_stream_sends_every_page_as_progress(server):
+    ids = _seed(server, 25)
+    ctx = _Context({"progressToken": "t1"})
+    summary = asyncio.run(server.chroma_get_documents("paged", include=[], page_size=10, stream=True, ctx=ctx))
+    assert summary["streamed"] == 25 and summary["pages"] == 3
+    assert [i for message in ctx.messages for i in message["result"]["ids"]] == ids
+
+
+@pytest.mark.parametrize("ctx", [None, _Context(None), _Context({})])
+def test_stream_without_progress_token_returns_a_page(server, ctx):
+    ids = _seed(server, 25)
+    page = asyncio.run(server.chroma_get_documents("paged", include=[], page_size=10, stream=True, ctx=ctx))
+    assert page["ids"] == ids[:10]
+    assert page["next_cursor"] and page["stream_unavailable"]
@@ -0,0 +1,54 @@
+"""Recall of the compressed vector tier against exact search."""
+
+import numpy as np
+import pytest
+
+from local_engine import LocalVectorIndex
+from quantization import QuantizedVectorIndex
+
+ROWS, DIMENSION = 2000, 32
+
+
+@pytest.fixture(scope="module")
+def rows():
+    """Clustered unit vectors, like embeddings of chunks on a handful of topics."""
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(20, DIMENSION))
+    vectors = centres[rng.integers(0, 20, ROWS)] + 0.4 * rng.normal(size=(ROWS, DIMENSION))
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+    ids = [str(n) for n in range(ROWS)]
+    metadatas = [{"programme": "MBA" if n % 3 else "MCA"} for n in range(ROWS)]
+    queries = vectors[rng.choice(ROWS, 25, replace=False)] + 0.1 * rng.normal(size=(25, DIMENSION)).astype(np.float32)
+    return ids, vectors, metadatas, queries
+
+
+@pytest.mark.parametrize("quantization, min_recall", [("int8", 0.98), ("pq", 0.8)])
+def test_rescored_recall_against_exact_search(rows, tmp_path, quantization, min_recall):
+    ids, vectors, metadatas, queries = rows
+    where = {"programme": "MCA"}
+    exact = LocalVectorIndex(ids, vectors, [None] * ROWS, metadatas, space="cosine")
+    compressed = QuantizedVectorIndex(ids, vectors, [None] * ROWS, metadatas, space="cosine",
+                                      cache_path=str(tmp_path / "vectors.npy"), quantization=quantization)
+
+    truth = exact.query(queries, n_results=10, where=where, include=["distances"])
+    found = compressed.query(queries, n_results=10, where=where, include=["distances", "metadatas"])
+    recall = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(truth["ids"], found["ids"])])
+    assert recall >= min_recall
+    assert all(m == where for hits in found["metadatas"] for m in hits)
+
+    # Returned distances are exact, whichever rows made the shortlist.
+    for qi, (hits, distances) in enumerate(zip(found["ids"], found["distances"])):
+        exact_distance = dict(zip(truth["ids"][qi], truth["distances"][qi]))
+        for doc_id, distance in zip(hits, distances):
+            if doc_id in exact_distance:
+                assert distance == pytest.approx(exact_distance[doc_id], abs=1e-5)
+    assert compressed.memory()["compression"] > 1
+
+
+@pytest.mark.parametrize("quantization", ["int8", "pq"])
+def test_empty_index(quantization):
+    index = QuantizedVectorIndex([], np.zeros((0, 0), dtype=np.float32), [], [], space="cosine",
+                                 quantization=quantization)
+    result = index.query(np.ones((2, 8), dtype=np.float32), n_results=5, include=["distances"])
+    assert result["ids"] == [[], []] and result["distances"] == [[], []]
+    assert index.memory()["rows"] == 0
@@ -0,0 +1,45 @@
+"""Invalidation of the server's query result cache."""
+
+import asyncio
+
+import pytest
+
+QUERY = {"query_texts": ["exam schedule"], "n_results": 3, "include": ["documents"]}
+
+
+@pytest.fixture
+def notices(server):
+    asyncio.run(server.chroma_create_collection("notices"))
+    asyncio.run(server.chroma_add_documents("notices", ["exam schedule", "fee refund"], ["a", "b"]))
+    return server
+
+
+def test_repeated_query_is_served_from_cache(notices):
+    first = asyncio.run(notices.chroma_query_documents("notices", **QUERY))
+    assert asyncio.run(notices.chroma_query_documents("notices", **QUERY)) == first
+    assert notices._query_cache.stats()["hits"] == 1
+
+
+def test_write_through_server_invalidates(notices):
+    asyncio.run(notices.chroma_query_documents("notices", **QUERY))
+    asyncio.run(notices.chroma_add_documents("notices", ["exam schedule revised"], ["c"]))
+    result = asyncio.run(notices.chroma_query_documents("notices", **QUERY))
+    assert "c" in result["ids"][0]
+    assert notices._query_cache.stats()["hits"] == 0
+
+
+def test_write_by_another_process_invalidates(notices, client):
+    asyncio.run(notices.chroma_query_documents("notices", **QUERY))
+    get = asyncio.run(notices.chroma_get_documents("notices", where={"kind": "exam"}))
+    assert get["ids"] == []
+
+    # Bypasses the server, as an ingest script sharing the data dir would.
+    collection = client.get_collection("notices")
+    collection.add(ids=["c"], documents=["exam schedule revised"], metadatas=[{"kind": "exam"}])
+    assert "c" in asyncio.run(notices.chroma_query_documents("notices", **QUERY))["ids"][0]
+    assert asyncio.run(notices.chroma_get_documents("notices", where={"kind": "exam"}))["ids"] == ["c"]
+
+    # Updates and deletes don't change the row count but still invalidate.
+    collection.update(ids=["c"], metadatas=[{"kind": "fees"}])
+    assert asyncio.run(notices.chroma_get_documents("notices", where={"kind": "exam"}))["ids"] == []
+    assert notices._query_cache.stats()["hits"] == 0
@@ -0,0 +1,163 @@
+"""Shard routing of the document tools for sharded collections."""
+
+import asyncio
+
+import pytest
+
+from sharding import ShardRouter
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def programmes(server):
+    run(server.chroma_create_sharded_collection("programmes", shard_key="programme"))
+    run(server.chroma_add_documents(
+        "programmes",
+        ["mba fees", "mca fees", "mba leave", "hostel rules"],
+        ["a", "b", "c", "d"],
+        [{"programme": "MBA", "year": 1}, {"programme": "MCA", "year": 1}, {"programme": "MBA", "year": 2}, {"year": 2}],
+    ))
+    return server
+
+
+def shard_ids(client):
+    router = ShardRouter(client, client.get_collection("programmes"))
+    return {value: sorted(shard.get(include=[])["ids"]) for value, shard in router.shards().items()}
+
+
+def test_get_and_count_fan_out(programmes):
+    got = run(programmes.chroma_get_documents("programmes", ids=["a", "b", "d"]))
+    assert sorted(got["ids"]) == ["a", "b", "d"]
+    assert run(programmes.chroma_get_documents("programmes", where={"year": 2}))["ids"] == ["c", "d"]
+    assert run(programmes.chroma_get_collection_count("programmes")) == 4
+    assert run(programmes.chroma_count_documents_with_filter("programmes", where={"year": 1})) == 2
+    assert run(programmes.chroma_get_collection_info("programmes"))["count"] == 4
+
+
+def test_limit_offset_and_cursor_span_shards(programmes):
+    everything = run(programmes.chroma_get_documents("programmes"))["ids"]
+    assert sorted(everything) == ["a", "b", "c", "d"]
+    assert run(programmes.chroma_get_documents("programmes", limit=2, offset=1))["ids"] == everything[1:3]
+
+    walked, cursor = [], None
+    while True:
+        page = run(programmes.chroma_get_documents("programmes", page_size=3, cursor=cursor))
+        walked += page["ids"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert walked == everything
+
+
+def test_update_in_place_and_across_shards(programmes, client):
+    run(programmes.chroma_update_documents("programmes", ["a"], documents=["mba fee waiver"]))
+    assert run(programmes.chroma_get_documents("programmes", ids=["a"]))["documents"] == ["mba fee waiver"]
+
+    # Changing the shard key value moves the row, merging its metadata like Chroma does.
+    run(programmes.chroma_update_documents("programmes", ["c", "missing"], metadatas=[{"programme": "MCA"}, {"x": 1}]))
+    assert shard_ids(client) == {"MBA": ["a"], "MCA": ["b", "c"], "_unsharded": ["d"]}
+    moved = run(programmes.chroma_get_documents("programmes", ids=["c"]))
+    assert moved["documents"] == ["mba leave"]
+    assert moved["metadatas"] == [{"programme": "MCA", "year": 2}]
+    hits = run(programmes.chroma_query_documents("programmes", ["mba leave"], n_results=1))
+    assert hits["ids"] == [["c"]]
+
+
+def test_upsert_moves_row_and_add_rejects_ids_of_other_shards(programmes, client):
+    run(programmes.chroma_upsert_documents("programmes", ["mca fees revised"], ["a"], [{"programme": "MCA"}]))
+    assert shard_ids(client) == {"MBA": ["c"], "MCA": ["a", "b"], "_unsharded": ["d"]}
+
+    with pytest.raises(Exception, match="already exist"):
+        run(programmes.chroma_add_documents("programmes", ["again"], ["d"], [{"programme": "MBA"}]))
+    assert run(programmes.chroma_get_collection_count("programmes")) == 4
+
+
+def test_deletes_and_reset_fan_out(programmes, client):
+    run(programmes.chroma_delete_documents("programmes", ["a", "b"]))
+    assert shard_ids(client) == {"MBA": ["c"], "MCA": [], "_unsharded": ["d"]}
+
+    run(programmes.chroma_delete_documents_by_filter("programmes", where={"year": 2}))
+    assert run(programmes.chroma_get_collection_count("programmes")) == 0
+
+    run(programmes.chroma_add_documents("programmes", ["mba fees"], ["e"], [{"programme": "MBA"}]))
+    assert "removed 1 documents" in run(programmes.chroma_reset_collection("programmes"))
+    assert run(programmes.chroma_get_collection_count("programmes")) == 0
+
+
+def test_background_delete_by_filter_fans_out(programmes):
+    async def delete_in_background():
+        message = await programmes.chroma_delete_documents_by_filter("programmes", where={"year": 1}, background=True)
+        job_id = message.split("'")[1]
+        while not programmes._jobs.get(job_id).finished:
+            await asyncio.sleep(0.01)
+        return programmes._jobs.get(job_id)
+
+    job = run(delete_in_background())
+    assert (job.status, job.done) == ("succeeded", 2)
+    assert sorted(run(programmes.chroma_get_documents("programmes"))["ids"]) == ["c", "d"]
+
+
+def test_rename_keeps_shards_attached(programmes):
+    run(programmes.chroma_modify_collection("programmes", new_name="courses"))
+    assert run(programmes.chroma_get_collection_count("courses")) == 4
+
+
+def test_rename_resumes_after_a_crash_part_way(programmes, client, monkeypatch):
+    router = ShardRouter(client, client.get_collection("programmes"))
+    renamed = []
+    real_modify = type(router.anchor).modify
+
+    def crash_after_one_shard(self, **kwargs):
+        if renamed:
+            raise RuntimeError("killed")
+        real_modify(self, **kwargs)
+        renamed.append(self.name)
+
+    monkeypatch.setattr(type(router.anchor), "modify", crash_after_one_shard)
+    with pytest.raises(RuntimeError):
+        router.rename("courses")
+    monkeypatch.undo()
+
+    # The anchor keeps its name until every shard has moved; renaming again finishes the job.
+    ShardRouter(client, client.get_collection("programmes")).rename("courses")
+    assert "programmes" not in {c.name for c in client.list_collections()}
+    assert ShardRouter(client, client.get_collection("courses")).count() == {"MBA": 2, "MCA": 1, "_unsharded": 1}
+
+
+def test_pages_read_only_the_shards_they_overlap(server, client, monkeypatch):
+    run(server.chroma_create_sharded_collection("programmes", shard_key="programme"))
+    names = ["BBA", "MBA", "MCA"]
+    run(server.chroma_add_documents(
+        "programmes",
+        [f"notice {i}" for i in range(15)],
+        [f"n{i:02}" for i in range(15)],
+        [{"programme": names[i % 3], "year": i % 2} for i in range(15)],
+    ))
+    router = ShardRouter(client, client.get_collection("programmes"))
+    everything = router.get()["ids"]
+    odd_years = router.get(where={"year": 1})["ids"]
+
+    reads = []
+    get = type(client.get_collection("programmes")).get
+
+    def recording_get(collection, *args, **kwargs):
+        if kwargs.get("include"):
+            reads.append((collection.name, kwargs.get("limit")))
+        return get(collection, *args, **kwargs)
+
+    monkeypatch.setattr(type(client.get_collection("programmes")), "get", recording_get)
+    for offset in range(0, 16):
+        for limit in (1, 3, 6):
+            assert router.get(limit=limit, offset=offset)["ids"] == everything[offset:offset + limit]
+            assert router.get(where={"year": 1}, limit=limit, offset=offset)["ids"] == odd_years[offset:offset + limit]
+
+    # Rows of the page come from the shards it spans, never more rows than the page holds.
+    reads.clear()
+    assert router.get(limit=3, offset=6)["ids"] == everything[6:9]
+    assert reads == [("programmes__MBA", 3)]
+    reads.clear()
+    router.get(limit=3, offset=4)
+    assert sorted(reads) == [("programmes__BBA", 1), ("programmes__MBA", 2)]
@@ -0,0 +1,87 @@
+"""Group commit of small writes: duplicate IDs and sharded collections."""
+
+import asyncio
+
+import pytest
+
+from sharding import ShardRouter
+from write_buffer import WriteCoalescer
+
+
+@pytest.fixture
+def coalescing(server, monkeypatch):
+    monkeypatch.setattr(server, "_write_buffer", WriteCoalescer(
+        window=0.05, max_docs=256, embed=server._embed_texts, write=server._write_rows,
+        existing=server._existing_ids, on_commit=server._mark_collection_changed,
+    ))
+    return server
+
+
+def together(*calls):
+    """Run tool calls concurrently, so they land in one group; returns results or exceptions."""
+    async def main():
+        return await asyncio.gather(*calls, return_exceptions=True)
+    return asyncio.run(main())
+
+
+def rows(server, collection_name):
+    got = asyncio.run(server.chroma_get_documents(collection_name, include=["documents"]))
+    return dict(zip(got["ids"], got["documents"]))
+
+
+def test_first_add_of_an_id_wins(coalescing):
+    asyncio.run(coalescing.chroma_create_collection("notices"))
+    asyncio.run(coalescing.chroma_add_documents("notices", ["fee refund"], ["a"]))
+
+    first, second, existing = together(
+        coalescing.chroma_add_documents("notices", ["exam schedule"], ["b"]),
+        coalescing.chroma_add_documents("notices", ["exam schedule revised", "hostel rules"], ["b", "c"]),
+        coalescing.chroma_add_documents("notices", ["fee refund again"], ["a"]),
+    )
+    assert isinstance(first, str)
+    assert isinstance(second, Exception) and "['b']" in str(second)
+    assert isinstance(existing, Exception) and "['a']" in str(existing)
+    assert rows(coalescing, "notices") == {"a": "fee refund", "b": "exam schedule"}
+    assert coalescing._write_buffer.stats()["groups"] == 2
+
+
+def test_last_upsert_of_an_id_wins(coalescing):
+    asyncio.run(coalescing.chroma_create_collection("notices"))
+    results = together(
+        coalescing.chroma_upsert_documents("notices", ["v1", "other"], ["a", "b"]),
+        coalescing.chroma_upsert_documents("notices", ["v2"], ["a"]),
+        coalescing.chroma_upsert_documents("notices", ["v3"], ["a"]),
+    )
+    assert all(isinstance(result, str) for result in results)
+    assert rows(coalescing, "notices") == {"a": "v3", "b": "other"}
+    assert coalescing._write_buffer.stats()["fallbacks"] == 0
+
+
+def test_call_repeating_an_id_fails_alone(coalescing):
+    asyncio.run(coalescing.chroma_create_collection("notices"))
+    repeated, fine = together(
+        coalescing.chroma_add_documents("notices", ["x", "y"], ["a", "a"]),
+        coalescing.chroma_add_documents("notices", ["z"], ["b"]),
+    )
+    assert isinstance(repeated, Exception) and "Expected IDs to be unique" in str(repeated)
+    assert isinstance(fine, str)
+    assert rows(coalescing, "notices") == {"b": "z"}
+
+
+def test_sharded_writes_check_and_route_through_shards(coalescing, client):
+    asyncio.run(coalescing.chroma_create_sharded_collection("programmes", shard_key="programme"))
+    asyncio.run(coalescing.chroma_add_documents("programmes", ["mba fees"], ["a"], [{"programme": "MBA"}]))
+
+    duplicate, moved = together(
+        coalescing.chroma_add_documents("programmes", ["mca fees"], ["a"], [{"programme": "MCA"}]),
+        coalescing.chroma_upsert_documents("programmes", ["mca leave"], ["b"], [{"programme": "MCA"}]),
+    )
+    assert isinstance(duplicate, Exception) and "already exist" in str(duplicate)
+    assert isinstance(moved, str)
+
+    # An upsert that changes the shard key leaves no copy in the old shard.
+    asyncio.run(coalescing.chroma_upsert_documents("programmes", ["mca fees"], ["a"], [{"programme": "MCA"}]))
+    router = ShardRouter(client, client.get_collection("programmes"))
+    shards = {value: sorted(shard.get(include=[])["ids"]) for value, shard in router.shards().items()}
+    assert shards == {"MBA": [], "MCA": ["a", "b"]}
+    assert client.get_collection("programmes").count() == 0
@@ -1,8 +1,12 @@
+import os
+import argparse
 import chromadb
 from pathlib import Path
 
+from perf_doctor import host_info, measure_collections, diagnose, write_report
+
 # Your ChromaDB path
-CHROMA_PATH = r"C:\Users\vikym\Documents\GitHub\llmAgent\chromaDB_MCP\chroma_data"
+CHROMA_PATH = os.getenv("CHROMA_DATA_DIR", r"C:\Users\vikym\Documents\GitHub\llmAgent\chromaDB_MCP\chroma_data")
 
 def test_connection():
     """Test ChromaDB connection and list collections."""
@@ -40,5 +44,37 @@ def test_connection():
         traceback.print_exc()
         return False
 
+
+def measure_latency(report_path: str | None = None, repeats: int = 20):
+    """Cold vs. warm query latency and HNSW index size of each collection."""
+    print("⏱️  Query latency (stored embeddings as queries):\n")
+    report = {"host": host_info(), "collections": measure_collections(Path(CHROMA_PATH), repeats=repeats)}
+    report["warnings"] = diagnose(report)
+    
+    for c in report["collections"]:
+        if "error" in c:
+            print(f"  ✗ {c['name']}: {c['error']}")
+        elif "cold_ms" in c:
+            size = f"{c['hnsw_bytes'] / 1024 ** 2:.1f} MB" if c.get("hnsw_bytes") else "-"
+            print(f"  {c['name']}: cold {c['cold_ms']} ms, warm p50 {c['warm_p50_ms']} ms, "
+                  f"p95 {c['warm_p95_ms']} ms, HNSW {size}")
+        else:
+            print(f"  {c['name']}: empty")
+    for w in report["warnings"]:
+        print(f"  ⚠️  [{w['area']}] {w['message']}")
+    
+    if report_path:
+        write_report(report, report_path)
+    return report
+
+
 if __name__ == "__main__":
-    test_connection()
+    parser = argparse.ArgumentParser(description="Test the ChromaDB connection and query latency")
+    parser.add_argument("--data-dir", default=CHROMA_PATH, help="Persistent ChromaDB directory")
+    parser.add_argument("--repeats", type=int, default=20, help="Warm queries per collection (default: 20)")
+    parser.add_argument("--report", default=None, help="Write the latency report as JSON to this file")
+    args = parser.parse_args()
+    CHROMA_PATH = args.data_dir
+    
+    if test_connection():
+        measure_latency(args.report, args.repeats)
@@ -0,0 +1,215 @@
+"""
+Group commit for small chroma_add_documents / chroma_upsert_documents calls.
+
+Agents tend to write one or two documents per call, and every call then
+pays its own embedding invocation and its own Chroma write (one SQLite
+transaction). WriteCoalescer holds such calls for up to `window` seconds
+per (collection, operation) and writes them together: one embedding call
+for all their documents and one add/upsert. A group is written early once
+it reaches `max_docs` documents.
+
+Each call still gets its own outcome, resolved as if the calls had run
+one after another:
+
+- a call repeating an ID within itself fails with Chroma's own
+  duplicate-ID error, before it joins a group;
+- adds are checked per call for IDs that already exist (looked up through
+  the `existing` callback, which routes to the shards of a sharded
+  collection), or that an earlier call in the same group claimed, and
+  fail with the same message as an uncoalesced add: the first add wins;
+- if the combined write fails (e.g. one call has invalid metadata), every
+  call of the group is retried on its own with its slice of the already
+  computed embeddings, so only the offending calls fail;
+- when several calls of a group upsert the same ID, only the last call's
+  row is written (last one wins), like separate calls would.
+
+A call returns only after its group is committed, so the caller reads its
+own writes on the next call. Groups of one collection are written one at a
+time, in order.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from chromadb.api.types import validate_ids
+
+OPERATIONS = ("add", "upsert")
+
+
+@dataclass
+class _Write:
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict] | None
+    future: asyncio.Future
+
+
+@dataclass
+class _Group:
+    collection: Any
+    writes: List[_Write] = field(default_factory=list)
+    docs: int = 0
+    timer: asyncio.TimerHandle | None = None
+
+
+class WriteCoalescer:
+    """Per-collection write buffer that turns concurrent small writes into one batch."""
+
+    def __init__(
+        self,
+        window: float,
+        max_docs: int,
+        embed: Callable[[Any, List[str]], Any],
+        write: Callable[..., None],
+        existing: Callable[[Any, List[str]], Iterable[str]],
+        on_commit: Callable[[str], None],
+    ):
+        """
+        Args:
+            window: Seconds the first write of a group waits for others
+            max_docs: Documents at which a group is written without waiting
+            embed: embed(collection, texts) -> embeddings
+            write: write(collection, op, ids, documents, metadatas, embeddings)
+            existing: existing(collection, unique_ids) -> the IDs among them already stored
+            on_commit: Called with the collection name after a group was written
+        """
+        if window <= 0 or max_docs < 1:
+            raise ValueError("window must be positive and max_docs >= 1.")
+        self.window = window
+        self.max_docs = max_docs
+        self.embed = embed
+        self.write_fn = write
+        self.existing_fn = existing
+        self.on_commit = on_commit
+        self._pending: Dict[Tuple[str, str, str], _Group] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._flushes: set = set()
+        self.counters = {"calls": 0, "documents": 0, "groups": 0, "embedding_calls": 0,
+                         "fallbacks": 0, "failed_calls": 0}
+        self.max_group_calls = 0
+
+    async def write(self, collection, op: str, ids: List[str], documents: List[str],
+                    metadatas: List[Dict] | None = None) -> None:
+        """Queue one call's write and wait until its group is committed; raises the call's own error."""
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown write operation: {op}. Valid options: {list(OPERATIONS)}")
+        # The error an uncoalesced write of this call would get from Chroma.
+        validate_ids(list(ids))
+        loop = asyncio.get_running_loop()
+        key = (collection.name, str(collection.id), op)
+        group = self._pending.get(key)
+        if group is None:
+            group = self._pending[key] = _Group(collection)
+            group.timer = loop.call_later(self.window, self._flush_soon, key)
+        write = _Write(ids, documents, metadatas, loop.create_future())
+        group.writes.append(write)
+        group.docs += len(ids)
+        self.counters["calls"] += 1
+        self.counters["documents"] += len(ids)
+        if group.docs >= self.max_docs:
+            group.timer.cancel()
+            self._flush_soon(key)
+        # A caller cancelled by its deadline must not cancel the group's shared write.
+        await asyncio.shield(write.future)
+
+    def _flush_soon(self, key: Tuple[str, str, str]) -> None:
+        group = self._pending.pop(key, None)
+        if group is None:
+            return
+        task = asyncio.get_running_loop().create_task(self._flush(key, group))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, key: Tuple[str, str, str], group: _Group) -> None:
+        lock = self._locks.setdefault(key[:2], asyncio.Lock())
+        async with lock:
+            try:
+                outcomes = await asyncio.to_thread(self._commit, group.collection, key[2], group.writes)
+            except Exception as e:
+                outcomes = [e] * len(group.writes)
+        self.counters["groups"] += 1
+        self.max_group_calls = max(self.max_group_calls, len(group.writes))
+        for write, outcome in zip(group.writes, outcomes):
+            if write.future.done():
+                continue
+            if outcome is None:
+                write.future.set_result(None)
+            else:
+                self.counters["failed_calls"] += 1
+                write.future.set_exception(outcome)
+
+    def _commit(self, collection, op: str, writes: List[_Write]) -> List[Exception | None]:
+        """Embed and write a group in one go; returns each call's error or None."""
+        outcomes: List[Exception | None] = [None] * len(writes)
+        if op == "add":
+            # Unique: Chroma rejects a lookup that repeats an ID.
+            requested = list(dict.fromkeys(doc_id for write in writes for doc_id in write.ids))
+            existing = set(self.existing_fn(collection, requested))
+            claimed = set()
+            for n, write in enumerate(writes):
+                taken = [doc_id for doc_id in write.ids if doc_id in existing or doc_id in claimed]
+                if taken:
+                    outcomes[n] = ValueError(
+                        f"The following IDs already exist in collection '{collection.name}': {taken}. "
+                        f"Use 'chroma_update_documents' to update existing documents."
+                    )
+                else:
+                    claimed.update(write.ids)
+
+        live = [n for n, outcome in enumerate(outcomes) if outcome is None]
+        if not live:
+            return outcomes
+        texts = [doc for n in live for doc in writes[n].documents]
+        self.counters["embedding_calls"] += 1
+        try:
+            embeddings = list(self.embed(collection, texts))
+        except Exception as e:
+            return [outcome or e for outcome in outcomes]
+
+        slices = {}
+        start = 0
+        for n in live:
+            slices[n] = embeddings[start:start + len(writes[n].ids)]
+            start += len(writes[n].ids)
+
+        try:
+            self._write_calls(collection, op, [(writes[n], slices[n]) for n in live])
+        except Exception:
+            # Find out which calls were at fault by writing each on its own.
+            self.counters["fallbacks"] += 1
+            for n in live:
+                try:
+                    self._write_calls(collection, op, [(writes[n], slices[n])])
+                except Exception as e:
+                    outcomes[n] = e
+        if any(outcome is None for outcome in outcomes):
+            self.on_commit(collection.name)
+        return outcomes
+
+    def _write_calls(self, collection, op: str, calls: List[Tuple[_Write, List]]) -> None:
+        rows: Dict[str, Tuple] = {}
+        for write, vectors in calls:
+            for row in zip(write.ids, write.documents, write.metadatas or [None] * len(write.ids), vectors):
+                # A later call's upsert of the same ID replaces the earlier one.
+                rows.pop(row[0], None)
+                rows[row[0]] = row
+        ids = list(rows)
+        documents = [row[1] for row in rows.values()]
+        metadatas = [row[2] for row in rows.values()]
+        embeddings = [row[3] for row in rows.values()]
+        self.write_fn(
+            collection, op, ids=ids, documents=documents,
+            metadatas=metadatas if any(m is not None for m in metadatas) else None, embeddings=embeddings,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        groups = self.counters["groups"]
+        return {
+            "window_ms": round(self.window * 1000, 3),
+            "max_docs": self.max_docs,
+            "pending_groups": len(self._pending),
+            **self.counters,
+            "mean_calls_per_group": round(self.counters["calls"] / groups, 2) if groups else None,
+            "max_calls_per_group": self.max_group_calls,
+        }
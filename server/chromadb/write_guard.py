@@ -0,0 +1,62 @@
+"""
+Keeps the server's own writes away from collections that are being rebuilt.
+
+chroma_rebuild_collection_index copies every row into a new collection and
+swaps it in under the old name; a write that lands on the old collection
+after its rows were copied would be lost with it. Every write tool (and
+background write job) holds `guard.write(name)` while it writes, and the
+rebuild holds `guard.exclusive(name)`: a rebuild is refused while writes
+are in progress, and writes are refused while a rebuild runs.
+
+Both sides fail fast instead of waiting, since a rebuild can take far
+longer than a tool call's deadline. Writes by other processes are not
+covered here; rebuild_collection detects those from the data version.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Set
+
+
+class CollectionWriteGuard:
+    """Per-collection shared (write) / exclusive (rebuild) access, safe across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._writes: Dict[str, int] = {}
+        self._exclusive: Set[str] = set()
+
+    @contextmanager
+    def write(self, collection_name: str) -> Iterator[None]:
+        """Hold for the duration of a write; raises RuntimeError while the collection is being rebuilt."""
+        with self._lock:
+            if collection_name in self._exclusive:
+                raise RuntimeError(
+                    f"Collection '{collection_name}' is being rebuilt; retry the write once the rebuild has finished."
+                )
+            self._writes[collection_name] = self._writes.get(collection_name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._writes[collection_name] -= 1
+                if not self._writes[collection_name]:
+                    del self._writes[collection_name]
+
+    @contextmanager
+    def exclusive(self, collection_name: str) -> Iterator[None]:
+        """Hold while rebuilding; raises RuntimeError if writes are in progress or another rebuild runs."""
+        with self._lock:
+            if collection_name in self._exclusive:
+                raise RuntimeError(f"Collection '{collection_name}' is already being rebuilt.")
+            writes = self._writes.get(collection_name, 0)
+            if writes:
+                raise RuntimeError(
+                    f"Collection '{collection_name}' has {writes} writes in progress; retry once they have finished."
+                )
+            self._exclusive.add(collection_name)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._exclusive.discard(collection_name)
@@ -1,12 +1,22 @@
 
-from fastmcp import FastMCP
-from server.rag import query_rag
+import os
+import json
+import argparse
+
+from fastmcp import FastMCP, Context
+from server.rag import query_rag, stream_rag, coalescing_stats, embedding_batch_stats, fact_index_stats
+from server.workers import serve_prefork, default_workers
+
+from mcp_shared.admission import AdmissionControl, ToolLimit, parse_tool_limits
+from mcp_shared.profiling import LiveProfiler
 
 
 mcp = FastMCP("regulations-rag")
+_admission: AdmissionControl | None = None
+_profiler: LiveProfiler | None = None
 
 @mcp.tool()
-async def search_regulations(query: str) -> str:
+async def search_regulations(query: str, stream: bool = False, ctx: Context | None = None) -> str:
     """
     This tool returns the FINAL answer.
 
@@ -15,8 +25,99 @@ async def search_regulations(query: str) -> str:
     - The returned text IS the final answer.
     - Do NOT apologize.
     - Do NOT mention configuration, API keys, or access issues.
+
+    With stream=true, progress notifications carry partial results while the
+    answer is built: first the retrieved source chunks (file, page, clause),
+    then pieces of the answer text. The returned text is still the full answer.
     """
-    return await query_rag(query)
+    if not stream or ctx is None:
+        return await query_rag(query)
+
+    sent = 0
+
+    async def emit(event: dict) -> None:
+        nonlocal sent
+        sent += 1
+        await ctx.report_progress(progress=sent, message=json.dumps(event, ensure_ascii=False))
+
+    return await stream_rag(query, emit)
+
+
+@mcp.tool()
+async def get_server_stats() -> dict:
+    """
+    Runtime counters of this server process (for operators, not for answering questions).
+
+    - coalescing: identical concurrent search_regulations calls that shared one computation
+    - embedding_batches: micro-batched query embeddings (batch sizes, added queueing delay)
+    - admission: calls in flight/queued, rejected (overloaded) and timed-out calls
+    - facts: questions answered from the structured fact index instead of RAG
+    """
+    return {
+        "coalescing": coalescing_stats(),
+        "embedding_batches": embedding_batch_stats(),
+        "admission": _admission.stats() if _admission is not None else None,
+        "facts": fact_index_stats(),
+    }
+
+
+async def profile_server(
+    seconds: float = 10,
+    cpu: str = "sampling",
+    memory: bool = True,
+    top_n: int = 20,
+    save: bool = False,
+) -> dict:
+    """
+    Profile this worker process for a few seconds while it keeps serving (for operators).
+
+    Registered only with --enable-profiling. With several workers, the
+    worker that receives the call is profiled; its pid is in the result.
+
+    - cpu: 'sampling' (all threads, low overhead), 'cprofile' (event-loop
+      thread only, exact call counts) or 'off'
+    - memory: allocation sites from tracemalloc snapshots
+    - save: also write the full profiles to --profile-dir
+    """
+    try:
+        return await _profiler.capture(seconds=seconds, cpu=cpu, memory=memory, top_n=top_n, save=save)
+    except Exception as e:
+        raise Exception(f"Failed to profile server: {str(e)}") from e
 
 if __name__ == "__main__":
-    mcp.run(transport="http",host="127.0.0.1",port=3002)
+    parser = argparse.ArgumentParser(description="Regulations RAG MCP server")
+    parser.add_argument("--host", default=os.getenv("RAG_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("RAG_PORT", "3002")))
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="Worker processes sharing the model and index (env RAG_WORKERS, default 1)")
+    parser.add_argument("--max-in-flight", type=int, default=int(os.getenv("RAG_MAX_IN_FLIGHT", "4")),
+                        help="Concurrent search_regulations calls per worker, 0 for unlimited (default 4)")
+    parser.add_argument("--max-queue", type=int, default=int(os.getenv("RAG_MAX_QUEUE", "32")),
+                        help="Calls waiting for a slot before new ones are rejected, 0 for unlimited (default 32)")
+    parser.add_argument("--tool-timeout", type=float, default=float(os.getenv("RAG_TOOL_TIMEOUT", "60")),
+                        help="Deadline in seconds per call including queueing, 0 for none (default 60)")
+    parser.add_argument("--tool-limits", default=os.getenv("RAG_TOOL_LIMITS"),
+                        help="Per-tool overrides as JSON")
+    parser.add_argument("--enable-profiling", action="store_true",
+                        default=os.getenv("RAG_ENABLE_PROFILING", "").lower() in ("1", "true", "yes"),
+                        help="Register the profile_server tool (env RAG_ENABLE_PROFILING, default off)")
+    parser.add_argument("--profile-dir", default=os.getenv("RAG_PROFILE_DIR", "./profiles"),
+                        help="Directory for full profiles saved by profile_server (default ./profiles)")
+    parser.add_argument("--profile-max-seconds", type=float, default=float(os.getenv("RAG_PROFILE_MAX_SECONDS", "60")),
+                        help="Longest capture window profile_server accepts (default 60)")
+    args = parser.parse_args()
+
+    overrides = parse_tool_limits(args.tool_limits)
+    overrides.setdefault("get_server_stats", ToolLimit())
+    overrides.setdefault("profile_server", ToolLimit())
+    _admission = AdmissionControl(
+        ToolLimit(max_in_flight=args.max_in_flight, max_queue=args.max_queue, timeout=args.tool_timeout),
+        overrides,
+    )
+    mcp.add_middleware(_admission)
+
+    if args.enable_profiling:
+        _profiler = LiveProfiler(args.profile_dir, max_seconds=args.profile_max_seconds)
+        mcp.tool(profile_server)
+
+    serve_prefork(mcp, host=args.host, port=args.port, workers=args.workers)
@@ -0,0 +1,164 @@
+"""
+Compare the current SentenceSplitter layout with RegulationNodeParser.
+
+For each chunker the regulation PDFs are parsed, embedded with the same
+bge-base model and written to a throwaway Chroma directory. The report
+covers node count, tokens embedded, ingest time, on-disk index size and
+retrieval on the questions/ set.
+
+There are no labelled relevant passages for questions/, so retrieval is
+scored with two proxies: mean top-1 similarity, and keyword coverage - the
+share of each question's content words that appear in the top-k retrieved
+text. Per-question hits are written out for side-by-side review.
+
+Usage (from server/llama_index):
+    python -m server.benchmark_chunking --top-k 5 --output bench_chunking.json
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import chromadb
+from llama_index.core import Settings, SimpleDirectoryReader, StorageContext, VectorStoreIndex
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.utils import get_tokenizer
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.readers.file import PDFReader
+from llama_index.vector_stores.chroma import ChromaVectorStore
+
+from server.chunking import RegulationNodeParser
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data" / "extracted" / "2024"
+QUESTIONS_DIR = BASE_DIR / "questions"
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "am", "i", "my", "me", "if", "of", "to", "in", "on", "for", "and",
+    "or", "do", "does", "can", "what", "which", "who", "how", "when", "will", "be", "it", "this",
+    "that", "there", "any", "with", "by", "at", "from", "as", "get", "have", "has", "still", "after",
+}
+
+
+def load_questions(limit: int | None = None) -> List[str]:
+    """Read the numbered questions from questions/q*.txt."""
+    questions = []
+    for path in sorted(QUESTIONS_DIR.glob("q*.txt")):
+        for line in path.read_text(encoding="utf-8").splitlines():
+            match = re.match(r"^\s*\d+\.\s*(.+)$", line)
+            if match:
+                questions.append(match.group(1).strip())
+    return questions[:limit] if limit else questions
+
+
+def content_words(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9%]+", text.lower()) if w not in STOPWORDS and len(w) > 1}
+
+
+def dir_size(path: str) -> int:
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def run_chunker(name: str, parser, documents, questions: List[str], top_k: int) -> Dict:
+    """Ingest with one chunker into a temp Chroma dir and score retrieval."""
+    tokenizer = get_tokenizer()
+    storage_dir = tempfile.mkdtemp(prefix=f"chunking_{name}_")
+    try:
+        started = time.perf_counter()
+        nodes = parser.get_nodes_from_documents(documents)
+        parse_s = time.perf_counter() - started
+
+        client = chromadb.PersistentClient(path=storage_dir)
+        collection = client.get_or_create_collection("bench")
+        storage_context = StorageContext.from_defaults(vector_store=ChromaVectorStore(chroma_collection=collection))
+        index = VectorStoreIndex(nodes, storage_context=storage_context)
+        ingest_s = time.perf_counter() - started
+
+        retriever = index.as_retriever(similarity_top_k=top_k)
+        per_question, top1, coverage, context_tokens = [], [], [], []
+        query_started = time.perf_counter()
+        for question in questions:
+            hits = retriever.retrieve(question)
+            context = "\n".join(h.node.get_content() for h in hits)
+            wanted = content_words(question)
+            covered = len(wanted & content_words(context)) / len(wanted) if wanted else 1.0
+            top1.append(hits[0].score if hits else 0.0)
+            coverage.append(covered)
+            context_tokens.append(len(tokenizer(context)))
+            per_question.append({
+                "question": question,
+                "keyword_coverage": round(covered, 3),
+                "hits": [
+                    {
+                        "score": round(h.score or 0.0, 4),
+                        "file": h.node.metadata.get("file_name"),
+                        "page": h.node.metadata.get("page_label"),
+                        "clause": h.node.metadata.get("clause_path"),
+                        "text": h.node.get_content()[:200],
+                    }
+                    for h in hits
+                ],
+            })
+        query_s = time.perf_counter() - query_started
+
+        n = max(len(questions), 1)
+        return {
+            "chunker": name,
+            "nodes": len(nodes),
+            "tokens_embedded": sum(len(tokenizer(node.get_content())) for node in nodes),
+            "parse_seconds": round(parse_s, 3),
+            "ingest_seconds": round(ingest_s, 3),
+            "index_bytes": dir_size(storage_dir),
+            "mean_top1_score": round(sum(top1) / n, 4),
+            "mean_keyword_coverage": round(sum(coverage) / n, 4),
+            "mean_context_tokens": round(sum(context_tokens) / n, 1),
+            "query_ms": round(query_s * 1000 / n, 2),
+            "questions": per_question,
+        }
+    finally:
+        shutil.rmtree(storage_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark regulation chunkers")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--limit-questions", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=512, help="RegulationNodeParser chunk size")
+    parser.add_argument("--output", default=None, help="Write the full report (with per-question hits) to this JSON file")
+    args = parser.parse_args()
+
+    Settings.llm = None
+    Settings.embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-base-en-v1.5")
+
+    documents = SimpleDirectoryReader(
+        input_dir=str(DATA_DIR), recursive=True, file_extractor={".pdf": PDFReader()}
+    ).load_data()
+    questions = load_questions(args.limit_questions)
+    print(f"📄 {len(documents)} pages, ❓ {len(questions)} questions")
+
+    chunkers = {
+        "sentence_700_300": SentenceSplitter(chunk_size=700, chunk_overlap=300),
+        "regulation": RegulationNodeParser(chunk_size=args.chunk_size),
+    }
+    reports = [run_chunker(name, p, documents, questions, args.top_k) for name, p in chunkers.items()]
+
+    columns = ["nodes", "tokens_embedded", "ingest_seconds", "index_bytes",
+               "mean_top1_score", "mean_keyword_coverage", "mean_context_tokens", "query_ms"]
+    print(f"\n{'metric':<24}" + "".join(f"{r['chunker']:>20}" for r in reports))
+    for column in columns:
+        print(f"{column:<24}" + "".join(f"{r[column]:>20}" for r in reports))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False)
+        print(f"\n📁 Full report: {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
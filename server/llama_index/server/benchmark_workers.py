@@ -0,0 +1,163 @@
+"""
+Measure how search_regulations throughput scales with --workers.
+
+For each worker count the server is started as a subprocess
+(`python server.py --workers N`), `--concurrency` clients call
+search_regulations with questions from questions/ for `--duration`
+seconds, and the server is stopped again. The report lists throughput,
+latency percentiles and the summed RSS of the server processes (shared
+copy-on-write pages are counted once per process, so this overstates the
+real footprint; PSS is reported too where /proc provides it).
+
+Usage (from server/llama_index):
+    python -m server.benchmark_workers --workers 1 2 4 --concurrency 16 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from fastmcp import Client
+
+from server.benchmark_chunking import load_questions
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def _wait_for_port(host: str, port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"Server did not start listening on {host}:{port} within {timeout}s")
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    return pids
+
+
+def _memory_kb(pids: List[int]) -> Dict[str, int]:
+    """Summed RSS and PSS (kB) of the given processes, from /proc (Linux only)."""
+    totals = {"rss_kb": 0, "pss_kb": 0}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key in ("Rss", "Pss"):
+                        totals[f"{key.lower()}_kb"] += int(value.split()[0])
+        except OSError:
+            pass
+    return totals
+
+
+async def _drive(url: str, questions: List[str], concurrency: int, duration: float) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def client_loop(worker: int):
+        nonlocal errors
+        i = worker
+        async with Client(url) as client:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    await client.call_tool("search_regulations", {"query": questions[i % len(questions)]})
+                    latencies.append(time.perf_counter() - started)
+                except Exception:
+                    errors += 1
+                i += concurrency
+
+    started = time.monotonic()
+    await asyncio.gather(*(client_loop(w) for w in range(concurrency)))
+    elapsed = time.monotonic() - started
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+    }
+
+
+def run_one(workers: int, args, questions: List[str]) -> Dict:
+    """Start the server with `workers` processes, drive load, stop it."""
+    server = subprocess.Popen(
+        [sys.executable, "server.py", "--workers", str(workers), "--port", str(args.port)],
+        cwd=BASE_DIR,
+        stdout=subprocess.DEVNULL if not args.verbose else None,
+        stderr=subprocess.DEVNULL if not args.verbose else None,
+    )
+    try:
+        _wait_for_port("127.0.0.1", args.port, args.startup_timeout)
+        url = f"http://127.0.0.1:{args.port}/mcp"
+        # Warm every worker (model pages, index) before measuring.
+        asyncio.run(_drive(url, questions, max(workers, 1) * 2, args.warmup))
+        result = asyncio.run(_drive(url, questions, args.concurrency, args.duration))
+        result.update(_memory_kb(_process_tree(server.pid)))
+        result["workers"] = workers
+        return result
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark regulations server throughput vs. worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before each run")
+    parser.add_argument("--port", type=int, default=3102)
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--limit-questions", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Write the report to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show server output")
+    args = parser.parse_args()
+
+    questions = load_questions(args.limit_questions)
+    if not questions:
+        raise SystemExit("No questions found in questions/")
+
+    reports = []
+    for workers in args.workers:
+        print(f"▶ {workers} worker(s), {args.concurrency} concurrent clients, {args.duration}s")
+        reports.append(run_one(workers, args, questions))
+
+    base = reports[0]["throughput_rps"] or 1.0
+    print(f"\n{'workers':>8}{'rps':>10}{'speedup':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}{'RSS MB':>10}{'PSS MB':>10}")
+    for r in reports:
+        print(f"{r['workers']:>8}{r['throughput_rps']:>10}{r['throughput_rps'] / base:>10.2f}{r['p50_ms']:>10}"
+              f"{r['p95_ms']:>10}{r['errors']:>8}{r['rss_kb'] / 1024:>10.0f}{r['pss_kb'] / 1024:>10.0f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n📁 Report: {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
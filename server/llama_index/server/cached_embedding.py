@@ -0,0 +1,63 @@
+"""
+LlamaIndex embedding wrapper backed by the shared on-disk embedding cache.
+
+The cache itself lives in the shared mcp_shared package (server/shared)
+so that both ingestion paths (this one and JSONToChromaIngester) use the
+same code and the same cache directory.
+"""
+
+from typing import Any, Dict, List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from mcp_shared.embedding_cache import EmbeddingCache, cache_enabled
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Serve text embeddings from the cache and embed only unseen texts with `inner`."""
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, cache: EmbeddingCache | None = None, **kwargs: Any) -> None:
+        super().__init__(
+            model_name=inner.model_name,
+            embed_batch_size=inner.embed_batch_size,
+            **kwargs,
+        )
+        self._inner = inner
+        self._cache = cache or EmbeddingCache(inner.model_name)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @classmethod
+    def wrap(cls, inner: BaseEmbedding) -> BaseEmbedding:
+        """Wrap `inner` unless EMBEDDING_CACHE=off."""
+        return cls(inner) if cache_enabled() else inner
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    # Queries are one-off and latency-bound; only document texts go through the cache.
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._inner.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return await self._inner.aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        vectors = self._cache.embed(texts, self._inner._get_text_embeddings)
+        return vectors.tolist()
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._get_text_embeddings(texts)
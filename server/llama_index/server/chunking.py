@@ -0,0 +1,239 @@
+"""
+Structure-aware node parser for the regulation PDFs.
+
+The regulations are numbered documents ("5. DURATION OF THE PROGRAMME",
+"5.1 A candidate is ...", "4.2.1. Credit Assignment") with the odd table
+in between. RegulationNodeParser splits on that numbering instead of on a
+fixed token window:
+
+- each clause becomes its own block; small sibling clauses of the same
+  section are packed together up to `chunk_size` tokens,
+- runs of table-like lines are kept together as table blocks (long tables
+  are split between rows, repeating the header row),
+- only clauses longer than `chunk_size` fall back to sentence splitting,
+  with a small `chunk_overlap`,
+- every node records where it sits in the clause hierarchy (`clause`,
+  `clause_path`, `section`, `section_title`, `block_type`, `page_label`).
+
+Pages from PDFReader arrive as separate documents; pages of the same file
+are stitched together first so clauses that cross a page break stay whole.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.node_parser.interface import NodeParser
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode
+from llama_index.core.utils import get_tokenizer
+
+# "5. DURATION OF THE PROGRAMME", "4.2.1. Credit Assignment", "5.1 A candidate ..."
+CLAUSE_RE = re.compile(r"^(\d{1,2}(?:\.\d{1,2}){0,3})\.?\s+(\S.*)$")
+
+# Short lines ending in one or more numeric cells ("1 Lecture / Tutorial Period 1", "O 10 91 - 100").
+TABLE_ROW_RE = re.compile(r"(?:\s+\d+(?:\.\d+)?(?:\s*[-–]\s*\d+)?%?)+\s*$")
+TABLE_ROW_MAX_CHARS = 90
+MIN_TABLE_ROWS = 3
+
+PAGE_NUMBER_RE = re.compile(r"^\s*\d{1,3}\s*$")
+
+# Node metadata kept out of the embedded text (bookkeeping, not content).
+EXCLUDED_EMBED_KEYS = ["clauses", "block_type", "file_path", "file_type", "file_size",
+                       "creation_date", "last_modified_date"]
+
+
+@dataclass
+class _Block:
+    """A run of lines belonging to one clause (or one table inside it)."""
+    path: Tuple[int, ...]
+    kind: str
+    page: int
+    lines: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines).strip()
+
+
+def _is_next_clause(current: Tuple[int, ...], parts: Tuple[int, ...], title: str) -> bool:
+    """Accept a numbered line as a heading only if it continues the current numbering."""
+    if len(parts) == 1:
+        expected = current[0] + 1 if current else 1
+        letters = [c for c in title if c.isalpha()]
+        looks_like_heading = bool(letters) and sum(c.isupper() for c in letters) >= 0.7 * len(letters)
+        return parts[0] == expected and looks_like_heading
+    if not current or parts[:-1] != current[:len(parts) - 1]:
+        return False
+    if len(parts) == len(current) + 1:
+        return parts[-1] == 1
+    if len(parts) <= len(current):
+        return parts[-1] == current[len(parts) - 1] + 1
+    return False
+
+
+def _is_table_row(line: str) -> bool:
+    stripped = line.strip()
+    return 0 < len(stripped) <= TABLE_ROW_MAX_CHARS and bool(TABLE_ROW_RE.search(stripped)) \
+        and not stripped.endswith((".", ",", ";", ":"))
+
+
+def split_into_blocks(pages: Sequence[str]) -> Tuple[List[_Block], Dict[Tuple[int, ...], str]]:
+    """
+    Segment the pages of one regulation into clause and table blocks.
+
+    Returns:
+        Tuple of (blocks in document order, clause path -> heading text)
+    """
+    titles: Dict[Tuple[int, ...], str] = {}
+    lines: List[Tuple[int, str, Tuple[int, ...] | None]] = []
+    current: Tuple[int, ...] = ()
+
+    for page_index, page_text in enumerate(pages):
+        page_lines = page_text.splitlines()
+        # Drop the printed page number at the top of each page.
+        while page_lines and (not page_lines[0].strip() or PAGE_NUMBER_RE.match(page_lines[0])):
+            page_lines.pop(0)
+        for line in page_lines:
+            match = CLAUSE_RE.match(line.strip())
+            heading = None
+            if match:
+                parts = tuple(int(p) for p in match.group(1).split("."))
+                if _is_next_clause(current, parts, match.group(2)):
+                    current = parts
+                    titles[parts] = match.group(2).strip()
+                    heading = parts
+            lines.append((page_index, line, heading))
+
+    # Mark runs of table rows (plus the header line just above them) as tables.
+    is_table = [False] * len(lines)
+    i = 0
+    while i < len(lines):
+        j = i
+        while j < len(lines) and lines[j][2] is None and _is_table_row(lines[j][1]):
+            j += 1
+        if j - i >= MIN_TABLE_ROWS:
+            start = i - 1 if i > 0 and lines[i - 1][2] is None and len(lines[i - 1][1].strip()) <= TABLE_ROW_MAX_CHARS else i
+            for k in range(start, j):
+                is_table[k] = True
+            i = j
+        else:
+            i = max(j, i + 1)
+
+    blocks: List[_Block] = []
+    path: Tuple[int, ...] = ()
+    for (page_index, line, heading), table in zip(lines, is_table):
+        if heading is not None:
+            path = heading
+        kind = "table" if table else ("clause" if path else "preamble")
+        if heading is not None or not blocks or blocks[-1].kind != kind or blocks[-1].path != path:
+            blocks.append(_Block(path=path, kind=kind, page=page_index))
+        blocks[-1].lines.append(line.rstrip())
+
+    return [b for b in blocks if b.text], titles
+
+
+class RegulationNodeParser(NodeParser):
+    """Split regulation documents on clause numbering and table boundaries."""
+
+    chunk_size: int = Field(default=512, description="Maximum tokens per node.", gt=0)
+    chunk_overlap: int = Field(
+        default=32, description="Token overlap, used only when a single clause must be split.", ge=0
+    )
+
+    _tokenizer: Callable = PrivateAttr()
+    _fallback: SentenceSplitter = PrivateAttr()
+
+    def __init__(self, chunk_size: int = 512, chunk_overlap: int = 32, **kwargs: Any) -> None:
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs)
+        self._tokenizer = get_tokenizer()
+        self._fallback = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RegulationNodeParser"
+
+    def _tokens(self, text: str) -> int:
+        return len(self._tokenizer(text))
+
+    def _clause_path(self, path: Tuple[int, ...], titles: Dict[Tuple[int, ...], str]) -> str:
+        parts = []
+        for depth in range(1, len(path) + 1):
+            prefix = path[:depth]
+            label = ".".join(str(p) for p in prefix)
+            parts.append(f"{label} {titles[prefix]}" if depth == 1 and prefix in titles else label)
+        return " > ".join(parts)
+
+    def _split_table(self, block: _Block) -> List[str]:
+        """Split a long table between rows, repeating its header row in every piece."""
+        header, rows = block.lines[0], block.lines[1:]
+        pieces, current = [], [header]
+        for row in rows:
+            if len(current) > 1 and self._tokens("\n".join(current + [row])) > self.chunk_size:
+                pieces.append("\n".join(current))
+                current = [header]
+            current.append(row)
+        pieces.append("\n".join(current))
+        return pieces
+
+    def _pack(self, blocks: List[_Block]) -> List[Tuple[List[_Block], str]]:
+        """Pack consecutive small clause blocks of one section; split oversized blocks."""
+        chunks: List[Tuple[List[_Block], str]] = []
+        group: List[_Block] = []
+
+        def flush():
+            if group:
+                chunks.append((list(group), "\n".join(b.text for b in group)))
+                group.clear()
+
+        for block in blocks:
+            size = self._tokens(block.text)
+            if size > self.chunk_size:
+                flush()
+                splits = self._split_table(block) if block.kind == "table" else self._fallback.split_text(block.text)
+                chunks.extend(([block], text) for text in splits)
+                continue
+            same_section = group and group[0].path[:1] == block.path[:1] and group[0].kind != "table" \
+                and block.kind != "table"
+            if same_section and self._tokens("\n".join(b.text for b in group + [block])) <= self.chunk_size:
+                group.append(block)
+            else:
+                flush()
+                group.append(block)
+        flush()
+        return chunks
+
+    def _parse_nodes(self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs: Any) -> List[BaseNode]:
+        # Stitch pages of the same file back together, keeping their order.
+        files: Dict[str, List[BaseNode]] = {}
+        for node in nodes:
+            key = node.metadata.get("file_path") or node.metadata.get("file_name") or node.node_id
+            files.setdefault(key, []).append(node)
+
+        all_nodes: List[BaseNode] = []
+        for pages in files.values():
+            blocks, titles = split_into_blocks([p.get_content() for p in pages])
+            for group, text in self._pack(blocks):
+                first = group[0]
+                source = pages[first.page]
+                section = first.path[:1]
+                metadata = {
+                    "clause": ".".join(str(p) for p in first.path) if first.path else "",
+                    "clauses": ", ".join(".".join(str(p) for p in b.path) for b in group if b.path),
+                    "clause_path": self._clause_path(first.path, titles),
+                    "section": str(section[0]) if section else "",
+                    "section_title": titles.get(section, ""),
+                    "block_type": first.kind,
+                }
+                for node in build_nodes_from_splits([text], source, id_func=self.id_func):
+                    node.metadata.update(metadata)
+                    node.excluded_embed_metadata_keys = list(
+                        dict.fromkeys(node.excluded_embed_metadata_keys + EXCLUDED_EMBED_KEYS)
+                    )
+                    node.excluded_llm_metadata_keys = list(
+                        dict.fromkeys(node.excluded_llm_metadata_keys + ["clauses", "block_type"])
+                    )
+                    all_nodes.append(node)
+        return all_nodes
@@ -0,0 +1,438 @@
+"""
+Structured fact index for the numbers in the regulations.
+
+Many questions only ask for a number - "minimum total credits", "maximum
+duration", "minimum attendance" - and don't need a vector search plus
+synthesis over prose chunks. At ingest time extract_facts() pulls these
+out of the regulation PDFs:
+
+- credits: minimum total credits (with the core/elective/... split where
+  given), minimum elective credits per category, the credit assignment
+  table (periods per week -> credits) and the per-semester credit cap,
+- durations: normal and maximum duration (and lateral entry variants),
+- attendance: overall, per-course, medical and startup thresholds and how
+  often medical condonation may be used.
+
+Facts are stored in SQLite (storage/regulation_facts.sqlite) keyed by
+regulation year, programme, fact and qualifier, with the clause, file and
+page they come from. answer_from_facts() recognises plain lookup questions
+and answers them from the index; anything conditional ("if I have 74% ...",
+"can I ...", "what happens ...") or not covered returns None so the caller
+falls back to RAG.
+
+Extraction is pattern based and deliberately strict: a rule whose wording
+isn't found simply yields no fact.
+"""
+
+import os
+import re
+import sqlite3
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+from server.chunking import split_into_blocks
+
+FACTS_FILE = "regulation_facts.sqlite"
+
+_WORD_NUMBERS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fourteen": 14, "sixteen": 16,
+    "once": 1, "twice": 2, "thrice": 3,
+}
+
+
+@dataclass
+class Fact:
+    """One number from one regulation, with where it was found."""
+    regulation: str
+    programme: str
+    fact: str
+    qualifier: str
+    value: float
+    unit: str
+    detail: str
+    file_name: str = ""
+    page_label: str = ""
+    clause: str = ""
+
+
+def _number(token: str) -> float | None:
+    token = token.lower()
+    if token.isdigit():
+        return float(token)
+    return _WORD_NUMBERS.get(token)
+
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def _collapse(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+##### Extraction #####
+
+def _programme_name(text: str, fallback: str) -> str:
+    match = re.search(r"minimum number of credits to complete the ([A-Za-z][A-Za-z /.]*?) programme", text)
+    if match is None:
+        match = re.search(r"\bthe ([A-Z][A-Za-z /.]*?) Degree pro ?gramme", text)
+    name = match.group(1) if match else fallback
+    return re.sub(r"\s*/\s*", "/", name).strip()
+
+
+def _regulation(file_name: str, text: str) -> str:
+    match = re.search(r"R\s?(\d{4})", file_name) or re.search(r"REGULATIONS[^0-9]{0,40}(\d{4})", text)
+    return f"R{match.group(1)}" if match else ""
+
+
+def _credit_facts(text: str, lines: List[str]) -> List[Tuple[str, str, float, str, str]]:
+    facts = []
+    match = re.search(r"minimum number of credits to complete the .+? programme is (\d+)([^.]*)", text)
+    if match:
+        facts.append(("min_total_credits", "", float(match.group(1)), "credits",
+                      f"Minimum total credits: {match.group(1)}"))
+        for credits, category in re.findall(r"(\d+) credits under ([a-z ]+?) courses", match.group(2)):
+            facts.append(("credits_by_category", category.strip(), float(credits), "credits",
+                          f"{credits} credits under {category.strip()} courses"))
+
+    match = re.search(r"Maximum number of credits .{0,40}?enrol ?l in a particular (semester|trimester) "
+                      r"can ?n ?ot exceed (\d+) credits", text)
+    if match:
+        facts.append(("max_credits_per_term", match.group(1), float(match.group(2)), "credits",
+                      f"Maximum credits per {match.group(1)}: {match.group(2)}"))
+
+    # Tables: "Contact period per week Credits" rows and "Category Minimum credit requirement" rows.
+    table = None
+    for line in lines:
+        stripped = _collapse(line)
+        if re.search(r"Contact period per week\s+Credits", stripped, re.I):
+            table = "credit_assignment"
+            continue
+        if re.search(r"Category\s+Minimum\s+credit\s+requirement", stripped, re.I):
+            table = "min_elective_credits"
+            continue
+        if table is None:
+            continue
+        row = re.match(r"^(\d+)\s+(.+?)\s+(\d+)$", stripped)
+        if row is None:
+            if not stripped or re.match(r"^[A-Za-z]", stripped) is None:
+                continue
+            if table == "credit_assignment" and len(stripped) < 40 and not stripped.endswith("."):
+                continue  # wrapped label of the next row
+            table = None
+            continue
+        first, label, value = row.groups()
+        if table == "credit_assignment":
+            facts.append(("credit_assignment", label, float(value), "credits",
+                          f"{first} {label} per week = {value} credit{'s' if value != '1' else ''}"))
+        else:
+            facts.append(("min_elective_credits", label, float(value), "credits",
+                          f"Minimum {label} credits: {value}"))
+    return facts
+
+
+def _duration_facts(text: str) -> List[Tuple[str, str, float, str, str]]:
+    facts = []
+    term = r"(\w+) (?:consecutive )?(semesters|trimesters) ?(?:/|\() ?(\d+) Years?"
+    for fact, pattern in (("normal_duration", r"pro ?gramme in " + term),
+                          ("max_duration", r"not more than " + term)):
+        match = re.search(pattern, text)
+        if match is None:
+            continue
+        terms, unit, years = _number(match.group(1)), match.group(2), float(match.group(3))
+        if terms is None:
+            continue
+        label = "Normal" if fact == "normal_duration" else "Maximum"
+        facts.append((fact, "", years, "years", f"{label} duration: {_fmt(terms)} {unit} ({_fmt(years)} years)"))
+
+    lateral = re.findall(r"\((\w+) (semesters|trimesters) ?/ ?(\d+) Years? for lateral entry", text)
+    for fact, (terms, unit, years) in zip(("normal_duration", "max_duration"), lateral):
+        label = "Normal" if fact == "normal_duration" else "Maximum"
+        facts.append((fact, "lateral entry", float(years), "years",
+                      f"{label} duration for lateral entry: {terms} {unit} ({years} years)"))
+    return facts
+
+
+def _attendance_facts(text: str) -> List[Tuple[str, str, float, str, str]]:
+    facts = []
+    rules = [
+        ("attendance_overall_min", r"not less than (\d+) ?%[^.]{0,160}?overall attendance",
+         "Minimum overall attendance: {}%"),
+        ("attendance_course_min", r"not less than (\d+) ?% attendance in each course",
+         "Minimum attendance in each course: {}%"),
+        ("attendance_medical_min", r"medical reasons.{0,200}?not less than (\d+) ?%",
+         "Minimum attendance with medical condonation (Principal's approval, condonation fee): {}%"),
+        ("attendance_startup_min", r"entrepreneurships?.{0,200}?not less than (\d+) ?%",
+         "Minimum attendance with the entrepreneurship/startup concession "
+         "(review committee and Principal): {}%"),
+    ]
+    for fact, pattern, detail in rules:
+        match = re.search(pattern, text)
+        if match:
+            facts.append((fact, "", float(match.group(1)), "percent", detail.format(match.group(1))))
+
+    match = re.search(r"avail this provision only (once|twice|thrice|\w+ times)", text)
+    if match:
+        times = _number(match.group(1).split()[0])
+        if times is not None:
+            facts.append(("medical_condonation_limit", "", times, "times",
+                          f"Medical condonation can be used only {match.group(1)} during the programme"))
+    return facts
+
+
+def extract_facts(pages: Sequence[Any]) -> List[Fact]:
+    """
+    Extract facts from the pages (LlamaIndex documents) of one regulation PDF.
+
+    Args:
+        pages: Documents of one file in page order, as produced by PDFReader
+
+    Returns:
+        List of facts; the first occurrence wins if a fact appears twice
+    """
+    if not pages:
+        return []
+    metadata = pages[0].metadata
+    file_name = metadata.get("file_name") or os.path.basename(metadata.get("file_path", ""))
+    blocks, _ = split_into_blocks([p.get_content() for p in pages])
+    full_text = _collapse(" ".join(b.text for b in blocks))
+    regulation = _regulation(file_name, full_text)
+    fallback = re.sub(r"^R\d{4}-|-Regulations.*$|\.pdf$", "", file_name, flags=re.I) or file_name
+    programme = _programme_name(full_text, fallback)
+
+    facts: Dict[Tuple[str, str], Fact] = {}
+    for block in blocks:
+        text = _collapse(block.text)
+        found = _credit_facts(text, block.lines) + _duration_facts(text) + _attendance_facts(text)
+        for fact, qualifier, value, unit, detail in found:
+            if (fact, qualifier) in facts:
+                continue
+            facts[(fact, qualifier)] = Fact(
+                regulation=regulation,
+                programme=programme,
+                fact=fact,
+                qualifier=qualifier,
+                value=value,
+                unit=unit,
+                detail=detail,
+                file_name=file_name,
+                page_label=str(pages[block.page].metadata.get("page_label", block.page + 1)),
+                clause=".".join(str(p) for p in block.path),
+            )
+    return list(facts.values())
+
+
+def extract_facts_from_documents(documents: Sequence[Any]) -> Dict[str, List[Fact]]:
+    """Group page documents by file and extract the facts of each; returns file_name -> facts."""
+    files: Dict[str, List[Any]] = {}
+    for document in documents:
+        key = document.metadata.get("file_path") or document.metadata.get("file_name") or document.doc_id
+        files.setdefault(key, []).append(document)
+    results = {}
+    for pages in files.values():
+        file_name = pages[0].metadata.get("file_name") or os.path.basename(pages[0].metadata.get("file_path", ""))
+        results[file_name] = extract_facts(pages)
+    return results
+
+
+##### Store #####
+
+class FactIndex:
+    """SQLite store of extracted facts, keyed by regulation, programme, fact and qualifier."""
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS facts (
+                    regulation TEXT NOT NULL,
+                    programme TEXT NOT NULL,
+                    fact TEXT NOT NULL,
+                    qualifier TEXT NOT NULL DEFAULT '',
+                    value REAL NOT NULL,
+                    unit TEXT NOT NULL,
+                    detail TEXT NOT NULL,
+                    file_name TEXT,
+                    page_label TEXT,
+                    clause TEXT,
+                    PRIMARY KEY (regulation, programme, fact, qualifier)
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS facts_by_fact ON facts (fact, regulation)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS facts_by_file ON facts (file_name)")
+
+    def replace_file(self, file_name: str, facts: Sequence[Fact]) -> int:
+        """Replace all facts extracted from `file_name`; returns the number stored."""
+        with self._conn:
+            self._conn.execute("DELETE FROM facts WHERE file_name = ?", (file_name,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO facts VALUES (:regulation, :programme, :fact, :qualifier, :value, "
+                ":unit, :detail, :file_name, :page_label, :clause)",
+                [asdict(f) for f in facts],
+            )
+        return len(facts)
+
+    def remove_file(self, file_name: str) -> int:
+        with self._conn:
+            return self._conn.execute("DELETE FROM facts WHERE file_name = ?", (file_name,)).rowcount
+
+    def lookup(self, facts: Sequence[str], regulation: str, programmes: Sequence[str] | None = None) -> List[Fact]:
+        """Facts of the given kinds for one regulation, optionally restricted to some programmes."""
+        sql = f"SELECT * FROM facts WHERE regulation = ? AND fact IN ({','.join('?' * len(facts))})"
+        params: List[Any] = [regulation, *facts]
+        if programmes:
+            sql += f" AND programme IN ({','.join('?' * len(programmes))})"
+            params += list(programmes)
+        rows = self._conn.execute(sql + " ORDER BY programme, rowid", params).fetchall()
+        return [Fact(**dict(row)) for row in rows]
+
+    def regulations(self) -> List[str]:
+        return [r[0] for r in self._conn.execute("SELECT DISTINCT regulation FROM facts ORDER BY regulation")]
+
+    def programmes(self, regulation: str) -> List[str]:
+        return [r[0] for r in self._conn.execute(
+            "SELECT DISTINCT programme FROM facts WHERE regulation = ? ORDER BY programme", (regulation,))]
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+
+
+def facts_path(storage_dir: str) -> str:
+    return os.path.join(storage_dir, FACTS_FILE)
+
+
+##### Query fast path #####
+
+# Questions that need reasoning over a rule, not a lookup of its number.
+_NOT_A_LOOKUP_RE = re.compile(
+    r"\bif\b|\bwhat happens\b|\bwho\b|\bwhy\b|\bunless\b|^(is|are|can|could|do|does|did|am|will|should|shall)\b"
+)
+
+# (intent, pattern that must match, facts answered). First match wins.
+_INTENTS: List[Tuple[str, re.Pattern, Tuple[str, ...]]] = [
+    ("credits_per_term",
+     re.compile(r"credits?\b.*\b(one|a|per|each|single|particular) (semester|trimester|term)\b"
+                r"|\b(semester|trimester)\b.*\bmax\w* (number of )?credits"),
+     ("max_credits_per_term",)),
+    ("credit_assignment",
+     re.compile(r"credits?\b.*\b(per|for (a|one|each)) (lecture|tutorial|practical|period|hour)"
+                r"|how are credits (assigned|calculated)"),
+     ("credit_assignment",)),
+    ("elective_credits",
+     re.compile(r"\belective\b.*\bcredits?\b|\bcredits?\b.*\belective"),
+     ("min_elective_credits", "credits_by_category")),
+    ("total_credits",
+     re.compile(r"^(?!.*\b(honours|online|mooc|one credit|bridge|extra|overload|underload|register|carry|from)\b)"
+                r"(.*\b(minimum|total)\b.*\bcredits?\b"
+                r"|.*\bcredits?\b.*\b(required|needed|need|must)\b.*\b(graduate|degree|complete|programme|program)\b)"),
+     ("min_total_credits", "credits_by_category")),
+    ("condonation_limit",
+     re.compile(r"how many times.*\b(medical|condonation)|\b(medical|condonation)\b.*how many times"),
+     ("medical_condonation_limit",)),
+    ("startup_attendance",
+     re.compile(r"(start ?up|entrepreneur).*(minimum|percent|%|how much|required)"
+                r"|(minimum|percent|%|how much|required).*(start ?up|entrepreneur)"),
+     ("attendance_startup_min",)),
+    ("medical_attendance",
+     re.compile(r"medical.*attendance.*(minimum|percent|%|how much|required)"
+                r"|(minimum|percent|%|how much|required).*attendance.*medical"),
+     ("attendance_medical_min", "medical_condonation_limit")),
+    ("attendance",
+     re.compile(r"(minimum|required|percentage|how much|%).*attendance|attendance.*(minimum|required|percentage)"),
+     ("attendance_overall_min", "attendance_course_min")),
+    ("max_duration",
+     re.compile(r"^(?!.*\b(normal|break)\b).*\b(max\w*)\b.*\b(duration|years|semesters|trimesters)\b"),
+     ("max_duration",)),
+    ("duration",
+     re.compile(r"^(?!.*\bbreak\b).*\b(duration|how many years|how long|how many (semesters|trimesters))\b"
+                r".*\b(complete|finish|degree|programme|program|course)\b|\bnormal and max\w* duration"),
+     ("normal_duration", "max_duration")),
+]
+
+
+def _alias_pattern(name: str) -> re.Pattern:
+    """Regex for one programme name part: 'BTech' also matches 'B.Tech' and 'B Tech'."""
+    body = r"[.\s]?".join(re.escape(c) for c in name) + r"\.?"
+    if len(name) <= 2:
+        # "BE" / "ME": only as written in capitals, not the words "be" and "me".
+        return re.compile(r"(?<![A-Za-z])" + body + r"(?![A-Za-z])")
+    return re.compile(r"(?<![A-Za-z])" + body + r"(?![A-Za-z])", re.I)
+
+
+def match_programmes(question: str, programmes: Sequence[str]) -> List[str]:
+    """Programmes named in the question ('BE/BTech' is named by 'BE', 'BTech' or 'B.Tech')."""
+    return [p for p in programmes if any(_alias_pattern(part).search(question) for part in p.split("/") if part)]
+
+
+def _match_regulation(question: str, regulations: Sequence[str]) -> str | None:
+    """Regulation named in the question ('R2024', '2024 regulation'), else the latest one."""
+    years = re.findall(r"\bR\s?-?(\d{4})\b|\b(20\d\d)\b", question, re.I)
+    for r_year, year in years:
+        candidate = f"R{r_year or year}"
+        if candidate in regulations:
+            return candidate
+    if years:
+        return None  # a year we don't have facts for: let RAG handle it
+    return regulations[-1] if regulations else None
+
+
+@dataclass
+class FactAnswer:
+    intent: str
+    text: str
+    facts: List[Fact]
+
+    def sources(self) -> List[Dict[str, Any]]:
+        return [{"file": f.file_name, "page": f.page_label, "clause": f.clause, "score": None, "text": f.detail}
+                for f in self.facts]
+
+
+def _format(regulation: str, facts: List[Fact]) -> str:
+    by_programme: Dict[str, List[Fact]] = {}
+    for fact in facts:
+        by_programme.setdefault(fact.programme, []).append(fact)
+    lines = []
+    for programme, items in by_programme.items():
+        lines.append(f"{programme} ({regulation}):")
+        for fact in items:
+            lines.append(f"- {fact.detail} [clause {fact.clause}, {fact.file_name}, page {fact.page_label}]")
+    return "\n".join(lines)
+
+
+def answer_from_facts(question: str, index: FactIndex) -> FactAnswer | None:
+    """
+    Answer a plain numeric lookup question from the fact index.
+
+    Returns:
+        FactAnswer, or None if the question isn't a lookup the index covers
+    """
+    normalized = _collapse(question.lower())
+    if _NOT_A_LOOKUP_RE.search(normalized):
+        return None
+    for intent, pattern, fact_names in _INTENTS:
+        if pattern.search(normalized):
+            break
+    else:
+        return None
+
+    regulation = _match_regulation(question, index.regulations())
+    if regulation is None:
+        return None
+    all_programmes = index.programmes(regulation)
+    programmes = match_programmes(question, all_programmes)
+    facts = index.lookup(fact_names, regulation, programmes or None)
+    answered = {f.programme for f in facts if f.fact == fact_names[0]}
+    # The primary fact must be present (companions such as the credit split are
+    # optional). Without a named programme, answer only if every programme has
+    # it, so a partial list isn't read as covering everyone.
+    if not answered or (not programmes and answered != set(all_programmes)):
+        return None
+    return FactAnswer(intent=intent, text=_format(regulation, facts), facts=facts)
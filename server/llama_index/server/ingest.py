@@ -7,12 +7,19 @@ from typing import List
 
 from llama_index.core import Settings, SimpleDirectoryReader, Document
 from llama_index.core.ingestion import IngestionPipeline
-from llama_index.core.node_parser import SentenceSplitter
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.readers.file import PDFReader
 from llama_index.core.storage.docstore import SimpleDocumentStore
 
+# Allow `python server/ingest.py` as well as `python -m server.ingest`.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.cached_embedding import CachedEmbedding
+from server.facts import FactIndex, extract_facts_from_documents, facts_path
+from server.layout import CHUNKERS, DEFAULT_CHUNKER, node_parsers, record_chunker, recorded_chunker
+from server.small_to_big import load_parent_store, parent_store_path, remove_parents, save_parent_store
+from mcp_shared.reload_signal import notify_reload
+
 
 
 def fail(msg: str):
@@ -30,12 +37,24 @@ print("\n🔍 STEP 0: Configuration")
 # 🔒 Force local-only execution
 # ----------------------------
 Settings.llm = None
-Settings.embed_model = HuggingFaceEmbedding(
+# Unchanged chunk texts are served from the shared embedding cache
+# (set EMBEDDING_CACHE=off to always re-embed).
+Settings.embed_model = CachedEmbedding.wrap(HuggingFaceEmbedding(
     model_name="BAAI/bge-base-en-v1.5"
-)
+))
 
 ok("Local embeddings + LLM disabled")
 
+# "small_to_big" embeds small child chunks and keeps their parent sections
+# in a local docstore (see server/small_to_big.py); "regulation" splits on
+# clause numbering with little overlap; "sentence" is the previous fixed
+# 700/300 token window (see server/layout.py).
+CHUNKER = os.getenv("INGEST_CHUNKER", DEFAULT_CHUNKER)
+if CHUNKER not in CHUNKERS:
+    fail(f"Unknown INGEST_CHUNKER: {CHUNKER}")
+
+print("🧩 Chunker:", CHUNKER)
+
 
 print("\n📁 STEP 1: Resolve paths")
 
@@ -87,14 +106,48 @@ print(sample)
 ok("Documents successfully parsed")
 
 
+CHROMA_PATH = os.path.join(PROJECT_ROOT, "storage")
+
+
+print("\n🔢 STEP 3b: Extract structured facts")
+
+# Credits, durations and attendance thresholds for the search_regulations fast path.
+fact_index = FactIndex(facts_path(CHROMA_PATH))
+for file_name, facts in extract_facts_from_documents(documents).items():
+    fact_index.replace_file(file_name, facts)
+    print(f"🔢 {file_name}: {len(facts)} facts")
+
+ok(f"Fact index: {fact_index.count()} facts → {fact_index.path}")
+
+
 print("\n🧱 STEP 4: Initialize Chroma vector store")
 
-CHROMA_PATH = os.path.join(PROJECT_ROOT, "storage")
 COLLECTION_NAME = "rag_demo"
 
 client = chromadb.PersistentClient(path=CHROMA_PATH)
 collection = client.get_or_create_collection(COLLECTION_NAME)
 
+# Nodes of different chunkers can't share one index: children would be
+# expanded against parents of another layout, or flat chunks mixed with
+# children. A layout change starts from an empty collection (and drops the
+# parent docstore); the same layout only replaces the files ingested now.
+previous_chunker = recorded_chunker(collection)
+if collection.count() and previous_chunker != CHUNKER:
+    print(f"♻️  Recreating {COLLECTION_NAME}: built with {previous_chunker or 'an unrecorded chunker'}, now {CHUNKER}")
+    client.delete_collection(COLLECTION_NAME)
+    collection = client.create_collection(COLLECTION_NAME)
+    if os.path.exists(parent_store_path(CHROMA_PATH)):
+        os.remove(parent_store_path(CHROMA_PATH))
+else:
+    file_paths = sorted({doc.metadata["file_path"] for doc in documents if doc.metadata.get("file_path")})
+    for file_path in file_paths:
+        stale = collection.get(where={"file_path": file_path}, include=[])["ids"]
+        if stale:
+            collection.delete(ids=stale)
+            print(f"🗑️  Replacing {len(stale)} vectors of {os.path.basename(file_path)}")
+# ingest_watcher.py splits files added later with the same chunker.
+record_chunker(collection, CHUNKER)
+
 print("📦 Chroma collection name:", collection.name)
 
 ok("Chroma collection ready")
@@ -102,10 +155,22 @@ ok("Chroma collection ready")
 
 print("\n🔗 STEP 5: Build ingestion pipeline")
 
+parents = []
+parent_parser, node_parser = node_parsers(CHUNKER)
+if parent_parser is not None:
+    parents = parent_parser.get_nodes_from_documents(documents)
+    # Parents of other files (e.g. added by ingest_watcher.py) stay in the store.
+    parent_store = load_parent_store(parent_store_path(CHROMA_PATH))
+    for file_path in {parent.metadata.get("file_path") for parent in parents}:
+        remove_parents(parent_store, file_path)
+    parent_store.add_documents(parents)
+    save_parent_store(parent_store, parent_store_path(CHROMA_PATH))
+    print(f"📚 Parent sections stored: {len(parents)} → {parent_store_path(CHROMA_PATH)}")
+
 docstore = SimpleDocumentStore()
 pipeline = IngestionPipeline(
     transformations=[
-        SentenceSplitter(chunk_size=700, chunk_overlap=300),
+        node_parser,
         Settings.embed_model, 
     ],
     vector_store=ChromaVectorStore(chroma_collection=collection),
@@ -116,13 +181,20 @@ ok("IngestionPipeline created")
 
 print("\n🚀 STEP 6: Run ingestion")
 
-nodes =pipeline.run(documents=documents)
+# Small-to-big embeds the children of the parent sections, not the pages.
+nodes = pipeline.run(nodes=parents) if parents else pipeline.run(documents=documents)
 
 
 ok("Pipeline execution completed")
 
 print("🧩 Nodes created:", len(nodes))
 
+if isinstance(Settings.embed_model, CachedEmbedding):
+    stats = Settings.embed_model.stats()
+    print(f"🗄️  Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+          f"(hit rate {stats['hit_rate']}), {stats['entries']} entries, "
+          f"{stats['size_bytes'] / 1024 / 1024:.1f} MB")
+
 vector_store = ChromaVectorStore(chroma_collection=collection)
 vector_store.add(nodes)
 print("\n📊 STEP 7: Verify vector count")
@@ -135,4 +207,7 @@ if count == 0:
 
 ok("Vectors successfully stored in Chroma")
 
+# Running regulation servers reopen the index on their next query.
+notify_reload(CHROMA_PATH, source="ingest.py")
+
 print("\n🎉 INGESTION PIPELINE VERIFIED END-TO-END\n")
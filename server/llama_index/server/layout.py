@@ -0,0 +1,78 @@
+"""
+Chunker layout of the regulations index.
+
+ingest.py builds `rag_demo` with one of three chunkers (INGEST_CHUNKER):
+
+- small_to_big: section-sized parents in the parent docstore, small
+  children embedded in Chroma (see server/small_to_big.py),
+- regulation: clause-aware chunks from RegulationNodeParser,
+- sentence: the fixed 700/300 token SentenceSplitter window.
+
+The chunker is recorded in the collection's metadata under CHUNKER_KEY,
+so incremental writers (ingest_watcher.py) split new files the same way
+as the rest of the index. Indexes built before the chunker was recorded
+used the sentence window (LEGACY_CHUNKER).
+"""
+
+import os
+from typing import Any, Optional, Tuple
+
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.node_parser.interface import NodeParser
+from mcp_shared.collection_metadata import modifiable_metadata
+
+from server.chunking import RegulationNodeParser
+from server.small_to_big import CHILD_CHUNK_SIZE, PARENT_CHUNK_SIZE, ChildNodeParser
+
+CHUNKERS = ("small_to_big", "regulation", "sentence")
+DEFAULT_CHUNKER = "small_to_big"
+CHUNKER_KEY = "chunker"
+# Layout of a non-empty index that records no chunker.
+LEGACY_CHUNKER = "sentence"
+
+
+def node_parsers(chunker: str) -> Tuple[Optional[NodeParser], NodeParser]:
+    """
+    Parsers of one layout.
+
+    Returns:
+        (parent parser, or None for flat layouts; parser whose nodes are embedded)
+    """
+    if chunker == "small_to_big":
+        return (RegulationNodeParser(chunk_size=PARENT_CHUNK_SIZE, chunk_overlap=32),
+                ChildNodeParser(chunk_size=CHILD_CHUNK_SIZE))
+    if chunker == "regulation":
+        return None, RegulationNodeParser(chunk_size=512, chunk_overlap=32)
+    if chunker == "sentence":
+        return None, SentenceSplitter(chunk_size=700, chunk_overlap=300)
+    raise ValueError(f"Unknown chunker: {chunker}. Valid options: {list(CHUNKERS)}")
+
+
+def recorded_chunker(collection: Any) -> Optional[str]:
+    """The chunker the collection was built with, or None for indexes built before it was recorded."""
+    return (collection.metadata or {}).get(CHUNKER_KEY)
+
+
+def record_chunker(collection: Any, chunker: str) -> None:
+    """Store `chunker` in the collection metadata, keeping the other keys."""
+    if recorded_chunker(collection) == chunker:
+        return
+    metadata = modifiable_metadata(collection.metadata)
+    metadata[CHUNKER_KEY] = chunker
+    collection.modify(metadata=metadata)
+
+
+def resolve_chunker(collection: Any, setting: Optional[str] = None) -> str:
+    """
+    Layout to write new files with: the recorded one, else LEGACY_CHUNKER if
+    the collection already holds nodes, else `setting` (INGEST_CHUNKER by
+    default), else DEFAULT_CHUNKER.
+    """
+    chunker = recorded_chunker(collection)
+    if chunker is None and collection.count():
+        # Built before the chunker was recorded; other layouts can't be mixed into it.
+        chunker = LEGACY_CHUNKER
+    chunker = chunker or setting or os.getenv("INGEST_CHUNKER") or DEFAULT_CHUNKER
+    if chunker not in CHUNKERS:
+        raise ValueError(f"Unknown chunker: {chunker}. Valid options: {list(CHUNKERS)}")
+    return chunker
@@ -0,0 +1,180 @@
+"""
+Micro-batching of query embeddings.
+
+Every concurrent search_regulations call embeds its query on its own, while
+a transformer forward pass over 16 queries costs little more than over one.
+MicroBatcher collects requests for up to `window` seconds (or until
+`max_batch` are waiting), runs one batched call in a worker thread and hands
+each caller its own result. One batch runs at a time; requests that arrive
+meanwhile form the next batch, so under load batches grow on their own and
+an idle server only pays the window once.
+
+MicroBatchEmbedding plugs this into LlamaIndex: it wraps the query-embedding
+path of an embedding model and leaves document embedding untouched.
+
+Settings:
+    RAG_EMBED_BATCH_WINDOW_MS   collection window (default 5; 0 disables batching)
+    RAG_EMBED_MAX_BATCH         largest batch (default 32)
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+
+class MicroBatcher:
+    """Group concurrent single-item async calls into batched calls of `fn`."""
+
+    def __init__(self, fn: Callable[[List[Any]], List[Any]], max_batch: int = 32, window: float = 0.005):
+        """
+        Args:
+            fn: Blocking function mapping a list of items to a list of results (run in a thread)
+            max_batch: Largest number of items per call of fn
+            window: Seconds to wait for more items after the first one arrives
+        """
+        if max_batch < 1 or window < 0:
+            raise ValueError("max_batch must be >= 1 and window must be >= 0.")
+        self.fn = fn
+        self.max_batch = max_batch
+        self.window = window
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.batch_sizes: Dict[int, int] = {}
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+        self.failed_batches = 0
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        return self._queue
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_worker().put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                # Take whatever is already waiting, then wait out the window.
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            live = [(item, future, queued) for item, future, queued in batch if not future.done()]
+            if not live:
+                continue
+            started = time.perf_counter()
+            self._record(len(live), [started - queued for _, _, queued in live])
+            try:
+                results = await asyncio.to_thread(self.fn, [item for item, _, _ in live])
+                if len(results) != len(live):
+                    # zip would leave the callers without a result waiting forever.
+                    raise RuntimeError(f"Batched call returned {len(results)} results for {len(live)} items.")
+            except Exception as e:
+                self.failed_batches += 1
+                for _, future, _ in live:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(live, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _record(self, size: int, delays: List[float]) -> None:
+        self.batches += 1
+        self.items += size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+        self.queue_delay_total += sum(delays)
+        self.queue_delay_max = max(self.queue_delay_max, max(delays))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": round(self.window * 1000, 3),
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "max_batch_size": self.max_batch_seen,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "mean_queue_delay_ms": round(self.queue_delay_total / self.items * 1000, 3) if self.items else None,
+            "max_queue_delay_ms": round(self.queue_delay_max * 1000, 3),
+            "failed_batches": self.failed_batches,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+def _batch_query_fn(inner: BaseEmbedding) -> Callable[[List[str]], List[Embedding]]:
+    """Batched form of inner's query embedding, preserving its query prompt/instruction."""
+    embed = getattr(inner, "_embed", None)
+    if embed is not None:
+        # HuggingFaceEmbedding: _get_query_embedding(q) is _embed(q, prompt_name="query").
+        def batched(queries: List[str]) -> List[Embedding]:
+            return embed(queries, prompt_name="query")
+        return batched
+    return lambda queries: [inner._get_query_embedding(q) for q in queries]
+
+
+class MicroBatchEmbedding(BaseEmbedding):
+    """Batch concurrent async query embeddings of `inner`; everything else passes through."""
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _batcher: MicroBatcher = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, max_batch: int = 32, window_ms: float = 5.0, **kwargs: Any) -> None:
+        super().__init__(model_name=inner.model_name, embed_batch_size=inner.embed_batch_size, **kwargs)
+        self._inner = inner
+        self._batcher = MicroBatcher(_batch_query_fn(inner), max_batch=max_batch, window=window_ms / 1000)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MicroBatchEmbedding"
+
+    @classmethod
+    def wrap(cls, inner: BaseEmbedding) -> BaseEmbedding:
+        """Wrap `inner` using RAG_EMBED_* settings, unless the window is 0."""
+        window_ms = float(os.getenv("RAG_EMBED_BATCH_WINDOW_MS", "5"))
+        if window_ms <= 0:
+            return inner
+        return cls(inner, max_batch=int(os.getenv("RAG_EMBED_MAX_BATCH", "32")), window_ms=window_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._batcher.stats()
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return await self._batcher.submit(query)
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._inner.get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._inner.get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._inner.get_text_embedding_batch(texts)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await self._inner.aget_text_embedding_batch(texts)
@@ -1,21 +1,50 @@
-from llama_index.core import VectorStoreIndex, Settings
+from llama_index.core import VectorStoreIndex, Settings, get_response_synthesizer
 from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 import chromadb
+import os
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable
+
+from server.singleflight import SingleFlight, normalize_query
+from server.microbatch import MicroBatchEmbedding
+from server.small_to_big import ParentExpander, parent_store_path
+from server.facts import FactAnswer, FactIndex, answer_from_facts, facts_path
+from mcp_shared.reload_signal import ReloadSignal, reopen_persistent_client
 
 
 # 🔑 CRITICAL: set embed model AGAIN for query-time
-Settings.embed_model = HuggingFaceEmbedding(
+# Concurrent query embeddings are micro-batched into one forward pass.
+Settings.embed_model = MicroBatchEmbedding.wrap(HuggingFaceEmbedding(
     model_name="BAAI/bge-base-en-v1.5"
-)
+))
 
 # Optional but safe
 Settings.llm = None  # or your local LLM if you have one
 
 
+# ingest.py and ingest_watcher.py write to storage/ from their own process
+# and then signal; queries only see their vectors once the client is reopened.
+_reload_signal = ReloadSignal("storage")
+_client = None
+
+
+def current_index():
+    """The index, reopened first if an ingester signalled new vectors since the last call."""
+    global _client
+    if _client is None:
+        _client = chromadb.PersistentClient(path="storage")
+    elif _reload_signal.changed():
+        _client = reopen_persistent_client(_client)
+        load_index.cache_clear()
+    return load_index()
+
+
+# One index per process: with --workers each worker opens it after the fork.
+@lru_cache(maxsize=1)
 def load_index():
-    client = chromadb.PersistentClient(path="storage")
-    collection = client.get_collection("rag_demo")
+    collection = _client.get_collection("rag_demo")
 
     vector_store = ChromaVectorStore(
         chroma_collection=collection
@@ -26,12 +55,161 @@ def load_index():
     )
 
 
+# Small-to-big: CHILD_TOP_K small chunks are retrieved and expanded to at
+# most TOP_K distinct parent sections. Indexes without a parent docstore
+# (flat chunkers) retrieve TOP_K chunks directly.
+TOP_K = 5
+CHILD_TOP_K = 12
+
+
+# Not lru_cache'd: whether the docstore exists is checked on every call, so
+# re-ingesting with another chunker takes effect without a restart.
+_parent_expander: ParentExpander | None = None
+
+
+def parent_expander() -> ParentExpander | None:
+    global _parent_expander
+    path = parent_store_path("storage")
+    if not os.path.exists(path):
+        return None
+    if _parent_expander is None:
+        _parent_expander = ParentExpander(store_path=path, top_n=TOP_K)
+    return _parent_expander
+
+
+def _retrieval_kwargs() -> dict:
+    expander = parent_expander()
+    if expander is None:
+        return {"similarity_top_k": TOP_K}
+    return {"similarity_top_k": CHILD_TOP_K, "node_postprocessors": [expander]}
+
+
+# Numeric lookups ("minimum total credits", "maximum duration") are answered
+# from the structured fact index built at ingest (see server/facts.py).
+# Like parent_expander(): a missing fact index is looked for again on the next call.
+_fact_index: FactIndex | None = None
+
+
+def load_fact_index() -> FactIndex | None:
+    global _fact_index
+    path = facts_path("storage")
+    if not os.path.exists(path):
+        return None
+    if _fact_index is None:
+        _fact_index = FactIndex(path)
+    return _fact_index
+
+
+_fact_stats = {"lookups": 0, "answered": 0, "lookup_seconds": 0.0}
+
+
+def fact_index_stats() -> dict:
+    lookups = _fact_stats["lookups"]
+    return {
+        "lookups": lookups,
+        "answered": _fact_stats["answered"],
+        "answered_ratio": round(_fact_stats["answered"] / lookups, 4) if lookups else None,
+        "mean_lookup_ms": round(_fact_stats["lookup_seconds"] / lookups * 1000, 3) if lookups else None,
+    }
+
+
+def _fact_answer(question: str) -> FactAnswer | None:
+    index = load_fact_index()
+    if index is None:
+        return None
+    started = time.perf_counter()
+    answer = answer_from_facts(question, index)
+    _fact_stats["lookups"] += 1
+    _fact_stats["lookup_seconds"] += time.perf_counter() - started
+    if answer is not None:
+        _fact_stats["answered"] += 1
+    return answer
+
+
+# Concurrent identical questions share one retrieval + synthesis.
+_flights = SingleFlight()
+
+
+def coalescing_stats() -> dict:
+    return _flights.stats()
+
+
+def embedding_batch_stats() -> dict | None:
+    if isinstance(Settings.embed_model, MicroBatchEmbedding):
+        return Settings.embed_model.stats()
+    return None
+
+
 async def query_rag(question: str) -> str:
-    index = load_index()
+    fact = _fact_answer(question)
+    if fact is not None:
+        return fact.text
+    return await _flights.run(normalize_query(question), lambda: _answer(question))
+
+
+async def _answer(question: str) -> str:
+    index = current_index()
 
     query_engine = index.as_query_engine(
-        similarity_top_k=5
+        **_retrieval_kwargs()
     )
 
     response = await query_engine.aquery(question)
     return str(response)
+
+
+# Streamed text is sent in pieces of at least this many characters (or
+# after this many seconds), not one notification per token.
+STREAM_MIN_CHARS = 200
+STREAM_MAX_DELAY = 0.1
+
+
+def _source(hit) -> dict:
+    metadata = hit.node.metadata
+    return {
+        "file": metadata.get("file_name"),
+        "page": metadata.get("page_label"),
+        "clause": metadata.get("clause_path"),
+        "score": round(hit.score, 4) if hit.score is not None else None,
+        "text": hit.node.get_content(),
+    }
+
+
+async def stream_rag(question: str, emit: Callable[[dict], Awaitable[None]]) -> str:
+    """
+    Answer `question`, emitting partial results as they become available.
+
+    `emit` is called first with {"event": "sources", "sources": [...]} as
+    soon as retrieval finishes, then with {"event": "delta", "text": ...}
+    pieces of the synthesized answer. Streamed calls are not coalesced,
+    since each caller needs its own stream.
+
+    Returns:
+        The full answer text
+    """
+    fact = _fact_answer(question)
+    if fact is not None:
+        await emit({"event": "sources", "sources": fact.sources()})
+        await emit({"event": "delta", "text": fact.text})
+        return fact.text
+
+    index = current_index()
+    retrieval = _retrieval_kwargs()
+    hits = await index.as_retriever(similarity_top_k=retrieval["similarity_top_k"]).aretrieve(question)
+    for postprocessor in retrieval.get("node_postprocessors", []):
+        hits = await postprocessor.apostprocess_nodes(hits, query_str=question)
+    await emit({"event": "sources", "sources": [_source(hit) for hit in hits]})
+
+    response = await get_response_synthesizer(streaming=True).asynthesize(question, hits)
+    answer, pending = [], []
+    last_sent = time.monotonic()
+    async for token in response.async_response_gen():
+        answer.append(token)
+        pending.append(token)
+        if sum(len(t) for t in pending) >= STREAM_MIN_CHARS or time.monotonic() - last_sent >= STREAM_MAX_DELAY:
+            await emit({"event": "delta", "text": "".join(pending)})
+            pending.clear()
+            last_sent = time.monotonic()
+    if pending:
+        await emit({"event": "delta", "text": "".join(pending)})
+    return "".join(answer)
@@ -0,0 +1,79 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+When several agent sessions ask the same question at the same time, only
+the first call runs the work; the others await the same in-flight task and
+get its result (or its exception). Once the task finishes the key is
+released, so later calls compute afresh - this coalesces, it does not cache.
+
+The work runs in its own task and callers await it through asyncio.shield,
+so one caller being cancelled doesn't cancel the answer for the others.
+"""
+
+import asyncio
+import re
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Key for coalescing: case, whitespace and trailing punctuation don't matter."""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    return _WHITESPACE_RE.sub(" ", text).strip().rstrip("?.! ")
+
+
+class SingleFlight:
+    """Share one in-flight computation between concurrent calls with the same key."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+        self._waiters: Dict[str, int] = {}
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await `fn()` unless a call with the same key is already running, in which case await that.
+
+        Args:
+            key: Coalescing key (e.g. normalize_query(question))
+            fn: Zero-argument coroutine function doing the work
+
+        Returns:
+            The (shared) result of fn()
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t, k=key: self._release(k, t))
+        else:
+            self.coalesced += 1
+
+        self._waiters[key] += 1
+        self.max_waiters = max(self.max_waiters, self._waiters[key])
+        return await asyncio.shield(task)
+
+    def _release(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        self._waiters.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller was cancelled meanwhile.
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / self.calls, 4) if self.calls else None,
+            "in_flight": len(self._inflight),
+            "max_waiters": self.max_waiters,
+        }
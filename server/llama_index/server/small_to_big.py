@@ -0,0 +1,141 @@
+"""
+Small-to-big retrieval for the regulations index.
+
+Large, overlapping chunks give the LLM enough context but make every
+vector less specific. Here the two concerns are separated:
+
+- parents: section-sized nodes from RegulationNodeParser (up to
+  PARENT_CHUNK_SIZE tokens). They are not embedded; they live in a local
+  key-value docstore (storage/parent_docstore.json) keyed by node id.
+- children: small, non-overlapping pieces of each parent (CHILD_CHUNK_SIZE
+  tokens). Only these are embedded and written to Chroma; each records its
+  parent as a PARENT relationship, so vector records carry the parent id
+  but not the parent text.
+
+At query time ParentExpander replaces every child hit by its parent,
+keeping the best child score per parent and dropping repeated parents, so
+several matching sentences of one clause cost the context window once.
+Hits without a parent (an index built with a flat chunker) pass through.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.node_parser.interface import NodeParser
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import BaseNode, NodeRelationship, NodeWithScore, QueryBundle, RelatedNodeInfo
+from llama_index.core.storage.docstore import SimpleDocumentStore
+
+PARENT_CHUNK_SIZE = 1024
+CHILD_CHUNK_SIZE = 128
+
+PARENT_STORE_FILE = "parent_docstore.json"
+
+
+class ChildNodeParser(NodeParser):
+    """Split parent nodes into small non-overlapping children that point back to their parent."""
+
+    chunk_size: int = Field(default=CHILD_CHUNK_SIZE, description="Maximum tokens per child node.", gt=0)
+
+    _splitter: SentenceSplitter = PrivateAttr()
+
+    def __init__(self, chunk_size: int = CHILD_CHUNK_SIZE, **kwargs: Any) -> None:
+        super().__init__(chunk_size=chunk_size, **kwargs)
+        self._splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=0)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ChildNodeParser"
+
+    def _parse_nodes(self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs: Any) -> List[BaseNode]:
+        children: List[BaseNode] = []
+        for parent in nodes:
+            # Only the id: the parent's text and metadata stay out of the vector record.
+            parent_info = RelatedNodeInfo(node_id=parent.node_id, node_type=parent.get_type())
+            for child in build_nodes_from_splits(self._splitter.split_text(parent.get_content()), parent,
+                                                 id_func=self.id_func):
+                child.relationships[NodeRelationship.PARENT] = parent_info
+                children.append(child)
+        return children
+
+
+def parent_store_path(storage_dir: str) -> str:
+    return os.path.join(storage_dir, PARENT_STORE_FILE)
+
+
+def load_parent_store(path: str) -> SimpleDocumentStore:
+    """Load the parent docstore, or return an empty one if it doesn't exist yet."""
+    if os.path.exists(path):
+        return SimpleDocumentStore.from_persist_path(path)
+    return SimpleDocumentStore()
+
+
+def save_parent_store(store: SimpleDocumentStore, path: str) -> None:
+    """Persist atomically, so a server reloading the file never sees a partial write."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".parent_docstore_", suffix=".json", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    try:
+        store.persist(persist_path=tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def remove_parents(store: SimpleDocumentStore, file_path: str) -> int:
+    """Delete the parents of one source file; returns how many were removed."""
+    ids = [node_id for node_id, node in store.docs.items() if node.metadata.get("file_path") == file_path]
+    for node_id in ids:
+        store.delete_document(node_id, raise_error=False)
+    return len(ids)
+
+
+class ParentExpander(BaseNodePostprocessor):
+    """Replace child hits by their (deduplicated) parent sections from the parent docstore."""
+
+    store_path: str = Field(description="Path of the persisted parent docstore.")
+    top_n: Optional[int] = Field(default=None, description="Parents to keep; None keeps all.")
+
+    _store: SimpleDocumentStore | None = PrivateAttr(default=None)
+    _mtime: float | None = PrivateAttr(default=None)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ParentExpander"
+
+    def _parents(self) -> SimpleDocumentStore:
+        """The parent docstore, reloaded when the ingester has rewritten the file."""
+        try:
+            mtime = os.path.getmtime(self.store_path)
+        except OSError:
+            mtime = None
+        if self._store is None or mtime != self._mtime:
+            self._store = load_parent_store(self.store_path)
+            self._mtime = mtime
+        return self._store
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        store = self._parents()
+        expanded: Dict[str, NodeWithScore] = {}
+        for hit in nodes:
+            parent_info = hit.node.parent_node
+            parent = store.get_node(parent_info.node_id, raise_error=False) if parent_info else None
+            key = parent.node_id if parent is not None else hit.node.node_id
+            best = expanded.get(key)
+            if best is None:
+                expanded[key] = NodeWithScore(node=parent or hit.node, score=hit.score)
+            elif hit.score is not None and (best.score is None or hit.score > best.score):
+                best.score = hit.score
+        ranked = sorted(expanded.values(), key=lambda h: h.score if h.score is not None else float("-inf"),
+                        reverse=True)
+        return ranked[:self.top_n] if self.top_n else ranked
@@ -0,0 +1,133 @@
+"""
+Pre-fork multi-worker serving for the regulations MCP server.
+
+One process handles every `search_regulations` call today, so embedding and
+retrieval share one core under the GIL. serve_prefork() binds the listening
+socket once, loads everything that can be shared (the embedding model is
+created when server.rag is imported) and then forks N workers that accept
+on the same socket:
+
+- model weights are loaded once in the parent and shared copy-on-write;
+  gc.freeze() keeps the collector from touching (and so copying) those pages,
+- each worker opens the persisted Chroma index itself after the fork and
+  only reads from it,
+- workers run MCP in stateless HTTP mode, since consecutive requests of one
+  client can land on different workers,
+- torch intra-op threads are split between workers to avoid oversubscription.
+
+The parent restarts workers that die and forwards SIGINT/SIGTERM. fork() is
+POSIX-only; elsewhere the server runs as a single process.
+"""
+
+import gc
+import os
+import signal
+import socket
+import time
+
+# Don't respawn a worker that keeps dying faster than this.
+MIN_WORKER_UPTIME = 5.0
+
+
+def default_workers() -> int:
+    return int(os.getenv("RAG_WORKERS", "1"))
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _limit_threads(workers: int) -> None:
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _run_worker(mcp, sock: socket.socket, workers: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _limit_threads(workers)
+    mcp.run(transport="http", sockets=[sock], stateless_http=True, show_banner=False)
+
+
+def serve_prefork(mcp, host: str, port: int, workers: int) -> None:
+    """
+    Serve `mcp` over HTTP from `workers` forked processes sharing one socket.
+
+    Args:
+        mcp: FastMCP server, with shared state (models) already loaded
+        host: Interface to bind
+        port: Port to bind
+        workers: Number of worker processes; 1 runs in-process
+    """
+    if workers < 1:
+        raise ValueError("workers must be a positive integer.")
+    if workers == 1 or not hasattr(os, "fork"):
+        if workers > 1:
+            print("⚠️  fork() is not available on this platform; running a single worker")
+        mcp.run(transport="http", host=host, port=port)
+        return
+
+    sock = _bind(host, port)
+    # Move everything allocated so far out of the collector's reach, so
+    # workers don't copy the shared pages by updating GC headers.
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(mcp, sock, workers)
+            finally:
+                os._exit(0)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(workers):
+        spawn()
+    print(f"🚀 regulations-rag on http://{host}:{port}/mcp with {workers} workers (pids {sorted(children)})")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        uptime = time.monotonic() - started
+        print(f"⚠️  worker {pid} exited (status {status}) after {uptime:.1f}s")
+        if uptime >= MIN_WORKER_UPTIME:
+            spawn()
+        elif not children:
+            print("❌ workers are crashing on startup; giving up")
+            break
+
+    sock.close()
+
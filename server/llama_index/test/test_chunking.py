@@ -0,0 +1,82 @@
+"""Clause and table segmentation of the regulation PDFs."""
+
+from llama_index.core import Document
+
+from server.chunking import RegulationNodeParser, split_into_blocks
+
+LONG_CLAUSE = " ".join(f"Sentence {i} of the attendance rule explains one more condition for the candidate."
+                       for i in range(12))
+
+PAGES = [
+    """1
+1. GENERAL
+1.1 These regulations apply to all programmes.
+1.2 The Principal decides cases not covered here.
+2. CREDIT ASSIGNMENT
+2.1 Credits are assigned as follows:
+Contact period per week Credits
+1 Lecture Period 1
+1 Tutorial Period 1
+2 Practical Periods 1
+2.2 A candidate may take up to
+""",
+    """2
+5 semesters of electives, as approved by the department.
+3. ATTENDANCE
+3.1 """ + LONG_CLAUSE + "\n",
+]
+
+
+def documents(pages):
+    return [Document(text=text, metadata={"file_path": "/data/R2024-BE.pdf", "file_name": "R2024-BE.pdf",
+                                          "page_label": str(n)})
+            for n, text in enumerate(pages, start=1)]
+
+
+def test_blocks_follow_clause_numbering_tables_and_pages():
+    blocks, titles = split_into_blocks(PAGES)
+
+    assert [(b.path, b.kind, b.page) for b in blocks] == [
+        ((1,), "clause", 0), ((1, 1), "clause", 0), ((1, 2), "clause", 0),
+        ((2,), "clause", 0), ((2, 1), "clause", 0), ((2, 1), "table", 0), ((2, 2), "clause", 0),
+        ((3,), "clause", 1), ((3, 1), "clause", 1),
+    ]
+    assert (titles[(1,)], titles[(2,)], titles[(3,)]) == ("GENERAL", "CREDIT ASSIGNMENT", "ATTENDANCE")
+    # The header line joins the table run.
+    assert blocks[5].lines[0] == "Contact period per week Credits" and len(blocks[5].lines) == 4
+    # A clause crossing the page break stays whole, without the page number; "5 semesters"
+    # doesn't continue the numbering, so it is not a heading.
+    assert blocks[6].text == "2.2 A candidate may take up to\n5 semesters of electives, as approved by the department."
+
+
+def test_nodes_pack_small_clauses_and_split_only_oversized_ones():
+    nodes = RegulationNodeParser(chunk_size=64, chunk_overlap=8).get_nodes_from_documents(documents(PAGES))
+    summary = [(n.metadata["clause"], n.metadata["clauses"], n.metadata["block_type"], n.metadata["page_label"])
+               for n in nodes]
+
+    assert summary[:5] == [
+        ("1", "1, 1.1, 1.2", "clause", "1"),
+        ("2", "2, 2.1", "clause", "1"),
+        ("2.1", "2.1", "table", "1"),
+        ("2.2", "2.2", "clause", "1"),
+        ("3", "3", "clause", "2"),
+    ]
+    oversized = [n for n in nodes if n.metadata["clause"] == "3.1"]
+    assert len(oversized) > 1
+    assert all(n.metadata["section_title"] == "ATTENDANCE" for n in oversized)
+    assert "Sentence 11" in oversized[-1].text
+    assert nodes[0].metadata["clause_path"] == "1 GENERAL"
+    assert nodes[3].metadata["clause_path"] == "2 CREDIT ASSIGNMENT > 2.2"
+    assert "clauses" in nodes[0].excluded_embed_metadata_keys
+
+
+def test_long_table_is_split_between_rows_with_its_header():
+    rows = "\n".join(f"{n} Course component {n} {n + 10}" for n in range(1, 41))
+    pages = [f"1. GRADING\n1.1 Components are weighted as follows:\nComponent Weight Marks\n{rows}\n"]
+    nodes = RegulationNodeParser(chunk_size=64, chunk_overlap=8).get_nodes_from_documents(documents(pages))
+
+    tables = [n for n in nodes if n.metadata["block_type"] == "table"]
+    assert len(tables) > 1
+    assert all(n.text.startswith("Component Weight Marks\n") for n in tables)
+    table_rows = [line for n in tables for line in n.text.splitlines()[1:]]
+    assert table_rows == rows.splitlines()
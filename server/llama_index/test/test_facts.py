@@ -0,0 +1,104 @@
+"""Fact extraction from regulation pages and the lookup fast path."""
+
+import pytest
+from llama_index.core import Document
+
+from server.facts import FactIndex, answer_from_facts, extract_facts
+
+BE_PAGES = [
+    """1
+1. CREDIT REQUIREMENTS
+1.1 The minimum number of credits to complete the BE/BTech programme is 163 with 120 credits under professional core courses and 18 credits under open elective courses.
+1.2 Maximum number of credits a candidate can enroll in a particular semester cannot exceed 27 credits.
+2. DURATION OF THE PROGRAMME
+2.1 A candidate shall complete the programme in eight consecutive semesters / 4 Years (six semesters / 3 Years for lateral entry) and not more than fourteen semesters / 7 Years (twelve semesters / 6 Years for lateral entry).
+3. ATTENDANCE
+3.1 A candidate shall secure not less than 75% overall attendance
+""",
+    """2
+in the semester to appear for the end semester examinations.
+3.2 A candidate shall have not less than 60% attendance in each course.
+3.3 A candidate absent for medical reasons may be permitted by the Principal if the attendance is not less than 65%. A candidate can avail this provision only twice during the programme.
+""",
+]
+
+MBA_PAGES = [
+    """1
+1. ATTENDANCE
+1.1 A student of the MBA Degree programme shall secure not less than 80% overall attendance in every trimester.
+""",
+]
+
+
+def pages(file_name, texts):
+    return [Document(text=text, metadata={"file_name": file_name, "page_label": str(n)})
+            for n, text in enumerate(texts, start=1)]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = FactIndex(str(tmp_path / "facts.sqlite"))
+    index.replace_file("R2024-BE-Regulations.pdf", extract_facts(pages("R2024-BE-Regulations.pdf", BE_PAGES)))
+    return index
+
+
+def test_extracts_credits_durations_and_attendance():
+    facts = {(f.fact, f.qualifier): f for f in extract_facts(pages("R2024-BE-Regulations.pdf", BE_PAGES))}
+    assert {f.regulation for f in facts.values()} == {"R2024"}
+    assert {f.programme for f in facts.values()} == {"BE/BTech"}
+
+    values = {key: fact.value for key, fact in facts.items()}
+    assert values == {
+        ("min_total_credits", ""): 163,
+        ("credits_by_category", "professional core"): 120,
+        ("credits_by_category", "open elective"): 18,
+        ("max_credits_per_term", "semester"): 27,
+        ("normal_duration", ""): 4,
+        ("max_duration", ""): 7,
+        ("normal_duration", "lateral entry"): 3,
+        ("max_duration", "lateral entry"): 6,
+        ("attendance_overall_min", ""): 75,
+        ("attendance_course_min", ""): 60,
+        ("attendance_medical_min", ""): 65,
+        ("medical_condonation_limit", ""): 2,
+    }
+    # Where each fact was found.
+    assert (facts[("max_credits_per_term", "semester")].clause, facts[("max_credits_per_term", "semester")].page_label) == ("1.2", "1")
+    assert (facts[("attendance_course_min", "")].clause, facts[("attendance_course_min", "")].page_label) == ("3.2", "2")
+
+
+def test_answers_plain_lookups(index):
+    answer = answer_from_facts("What is the minimum total credits for B.E.?", index)
+    assert answer.intent == "total_credits"
+    assert "Minimum total credits: 163" in answer.text and "120 credits under professional core" in answer.text
+    assert answer.sources()[0] == {"file": "R2024-BE-Regulations.pdf", "page": "1", "clause": "1.1",
+                                   "score": None, "text": "Minimum total credits: 163"}
+
+    assert answer_from_facts("Maximum duration to complete the degree?", index).facts[0].value == 7
+    attendance = answer_from_facts("What is the minimum attendance required in R2024?", index)
+    assert [f.value for f in attendance.facts] == [75, 60]
+
+
+@pytest.mark.parametrize("question", [
+    "If I have 74% attendance, can I write the exam?",
+    "Can I register for 30 credits in one semester?",
+    "What happens if my attendance is below 75%?",
+])
+def test_conditional_questions_fall_back_to_rag(index, question):
+    assert answer_from_facts(question, index) is None
+
+
+def test_year_without_facts_falls_back_to_rag(index):
+    assert answer_from_facts("What is the minimum attendance required in R2019?", index) is None
+
+
+def test_partial_coverage_needs_a_named_programme(index):
+    index.replace_file("R2024-MBA-Regulations.pdf", extract_facts(pages("R2024-MBA-Regulations.pdf", MBA_PAGES)))
+    assert index.programmes("R2024") == ["BE/BTech", "MBA"]
+
+    # MBA has no credit facts, so an answer listing only BE/BTech would be misleading.
+    assert answer_from_facts("What is the minimum total credits?", index) is None
+    assert answer_from_facts("What is the minimum total credits for BTech?", index).facts[0].value == 163
+    both = answer_from_facts("What is the minimum attendance required?", index)
+    assert {(f.programme, f.value) for f in both.facts if f.fact == "attendance_overall_min"} == {
+        ("BE/BTech", 75), ("MBA", 80)}
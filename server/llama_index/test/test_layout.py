@@ -0,0 +1,47 @@
+"""Recording the chunker layout of the regulations index."""
+
+import chromadb
+import pytest
+from chromadb.api.shared_system_client import SharedSystemClient
+
+from server.chunking import RegulationNodeParser
+from server.layout import node_parsers, record_chunker, recorded_chunker, resolve_chunker
+from server.small_to_big import ChildNodeParser
+
+
+@pytest.fixture
+def collection(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path / "storage"))
+    yield client.create_collection("rag_demo", metadata={"hnsw:space": "cosine", "owner": "exam cell"})
+    SharedSystemClient.clear_system_cache()
+
+
+def test_recorded_chunker_wins_over_the_setting(collection, monkeypatch):
+    monkeypatch.delenv("INGEST_CHUNKER", raising=False)
+    assert recorded_chunker(collection) is None
+    assert resolve_chunker(collection) == "small_to_big"
+    assert resolve_chunker(collection, "sentence") == "sentence"
+
+    record_chunker(collection, "regulation")
+    assert collection.metadata == {"owner": "exam cell", "chunker": "regulation"}
+    assert collection.configuration_json["hnsw"]["space"] == "cosine"
+    assert resolve_chunker(collection, "sentence") == "regulation"
+
+
+def test_unrecorded_index_with_nodes_keeps_the_sentence_window(collection, monkeypatch):
+    monkeypatch.setenv("INGEST_CHUNKER", "small_to_big")
+    collection.add(ids=["n1"], documents=["Attendance below 75% bars the examination."], embeddings=[[1.0, 0.0]])
+    assert resolve_chunker(collection) == "sentence"
+    assert resolve_chunker(collection, "regulation") == "sentence"
+
+
+def test_unknown_chunker_is_rejected(collection):
+    with pytest.raises(ValueError, match="Unknown chunker"):
+        resolve_chunker(collection, "pages")
+
+
+def test_only_small_to_big_has_parents():
+    parent, child = node_parsers("small_to_big")
+    assert isinstance(parent, RegulationNodeParser) and isinstance(child, ChildNodeParser)
+    assert node_parsers("regulation")[0] is None
+    assert node_parsers("sentence")[0] is None
@@ -0,0 +1,60 @@
+"""Results and errors of micro-batched calls."""
+
+import asyncio
+
+import pytest
+
+from server.microbatch import MicroBatcher
+
+
+def submit_all(batcher, items):
+    async def main():
+        return await asyncio.gather(*(batcher.submit(item) for item in items), return_exceptions=True)
+    return asyncio.run(main())
+
+
+def test_concurrent_items_share_one_call():
+    calls = []
+
+    def double(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch=8, window=0.01)
+    assert submit_all(batcher, [1, 2, 3]) == [2, 4, 6]
+    assert calls == [[1, 2, 3]]
+
+
+def test_failed_batch_fails_each_caller_and_the_next_batch_runs():
+    def flaky(items):
+        if "bad" in items:
+            raise RuntimeError("model not loaded")
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(flaky, max_batch=2, window=0.01)
+
+    async def main():
+        failed = await asyncio.gather(batcher.submit("bad"), batcher.submit("ok"), return_exceptions=True)
+        return failed, await batcher.submit("fine")
+
+    failed, recovered = asyncio.run(main())
+    assert [str(error) for error in failed] == ["model not loaded"] * 2
+    assert recovered == "FINE"
+    assert batcher.stats()["failed_batches"] == 1
+
+
+def test_wrong_number_of_results_fails_instead_of_hanging():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch=4, window=0.01)
+
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True), timeout=2
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) and "1 results for 3 items" in str(r) for r in results)
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        MicroBatcher(lambda items: items, max_batch=0)
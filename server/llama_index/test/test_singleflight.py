@@ -0,0 +1,55 @@
+"""Results and errors of coalesced identical calls."""
+
+import asyncio
+
+import pytest
+
+from server.singleflight import SingleFlight, normalize_query
+
+
+def test_normalized_questions_share_a_key():
+    assert normalize_query("  Minimum   CREDITS for B.E.? ") == normalize_query("minimum credits for b.e.")
+
+
+def test_error_reaches_every_waiter_and_the_key_is_released():
+    flights = SingleFlight()
+    runs = []
+
+    async def failing():
+        runs.append("failing")
+        await asyncio.sleep(0.01)
+        raise RuntimeError("index not loaded")
+
+    async def answer():
+        runs.append("answer")
+        return "42 credits"
+
+    async def main():
+        results = await asyncio.gather(*(flights.run("q", failing) for _ in range(3)), return_exceptions=True)
+        # Not cached: the next call runs again.
+        return results, await flights.run("q", answer)
+
+    results, retried = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) and str(r) == "index not loaded" for r in results)
+    assert retried == "42 credits"
+    assert runs == ["failing", "answer"]
+    assert flights.stats()["coalesced"] == 2 and flights.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    flights = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        first = asyncio.ensure_future(flights.run("q", slow))
+        second = asyncio.ensure_future(flights.run("q", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "answer"
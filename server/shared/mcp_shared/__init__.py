@@ -0,0 +1,12 @@
+"""
+Modules shared by the Chroma MCP server (server/chromadb) and the
+regulations RAG server (server/llama_index):
+
+- admission: per-tool concurrency limits, wait queues and deadlines
+- profiling: live CPU and memory profiles of a running server
+- embedding_cache: on-disk embedding cache used by both ingestion paths
+- reload_signal: lets ingesters tell running servers to reopen their Chroma client
+- collection_metadata: collection metadata without the keys Chroma's modify() rejects
+
+Install once per environment with `pip install -e server/shared`.
+"""
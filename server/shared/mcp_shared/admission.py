@@ -0,0 +1,189 @@
+"""
+Admission control, deadlines and load shedding for FastMCP servers.
+
+AdmissionControl is a FastMCP middleware that gives every tool a gate:
+
+- at most `max_in_flight` calls of the tool run at once,
+- up to `max_queue` further calls wait for a slot; when the queue is full
+  the call fails immediately with an "overloaded" error instead of piling
+  onto the event loop,
+- every call has a deadline (the tool's `timeout`, or a shorter
+  `deadline_ms` sent by the client in the request `_meta`). Time spent
+  queued counts against it; when it passes, the call is cancelled and
+  fails with a "deadline exceeded" error.
+
+Cancelling a call stops its coroutine. Work already handed to a thread
+(asyncio.to_thread) runs to completion in the background, but its result
+is discarded.
+
+Used by both mcp_chroma_server.py and the regulations server
+(server/llama_index/server.py). Limits of 0 mean "unlimited".
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict
+
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+
+@dataclass
+class ToolLimit:
+    """Admission limits of one tool; 0 disables the respective limit."""
+    max_in_flight: int = 0
+    max_queue: int = 0
+    timeout: float = 0.0
+
+
+class _Gate:
+    """Concurrency slot pool and counters of one tool."""
+
+    def __init__(self, limit: ToolLimit):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit.max_in_flight) if limit.max_in_flight > 0 else None
+        self.in_flight = 0
+        self.waiting = 0
+        self.counters = {"admitted": 0, "completed": 0, "failed": 0, "rejected": 0,
+                         "timed_out_queued": 0, "timed_out_running": 0, "cancelled": 0}
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        admitted = self.counters["admitted"]
+        return {
+            "limit": asdict(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            **self.counters,
+            "mean_queue_wait_ms": round(self.queue_wait_total / admitted * 1000, 3) if admitted else None,
+            "max_queue_wait_ms": round(self.queue_wait_max * 1000, 3),
+        }
+
+
+def _requested_deadline(context: MiddlewareContext) -> float | None:
+    """Client-requested deadline in seconds, from the request's `_meta.deadline_ms`."""
+    meta = getattr(context.message, "meta", None)
+    if meta is None and context.fastmcp_context is not None:
+        try:
+            meta = context.fastmcp_context.request_context.meta
+        except Exception:
+            meta = None
+    if meta is None:
+        return None
+    if isinstance(meta, dict):
+        value = meta.get("deadline_ms")
+    else:
+        value = getattr(meta, "deadline_ms", None)
+        if value is None:
+            value = (getattr(meta, "model_extra", None) or {}).get("deadline_ms")
+    try:
+        return float(value) / 1000 if value is not None and float(value) > 0 else None
+    except (TypeError, ValueError):
+        return None
+
+
+class AdmissionControl(Middleware):
+    """Per-tool concurrency limits, bounded wait queues and deadlines."""
+
+    def __init__(self, default: ToolLimit, overrides: Dict[str, ToolLimit] | None = None):
+        """
+        Args:
+            default: Limits applied to tools without an override
+            overrides: Tool name -> limits
+        """
+        for limit in [default, *(overrides or {}).values()]:
+            if limit.max_in_flight < 0 or limit.max_queue < 0 or limit.timeout < 0:
+                raise ValueError("Admission limits must be >= 0 (0 means unlimited).")
+        self.default = default
+        self.overrides = dict(overrides or {})
+        self._gates: Dict[str, _Gate] = {}
+
+    def _gate(self, tool: str) -> _Gate:
+        gate = self._gates.get(tool)
+        if gate is None:
+            gate = self._gates[tool] = _Gate(self.overrides.get(tool, self.default))
+        return gate
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool = context.message.name
+        gate = self._gate(tool)
+        limit = gate.limit
+
+        timeout = limit.timeout or None
+        requested = _requested_deadline(context)
+        if requested is not None:
+            timeout = min(timeout, requested) if timeout else requested
+        deadline = time.monotonic() + timeout if timeout else None
+
+        queued_at = time.monotonic()
+        if gate.semaphore is not None:
+            if gate.semaphore.locked() and limit.max_queue and gate.waiting >= limit.max_queue:
+                gate.counters["rejected"] += 1
+                raise ToolError(
+                    f"Server overloaded: {tool} has {gate.in_flight} calls running and "
+                    f"{gate.waiting} queued. Retry later."
+                )
+            gate.waiting += 1
+            try:
+                if deadline is None:
+                    await gate.semaphore.acquire()
+                else:
+                    await asyncio.wait_for(gate.semaphore.acquire(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                gate.counters["timed_out_queued"] += 1
+                raise ToolError(f"Deadline exceeded: {tool} waited {timeout:.1f}s for a free slot") from None
+            finally:
+                gate.waiting -= 1
+
+        waited = time.monotonic() - queued_at
+        gate.queue_wait_total += waited
+        gate.queue_wait_max = max(gate.queue_wait_max, waited)
+        gate.counters["admitted"] += 1
+        gate.in_flight += 1
+        try:
+            if deadline is None:
+                result = await call_next(context)
+            else:
+                result = await asyncio.wait_for(call_next(context), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            gate.counters["timed_out_running"] += 1
+            raise ToolError(f"Deadline exceeded: {tool} did not finish within {timeout:.1f}s") from None
+        except asyncio.CancelledError:
+            gate.counters["cancelled"] += 1
+            raise
+        except Exception:
+            gate.counters["failed"] += 1
+            raise
+        finally:
+            gate.in_flight -= 1
+            if gate.semaphore is not None:
+                gate.semaphore.release()
+        gate.counters["completed"] += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-tool counters plus totals of rejected and timed-out calls."""
+        tools = {tool: gate.stats() for tool, gate in sorted(self._gates.items())}
+        return {
+            "default_limit": asdict(self.default),
+            "rejected": sum(t["rejected"] for t in tools.values()),
+            "timed_out": sum(t["timed_out_queued"] + t["timed_out_running"] for t in tools.values()),
+            "tools": tools,
+        }
+
+
+def parse_tool_limits(spec: str | None) -> Dict[str, ToolLimit]:
+    """
+    Parse per-tool overrides from JSON, e.g.
+    '{"chroma_query_documents": {"max_in_flight": 8, "timeout": 10}}'.
+    """
+    if not spec:
+        return {}
+    try:
+        raw = json.loads(spec)
+        return {tool: ToolLimit(**values) for tool, values in raw.items()}
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid tool limits: {spec} ({e})") from e
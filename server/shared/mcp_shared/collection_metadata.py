@@ -0,0 +1,15 @@
+"""
+Collection metadata that can be passed back to Chroma's modify().
+
+Collections created with legacy `hnsw:*` metadata keys (e.g. `hnsw:space`)
+report them in `collection.metadata`, but modify() rejects them. The HNSW
+configuration itself stays with the collection, so writers drop these keys
+when they copy the metadata to change or add a key.
+"""
+
+from typing import Any, Dict, Mapping, Optional
+
+
+def modifiable_metadata(metadata: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    """Copy of `metadata` without the `hnsw:*` keys modify() rejects."""
+    return {k: v for k, v in (metadata or {}).items() if not k.startswith("hnsw:")}
@@ -0,0 +1,491 @@
+"""
+Persistent, content-addressed embedding cache.
+
+Both ingestion paths (ingest_json_to_chroma.py with sentence-transformers
+and server/llama_index/server/ingest.py with bge-base via LlamaIndex)
+recompute every embedding on every run, although most chunk texts were
+seen before and the programme regulations share large blocks of text.
+This cache stores each vector once, keyed by
+
+    (model name, model revision, hash of the normalized text)
+
+The model name and revision select a cache directory; inside it rows are
+addressed by a 16-byte BLAKE2b digest of the text after Unicode (NFKC) and
+whitespace normalization. Each directory holds:
+
+    meta.json       - model, revision, dimension, row count, generation
+    keys.npy        - (capacity,) 16-byte digest of each row's text, memory-mapped
+    vectors.npy     - (capacity, dimension) float32, memory-mapped
+    last_used.npy   - (capacity,) int64 use ticks for LRU eviction
+    .lock           - lock file serializing writers
+
+Files grow by doubling. When the directory exceeds `max_bytes` the least
+recently used rows are dropped and the files compacted.
+
+Several processes may share a cache directory (the ingesters, the ingest
+watcher). Writers append rows and publish the new row count in meta.json
+while holding an exclusive lock on `.lock`. Growing or compacting writes
+new files, swaps them in and bumps the generation in meta.json; rows are
+never moved inside a file another process may have mapped. Readers pick
+up new rows, or reload after a new generation, under a shared lock before
+each lookup, and check each row's stored digest against the text they
+asked for, so a row index from an outdated view is never trusted.
+
+Usage:
+    python -m mcp_shared.embedding_cache stats
+    python -m mcp_shared.embedding_cache clear --model all-MiniLM-L6-v2
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import unicodedata
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# server/embedding_cache in a source checkout (the package is installed editable).
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / "embedding_cache"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+CACHE_FORMAT_VERSION = 2
+DIGEST_SIZE = 16
+INITIAL_CAPACITY = 1024
+
+# Fraction of max_bytes kept after an eviction pass, so eviction doesn't run on every put.
+EVICT_TO = 0.8
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text before hashing so cosmetic differences share one entry."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def text_digest(text: str) -> bytes:
+    """16-byte content address of a text."""
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+def model_revision(model_name: str) -> str:
+    """
+    Best-effort revision (Hugging Face snapshot hash) of a locally cached model.
+
+    EMBEDDING_CACHE_REVISION overrides the lookup. Falls back to "unknown",
+    in which case entries are keyed by model name only.
+    """
+    override = os.getenv("EMBEDDING_CACHE_REVISION")
+    if override:
+        return override
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return "unknown"
+    candidates = [model_name] if "/" in model_name else [f"sentence-transformers/{model_name}", model_name]
+    for repo_id in candidates:
+        try:
+            path = try_to_load_from_cache(repo_id, "config.json")
+        except Exception:
+            continue
+        if isinstance(path, str):
+            # .../models--org--name/snapshots/<revision>/config.json
+            return Path(path).parent.name
+    return "unknown"
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9._-]+", "_", value).strip("._-") or "model"
+
+
+def _remove_entries(path: Path) -> None:
+    """Delete a model cache's files, keeping its lock file: other processes may be waiting on it."""
+    for child in path.iterdir():
+        if child.name != ".lock":
+            child.unlink()
+
+
+@contextmanager
+def _file_lock(path: Path, shared: bool = False) -> Iterator[None]:
+    """Hold an advisory lock on `path` (created if missing); shared for readers, exclusive for writers."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            # msvcrt has no shared locks; readers take the exclusive one too.
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class EmbeddingCache:
+    """On-disk embedding cache for one model revision."""
+
+    def __init__(
+        self,
+        model_name: str,
+        revision: str | None = None,
+        cache_dir: str | None = None,
+        max_bytes: int | None = None,
+    ):
+        """
+        Open (or create) the cache directory for a model.
+
+        Args:
+            model_name: Embedding model name, e.g. "BAAI/bge-base-en-v1.5"
+            revision: Model revision; looked up with model_revision() if omitted
+            cache_dir: Root cache directory (default: EMBEDDING_CACHE_DIR or server/embedding_cache)
+            max_bytes: Size limit of this model's cache (default: EMBEDDING_CACHE_MAX_MB or 1 GiB)
+        """
+        self.model_name = model_name
+        self.revision = revision or model_revision(model_name)
+        root = Path(cache_dir or os.getenv("EMBEDDING_CACHE_DIR") or DEFAULT_CACHE_DIR)
+        self.path = root / f"{_slug(model_name)}@{_slug(self.revision)}"
+        if max_bytes is None:
+            max_mb = os.getenv("EMBEDDING_CACHE_MAX_MB")
+            max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be a positive integer.")
+        self.max_bytes = max_bytes
+
+        self.dimension: int | None = None
+        self.count = 0
+        self.generation = 0
+        self._keys = None
+        self._vectors = None
+        self._last_used = None
+        self._rows: Dict[bytes, int] = {}
+        self._tick = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        with self._locked(shared=True):
+            self._refresh()
+
+    ##### Storage #####
+
+    def _file(self, name: str) -> Path:
+        return self.path / name
+
+    def _locked(self, shared: bool = False):
+        return _file_lock(self.path / ".lock", shared=shared)
+
+    def _reset(self) -> None:
+        self._keys = self._vectors = self._last_used = None
+        self.dimension = None
+        self.count = 0
+        self.generation = 0
+        self._rows = {}
+        self._tick = 0
+
+    def _refresh(self) -> None:
+        """Catch up with rows and files written by other processes; call with the lock held."""
+        try:
+            with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            if self._keys is not None:
+                self._reset()  # Cleared by another process.
+            return
+        if meta.get("format_version") != CACHE_FORMAT_VERSION:
+            # Unknown layout; start over rather than misread vectors.
+            self._reset()
+            _remove_entries(self.path)
+            return
+        if self._keys is not None and (meta["generation"], meta["count"]) == (self.generation, self.count):
+            return
+
+        if self._keys is None or meta["generation"] != self.generation:
+            self._keys = np.load(self._file("keys.npy"), mmap_mode="r+")
+            self._vectors = np.load(self._file("vectors.npy"), mmap_mode="r+")
+            self._last_used = np.load(self._file("last_used.npy"), mmap_mode="r+")
+            self._rows = {}
+            known = 0
+        else:
+            # Same files; only rows past our count are new.
+            known = self.count
+        self.dimension = meta["dimension"]
+        self.count = meta["count"]
+        self.generation = meta["generation"]
+        self._rows.update((bytes(self._keys[row]), row) for row in range(known, self.count))
+        if self.count:
+            self._tick = max(self._tick, int(self._last_used[:self.count].max()))
+
+    def _rewrite(self, capacity: int, rows: np.ndarray | None = None) -> None:
+        """
+        Write the kept rows into new files of `capacity` rows and swap them in.
+
+        Processes that still map the old files keep reading them unchanged,
+        so rows are never moved under a reader.
+
+        Args:
+            capacity: Rows the new files can hold
+            rows: Indices of the rows to keep, in order (default: all)
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        if rows is None:
+            rows = np.arange(self.count)
+        arrays = {
+            "keys.npy": (np.dtype(f"S{DIGEST_SIZE}"), (capacity,), self._keys),
+            "vectors.npy": (np.dtype(np.float32), (capacity, self.dimension), self._vectors),
+            "last_used.npy": (np.dtype(np.int64), (capacity,), self._last_used),
+        }
+        opened = {}
+        for name, (dtype, shape, old) in arrays.items():
+            tmp = self._file(name + ".tmp")
+            out = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=shape)
+            if old is not None and len(rows):
+                out[:len(rows)] = old[rows]
+            out.flush()
+            del out
+            opened[name] = tmp
+        # Release the old maps before replacing their files (required on Windows).
+        arrays.clear()
+        self._keys = self._vectors = self._last_used = None
+        for name, tmp in opened.items():
+            os.replace(tmp, self._file(name))
+        self._keys = np.load(self._file("keys.npy"), mmap_mode="r+")
+        self._vectors = np.load(self._file("vectors.npy"), mmap_mode="r+")
+        self._last_used = np.load(self._file("last_used.npy"), mmap_mode="r+")
+        self.count = len(rows)
+        self._rows = {bytes(key): row for row, key in enumerate(self._keys[:self.count])}
+        self.generation += 1
+
+    @property
+    def _row_bytes(self) -> int:
+        return DIGEST_SIZE + 8 + 4 * (self.dimension or 0)
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._keys is None else len(self._keys)
+
+    def size_bytes(self) -> int:
+        """Bytes used by stored rows (allocated file space can be up to twice this)."""
+        return self.count * self._row_bytes
+
+    ##### Lookups #####
+
+    def get_many(self, texts: Sequence[str]) -> List[np.ndarray | None]:
+        """Cached vectors for `texts`, with None for misses."""
+        with self._locked(shared=True):
+            self._refresh()
+        results: List[np.ndarray | None] = []
+        for text in texts:
+            digest = text_digest(text)
+            row = self._rows.get(digest)
+            if row is not None and bytes(self._keys[row]) != digest:
+                # Not the row we indexed; never serve another text's vector.
+                del self._rows[digest]
+                row = None
+            if row is None:
+                self.misses += 1
+                results.append(None)
+                continue
+            self.hits += 1
+            self._tick += 1
+            # A racy LRU hint; concurrent writers may overwrite it.
+            self._last_used[row] = self._tick
+            results.append(np.array(self._vectors[row]))
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors) -> None:
+        """Store and publish vectors for `texts`; texts already cached keep their entry."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if len(texts) != len(vectors):
+            raise ValueError(f"Got {len(texts)} texts but {len(vectors)} vectors")
+        if not len(texts):
+            return
+
+        with self._locked():
+            self._refresh()
+            if self.dimension is None:
+                self.dimension = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match cache dimension {self.dimension} "
+                    f"for model '{self.model_name}'"
+                )
+
+            for text, vector in zip(texts, vectors):
+                digest = text_digest(text)
+                row = self._rows.get(digest)
+                if row is None:
+                    if self.count >= self.capacity:
+                        self._rewrite(max(INITIAL_CAPACITY, self.capacity * 2))
+                    # Appended past the published count, so no reader looks at it yet.
+                    row = self.count
+                    self.count += 1
+                    self._vectors[row] = vector
+                    self._keys[row] = digest
+                    self._rows[digest] = row
+                self._tick += 1
+                self._last_used[row] = self._tick
+
+            if self.size_bytes() > self.max_bytes:
+                self._evict(int(self.max_bytes * EVICT_TO))
+            self._publish()
+
+    def _evict(self, target_bytes: int) -> None:
+        """Drop least recently used rows until the cache fits in `target_bytes`, into new files."""
+        keep = max(0, target_bytes // self._row_bytes)
+        order = np.argsort(self._last_used[:self.count])[::-1][:keep]
+        order.sort()
+        self.evicted += self.count - len(order)
+        self._rewrite(max(INITIAL_CAPACITY, len(order)), rows=order)
+
+    def embed(self, texts: Sequence[str], embed_fn: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Embed `texts`, computing only the misses with `embed_fn`.
+
+        Duplicate texts within one call are embedded once.
+
+        Args:
+            texts: Texts to embed
+            embed_fn: Function mapping a list of texts to a (n, dimension) array-like
+
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        texts = list(texts)
+        cached = self.get_many(texts)
+        missing: Dict[bytes, List[int]] = {}
+        for i, vector in enumerate(cached):
+            if vector is None:
+                missing.setdefault(text_digest(texts[i]), []).append(i)
+
+        if missing:
+            first = [positions[0] for positions in missing.values()]
+            computed = np.atleast_2d(np.asarray(embed_fn([texts[i] for i in first]), dtype=np.float32))
+            self.put_many([texts[i] for i in first], computed)
+            for positions, vector in zip(missing.values(), computed):
+                for i in positions:
+                    cached[i] = vector
+
+        if not cached:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return np.stack(cached)
+
+    ##### Persistence & reporting #####
+
+    def flush(self) -> None:
+        """Persist LRU ticks; rows are already published by put_many()."""
+        with self._locked():
+            self._refresh()
+            self._publish()
+
+    def _publish(self) -> None:
+        """Flush the maps, then make the rows visible to other processes; call with the lock held."""
+        if self._keys is None:
+            return
+        for array in (self._keys, self._vectors, self._last_used):
+            array.flush()
+        meta = {
+            "format_version": CACHE_FORMAT_VERSION,
+            "model_name": self.model_name,
+            "revision": self.revision,
+            "dimension": self.dimension,
+            "count": self.count,
+            "generation": self.generation,
+        }
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, self._file("meta.json"))
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process and the cache's current size."""
+        lookups = self.hits + self.misses
+        return {
+            "model_name": self.model_name,
+            "revision": self.revision,
+            "path": str(self.path),
+            "entries": self.count,
+            "dimension": self.dimension,
+            "size_bytes": self.size_bytes(),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evicted": self.evicted,
+        }
+
+    def clear(self) -> None:
+        """Delete every entry of this model revision."""
+        with self._locked():
+            self._reset()
+            _remove_entries(self.path)
+
+
+def cache_enabled() -> bool:
+    """The cache is on unless EMBEDDING_CACHE=off."""
+    return os.getenv("EMBEDDING_CACHE", "on").lower() not in ("off", "0", "false", "no")
+
+
+def list_caches(cache_dir: str | None = None) -> List[Dict[str, Any]]:
+    """Manifest of every model cache under the root directory."""
+    root = Path(cache_dir or os.getenv("EMBEDDING_CACHE_DIR") or DEFAULT_CACHE_DIR)
+    caches = []
+    for meta_path in sorted(root.glob("*/meta.json")):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        meta["path"] = str(meta_path.parent)
+        meta["disk_bytes"] = sum(p.stat().st_size for p in meta_path.parent.iterdir() if p.is_file())
+        caches.append(meta)
+    return caches
+
+
+def create_parser():
+    """Create and return the argument parser."""
+    parser = argparse.ArgumentParser(description='Inspect or clear the shared embedding cache')
+    parser.add_argument('--cache-dir', default=os.getenv('EMBEDDING_CACHE_DIR', str(DEFAULT_CACHE_DIR)),
+                        help='Root directory of the embedding cache')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('stats', help='List cached models with entry counts and sizes')
+    clear_parser = sub.add_parser('clear', help='Delete cached embeddings')
+    clear_parser.add_argument('--model', default=None, help='Only clear this model (default: all)')
+    return parser
+
+
+def main():
+    """Command line entry point."""
+    args = create_parser().parse_args()
+    caches = list_caches(args.cache_dir)
+
+    if args.command == 'stats':
+        if not caches:
+            print(f"No embedding caches under {args.cache_dir}")
+        for meta in caches:
+            print(f"{meta['model_name']} @ {meta['revision']}: {meta['count']} entries, "
+                  f"dim {meta['dimension']}, {meta['disk_bytes'] / 1024 / 1024:.1f} MB on disk")
+    else:
+        for meta in caches:
+            if args.model in (None, meta['model_name']):
+                with _file_lock(Path(meta['path']) / ".lock"):
+                    _remove_entries(Path(meta['path']))
+                print(f"✓ Cleared {meta['model_name']} @ {meta['revision']}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
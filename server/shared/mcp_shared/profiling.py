@@ -0,0 +1,303 @@
+"""
+On-demand profiling of a running MCP server process.
+
+LiveProfiler captures one time-bounded window of the live process:
+
+- CPU, either
+  - "sampling": a background thread records the stack of every thread
+    each `interval` seconds (sys._current_frames). It sees the event loop
+    and work handed to threads (asyncio.to_thread, Chroma, the LLM client)
+    at low overhead. Threads parked in select/wait/queue.get count as idle
+    and are left out of the ranking.
+  - "cprofile": deterministic cProfile of the event-loop thread only;
+    exact call counts, but higher overhead and blind to worker threads.
+- memory: tracemalloc snapshots at the start and end of the window. Sites
+  are ranked by growth during the window, plus the largest live sites.
+  Allocations made before the window are only visible when tracing was
+  already on (PYTHONTRACEMALLOC=1).
+
+The summary (top functions and allocation sites) is returned; with
+save=True the full data is also written to `output_dir`: collapsed stacks
+(.folded, for flamegraph.pl or speedscope), a pstats dump (.prof) and a
+tracemalloc snapshot (.tracemalloc).
+
+Only one capture runs at a time per process. Used by mcp_chroma_server.py
+and the regulations server (server/llama_index/server.py); both register
+their profiling tool only when started with --enable-profiling.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import cProfile
+import pstats
+import threading
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+CPU_MODES = ("sampling", "cprofile", "off")
+
+# (file name, function) of leaf frames where a thread is waiting, not working.
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("selectors.py", "poll"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socket.py", "accept"),
+    ("connection.py", "wait"),
+}
+
+Frame = Tuple[str, int, str]
+
+
+def _short_path(filename: str) -> str:
+    """Last two path components, e.g. 'chromadb/mcp_chroma_server.py'."""
+    parts = Path(filename).parts
+    return os.path.join(*parts[-2:]) if len(parts) >= 2 else filename
+
+
+def _label(frame: Frame) -> str:
+    filename, lineno, name = frame
+    return f"{name} ({_short_path(filename)}:{lineno})"
+
+
+class _StackSampler(threading.Thread):
+    """Records the stacks of all other threads every `interval` seconds."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.interval = interval
+        self.samples = 0
+        self.idle = 0
+        self.stacks: Counter = Counter()
+        self._halt = threading.Event()
+
+    def run(self) -> None:
+        me = threading.get_ident()
+        while not self._halt.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                stack: List[Frame] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                self.samples += 1
+                leaf = stack[0] if stack else None
+                if leaf is None or (os.path.basename(leaf[0]), leaf[2]) in _IDLE_FRAMES:
+                    self.idle += 1
+                    continue
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._halt.set()
+        self.join()
+
+    def summary(self, top_n: int) -> Dict[str, Any]:
+        busy = sum(self.stacks.values())
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for frame in set(stack):
+                total_counts[frame] += count
+
+        def ranked(counts: Counter) -> List[Dict[str, Any]]:
+            return [
+                {
+                    "function": _label(frame),
+                    "self_pct": round(self_counts[frame] / busy * 100, 1),
+                    "total_pct": round(total_counts[frame] / busy * 100, 1),
+                }
+                for frame, _ in counts.most_common(top_n)
+            ]
+
+        return {
+            "mode": "sampling",
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "busy_samples": busy,
+            "idle_samples": self.idle,
+            "top_self": ranked(self_counts) if busy else [],
+            # Frames on every busy stack (thread entry points, the loop) say nothing.
+            "top_total": ranked(Counter({f: c for f, c in total_counts.items() if c < busy})) if busy else [],
+        }
+
+    def write_folded(self, path: str) -> None:
+        """Collapsed-stack format: 'outer;...;leaf count' per line."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(";".join(_label(frame) for frame in stack) + f" {count}\n")
+
+
+def _cprofile_summary(profile: cProfile.Profile, top_n: int) -> Dict[str, Any]:
+    stats = pstats.Stats(profile).stats
+
+    def ranked(index: int) -> List[Dict[str, Any]]:
+        rows = sorted(stats.items(), key=lambda item: item[1][index], reverse=True)[:top_n]
+        return [
+            {
+                "function": _label(func),
+                "calls": primitive_calls,
+                "self_ms": round(self_time * 1000, 2),
+                "total_ms": round(total_time * 1000, 2),
+            }
+            for func, (primitive_calls, _, self_time, total_time, _) in rows
+        ]
+
+    return {
+        "mode": "cprofile",
+        "functions": len(stats),
+        "top_self": ranked(2),
+        "top_total": ranked(3),
+    }
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    # The profiler's own bookkeeping is noise in the ranking.
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+
+
+def _memory_summary(start: tracemalloc.Snapshot, end: tracemalloc.Snapshot, top_n: int) -> Dict[str, Any]:
+    current, peak = tracemalloc.get_traced_memory()
+    growth = [d for d in end.compare_to(start, "lineno") if d.size_diff > 0][:top_n]
+    return {
+        "traced_current_mb": round(current / 1024 ** 2, 2),
+        "traced_peak_mb": round(peak / 1024 ** 2, 2),
+        "top_growth": [
+            {
+                "site": f"{_short_path(d.traceback[0].filename)}:{d.traceback[0].lineno}",
+                "size_kb": round(d.size / 1024, 1),
+                "size_diff_kb": round(d.size_diff / 1024, 1),
+                "count_diff": d.count_diff,
+            }
+            for d in growth
+        ],
+        "top_live": [
+            {
+                "site": f"{_short_path(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+                "size_kb": round(s.size / 1024, 1),
+                "count": s.count,
+            }
+            for s in end.statistics("lineno")[:top_n]
+        ],
+    }
+
+
+class LiveProfiler:
+    """Time-bounded CPU and allocation profiles of the current process, one at a time."""
+
+    def __init__(self, output_dir: str, max_seconds: float = 60.0, interval: float = 0.005):
+        """
+        Args:
+            output_dir: Directory for full profiles written with save=True
+            max_seconds: Longest capture window a caller may request
+            interval: Seconds between stack samples in sampling mode
+        """
+        if max_seconds <= 0 or interval <= 0:
+            raise ValueError("max_seconds and interval must be positive.")
+        self.output_dir = output_dir
+        self.max_seconds = max_seconds
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self.captures = 0
+
+    async def capture(
+        self,
+        seconds: float = 10.0,
+        cpu: str = "sampling",
+        memory: bool = True,
+        top_n: int = 20,
+        save: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Profile the process for `seconds` while it keeps serving requests.
+
+        Args:
+            seconds: Length of the capture window
+            cpu: 'sampling', 'cprofile' or 'off'
+            memory: Also capture tracemalloc snapshots
+            top_n: Entries per ranking in the summary
+            save: Write the full profiles to output_dir
+
+        Returns:
+            Summary with top functions and allocation sites, and the written file paths
+        """
+        if cpu not in CPU_MODES:
+            raise ValueError(f"Unknown cpu mode: {cpu}. Valid options: {list(CPU_MODES)}")
+        if not 0 < seconds <= self.max_seconds:
+            raise ValueError(f"seconds must be in (0, {self.max_seconds}]")
+        if top_n < 1:
+            raise ValueError("top_n must be >= 1")
+        if cpu == "off" and not memory:
+            raise ValueError("Nothing to capture: cpu is 'off' and memory is false.")
+        if self._lock.locked():
+            raise RuntimeError("A profile capture is already running in this process.")
+
+        async with self._lock:
+            started_tracing = False
+            if memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            sampler = profile = None
+            try:
+                start_snapshot = None
+                if memory:
+                    start_snapshot = await asyncio.to_thread(_snapshot)
+                    tracemalloc.reset_peak()
+                if cpu == "sampling":
+                    sampler = _StackSampler(self.interval)
+                    sampler.start()
+                elif cpu == "cprofile":
+                    profile = cProfile.Profile()
+                    profile.enable()
+                began = time.perf_counter()
+                try:
+                    await asyncio.sleep(seconds)
+                finally:
+                    if profile is not None:
+                        profile.disable()
+                    if sampler is not None:
+                        await asyncio.to_thread(sampler.stop)
+                elapsed = time.perf_counter() - began
+                end_snapshot = await asyncio.to_thread(_snapshot) if memory else None
+
+                result: Dict[str, Any] = {"pid": os.getpid(), "seconds": round(elapsed, 3)}
+                if sampler is not None:
+                    result["cpu"] = sampler.summary(top_n)
+                elif profile is not None:
+                    result["cpu"] = _cprofile_summary(profile, top_n)
+                if memory:
+                    result["memory"] = _memory_summary(start_snapshot, end_snapshot, top_n)
+                    result["memory"]["tracing_before_capture"] = not started_tracing
+                if save:
+                    result["files"] = await asyncio.to_thread(self._save, sampler, profile, end_snapshot)
+                self.captures += 1
+                return result
+            finally:
+                if started_tracing:
+                    tracemalloc.stop()
+
+    def _save(self, sampler, profile, snapshot) -> Dict[str, str]:
+        Path(self.output_dir).mkdir(parents=True, exist_ok=True)
+        prefix = os.path.join(self.output_dir, f"profile_{os.getpid()}_{time.strftime('%Y%m%d_%H%M%S')}")
+        files = {}
+        if sampler is not None:
+            files["stacks"] = prefix + ".folded"
+            sampler.write_folded(files["stacks"])
+        if profile is not None:
+            files["pstats"] = prefix + ".prof"
+            profile.dump_stats(files["pstats"])
+        if snapshot is not None:
+            files["tracemalloc"] = prefix + ".tracemalloc"
+            snapshot.dump(files["tracemalloc"])
+        return {kind: os.path.abspath(path) for kind, path in files.items()}
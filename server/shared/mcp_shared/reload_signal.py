@@ -0,0 +1,90 @@
+"""
+Telling running servers that another process wrote to their Chroma directory.
+
+A PersistentClient keeps each collection's HNSW index in memory and only
+applies writes made through its own Chroma system: rows added by another
+process (the ingest watcher, ingest_json_to_chroma.py, ingest.py) show up
+in get() and count(), but queries keep answering from the old index until
+the client is reopened.
+
+Writers call `notify_reload(data_dir)` after their writes are complete;
+this replaces `<data_dir>/reload_signal.json`. Servers hold a
+`ReloadSignal(data_dir)` and check it at the start of each call (one
+stat()); when it fired they swap their client for
+`reopen_persistent_client(client)`. Calls already running on the old
+client (including background jobs) finish on it; its Chroma system is
+released once nothing references it any more.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+RELOAD_SIGNAL_FILE = "reload_signal.json"
+
+
+def signal_path(data_dir: str) -> Path:
+    return Path(data_dir) / RELOAD_SIGNAL_FILE
+
+
+def notify_reload(data_dir: str, source: str = "") -> None:
+    """Tell servers using `data_dir` to reopen their client; call after the writes are done."""
+    path = signal_path(data_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{RELOAD_SIGNAL_FILE}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"written_at": time.time(), "pid": os.getpid(), "source": source}, f)
+    # A new inode per signal, so two signals within one mtime tick still differ.
+    os.replace(tmp, path)
+
+
+class ReloadSignal:
+    """Reports, once per signal, that a writer called notify_reload() for `data_dir`."""
+
+    def __init__(self, data_dir: str):
+        self.path = signal_path(data_dir)
+        self._lock = threading.Lock()
+        self._seen = self._token()
+        self.reloads = 0
+
+    def _token(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def changed(self) -> bool:
+        """True if a signal arrived since the last call (or since construction)."""
+        token = self._token()
+        with self._lock:
+            if token == self._seen:
+                return False
+            self._seen = token
+            self.reloads += 1
+            return True
+
+
+def reopen_persistent_client(client: Any) -> Any:
+    """
+    A new PersistentClient on the same path, with a Chroma system of its own.
+
+    Chroma shares one system per path within a process, so a plain
+    PersistentClient(path) would return the stale one. The old system is
+    only taken out of that cache, not stopped, so calls still using
+    `client` are not cut off.
+
+    Args:
+        client: PersistentClient to replace
+
+    Returns:
+        The new client
+    """
+    import chromadb
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    SharedSystemClient._identifier_to_system.pop(client._identifier, None)
+    return chromadb.PersistentClient(path=client._identifier, settings=client.get_settings())
@@ -0,0 +1,107 @@
+"""Queueing, load shedding and deadlines of the admission gate."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastmcp.exceptions import ToolError
+
+from mcp_shared.admission import AdmissionControl, ToolLimit
+
+
+def call(admission, call_next, tool="search", deadline_ms=None):
+    """Run one tool call through the gate, as FastMCP's middleware chain would."""
+    meta = {"deadline_ms": deadline_ms} if deadline_ms is not None else None
+    context = SimpleNamespace(message=SimpleNamespace(name=tool, meta=meta), fastmcp_context=None)
+    return admission.on_call_tool(context, call_next)
+
+
+def blocked_until(event):
+    async def call_next(context):
+        await event.wait()
+        return "done"
+    return call_next
+
+
+async def answer(context):
+    return "answer"
+
+
+def test_full_queue_rejects_instead_of_waiting():
+    admission = AdmissionControl(ToolLimit(max_in_flight=1, max_queue=1))
+
+    async def main():
+        release = asyncio.Event()
+        running = asyncio.ensure_future(call(admission, blocked_until(release)))
+        queued = asyncio.ensure_future(call(admission, answer))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ToolError, match="Server overloaded"):
+            await call(admission, answer)
+        release.set()
+        return await running, await queued
+
+    assert asyncio.run(main()) == ("done", "answer")
+    stats = admission.stats()["tools"]["search"]
+    assert (stats["rejected"], stats["completed"], stats["in_flight"], stats["waiting"]) == (1, 2, 0, 0)
+
+
+def test_deadline_expires_while_queued_and_while_running():
+    admission = AdmissionControl(ToolLimit(max_in_flight=1, timeout=0.3))
+
+    async def main():
+        never = asyncio.Event()
+        running = asyncio.ensure_future(call(admission, blocked_until(never)))
+        await asyncio.sleep(0.01)
+        # Expires in the queue, well before the running call gives up its slot.
+        with pytest.raises(ToolError, match="waited .* for a free slot"):
+            await call(admission, answer, deadline_ms=50)
+        with pytest.raises(ToolError, match="did not finish"):
+            await running
+
+    asyncio.run(main())
+    stats = admission.stats()
+    assert (stats["tools"]["search"]["timed_out_queued"], stats["tools"]["search"]["timed_out_running"]) == (1, 1)
+    assert stats["timed_out"] == 2
+
+
+@pytest.mark.parametrize("timeout, deadline_ms", [(0.1, 60_000), (60.0, 100)])
+def test_requested_deadline_is_capped_by_the_tool_timeout(timeout, deadline_ms):
+    admission = AdmissionControl(ToolLimit(timeout=timeout))
+
+    async def main():
+        started = time.monotonic()
+        with pytest.raises(ToolError, match="Deadline exceeded"):
+            await call(admission, blocked_until(asyncio.Event()), deadline_ms=deadline_ms)
+        return time.monotonic() - started
+
+    # The shorter of the tool timeout and the client's deadline applies.
+    assert asyncio.run(main()) < 5
+
+
+def test_slot_is_released_after_a_failure_or_cancellation():
+    admission = AdmissionControl(ToolLimit(max_in_flight=1, max_queue=1, timeout=5))
+
+    async def failing(context):
+        raise ValueError("collection not found")
+
+    async def main():
+        with pytest.raises(ValueError):
+            await call(admission, failing)
+        assert await call(admission, answer) == "answer"
+
+        cancelled = asyncio.ensure_future(call(admission, blocked_until(asyncio.Event())))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await asyncio.wait_for(call(admission, answer), 1)
+
+    assert asyncio.run(main()) == "answer"
+    stats = admission.stats()["tools"]["search"]
+    assert (stats["failed"], stats["cancelled"], stats["completed"], stats["in_flight"]) == (1, 1, 2, 0)
+
+
+def test_negative_limits_are_rejected():
+    with pytest.raises(ValueError):
+        AdmissionControl(ToolLimit(max_queue=-1))
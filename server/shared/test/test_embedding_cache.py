@@ -0,0 +1,82 @@
+"""Sharing one embedding cache directory between several processes."""
+
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from mcp_shared.embedding_cache import EmbeddingCache, text_digest
+
+DIMENSION = 8
+
+
+def vector_for(text):
+    """Deterministic stand-in for an embedding model."""
+    rng = np.random.default_rng(int.from_bytes(text_digest(text)[:4], "little"))
+    return rng.standard_normal(DIMENSION).astype(np.float32)
+
+
+def embed(texts):
+    return np.stack([vector_for(text) for text in texts])
+
+
+def open_cache(root, **kwargs):
+    return EmbeddingCache("test-model", revision="r1", cache_dir=str(root), **kwargs)
+
+
+def fill(root, worker, count):
+    open_cache(root).embed([f"worker {worker} chunk {i}" for i in range(count)], embed)
+
+
+def test_rows_written_by_another_process_are_seen(tmp_path):
+    reader, writer = open_cache(tmp_path), open_cache(tmp_path)
+    writer.embed(["leave rules", "fee refund"], embed)
+    assert reader.get_many(["leave rules"])[0] == pytest.approx(vector_for("leave rules"))
+
+    # Growing past the initial capacity swaps in new files; the reader reloads them.
+    texts = [f"chunk {i}" for i in range(3000)]
+    writer.embed(texts, embed)
+    hits = reader.get_many(["fee refund", "chunk 2999"])
+    assert hits[0] == pytest.approx(vector_for("fee refund"))
+    assert hits[1] == pytest.approx(vector_for("chunk 2999"))
+
+
+def test_compaction_by_another_process_never_serves_wrong_vectors(tmp_path):
+    texts = [f"chunk {i}" for i in range(200)]
+    reader = open_cache(tmp_path)
+    open_cache(tmp_path).embed(texts, embed)
+    reader.get_many(texts)
+
+    # Evicts most rows and compacts the rest into new files.
+    small = open_cache(tmp_path, max_bytes=50 * (16 + 8 + 4 * DIMENSION))
+    small.embed(["new text"], embed)
+
+    for text, vector in zip(texts + ["new text"], reader.get_many(texts + ["new text"])):
+        if vector is not None:
+            assert vector == pytest.approx(vector_for(text))
+    assert reader.count == small.count < 201
+
+
+def test_row_with_another_texts_digest_is_a_miss(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.embed(["a", "b"], embed)
+    # A stale index pointing at the wrong row must not return that row's vector.
+    cache._rows[text_digest("a")] = cache._rows[text_digest("b")]
+    assert cache.get_many(["a"]) == [None]
+
+
+def test_concurrent_writers_lose_no_rows(tmp_path):
+    # Spawned, not forked: a fork can copy a lock held by another test's background thread.
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=fill, args=(tmp_path, w, 700)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=120)
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    cache = open_cache(tmp_path)
+    assert cache.count == 2800
+    texts = [f"worker {w} chunk {i}" for w in range(4) for i in (0, 699)]
+    for text, vector in zip(texts, cache.get_many(texts)):
+        assert vector == pytest.approx(vector_for(text))